@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['client', 'backend_user32', 'movements', 'recording', 'pynput', 'pynput.mouse', 'pynput.keyboard', 'pynput._util', 'pyautogui'],
+    hiddenimports=['client', 'backend_user32', 'movements', 'recording', 'timed_queue', 'ring', 'profiling', 'debuglog', 'catalog', 'sqlite3', 'backend_memory', 'fidelity', 'rawinput', 'timeline', 'archive', 'stress', 'display', 'win32', 'preview', 'jobs', 'daemon', 'journal', 'plancache', 'accel', 'pynput', 'pynput.mouse', 'pynput.keyboard', 'pynput._util', 'pyautogui'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,246 @@
+"""
+Pointer-acceleration compensation for relative playback.
+Hook recordings store cursor deltas, i.e. motion after Windows applied
+"Enhance pointer precision"; injecting them through MouClass applies the curve
+a second time and the cursor overshoots. calibrate() measures the active curve
+(device counts per event -> cursor pixels per event), InverseLUT inverts it,
+and compensate_events() rewrites the move deltas once, when the playback
+events are compiled, so playback itself does no extra work per event.
+Raw Input recordings already hold device counts and need no compensation.
+Apart from run_calibration() everything here is pure and runs offline
+against synthetic curves (AccelCurve.from_function).
+"""
+
+import bisect
+import ctypes
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+CALIBRATION_PATH = Path(__file__).resolve().parent / "accel_calibration.json"
+CALIBRATION_VERSION = 1
+
+# Per-event magnitudes (counts) measured by calibrate(); 64 * 8 repeats = 512 px runs
+CALIBRATION_MAGNITUDES = (1, 2, 3, 4, 5, 6, 8, 10, 12, 16, 20, 24, 32, 40, 48, 64)
+CALIBRATION_REPEATS = 8
+CALIBRATION_INTERVAL_MS = 8  # 125 Hz, a common mouse report rate
+CALIBRATION_SETTLE_MS = 30
+
+DEFAULT_LUT_SIZE = 256  # output magnitudes tabulated; larger ones go through the curve
+
+SPI_GETMOUSE = 0x0003
+SPI_GETMOUSESPEED = 0x0070
+
+
+def magnitude(dx: float, dy: float) -> float:
+    """Speed measure of Windows' pointer ballistics: max(|dx|, |dy|) + min(|dx|, |dy|) / 2."""
+    ax, ay = abs(dx), abs(dy)
+    return max(ax, ay) + min(ax, ay) / 2
+
+
+def pointer_settings() -> Optional[dict]:
+    """Current mouse thresholds, "Enhance pointer precision" and pointer speed (None off Windows)."""
+    if sys.platform != "win32":
+        return None
+    spi = ctypes.windll.user32.SystemParametersInfoW
+    mouse = (ctypes.c_int * 3)()
+    speed = ctypes.c_int()
+    if not spi(SPI_GETMOUSE, 0, mouse, 0) or not spi(SPI_GETMOUSESPEED, 0, ctypes.byref(speed), 0):
+        return None
+    return {"threshold1": mouse[0], "threshold2": mouse[1], "acceleration": mouse[2], "speed": speed.value}
+
+
+class AccelCurve:
+    """
+    Non-decreasing piecewise-linear map from input magnitude (counts per
+    event) to output magnitude (pixels per event) through (0, 0). Past the
+    last point the last segment's slope continues. settings records the
+    pointer_settings() the curve was measured under.
+    """
+
+    def __init__(self, points: Iterable[tuple[float, float]], settings: Optional[dict] = None) -> None:
+        merged = [(0.0, 0.0)]
+        for i, o in sorted((float(i), float(o)) for i, o in points if i > 0):
+            o = max(o, merged[-1][1])
+            if i == merged[-1][0]:
+                merged[-1] = (i, o)
+            else:
+                merged.append((i, o))
+        if len(merged) < 2:
+            raise ValueError("curve needs a point with input > 0")
+        self.points = merged
+        self.settings = settings
+        self._inputs = [i for i, _ in merged]
+        self._outputs = [o for _, o in merged]
+
+    @classmethod
+    def linear(cls, gain: float) -> "AccelCurve":
+        return cls([(1, gain)])
+
+    @classmethod
+    def from_function(cls, fn: Callable[[float], float], magnitudes: Iterable[float] = CALIBRATION_MAGNITUDES) -> "AccelCurve":
+        """Sample a synthetic curve fn(input) -> output (offline tests, simulated backends)."""
+        return cls([(m, fn(m)) for m in magnitudes])
+
+    @classmethod
+    def fit(cls, samples: Iterable[tuple[float, float]], settings: Optional[dict] = None) -> "AccelCurve":
+        """Curve through the median output measured at each input magnitude."""
+        by_input: dict[float, list[float]] = {}
+        for i, o in samples:
+            by_input.setdefault(float(i), []).append(float(o))
+        return cls([(i, statistics.median(v)) for i, v in by_input.items()], settings)
+
+    def _segment(self, k: int) -> tuple[float, float, float, float]:
+        k = min(max(k, 1), len(self.points) - 1)
+        (i0, o0), (i1, o1) = self.points[k - 1], self.points[k]
+        return i0, o0, i1, o1
+
+    def output(self, s: float) -> float:
+        i0, o0, i1, o1 = self._segment(bisect.bisect_right(self._inputs, abs(s)))
+        return o0 + (abs(s) - i0) * (o1 - o0) / (i1 - i0)
+
+    def input_for(self, out: float) -> float:
+        """Smallest input magnitude whose output reaches out (inverse of output)."""
+        out = abs(out)
+        if out == 0:
+            return 0.0
+        k = bisect.bisect_left(self._outputs, out)
+        if k >= len(self.points):
+            k = len(self.points) - 1
+            i0, o0, i1, o1 = self._segment(k)
+            if o1 <= o0:
+                return i1  # flat top: nothing reaches further
+        else:
+            i0, o0, i1, o1 = self._segment(k)
+        return i0 + (out - o0) * (i1 - i0) / (o1 - o0)
+
+    def matches_system(self) -> bool:
+        """False if the pointer settings changed since calibration (re-calibrate)."""
+        current = pointer_settings()
+        return current is None or self.settings is None or current == self.settings
+
+    def to_dict(self) -> dict:
+        return {"version": CALIBRATION_VERSION, "points": self.points[1:], "settings": self.settings}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AccelCurve":
+        return cls([tuple(p) for p in data["points"]], data.get("settings"))
+
+
+class InverseLUT:
+    """
+    Input magnitude needed for each integer output magnitude below size,
+    interpolated in between; larger outputs are inverted through the curve.
+    """
+
+    def __init__(self, curve: AccelCurve, size: int = DEFAULT_LUT_SIZE) -> None:
+        self.curve = curve
+        self.table = [curve.input_for(m) for m in range(max(2, size))]
+
+    def input_for(self, out: float) -> float:
+        out = abs(out)
+        i = int(out)
+        if i + 1 >= len(self.table):
+            return self.curve.input_for(out)
+        lo = self.table[i]
+        return lo + (out - i) * (self.table[i + 1] - lo)
+
+
+def compensate_events(events: Iterable[dict], lut: InverseLUT) -> Iterator[dict]:
+    """
+    Rewrite move deltas so that after acceleration the cursor travels the
+    recorded deltas. Each move's wanted output (recorded delta plus carried
+    error) is scaled by the inverse table and rounded to counts; the part the
+    curve predicts those counts miss carries into the next move, so rounding
+    does not build up into drift. Anchors reset the carry; other events pass
+    through unchanged.
+    """
+    curve = lut.curve
+    carry_x = carry_y = 0.0
+    for ev in events:
+        ev_type = ev.get("type")
+        if ev_type == "anchor":
+            carry_x = carry_y = 0.0
+        if ev_type != "move":
+            yield ev
+            continue
+        want_x = ev.get("dx", 0) + carry_x
+        want_y = ev.get("dy", 0) + carry_y
+        m = magnitude(want_x, want_y)
+        nx = ny = 0
+        if m > 0:
+            scale = lut.input_for(m) / m
+            nx, ny = round(want_x * scale), round(want_y * scale)
+        n = magnitude(nx, ny)
+        gain = curve.output(n) / n if n else 0.0
+        carry_x = want_x - nx * gain
+        carry_y = want_y - ny * gain
+        yield dict(ev, dx=nx, dy=ny)
+
+
+def calibrate(
+    backend,
+    cursor_pos: Callable[[], tuple[int, int]],
+    magnitudes: Iterable[int] = CALIBRATION_MAGNITUDES,
+    repeats: int = CALIBRATION_REPEATS,
+    interval_ms: float = CALIBRATION_INTERVAL_MS,
+    settle_ms: float = CALIBRATION_SETTLE_MS,
+    sleep: Callable[[float], None] = time.sleep,
+    settings: Optional[dict] = None,
+    park: Optional[Callable[[], None]] = None,
+) -> AccelCurve:
+    """
+    Measure the active curve: for each magnitude inject `repeats` moves of
+    (+m, 0), interval_ms apart, then the same back, then (0, +m) and back,
+    reading the cursor before and after each run; output per event = pixels
+    travelled along the run's axis / repeats. Both axes feed one curve (Windows
+    accelerates the combined magnitude). park(), if given, re-centres the cursor
+    before each run; either way it should stay away from screen edges
+    (clipping shortens runs). Raises RuntimeError if the backend rejects a move.
+    """
+    samples = []
+    for m in magnitudes:
+        for axis in (0, 1):
+            for sign in (1, -1):
+                if park is not None:
+                    park()
+                start = cursor_pos()
+                dx, dy = (sign * m, 0) if axis == 0 else (0, sign * m)
+                for _ in range(repeats):
+                    if not backend.move_mouse(dx, dy):
+                        raise RuntimeError(f"calibration move failed (error {backend.get_last_error()})")
+                    sleep(interval_ms / 1000)
+                sleep(settle_ms / 1000)
+                end = cursor_pos()
+                samples.append((m, abs(end[axis] - start[axis]) / repeats))
+    return AccelCurve.fit(samples, settings)
+
+
+def run_calibration(backend, path: Optional[Path] = CALIBRATION_PATH) -> AccelCurve:
+    """Calibrate on the primary monitor (cursor parked at its centre before each run) and save the curve to path."""
+    from display import get_display_service
+    display = get_display_service()
+    rect = display.primary().rect
+    centre = (rect.left + rect.width // 2, rect.top + rect.height // 2)
+    park = (lambda: backend.move_to(*centre)) if hasattr(backend, "move_to") else None
+    curve = calibrate(backend, display.cursor_pos, settings=pointer_settings(), park=park)
+    if path is not None:
+        save_calibration(curve, path)
+    return curve
+
+
+def save_calibration(curve: AccelCurve, path: Path = CALIBRATION_PATH) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(curve.to_dict(), f, indent=2)
+
+
+def load_calibration(path: Path = CALIBRATION_PATH) -> Optional[AccelCurve]:
+    """Saved curve, or None if there is none (or it is unreadable)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return AccelCurve.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
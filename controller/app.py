@@ -2,6 +2,8 @@
 InputHog Control — GUI for testing kernel-mode mouse injection.
 """
 
+import multiprocessing
+import os
 import sys
 import threading
 import traceback
@@ -10,10 +12,20 @@ from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 
+from accel import CALIBRATION_PATH, InverseLUT, compensate_events, load_calibration, run_calibration
 from client import InputHogClient, ERROR_CODES
 from backend_user32 import User32Backend
-from movements import test_square, test_circle, test_triangle, test_line, test_random_drag, move
-from recording import MouseRecorder, save_recording, load_recording, play_recording
+from movements import test_square, test_circle, test_triangle, test_line, test_random_drag, move, pattern_events
+from recording import MouseRecorder, ANCHOR_INTERVAL_MS, RECORDING_VERSION, read_header, save_recording, play_recording
+from catalog import Catalog, describe
+from plancache import CACHE_DIR, CompiledPlan, PlanCache
+from jobs import FAILED, RUNNING, Job, JobExecutor
+from preview import decimate_path, describe_stats, fit_to_canvas
+from rawinput import RawMouseCapture
+from stress import StressTest
+from timeline import TimelineScheduler
+import debuglog
+import profiling
 
 # Log file for debugging (next to exe, or current dir)
 def _log_path() -> Path:
@@ -22,6 +34,20 @@ def _log_path() -> Path:
     return Path.cwd() / "inputhog_debug.log"
 
 
+def _calibration_path() -> Path:
+    """Acceleration calibration: next to exe when frozen, else controller/accel_calibration.json."""
+    if getattr(sys, "frozen", False):
+        return Path(sys.executable).parent / CALIBRATION_PATH.name
+    return CALIBRATION_PATH
+
+
+def _plan_cache_dir() -> Path:
+    """Compiled plan cache: next to exe when frozen, else controller/plan_cache/."""
+    if getattr(sys, "frozen", False):
+        return Path(sys.executable).parent / CACHE_DIR.name
+    return CACHE_DIR
+
+
 def _recordings_dir() -> Path:
     """Recordings folder: next to exe when frozen, else controller/recordings/."""
     if getattr(sys, "frozen", False):
@@ -33,19 +59,26 @@ def _recordings_dir() -> Path:
     return folder
 
 def _log(msg: str) -> None:
-    try:
-        with open(_log_path(), "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    """Queue a line for inputhog_debug.log; the file is written by debuglog's background thread."""
+    debuglog.log(msg)
 
 def _excepthook(exc_type, exc_value, exc_tb):
     tb = "".join(traceback.format_exception(exc_type, exc_value, exc_tb))
     _log(f"Uncaught exception:\n{tb}")
+    debuglog.flush()
     sys.__excepthook__(exc_type, exc_value, exc_tb)
 
 sys.excepthook = _excepthook
 
+debuglog.configure(_log_path())
+
+# Profile files go next to inputhog_debug.log
+profiling.configure(os.environ.get(profiling.ENV_VAR), _log_path().parent)
+
+
+PREVIEW_WIDTH, PREVIEW_HEIGHT = 360, 140
+RECORD_POLL_MS = 250
+
 
 def _fmt_ntstatus(status: int) -> str:
     return f"0x{status & 0xFFFFFFFF:08X}"
@@ -65,13 +98,26 @@ class InputHogApp:
         self.error_count = 0
         self.last_move = (0, 0)
         self._last_error_msg = ""
-        self._busy = False
         self._recorder = MouseRecorder()
         self._current_recording: list[dict] | None = None
+        self._current_source: tuple[Path, str] | None = None  # (file, sha256) the recording was loaded from
+        self._current_mouse_source = ""  # "raw" / "hook" (MouseRecorder.mouse_source); "" if unknown
         self._recording = False
+        self._load_cancel: threading.Event | None = None  # set while a background load runs
+        self._catalog = Catalog(_recordings_dir())
+        self._library: list[dict] = []
+        self._timelines = TimelineScheduler(self.client, on_event=self._on_timeline_event)
+        self._timeline_poll_active = False
+        self._jobs = JobExecutor(on_update=self._post_job_update)
+        self._stress_job: Job | None = None
+        self._accel_lut: InverseLUT | None = None
+        self._compiled: tuple = (None, None, None)  # (source events, InverseLUT, compensated events)
+        self._compensating = False  # set while a worker compensates for a pending Play
+        self._plans = PlanCache(_plan_cache_dir())
 
         self._build_ui()
         self._on_mode_changed()
+        self._refresh_library()
 
     def _build_ui(self) -> None:
         pad = {"padx": 12, "pady": 6}
@@ -137,7 +183,27 @@ class InputHogApp:
         btn_frame2 = ttk.Frame(test_frame)
         btn_frame2.pack(fill=tk.X, pady=(6, 0))
         self.btn_random_drag = ttk.Button(btn_frame2, text="Random Drag (right-click)", command=self._on_random_drag)
-        self.btn_random_drag.pack(side=tk.LEFT)
+        self.btn_random_drag.pack(side=tk.LEFT, padx=(0, 6))
+        self.btn_stress = ttk.Button(btn_frame2, text="Stress test", command=self._on_stress_test)
+        self.btn_stress.pack(side=tk.LEFT)
+
+        # Third row: run patterns / playback side by side on the timeline scheduler
+        btn_frame3 = ttk.Frame(test_frame)
+        btn_frame3.pack(fill=tk.X, pady=(6, 0))
+        self.concurrent_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(btn_frame3, text="Run concurrently", variable=self.concurrent_var).pack(side=tk.LEFT, padx=(0, 6))
+        self.btn_cancel_timelines = ttk.Button(btn_frame3, text="Cancel all", command=self._on_cancel_timelines, state=tk.DISABLED)
+        self.btn_cancel_timelines.pack(side=tk.LEFT, padx=(0, 6))
+        self.timelines_label = ttk.Label(btn_frame3, text="", foreground="gray")
+        self.timelines_label.pack(side=tk.LEFT)
+
+        # Fourth row: queued jobs (everything not run concurrently goes through one worker)
+        btn_frame4 = ttk.Frame(test_frame)
+        btn_frame4.pack(fill=tk.X, pady=(6, 0))
+        self.btn_cancel_jobs = ttk.Button(btn_frame4, text="Cancel jobs", command=self._on_cancel_jobs, state=tk.DISABLED)
+        self.btn_cancel_jobs.pack(side=tk.LEFT, padx=(0, 6))
+        self.jobs_label = ttk.Label(btn_frame4, text="", foreground="gray")
+        self.jobs_label.pack(side=tk.LEFT)
 
         # Custom move
         move_frame = ttk.LabelFrame(self.root, text="Custom Move", padding=8)
@@ -164,6 +230,14 @@ class InputHogApp:
         self.btn_record.pack(side=tk.LEFT, padx=(0, 6))
         self.btn_stop = ttk.Button(rec_row1, text="Stop", command=self._on_stop_record, state=tk.DISABLED)
         self.btn_stop.pack(side=tk.LEFT, padx=(0, 6))
+        self.raw_input_var = tk.BooleanVar(value=RawMouseCapture.is_available())
+        self.chk_raw_input = ttk.Checkbutton(rec_row1, text="Raw Input", variable=self.raw_input_var)
+        self.chk_raw_input.pack(side=tk.LEFT, padx=(0, 6))
+        if not RawMouseCapture.is_available():
+            self.chk_raw_input.config(state=tk.DISABLED)
+        self.anchors_var = tk.BooleanVar(value=False)
+        self.chk_anchors = ttk.Checkbutton(rec_row1, text="Anchors", variable=self.anchors_var)
+        self.chk_anchors.pack(side=tk.LEFT, padx=(0, 6))
         self.rec_status_label = ttk.Label(rec_row1, text="", foreground="gray")
         self.rec_status_label.pack(side=tk.LEFT)
         rec_row2 = ttk.Frame(rec_frame)
@@ -174,14 +248,41 @@ class InputHogApp:
         self.btn_load.pack(side=tk.LEFT, padx=(0, 6))
         self.btn_play = ttk.Button(rec_row2, text="Play", command=self._on_play_recording)
         self.btn_play.pack(side=tk.LEFT, padx=(0, 6))
+        self.accel_comp_var = tk.BooleanVar(value=False)
+        self.chk_accel_comp = ttk.Checkbutton(rec_row2, text="Accel comp", variable=self.accel_comp_var)
+        self.chk_accel_comp.pack(side=tk.LEFT, padx=(0, 6))
+        self.btn_calibrate = ttk.Button(rec_row2, text="Calibrate", command=self._on_calibrate)
+        self.btn_calibrate.pack(side=tk.LEFT, padx=(0, 6))
         self.btn_export_exe = ttk.Button(rec_row2, text="Export as .exe", command=self._on_export_exe)
         self.btn_export_exe.pack(side=tk.LEFT)
+        rec_row3 = ttk.Frame(rec_frame)
+        rec_row3.pack(fill=tk.X, pady=(6, 0))
+        ttk.Label(rec_row3, text="Library:").pack(side=tk.LEFT, padx=(0, 4))
+        self.library_var = tk.StringVar()
+        self.library_combo = ttk.Combobox(rec_row3, textvariable=self.library_var, state="readonly", width=28)
+        self.library_combo.pack(side=tk.LEFT, padx=(0, 6))
+        self.library_combo.bind("<<ComboboxSelected>>", lambda e: self._on_library_selected())
+        self.btn_load_selected = ttk.Button(rec_row3, text="Load selected", command=self._on_load_selected)
+        self.btn_load_selected.pack(side=tk.LEFT)
+        self.library_info_label = ttk.Label(rec_frame, text="", foreground="gray")
+        self.library_info_label.pack(anchor=tk.W, pady=(4, 0))
+        self.preview_canvas = tk.Canvas(
+            rec_frame, width=PREVIEW_WIDTH, height=PREVIEW_HEIGHT, background="white", highlightthickness=1,
+        )
+        self.preview_canvas.pack(anchor=tk.W, pady=(6, 0))
 
         # Feedback
         fb_frame = ttk.Frame(self.root)
         fb_frame.pack(fill=tk.X, **pad)
         self.fb_label = ttk.Label(fb_frame, text="Last: —  |  Errors: 0")
         self.fb_label.pack(anchor=tk.W)
+        self.profile_var = tk.BooleanVar(value=profiling.enabled())
+        ttk.Checkbutton(
+            fb_frame,
+            text="Profile (writes inputhog_profile_* next to the log)",
+            variable=self.profile_var,
+            command=self._on_profile_toggled,
+        ).pack(anchor=tk.W)
 
         # Instructions (when disconnected)
         self.help_text = tk.Text(self.root, height=5, width=45, wrap=tk.WORD, state=tk.DISABLED, font=("Segoe UI", 9))
@@ -207,8 +308,8 @@ class InputHogApp:
             self._update_help()
 
     def _check_connection(self) -> None:
-        if self._busy:
-            return
+        if self._jobs.current() is not None:
+            return  # a job is using the open handle
         if not self._use_driver:
             self._on_mode_changed()
             return
@@ -264,6 +365,7 @@ class InputHogApp:
             self.btn_triangle.config(state=tk.NORMAL)
             self.btn_line.config(state=tk.NORMAL)
             self.btn_random_drag.config(state=tk.NORMAL)
+            self.btn_stress.config(state=tk.NORMAL)
             self.btn_move.config(state=tk.NORMAL)
             self._refresh_driver_status()
         else:
@@ -276,6 +378,7 @@ class InputHogApp:
             self.btn_triangle.config(state=tk.DISABLED)
             self.btn_line.config(state=tk.DISABLED)
             self.btn_random_drag.config(state=tk.DISABLED)
+            self.btn_stress.config(state=tk.DISABLED)
             self.btn_move.config(state=tk.DISABLED)
         self._update_recording_buttons()
 
@@ -283,16 +386,26 @@ class InputHogApp:
         if self._recording:
             self.btn_record.config(state=tk.DISABLED)
             self.btn_stop.config(state=tk.NORMAL)
+            self.chk_raw_input.config(state=tk.DISABLED)
+            self.chk_anchors.config(state=tk.DISABLED)
             self.btn_save.config(state=tk.DISABLED)
             self.btn_load.config(state=tk.DISABLED)
+            self.btn_load_selected.config(state=tk.DISABLED)
             self.btn_play.config(state=tk.DISABLED)
+            self.btn_calibrate.config(state=tk.DISABLED)
             self.btn_export_exe.config(state=tk.DISABLED)
         else:
             self.btn_record.config(state=tk.NORMAL)
             self.btn_stop.config(state=tk.DISABLED)
+            self.chk_raw_input.config(state=tk.NORMAL if RawMouseCapture.is_available() else tk.DISABLED)
+            self.chk_anchors.config(state=tk.NORMAL)
             self.btn_save.config(state=tk.NORMAL if self._current_recording else tk.DISABLED)
             self.btn_load.config(state=tk.NORMAL)
-            self.btn_play.config(state=tk.NORMAL if (self._current_recording and self.connected) else tk.DISABLED)
+            loading = self._load_cancel is not None
+            self.btn_load_selected.config(state=tk.NORMAL if (self._library and not loading) else tk.DISABLED)
+            busy = loading or self._compensating
+            self.btn_play.config(state=tk.NORMAL if (self._current_recording and self.connected and not busy) else tk.DISABLED)
+            self.btn_calibrate.config(state=tk.NORMAL if self.connected else tk.DISABLED)
             self.btn_export_exe.config(state=tk.NORMAL if self._current_recording else tk.DISABLED)
 
     def _update_help(self) -> None:
@@ -310,16 +423,41 @@ class InputHogApp:
 
     def _on_record(self) -> None:
         self._recording = True
+        self._recorder.raw_input = self.raw_input_var.get()
+        self._recorder.anchor_interval_ms = ANCHOR_INTERVAL_MS if self.anchors_var.get() else 0
         self._recorder.start()
-        self.rec_status_label.config(text="Recording... move mouse, click, type")
+        source = "raw input" if self._recorder.mouse_source == "raw" else "hook"
+        self.rec_status_label.config(text=f"Recording ({source})... move mouse, click, type")
         self._update_recording_buttons()
+        self.root.after(RECORD_POLL_MS, self._poll_recording)
+
+    def _poll_recording(self) -> None:
+        """Live counters and path while recording; both are kept up to date by the recorder."""
+        if not self._recording:
+            return
+        self.rec_status_label.config(text=describe_stats(self._recorder.get_stats()))
+        self._draw_preview(*self._recorder.get_path_points())
+        self.root.after(RECORD_POLL_MS, self._poll_recording)
+
+    def _draw_preview(self, points: list[tuple[int, int]], bbox: tuple[int, int, int, int]) -> None:
+        canvas = self.preview_canvas
+        canvas.delete("all")
+        coords = fit_to_canvas(points, bbox, PREVIEW_WIDTH, PREVIEW_HEIGHT)
+        if len(coords) >= 4:
+            canvas.create_line(*coords, fill="#1f6fd0")
+        if coords:
+            canvas.create_oval(coords[0] - 3, coords[1] - 3, coords[0] + 3, coords[1] + 3, outline="green")
+            canvas.create_oval(coords[-2] - 3, coords[-1] - 3, coords[-2] + 3, coords[-1] + 3, outline="red")
 
     def _on_stop_record(self) -> None:
         self._recording = False
         events = self._recorder.stop()
         self._current_recording = events
-        n = len(events)
-        self.rec_status_label.config(text=f"Recorded {n} events")
+        self._current_source = None
+        self._current_mouse_source = self._recorder.mouse_source
+        stats = self._recorder.get_stats()
+        self.rec_status_label.config(text=f"Recorded {len(events)} events, peak {stats['peak_rate']}/s")
+        self._draw_preview(*self._recorder.get_path_points())
         self._update_recording_buttons()
 
     def _on_save_recording(self) -> None:
@@ -333,36 +471,260 @@ class InputHogApp:
         )
         if path:
             try:
-                save_recording(self._current_recording, Path(path))
+                save_recording(self._current_recording, Path(path), self._current_mouse_source)
                 self.rec_status_label.config(text=f"Saved to {Path(path).name}")
+                self._refresh_library()
             except Exception as e:
                 messagebox.showerror("Save failed", str(e))
 
     def _on_load_recording(self) -> None:
+        if self._load_cancel is not None:
+            self._load_cancel.set()
+            return
         path = filedialog.askopenfilename(
             initialdir=_recordings_dir(),
-            filetypes=[("InputHog Recording", "*.json"), ("All files", "*.*")],
+            filetypes=[("InputHog Recording", "*.json *.ihar"), ("All files", "*.*")],
             title="Load recording",
         )
         if path:
+            self._start_load(Path(path))
+
+    def _on_load_selected(self) -> None:
+        entry = self._selected_library_entry()
+        if entry is not None and self._load_cancel is None:
+            self._start_load(self._catalog.directory / entry["name"])
+
+    def _start_load(self, path: Path) -> None:
+        """Parse a recording on a worker thread; the Load button becomes Cancel meanwhile."""
+        cancel = threading.Event()
+        self._load_cancel = cancel
+        self.btn_load.config(text="Cancel load")
+        self.btn_play.config(state=tk.DISABLED)
+        self.btn_load_selected.config(state=tk.DISABLED)
+        self.rec_status_label.config(text=f"Loading {path.name}...")
+        lut = self._accel_lut if self.accel_comp_var.get() else None  # compensate up front when already calibrated
+        last_pct = [-1]
+
+        def on_progress(done: int, total: int) -> None:
+            pct = done * 100 // total if total else 100
+            if pct != last_pct[0]:
+                last_pct[0] = pct
+                self.root.after(0, lambda p=pct: self.rec_status_label.config(text=f"Loading... {p}%"))
+
+        def worker():
+            events: list[dict] = []
+            try:
+                # A cached plan is mapped instead of parsed; otherwise the plan is stored once fully read
+                stream = self._plans.stream(path, on_progress=on_progress)
+                cached = isinstance(stream, CompiledPlan)
+                try:
+                    for ev in stream:
+                        if cancel.is_set():
+                            break
+                        events.append(ev)
+                finally:
+                    stream.close()  # unmap the plan: the events are copied out
+                source = (path, self._plans.source_digest(path))
+            except Exception as e:
+                _log(f"Load failed: {path}: {e}")
+                self.root.after(0, lambda m=str(e): self._on_load_done(None, m))
+                return
+            if cancel.is_set():
+                self.root.after(0, lambda: self._on_load_done(None, ""))
+                return
+            mouse_source = read_header(path).get("mouse_source", "")
+            compiled = None
+            if lut is not None and mouse_source != "raw":
+                try:
+                    compiled = (events, lut, self._compensate(events, source, lut))
+                except Exception as e:
+                    _log(f"Compensation failed: {path}: {e}")
+            preview = decimate_path(events)  # off the UI thread: large files take a moment
+            self.root.after(0, lambda: self._on_load_done(events, "", preview, source, cached, mouse_source, compiled))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_load_done(
+        self,
+        events: list[dict] | None,
+        error: str,
+        preview=None,
+        source: tuple[Path, str] | None = None,
+        cached: bool = False,
+        mouse_source: str = "",
+        compiled: tuple | None = None,
+    ) -> None:
+        self._load_cancel = None
+        self.btn_load.config(text="Load recording")
+        if error:
+            self.rec_status_label.config(text="Load failed")
+            messagebox.showerror("Load failed", error)
+        elif events is None:
+            self.rec_status_label.config(text="Load cancelled")
+        else:
+            self._current_recording = events
+            self._current_source = source
+            self._current_mouse_source = mouse_source
+            if compiled is not None:
+                self._compiled = compiled
+            self.rec_status_label.config(text=f"Loaded {len(events)} events" + (" (cached plan)" if cached else ""))
+            if preview is not None:
+                self._draw_preview(*preview)
+        self._update_recording_buttons()
+
+    def _refresh_library(self) -> None:
+        """Re-index the recordings folder in the background, then repopulate the list."""
+        def worker():
             try:
-                self._current_recording = load_recording(Path(path))
-                n = len(self._current_recording)
-                self.rec_status_label.config(text=f"Loaded {n} events")
-                self._update_recording_buttons()
+                self._catalog.refresh()
+                entries = self._catalog.entries()
             except Exception as e:
-                messagebox.showerror("Load failed", str(e))
+                _log(f"Catalog refresh failed: {e}")
+                return
+            self.root.after(0, lambda: self._on_library_ready(entries))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_library_ready(self, entries: list[dict]) -> None:
+        self._library = entries
+        names = [e["name"] for e in entries]
+        self.library_combo.config(values=names)
+        if names and self.library_var.get() not in names:
+            self.library_var.set(names[0])
+        self._on_library_selected()
+        self._update_recording_buttons()
+
+    def _selected_library_entry(self) -> dict | None:
+        name = self.library_var.get()
+        return next((e for e in self._library if e["name"] == name), None)
+
+    def _on_library_selected(self) -> None:
+        entry = self._selected_library_entry()
+        self.library_info_label.config(text=describe(entry) if entry else "")
+
+    def _compensation_lut(self) -> InverseLUT | None:
+        """
+        The calibration's inverse table. None (after telling the user) if there
+        is no calibration or the pointer settings changed since it was measured.
+        """
+        if self._accel_lut is None:
+            curve = load_calibration(_calibration_path())
+            if curve is None:
+                messagebox.showinfo("No calibration", "Click Calibrate first (pointer acceleration is measured once).")
+                return None
+            self._accel_lut = InverseLUT(curve)
+        if not self._accel_lut.curve.matches_system():
+            messagebox.showinfo("Calibration out of date", "Pointer settings changed since calibration. Click Calibrate again.")
+            return None
+        return self._accel_lut
+
+    def _compensate(self, events: list[dict], source: tuple[Path, str] | None, lut: InverseLUT) -> list[dict]:
+        """
+        Compensated copy of events, from the plan cache when they came unchanged
+        from a file. Worker threads only: a cache miss compiles the whole file.
+        """
+        compiled = self._cached_plan(source, lut.curve)
+        if compiled is None:
+            compiled = list(compensate_events(events, lut))
+        return compiled
+
+    def _cached_plan(self, source: tuple[Path, str] | None, curve) -> list[dict] | None:
+        """
+        Events of the compiled plan of the file source = (path, sha256) names,
+        if that file is unchanged. Copied out so the plan is not left mapped.
+        """
+        if source is None:
+            return None
+        path, digest = source
+        try:
+            if self._plans.source_digest(path) != digest:
+                return None
+            with self._plans.compile(path, curve) as plan:
+                return plan.to_events()
+        except (OSError, ValueError) as e:
+            _log(f"Plan cache: {path}: {e}")
+            return None
+
+    def _on_calibrate(self) -> None:
+        if not self.connected:
+            return
+
+        def do(job: Job):
+            curve = run_calibration(job.backend(self._backend()), _calibration_path())
+            self._accel_lut = InverseLUT(curve)
+            self._compiled = (None, None, None)
+            points = len(curve.points) - 1
+            self.root.after(0, lambda: self.rec_status_label.config(text=f"Calibrated ({points} points)"))
+            return curve
+
+        self._jobs.submit(do, "calibrate")
 
     def _on_play_recording(self) -> None:
         if not self.connected or not self._current_recording:
             return
-        def do():
+        events = self._current_recording
+        # Raw Input recordings hold device counts, which acceleration has not touched
+        if self.accel_comp_var.get() and self._current_mouse_source != "raw":
+            lut = self._compensation_lut()
+            if lut is None:
+                return
+            source, compiled_lut, compiled = self._compiled
+            if source is not events or compiled_lut is not lut:
+                self._start_compensation(events, lut)
+                return
+            events = compiled
+        self._play(events)
+
+    def _start_compensation(self, events: list[dict], lut: InverseLUT) -> None:
+        """Compensate the recording on a worker thread, then play it."""
+        self._compensating = True
+        self._update_recording_buttons()
+        self.rec_status_label.config(text="Compensating for pointer acceleration...")
+        source = self._current_source
+
+        def worker():
+            try:
+                compiled = self._compensate(events, source, lut)
+            except Exception as e:
+                _log(f"Compensation failed: {e}")
+                self.root.after(0, lambda m=str(e): self._on_compensated(events, lut, None, m))
+                return
+            self.root.after(0, lambda: self._on_compensated(events, lut, compiled, ""))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_compensated(self, events: list[dict], lut: InverseLUT, compiled: list[dict] | None, error: str) -> None:
+        self._compensating = False
+        self._update_recording_buttons()
+        if error:
+            self.rec_status_label.config(text="Compensation failed")
+            messagebox.showerror("Compensation failed", error)
+            return
+        self._compiled = (events, lut, compiled)
+        # Play only if the recording is still the one Play was clicked for
+        if events is self._current_recording and self.connected:
+            self.rec_status_label.config(text=f"Compensated {len(compiled)} events")
+            self._play(compiled)
+
+    def _play(self, events: list[dict]) -> None:
+        if self.concurrent_var.get():
+            self._add_timeline("recording", list(events))
+            return
+
+        def do(job: Job) -> int:
+            total = len(events)
+            played = 0
+
             def on_ev(ev: dict, ok: bool) -> None:
-                pass  # could update UI
-            success = play_recording(self._backend(), self._current_recording, on_ev)
-            self.root.after(0, lambda: self.rec_status_label.config(text=f"Played {success}/{len(self._current_recording)} events"))
+                nonlocal played
+                played += 1
+                job.track_event(ev, ok)
+                job.report(played, total)
+            success = play_recording(job.backend(self._backend()), events, on_ev, cancel=job.cancel_event)
+            self.root.after(0, lambda: self.rec_status_label.config(text=f"Played {success}/{total} events"))
+            return success
 
-        self._run_in_thread(do)
+        self._jobs.submit(do, "playback")
 
     def _on_export_exe(self) -> None:
         if not self._current_recording:
@@ -379,7 +741,7 @@ class InputHogApp:
 
     def _do_export_exe(self, exe_path: Path) -> None:
         """Create a standalone Python script that plays the current recording (single file, no deps)."""
-        embed_json = __import__("json").dumps({"version": 2, "events": self._current_recording})
+        embed_json = __import__("json").dumps({"version": RECORDING_VERSION, "events": self._current_recording})
         out_script = exe_path.with_suffix(".py")
         if str(out_script) == str(exe_path):
             out_script = exe_path.parent / (exe_path.stem + "_macro.py")
@@ -394,6 +756,7 @@ RECORDING = {embed_json}
 # Minimal client (matches shared/ioctl.h)
 IOCTL_MOVE = (0x8000 << 16) | (0x801 << 2)
 IOCTL_INPUT = (0x8000 << 16) | (0x803 << 2)
+IOCTL_ABSOLUTE = (0x8000 << 16) | (0x80A << 2)
 GENERIC_RW = 0x80000000 | 0x40000000
 FILE_SHARE_RW = 0x00000001 | 0x00000002
 
@@ -406,16 +769,19 @@ def play():
         print("Failed to connect. Run as Administrator. Is InputHog driver loaded?")
         return 0
     success = 0
-    prev_t = 0
+    start_ns = time.perf_counter_ns()
     for ev in RECORDING["events"]:
-        t = ev.get("t", 0)
-        if t - prev_t > 0:
-            time.sleep((t - prev_t) / 1000.0)
-        prev_t = t
+        # Sleep to within 2 ms of the event, then spin for sub-millisecond timing
+        deadline = start_ns + ev.get("t_us", 0) * 1000
+        while True:
+            remaining = deadline - time.perf_counter_ns()
+            if remaining <= 0:
+                break
+            time.sleep((remaining - 2000000) / 1e9 if remaining > 2000000 else 0)
         if ev.get("type") == "move":
             buf = ctypes.create_string_buffer(8)
             ctypes.memmove(buf, ctypes.byref(ctypes.c_long(ev.get("dx", 0))), 4)
-            ctypes.memmove(buf[4:], ctypes.byref(ctypes.c_long(ev.get("dy", 0))), 4)
+            ctypes.memmove(ctypes.addressof(buf) + 4, ctypes.byref(ctypes.c_long(ev.get("dy", 0))), 4)
             if ctypes.windll.kernel32.DeviceIoControl(h, IOCTL_MOVE, buf, 8, None, 0, ctypes.byref(wintypes.DWORD()), None):
                 success += 1
         elif ev.get("type") == "button":
@@ -425,6 +791,17 @@ def play():
             ctypes.memmove(buf[6:], ctypes.byref(ctypes.c_long(0)), 4)
             if ctypes.windll.kernel32.DeviceIoControl(h, IOCTL_INPUT, buf, 10, None, 0, ctypes.byref(wintypes.DWORD()), None):
                 success += 1
+        elif ev.get("type") == "anchor":
+            # Virtual-desktop pixel -> 0..65535 (same mapping as display.normalize_point)
+            gsm = ctypes.windll.user32.GetSystemMetrics
+            left, top, width, height = gsm(76), gsm(77), max(gsm(78), 1), max(gsm(79), 1)
+            nx = (min(max(ev.get("x", 0) - left, 0), width - 1) * 65536 + width - 1) // width
+            ny = (min(max(ev.get("y", 0) - top, 0), height - 1) * 65536 + height - 1) // height
+            buf = ctypes.create_string_buffer(10)
+            ctypes.memmove(ctypes.addressof(buf) + 2, ctypes.byref(ctypes.c_long(nx)), 4)
+            ctypes.memmove(ctypes.addressof(buf) + 6, ctypes.byref(ctypes.c_long(ny)), 4)
+            if ctypes.windll.kernel32.DeviceIoControl(h, IOCTL_ABSOLUTE, buf, 10, None, 0, ctypes.byref(wintypes.DWORD()), None):
+                success += 1
         elif ev.get("type") == "key":
             vk = ev.get("vk")
             if vk is not None:
@@ -452,61 +829,160 @@ if __name__ == "__main__":
         except Exception as e:
             messagebox.showerror("Export failed", str(e))
 
-    def _update_feedback(self, dx: int, dy: int, ok: bool, error_code: int = 0) -> None:
-        self.last_move = (dx, dy)
-        if not ok:
-            self.error_count += 1
-            msg = ERROR_CODES.get(error_code, f"Win32 error {error_code}")
-            if msg != self._last_error_msg:
-                self._last_error_msg = msg
-                _log(f"Move failed: ({dx},{dy}) -> {msg} (code {error_code})")
-            self.fb_label.config(text=f"Last: ({dx}, {dy})  |  Errors: {self.error_count}\n{msg}")
+    def _on_profile_toggled(self) -> None:
+        if self.profile_var.get():
+            profiling.configure(os.environ.get(profiling.ENV_VAR) or "spans")
         else:
-            self._last_error_msg = ""
-            self.fb_label.config(text=f"Last: ({dx}, {dy})  |  Errors: {self.error_count}")
+            profiling.configure(None)
+
+    def _update_feedback(self, dx: int, dy: int, ok: bool, error_code: int = 0) -> None:
+        with profiling.span("tk.feedback"):
+            self.last_move = (dx, dy)
+            if not ok:
+                self.error_count += 1
+                msg = ERROR_CODES.get(error_code, f"Win32 error {error_code}")
+                if msg != self._last_error_msg:
+                    self._last_error_msg = msg
+                    _log(f"Move failed: ({dx},{dy}) -> {msg} (code {error_code})")
+                self.fb_label.config(text=f"Last: ({dx}, {dy})  |  Errors: {self.error_count}\n{msg}")
+            else:
+                self._last_error_msg = ""
+                self.fb_label.config(text=f"Last: ({dx}, {dy})  |  Errors: {self.error_count}")
 
-    def _run_in_thread(self, fn, *args, **kwargs) -> None:
-        if self._busy:
+    def _on_stress_test(self) -> None:
+        """Ramp the injection rate until the backend saturates; the button stops a running test."""
+        if self._stress_job is not None:
+            self._jobs.cancel(self._stress_job.id)
+            return
+        if not self.connected:
             return
-        self._busy = True
-        self.btn_refresh.config(state=tk.DISABLED)
-        self.btn_square.config(state=tk.DISABLED)
-        self.btn_circle.config(state=tk.DISABLED)
-        self.btn_triangle.config(state=tk.DISABLED)
-        self.btn_line.config(state=tk.DISABLED)
-        self.btn_random_drag.config(state=tk.DISABLED)
-        self.btn_move.config(state=tk.DISABLED)
-        self.btn_record.config(state=tk.DISABLED)
-        self.btn_save.config(state=tk.DISABLED)
-        self.btn_load.config(state=tk.DISABLED)
-        self.btn_play.config(state=tk.DISABLED)
-        self.btn_export_exe.config(state=tk.DISABLED)
 
-        def worker():
-            try:
-                fn(*args, **kwargs)
-            except Exception as e:
-                tb = traceback.format_exc()
-                _log(f"Thread error:\n{tb}")
-                err_msg = f"{e}\n\nSee inputhog_debug.log for full traceback."
-                self.root.after(0, lambda m=err_msg: messagebox.showerror("Error", m))
-            finally:
-                self.root.after(0, self._on_thread_done)
+        def do(job: Job) -> dict:
+            stress = StressTest(self._backend())
+            job.on_cancel(stress.stop)
+
+            def on_step(step: dict) -> None:
+                text = (
+                    f"Stress {step['target_hz']:.0f}/s: achieved {step['achieved_hz']:.0f}/s, "
+                    f"p99 {step['latency_p99_us']:.0f} us, failed {max(step['client_failed'], step['driver_failed'] or 0)}"
+                )
+                job.report(detail=f"{step['target_hz']:.0f}/s")
+                self.root.after(0, lambda: self.status_detail_label.config(text=text))
+
+            result = stress.run(on_step)
+            for step in result["steps"]:
+                _log(f"Stress step: {step}")
+            if result["knee_hz"] is not None:
+                msg = (
+                    f"Sustainable rate: {result['sustainable_hz'] or 0:.0f} events/s\n"
+                    f"Saturates at {result['knee_hz']:.0f}/s ({result['reason']})"
+                )
+            else:
+                last = result["steps"][-1]["target_hz"] if result["steps"] else 0
+                msg = f"No saturation up to {last:.0f} events/s"
+            if result["cancelled"]:
+                msg += "\n(stopped early)"
+            _log(f"Stress result: {msg}")
+            self.root.after(0, lambda: messagebox.showinfo("Stress test", msg))
+            return result
+
+        self._stress_job = self._jobs.submit(do, "stress test")
+        self.btn_stress.config(text="Stop stress test")
+
+    def _add_timeline(self, name: str, events: list[dict]) -> None:
+        """Queue events on the shared scheduler; they interleave with anything already running."""
+        self._timelines.add(events, name=name, backend=self._backend())
+        self._poll_timelines()
+
+    def _on_timeline_event(self, tid: int, ev: dict, ok: bool) -> None:
+        # Scheduler thread: only failures go to the UI (recordings can run at 1 kHz)
+        if not ok and ev.get("type") != "key":
+            err = self._backend().get_last_error()
+            dx, dy = ev.get("dx", 0), ev.get("dy", 0)
+            self.root.after(0, lambda: self._update_feedback(dx, dy, False, err))
+
+    def _poll_timelines(self) -> None:
+        """Refresh the timelines label every 200 ms while any are running."""
+        status = self._timelines.status()
+        if status:
+            sent = sum(t["sent"] for t in status)
+            names = ", ".join(t["name"] for t in status)
+            self.timelines_label.config(text=f"{len(status)} running ({names}), {sent} sent")
+            self.btn_cancel_timelines.config(state=tk.NORMAL)
+            if not self._timeline_poll_active:
+                self._timeline_poll_active = True
+                self.root.after(200, self._poll_timelines_tick)
+        else:
+            self.timelines_label.config(text="")
+            self.btn_cancel_timelines.config(state=tk.DISABLED)
 
-        threading.Thread(target=worker, daemon=True).start()
+    def _poll_timelines_tick(self) -> None:
+        self._timeline_poll_active = False
+        self._poll_timelines()
 
-    def _on_thread_done(self) -> None:
-        self._busy = False
-        self.btn_refresh.config(state=tk.NORMAL)
-        if self.connected:
-            self.btn_square.config(state=tk.NORMAL)
-            self.btn_circle.config(state=tk.NORMAL)
-            self.btn_triangle.config(state=tk.NORMAL)
-            self.btn_line.config(state=tk.NORMAL)
-            self.btn_random_drag.config(state=tk.NORMAL)
-            self.btn_move.config(state=tk.NORMAL)
-            self._refresh_driver_status()
-        self._update_recording_buttons()
+    def _on_cancel_timelines(self) -> None:
+        n = self._timelines.cancel()
+        _log(f"Cancelled {n} timeline(s)")
+        self._poll_timelines()
+
+    def _submit_pattern(self, name: str, run) -> None:
+        """Queue run(backend, on_move) as a job; each move updates the feedback line and the job's progress."""
+        def do(job: Job):
+            moves = 0
+
+            def on_move(dx, dy, ok, err=0):
+                nonlocal moves
+                moves += 1
+                job.report(detail=f"{moves} moves")
+                self.root.after(0, lambda d=dx, e=dy, o=ok, r=err: self._update_feedback(d, e, o, r))
+            return run(job.backend(self._backend()), on_move)
+
+        self._jobs.submit(do, name)
+
+    def _post_job_update(self, job: Job) -> None:
+        # Executor thread -> Tk thread; the window may already be gone during shutdown
+        try:
+            self.root.after(0, lambda: self._on_job_update(job))
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def _on_job_update(self, job: Job) -> None:
+        if job.done.is_set():
+            _log(f"Job {job.name!r} {job.state} after {job.elapsed_s():.2f} s (queued {job.wait_s():.2f} s)")
+            if job.state == FAILED:
+                _log(f"Job error:\n{job.traceback}")
+                messagebox.showerror("Error", f"{job.error}\n\nSee inputhog_debug.log for full traceback.")
+            if job is self._stress_job:
+                self._stress_job = None
+                self.btn_stress.config(text="Stress test")
+            if self.connected:
+                self._refresh_driver_status()
+        self._refresh_jobs_label()
+
+    def _refresh_jobs_label(self) -> None:
+        pending = self._jobs.pending()
+        if not pending:
+            self.jobs_label.config(text="")
+            self.btn_cancel_jobs.config(state=tk.DISABLED)
+            return
+        current = pending[0]
+        text = current.name
+        queued = len(pending)
+        if current.state == RUNNING:
+            queued -= 1
+            if current.progress is not None:
+                text += f" {current.progress:.0%}"
+            elif current.detail:
+                text += f" ({current.detail})"
+            text += f", {current.elapsed_s():.1f} s"
+        if queued:
+            text += f" | {queued} queued"
+        self.jobs_label.config(text=text)
+        self.btn_cancel_jobs.config(state=tk.NORMAL)
+
+    def _on_cancel_jobs(self) -> None:
+        n = self._jobs.cancel()
+        _log(f"Cancelled {n} job(s)")
 
     def _get_pattern_opts(self) -> tuple[int, int, int, float]:
         """Return (size, radius, steps, delay_ms). Raises ValueError on bad input."""
@@ -528,13 +1004,11 @@ if __name__ == "__main__":
         except ValueError as e:
             messagebox.showerror("Invalid Input", str(e))
             return
+        if self.concurrent_var.get():
+            self._add_timeline("square", pattern_events("square", delay_ms=delay, size=size))
+            return
 
-        def do():
-            def on_move(dx, dy, ok, err=0):
-                self.root.after(0, lambda d=dx, e=dy, o=ok, r=err: self._update_feedback(d, e, o, r))
-            test_square(self._backend(), size=size, delay_ms=delay, on_move=on_move)
-
-        self._run_in_thread(do)
+        self._submit_pattern("square", lambda backend, on_move: test_square(backend, size=size, delay_ms=delay, on_move=on_move))
 
     def _on_test_circle(self) -> None:
         if not self.connected:
@@ -547,13 +1021,11 @@ if __name__ == "__main__":
         except ValueError as e:
             messagebox.showerror("Invalid Input", str(e))
             return
+        if self.concurrent_var.get():
+            self._add_timeline("circle", pattern_events("circle", delay_ms=delay, radius=radius, steps=steps))
+            return
 
-        def do():
-            def on_move(dx, dy, ok, err=0):
-                self.root.after(0, lambda d=dx, e=dy, o=ok, r=err: self._update_feedback(d, e, o, r))
-            test_circle(self._backend(), radius=radius, steps=steps, delay_ms=delay, on_move=on_move)
-
-        self._run_in_thread(do)
+        self._submit_pattern("circle", lambda backend, on_move: test_circle(backend, radius=radius, steps=steps, delay_ms=delay, on_move=on_move))
 
     def _on_test_triangle(self) -> None:
         if not self.connected:
@@ -566,13 +1038,11 @@ if __name__ == "__main__":
         except ValueError as e:
             messagebox.showerror("Invalid Input", str(e))
             return
+        if self.concurrent_var.get():
+            self._add_timeline("triangle", pattern_events("triangle", delay_ms=delay, size=size))
+            return
 
-        def do():
-            def on_move(dx, dy, ok, err=0):
-                self.root.after(0, lambda d=dx, e=dy, o=ok, r=err: self._update_feedback(d, e, o, r))
-            test_triangle(self._backend(), size=size, delay_ms=delay, on_move=on_move)
-
-        self._run_in_thread(do)
+        self._submit_pattern("triangle", lambda backend, on_move: test_triangle(backend, size=size, delay_ms=delay, on_move=on_move))
 
     def _on_test_line(self) -> None:
         if not self.connected:
@@ -585,13 +1055,11 @@ if __name__ == "__main__":
         except ValueError as e:
             messagebox.showerror("Invalid Input", str(e))
             return
+        if self.concurrent_var.get():
+            self._add_timeline("line", pattern_events("line", delay_ms=delay, size=size, steps=min(steps, 20)))
+            return
 
-        def do():
-            def on_move(dx, dy, ok, err=0):
-                self.root.after(0, lambda d=dx, e=dy, o=ok, r=err: self._update_feedback(d, e, o, r))
-            test_line(self._backend(), length=size * 2, steps=min(steps, 20), delay_ms=delay, horizontal=True, on_move=on_move)
-
-        self._run_in_thread(do)
+        self._submit_pattern("line", lambda backend, on_move: test_line(backend, length=size * 2, steps=min(steps, 20), delay_ms=delay, horizontal=True, on_move=on_move))
 
     def _on_random_drag(self) -> None:
         if not self.connected:
@@ -605,12 +1073,7 @@ if __name__ == "__main__":
             messagebox.showerror("Invalid Input", str(e))
             return
 
-        def do():
-            def on_move(dx, dy, ok, err=0):
-                self.root.after(0, lambda d=dx, e=dy, o=ok, r=err: self._update_feedback(d, e, o, r))
-            test_random_drag(self._backend(), delay_ms=delay, steps=min(steps, 30), on_move=on_move)
-
-        self._run_in_thread(do)
+        self._submit_pattern("random drag", lambda backend, on_move: test_random_drag(backend, delay_ms=delay, steps=min(steps, 30), on_move=on_move))
 
     def _on_custom_move(self) -> None:
         if not self.connected:
@@ -632,16 +1095,20 @@ if __name__ == "__main__":
 
     def run(self) -> None:
         self.root.mainloop()
+        self._jobs.close()
+        self._timelines.close()
         self.client.close()
 
 
 def main() -> None:
+    multiprocessing.freeze_support()  # catalog refresh may use a process pool in the frozen exe
     try:
         app = InputHogApp()
         app.run()
     except Exception:
         tb = traceback.format_exc()
         _log(f"Startup error:\n{tb}")
+        debuglog.flush()
         raise
 
 
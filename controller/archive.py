@@ -0,0 +1,386 @@
+"""
+Compressed recording archive (.ihar) for long-term storage.
+Events are split into time-bounded chunks; each chunk is delta-encoded
+(timestamps and dx/dy as zigzag varints) and compressed with zlib or lzma.
+A footer index maps every chunk's time range to its file offset, so playback
+decompresses one chunk at a time and seeking only touches the chunks it needs.
+
+    python archive.py convert recordings/ [--out DIR] [--codec zlib|lzma] [-j N]
+    python archive.py info session.ihar
+    python archive.py extract session.ihar session.json
+
+Layout (little-endian):
+    header   "IHAR" u16 version, u8 codec, u8 reserved
+    chunks   compressed payloads, back to back
+    index    per chunk: i64 start_us, i64 end_us, u64 offset, u32 length, u32 events
+    trailer  u32 chunk count, u64 index offset, "IHIX"
+"""
+
+import argparse
+import bisect
+import json
+import lzma
+import struct
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from recording import iter_recording, save_recording, upgrade_event
+
+ARCHIVE_SUFFIX = ".ihar"
+ARCHIVE_VERSION = 1
+CHUNK_US = 5_000_000  # new chunk after this much recording time...
+CHUNK_MAX_EVENTS = 32768  # ...or this many events, whichever comes first
+
+CODEC_ZLIB = 0
+CODEC_LZMA = 1
+CODECS = {"zlib": CODEC_ZLIB, "lzma": CODEC_LZMA}
+
+_MAGIC = b"IHAR"
+_TRAILER_MAGIC = b"IHIX"
+_HEADER = struct.Struct("<4sHBB")
+_INDEX_ENTRY = struct.Struct("<qqQII")  # t_us may be negative (e.g. after a time shift)
+_TRAILER = struct.Struct("<IQ4s")
+
+# Per-event tags in a chunk payload; anything else is stored as JSON
+_TAG_MOVE = 0
+_TAG_BUTTON = 1
+_TAG_KEY = 2
+_TAG_JSON = 0xFF
+_PLAIN_KEYS = {
+    "move": {"t_us", "type", "dx", "dy"},
+    "button": {"t_us", "type", "flag"},
+    "key": {"t_us", "type", "vk", "pressed"},
+}
+# Fields a tag stores as varints; events whose values do not fit are stored as JSON
+_VARINT_FIELDS = {"move": ("dx", "dy"), "button": ("flag",), "key": ("vk",)}
+
+
+def _compact(ev: dict) -> bool:
+    """True if ev round-trips through its tag: only the plain keys, integer fields, bool pressed."""
+    ev_type = ev.get("type")
+    plain = _PLAIN_KEYS.get(ev_type)
+    if plain is None or not set(ev) <= plain:
+        return False
+    for name in _VARINT_FIELDS[ev_type]:
+        v = ev.get(name, 0)
+        if type(v) is not int or (ev_type != "move" and v < 0):
+            return False
+    return type(ev.get("pressed", True)) is bool
+
+
+def is_archive(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == _MAGIC
+    except OSError:
+        return False
+
+
+def _put_uvarint(out: bytearray, v: int) -> None:
+    while v >= 0x80:
+        out.append((v & 0x7F) | 0x80)
+        v >>= 7
+    out.append(v)
+
+
+def _put_svarint(out: bytearray, v: int) -> None:
+    _put_uvarint(out, v << 1 if v >= 0 else ((-v) << 1) - 1)
+
+
+def _get_uvarint(buf: bytes, pos: int) -> tuple[int, int]:
+    v = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        v |= (b & 0x7F) << shift
+        if b < 0x80:
+            return v, pos
+        shift += 7
+
+
+def _get_svarint(buf: bytes, pos: int) -> tuple[int, int]:
+    v, pos = _get_uvarint(buf, pos)
+    return (v >> 1) ^ -(v & 1), pos
+
+
+def encode_chunk(events: list[dict], start_us: int) -> bytes:
+    """
+    Delta-encode events (t_us ascending) relative to start_us. Uncompressed.
+    Raises ValueError for an event whose t_us is not an integer.
+    """
+    out = bytearray()
+    _put_uvarint(out, len(events))
+    prev_t = start_us
+    prev_dx = prev_dy = 0
+    for ev in events:
+        ev_type = ev.get("type")
+        t = ev.get("t_us", 0)
+        if type(t) is not int:
+            raise ValueError(f"cannot archive {ev_type!r} event: t_us must be an integer, got {t!r}")
+        if not _compact(ev):
+            out.append(_TAG_JSON)
+            _put_svarint(out, t - prev_t)
+            blob = json.dumps(ev, separators=(",", ":")).encode("utf-8")
+            _put_uvarint(out, len(blob))
+            out += blob
+        elif ev_type == "move":
+            dx, dy = ev.get("dx", 0), ev.get("dy", 0)
+            out.append(_TAG_MOVE)
+            _put_svarint(out, t - prev_t)
+            # Consecutive moves are similar, so store the change from the previous move
+            _put_svarint(out, dx - prev_dx)
+            _put_svarint(out, dy - prev_dy)
+            prev_dx, prev_dy = dx, dy
+        elif ev_type == "button":
+            out.append(_TAG_BUTTON)
+            _put_svarint(out, t - prev_t)
+            _put_uvarint(out, ev.get("flag", 0))
+        else:
+            out.append(_TAG_KEY)
+            _put_svarint(out, t - prev_t)
+            _put_uvarint(out, ev.get("vk", 0))
+            out.append(1 if ev.get("pressed", True) else 0)
+        prev_t = t
+    return bytes(out)
+
+
+def decode_chunk(payload: bytes, start_us: int) -> list[dict]:
+    """Inverse of encode_chunk."""
+    count, pos = _get_uvarint(payload, 0)
+    events = []
+    t = start_us
+    dx = dy = 0
+    for _ in range(count):
+        tag = payload[pos]
+        delta, pos = _get_svarint(payload, pos + 1)
+        t += delta
+        if tag == _TAG_MOVE:
+            ddx, pos = _get_svarint(payload, pos)
+            ddy, pos = _get_svarint(payload, pos)
+            dx += ddx
+            dy += ddy
+            events.append({"t_us": t, "type": "move", "dx": dx, "dy": dy})
+        elif tag == _TAG_BUTTON:
+            flag, pos = _get_uvarint(payload, pos)
+            events.append({"t_us": t, "type": "button", "flag": flag})
+        elif tag == _TAG_KEY:
+            vk, pos = _get_uvarint(payload, pos)
+            events.append({"t_us": t, "type": "key", "vk": vk, "pressed": bool(payload[pos])})
+            pos += 1
+        elif tag == _TAG_JSON:
+            n, pos = _get_uvarint(payload, pos)
+            events.append(json.loads(payload[pos:pos + n]))
+            pos += n
+        else:
+            raise ValueError(f"Corrupt archive chunk: unknown tag {tag:#x}")
+    return events
+
+
+def _compress(data: bytes, codec: int) -> bytes:
+    return lzma.compress(data, preset=6) if codec == CODEC_LZMA else zlib.compress(data, 9)
+
+
+def _decompress(data: bytes, codec: int) -> bytes:
+    return lzma.decompress(data) if codec == CODEC_LZMA else zlib.decompress(data)
+
+
+def write_archive(
+    events: Iterable[dict],
+    path: Path,
+    codec: str = "zlib",
+    chunk_us: int = CHUNK_US,
+    chunk_max_events: int = CHUNK_MAX_EVENTS,
+) -> int:
+    """
+    Stream events (t_us ascending, e.g. from iter_recording) into an archive.
+    Returns the number of events written.
+    """
+    codec_id = CODECS[codec]
+    index = []
+    total = 0
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, ARCHIVE_VERSION, codec_id, 0))
+        chunk: list[dict] = []
+
+        def flush() -> None:
+            start_us = chunk[0].get("t_us", 0)
+            blob = _compress(encode_chunk(chunk, start_us), codec_id)
+            index.append((start_us, chunk[-1].get("t_us", 0), f.tell(), len(blob), len(chunk)))
+            f.write(blob)
+            chunk.clear()
+
+        for ev in events:
+            ev = upgrade_event(ev)
+            if chunk and (ev.get("t_us", 0) - chunk[0].get("t_us", 0) >= chunk_us or len(chunk) >= chunk_max_events):
+                flush()
+            chunk.append(ev)
+            total += 1
+        if chunk:
+            flush()
+        index_offset = f.tell()
+        for entry in index:
+            f.write(_INDEX_ENTRY.pack(*entry))
+        f.write(_TRAILER.pack(len(index), index_offset, _TRAILER_MAGIC))
+    return total
+
+
+class ArchiveReader:
+    """Reads the header and footer index up front; chunks are decompressed on demand."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            magic, version, codec, _ = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{self.path.name}: not an InputHog archive")
+            if version > ARCHIVE_VERSION:
+                raise ValueError(f"{self.path.name}: archive version {version} is newer than supported ({ARCHIVE_VERSION})")
+            f.seek(-_TRAILER.size, 2)
+            count, index_offset, trailer = _TRAILER.unpack(f.read(_TRAILER.size))
+            if trailer != _TRAILER_MAGIC:
+                raise ValueError(f"{self.path.name}: archive index missing (truncated file?)")
+            f.seek(index_offset)
+            raw = f.read(count * _INDEX_ENTRY.size)
+        self.codec = codec
+        self.chunks = [_INDEX_ENTRY.unpack_from(raw, i * _INDEX_ENTRY.size) for i in range(count)]
+        self._ends = [c[1] for c in self.chunks]
+
+    def __len__(self) -> int:
+        return sum(c[4] for c in self.chunks)
+
+    @property
+    def duration_us(self) -> int:
+        return self.chunks[-1][1] - self.chunks[0][0] if self.chunks else 0
+
+    def read_chunk(self, i: int, f=None) -> list[dict]:
+        start_us, _, offset, length, _ = self.chunks[i]
+        if f is None:
+            with open(self.path, "rb") as fh:
+                fh.seek(offset)
+                blob = fh.read(length)
+        else:
+            f.seek(offset)
+            blob = f.read(length)
+        return decode_chunk(_decompress(blob, self.codec), start_us)
+
+    def iter_events(
+        self,
+        start_us: Optional[int] = None,
+        end_us: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Iterator[dict]:
+        """
+        Yield events with start_us <= t_us (< end_us), decompressing only the
+        chunks that overlap. start_us None starts at the first event.
+        """
+        if start_us is None:
+            start_us = self.chunks[0][0] if self.chunks else 0
+        first = bisect.bisect_left(self._ends, start_us)
+        total = sum(c[3] for c in self.chunks[first:])
+        done = 0
+        with open(self.path, "rb") as f:
+            for i in range(first, len(self.chunks)):
+                if end_us is not None and self.chunks[i][0] >= end_us:
+                    break
+                for ev in self.read_chunk(i, f):
+                    t = ev.get("t_us", 0)
+                    if t < start_us:
+                        continue
+                    if end_us is not None and t >= end_us:
+                        return
+                    yield ev
+                done += self.chunks[i][3]
+                if on_progress:
+                    on_progress(done, total)
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.iter_events()
+
+
+def iter_archive(path: Path, on_progress: Optional[Callable[[int, int], None]] = None, start_us: Optional[int] = None) -> Iterator[dict]:
+    return ArchiveReader(path).iter_events(start_us, on_progress=on_progress)
+
+
+def convert_file(src: Path, dst: Path, codec: str = "zlib") -> dict:
+    """JSON recording -> archive. Returns sizes and counts, or {"error": ...}."""
+    result = {"source": str(src), "archive": str(dst)}
+    try:
+        result["events"] = write_archive(iter_recording(src), dst, codec)
+    except Exception as e:
+        dst.unlink(missing_ok=True)
+        return {**result, "error": str(e) or type(e).__name__}
+    result["json_bytes"] = src.stat().st_size
+    result["archive_bytes"] = dst.stat().st_size
+    result["ratio"] = round(result["json_bytes"] / result["archive_bytes"], 2) if result["archive_bytes"] else None
+    return result
+
+
+def _convert_job(args: tuple) -> dict:
+    return convert_file(*args)
+
+
+def convert_directory(
+    src_dir: Path,
+    dst_dir: Optional[Path] = None,
+    codec: str = "zlib",
+    workers: Optional[int] = None,
+    skip_existing: bool = True,
+) -> list[dict]:
+    """Transcode every *.json recording in src_dir to dst_dir (default: alongside) in a process pool."""
+    src_dir = Path(src_dir)
+    dst_dir = Path(dst_dir) if dst_dir else src_dir
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    jobs = []
+    for src in sorted(src_dir.glob("*.json")):
+        dst = dst_dir / (src.stem + ARCHIVE_SUFFIX)
+        if skip_existing and dst.exists() and dst.stat().st_mtime_ns >= src.stat().st_mtime_ns:
+            continue
+        jobs.append((src, dst, codec))
+    if len(jobs) <= 1 or workers == 1:
+        return [_convert_job(j) for j in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_convert_job, jobs, chunksize=4))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="InputHog recording archives (.ihar).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_conv = sub.add_parser("convert", help="transcode a directory of .json recordings in parallel")
+    p_conv.add_argument("src", type=Path)
+    p_conv.add_argument("--out", type=Path)
+    p_conv.add_argument("--codec", choices=sorted(CODECS), default="zlib")
+    p_conv.add_argument("-j", "--jobs", type=int)
+    p_conv.add_argument("--force", action="store_true", help="re-convert up-to-date archives")
+    p_info = sub.add_parser("info", help="print an archive's chunk index")
+    p_info.add_argument("path", type=Path)
+    p_ext = sub.add_parser("extract", help="write an archive back out as a .json recording")
+    p_ext.add_argument("path", type=Path)
+    p_ext.add_argument("out", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        results = convert_directory(args.src, args.out, args.codec, args.jobs, skip_existing=not args.force)
+        for r in results:
+            print(json.dumps(r))
+        return 0 if all("error" not in r for r in results) else 2
+    reader = ArchiveReader(args.path)
+    if args.command == "info":
+        print(json.dumps({
+            "codec": next(k for k, v in CODECS.items() if v == reader.codec),
+            "events": len(reader),
+            "duration_us": reader.duration_us,
+            "chunks": [
+                {"start_us": s, "end_us": e, "offset": o, "bytes": n, "events": c}
+                for s, e, o, n, c in reader.chunks
+            ],
+        }, indent=2))
+        return 0
+    save_recording(list(reader), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
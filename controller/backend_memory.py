@@ -0,0 +1,127 @@
+"""
+In-memory input backend (no driver, no OS input).
+Implements the same move_mouse/mouse_input interface as InputHogClient and
+only tracks the resulting cursor position and button state, so playback,
+patterns and analyzers can run on any OS.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from client import (
+    MOUSE_LEFT_BUTTON_DOWN,
+    MOUSE_LEFT_BUTTON_UP,
+    MOUSE_RIGHT_BUTTON_DOWN,
+    MOUSE_RIGHT_BUTTON_UP,
+    MOUSE_MIDDLE_BUTTON_DOWN,
+    MOUSE_MIDDLE_BUTTON_UP,
+)
+
+_FLAG_TO_BUTTON = {
+    MOUSE_LEFT_BUTTON_DOWN: ("left", True),
+    MOUSE_LEFT_BUTTON_UP: ("left", False),
+    MOUSE_RIGHT_BUTTON_DOWN: ("right", True),
+    MOUSE_RIGHT_BUTTON_UP: ("right", False),
+    MOUSE_MIDDLE_BUTTON_DOWN: ("middle", True),
+    MOUSE_MIDDLE_BUTTON_UP: ("middle", False),
+}
+
+ERROR_SIMULATED_FAILURE = 31  # ERROR_GEN_FAILURE, reported for injected failures
+
+
+class MemoryBackend:
+    """
+    Input backend that applies moves to an in-memory cursor.
+    call_cost_us busy-waits per call to mimic injection cost; fail_every=N makes
+    every Nth call fail (and leaves the cursor untouched) to exercise error paths.
+    """
+
+    def __init__(self, call_cost_us: int = 0, fail_every: int = 0) -> None:
+        self.call_cost_us = call_cost_us
+        self.fail_every = fail_every
+        self.x = 0
+        self.y = 0
+        self.buttons: set[str] = set()
+        self.keys: set[int] = set()  # virtual-key codes currently down
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._failed = 0
+        self._last_error = 0
+
+    @staticmethod
+    def is_available() -> bool:
+        return True
+
+    def get_last_error(self) -> int:
+        return self._last_error
+
+    def _begin(self) -> bool:
+        """Count the call, pay its simulated cost; False if this call should fail."""
+        if self.call_cost_us:
+            deadline = time.perf_counter_ns() + self.call_cost_us * 1000
+            while time.perf_counter_ns() < deadline:
+                pass
+        self._calls += 1
+        if self.fail_every and self._calls % self.fail_every == 0:
+            self._failed += 1
+            self._last_error = ERROR_SIMULATED_FAILURE
+            return False
+        self._last_error = 0
+        return True
+
+    def move_mouse(self, x: int, y: int) -> bool:
+        with self._lock:
+            if not self._begin():
+                return False
+            self.x += x
+            self.y += y
+            return True
+
+    def mouse_input(self, button_flags: int, x: int, y: int) -> bool:
+        with self._lock:
+            if not self._begin():
+                return False
+            self.x += x
+            self.y += y
+            button = _FLAG_TO_BUTTON.get(button_flags)
+            if button is not None:
+                name, pressed = button
+                if pressed:
+                    self.buttons.add(name)
+                else:
+                    self.buttons.discard(name)
+            return True
+
+    def move_to(self, x: int, y: int, button_flags: int = 0) -> bool:
+        """Absolute move; the cursor lands exactly on (x, y)."""
+        if not self.mouse_input(button_flags, 0, 0):
+            return False
+        with self._lock:
+            self.x = x
+            self.y = y
+        return True
+
+    def key(self, vk: int, pressed: bool = True, scan: Optional[int] = None) -> bool:
+        with self._lock:
+            if not self._begin():
+                return False
+            if pressed:
+                self.keys.add(vk)
+            else:
+                self.keys.discard(vk)
+            return True
+
+    def get_status(self) -> Optional[dict]:
+        """Driver-shaped status so status views work unchanged."""
+        with self._lock:
+            return {
+                "version": 0,
+                "injection_initialized": True,
+                "callback_found": True,
+                "last_init_status": 0,
+                "last_inject_status": 0 if self._last_error == 0 else -1,
+                "total_requests": self._calls,
+                "failed_requests": self._failed,
+                "keyboard_callback_found": True,
+            }
@@ -82,3 +82,16 @@ class User32Backend:
         except Exception:
             self._last_error = 1
             return False
+
+    def move_to(self, x: int, y: int, button_flags: int = 0) -> bool:
+        """Absolute move to virtual-desktop pixel (x, y) via pyautogui.moveTo."""
+        if not HAS_PYAUTOGUI:
+            self._last_error = 1
+            return False
+        try:
+            pyautogui.moveTo(x, y, _pause=False)
+            self._last_error = 0
+        except Exception:
+            self._last_error = 1
+            return False
+        return self.mouse_input(button_flags, 0, 0) if button_flags else True
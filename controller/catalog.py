@@ -0,0 +1,178 @@
+"""
+Cached metadata catalog over a recordings directory (SQLite).
+Stores duration, event counts by type, peak event rate and the bounding box
+of the relative path for each recording (*.json, *.ihar), keyed by file name
+and refreshed incrementally by mtime/size. Large refreshes parse in a process pool.
+"""
+
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from archive import ARCHIVE_SUFFIX
+from recording import iter_recording
+
+CATALOG_NAME = ".catalog.sqlite"
+RATE_WINDOW_US = 1_000_000  # peak rate = most events in any window this long, per second
+RECORDING_PATTERNS = ("*.json", "*" + ARCHIVE_SUFFIX)
+POOL_THRESHOLD = 8  # parse in a process pool when at least this many files changed
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    name TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    duration_us INTEGER,
+    events INTEGER,
+    moves INTEGER,
+    buttons INTEGER,
+    keys INTEGER,
+    peak_rate REAL,
+    min_x INTEGER,
+    min_y INTEGER,
+    max_x INTEGER,
+    max_y INTEGER,
+    error TEXT
+)
+"""
+_FIELDS = (
+    "duration_us", "events", "moves", "buttons", "keys", "peak_rate",
+    "min_x", "min_y", "max_x", "max_y", "error",
+)
+
+
+def summarize(path: Path) -> dict:
+    """
+    Single streaming pass over a recording. Returns the catalog fields.
+    Memory stays bounded by the events in one rate window: recordings are in
+    time order, and an out-of-order timestamp counts at the latest time seen.
+    """
+    counts = {"move": 0, "button": 0, "key": 0}
+    window: deque[int] = deque()  # timestamps of the last RATE_WINDOW_US
+    events = peak = 0
+    first_t = last_t = None
+    x = y = min_x = min_y = max_x = max_y = 0
+    try:
+        for ev in iter_recording(path):
+            ev_type = ev.get("type")
+            if ev_type in counts:
+                counts[ev_type] += 1
+            t = ev.get("t_us", 0)
+            if last_t is None:
+                first_t = last_t = t
+            elif t > last_t:
+                last_t = t
+            events += 1
+            window.append(last_t)
+            while last_t - window[0] >= RATE_WINDOW_US:
+                window.popleft()
+            peak = max(peak, len(window))
+            if ev_type == "move":
+                x += ev.get("dx", 0)
+                y += ev.get("dy", 0)
+                min_x, max_x = min(min_x, x), max(max_x, x)
+                min_y, max_y = min(min_y, y), max(max_y, y)
+    except Exception as e:
+        return {field: None for field in _FIELDS} | {"error": str(e) or type(e).__name__}
+
+    return {
+        "duration_us": last_t - first_t if events else 0,
+        "events": events,
+        "moves": counts["move"],
+        "buttons": counts["button"],
+        "keys": counts["key"],
+        "peak_rate": peak * 1_000_000 / RATE_WINDOW_US,
+        "min_x": min_x,
+        "min_y": min_y,
+        "max_x": max_x,
+        "max_y": max_y,
+        "error": None,
+    }
+
+
+class Catalog:
+    """Metadata index for one recordings directory. Safe to use from any thread."""
+
+    def __init__(self, directory: Path, db_path: Optional[Path] = None) -> None:
+        self.directory = Path(directory)
+        self.db_path = Path(db_path) if db_path else self.directory / CATALOG_NAME
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connection per call (commit on success), so any thread can use the catalog."""
+        db = sqlite3.connect(self.db_path)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def refresh(self, use_pool: Optional[bool] = None) -> dict:
+        """
+        Bring the catalog in line with the directory: parse new or changed
+        files (by mtime/size) and drop rows for deleted ones. Returns
+        {"added", "updated", "removed"} counts.
+        """
+        on_disk = {}
+        for pattern in RECORDING_PATTERNS:
+            for path in self.directory.glob(pattern):
+                st = path.stat()
+                on_disk[path.name] = (st.st_mtime_ns, st.st_size)
+        with self._connect() as db:
+            known = {r["name"]: (r["mtime_ns"], r["size"]) for r in db.execute("SELECT name, mtime_ns, size FROM recordings")}
+
+        stale = [name for name, sig in on_disk.items() if known.get(name) != sig]
+        removed = [name for name in known if name not in on_disk]
+        paths = [self.directory / name for name in stale]
+        if use_pool is None:
+            use_pool = len(paths) >= POOL_THRESHOLD
+        if use_pool and paths:
+            with ProcessPoolExecutor() as pool:
+                summaries = list(pool.map(summarize, paths, chunksize=4))
+        else:
+            summaries = [summarize(p) for p in paths]
+
+        with self._connect() as db:
+            db.executemany("DELETE FROM recordings WHERE name = ?", [(n,) for n in removed])
+            db.executemany(
+                f"INSERT OR REPLACE INTO recordings (name, mtime_ns, size, {', '.join(_FIELDS)}) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(_FIELDS))})",
+                [(name, *on_disk[name], *(s[f] for f in _FIELDS)) for name, s in zip(stale, summaries)],
+            )
+        updated = sum(1 for name in stale if name in known)
+        return {"added": len(stale) - updated, "updated": updated, "removed": len(removed)}
+
+    def entries(self) -> list[dict]:
+        """All catalogued recordings, most recently modified first."""
+        with self._connect() as db:
+            rows = db.execute("SELECT * FROM recordings ORDER BY mtime_ns DESC").fetchall()
+        return [dict(r) for r in rows]
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM recordings WHERE name = ?", (Path(name).name,)).fetchone()
+        return dict(row) if row else None
+
+    def most_recent(self) -> Optional[Path]:
+        with self._connect() as db:
+            row = db.execute("SELECT name FROM recordings ORDER BY mtime_ns DESC LIMIT 1").fetchone()
+        return self.directory / row["name"] if row else None
+
+
+def describe(entry: dict) -> str:
+    """One-line summary for lists and status labels."""
+    if entry.get("error"):
+        return f"{entry['name']} — unreadable ({entry['error']})"
+    w = entry["max_x"] - entry["min_x"]
+    h = entry["max_y"] - entry["min_y"]
+    return (
+        f"{entry['name']} — {entry['duration_us'] / 1e6:.1f} s, {entry['events']} events "
+        f"({entry['moves']} move, {entry['buttons']} button, {entry['keys']} key), "
+        f"peak {entry['peak_rate']:.0f}/s, {w}x{h} px"
+    )
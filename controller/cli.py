@@ -0,0 +1,343 @@
+"""
+Headless InputHog runner (no Tk).
+Runs recordings and patterns back to back over one open backend session and
+prints one JSON line per job with timing and throughput.
+
+    python cli.py play a.json b.json
+    python cli.py pattern square circle --delay-ms 30
+    python cli.py status
+    python cli.py fidelity a.json   # lateness / drops / drift of one playback (see fidelity.py)
+    python cli.py stress --max-hz 32000   # ramp the injection rate to find where it saturates (see stress.py)
+    python cli.py contention --max-threads 8   # move throughput with 1, 2, 4, 8 sending threads (handle pool)
+    python cli.py list              # recordings catalog (cached metadata), one JSON line each
+    python cli.py --backend daemon pattern square   # through a running daemon.py (shared driver handle)
+    python cli.py --combine-us 250 pattern circle status   # write-combine moves; status reports calls saved
+    python cli.py calibrate         # measure pointer acceleration (see accel.py)
+    python cli.py play a.json --accel-comp   # undo acceleration baked into hook-recorded deltas
+    python cli.py play a.json --start-s 5 --end-s 20 --speed 2 --scale 1.25   # edited on the fly (numpy)
+    python cli.py journal --save j.bin   # driver injection journal summary (see journal.py)
+    python cli.py journal --load j.bin   # decode a captured journal blob, no backend needed
+    python cli.py cache [--clear]   # compiled plan cache usage (see plancache.py)
+    python cli.py run jobs.json     # [{"kind": "play", "path": "a.json"}, {"kind": "pattern", "name": "square"}, ...]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from accel import load_calibration, run_calibration
+from catalog import Catalog
+from client import InputHogClient, ERROR_CODES, bench_contention
+from backend_user32 import User32Backend
+from backend_memory import MemoryBackend
+from daemon import DEFAULT_ADDRESS, DaemonClient
+from fidelity import measure
+from journal import decode_journal, summarize
+from stress import SaturatingBackend, StressTest
+from plancache import EDIT_KEYS, PlanCache, compile_events
+from movements import test_square, test_circle, test_triangle, test_line, test_random_drag
+from recording import iter_recording, play_recording, read_header
+
+RECORDINGS_DIR = Path(__file__).resolve().parent / "recordings"
+PLANS = PlanCache()
+
+PATTERNS = {
+    "square": lambda b, o: test_square(b, size=o.get("size", 50), delay_ms=o.get("delay_ms", 30)),
+    "circle": lambda b, o: test_circle(b, radius=o.get("radius", 30), steps=o.get("steps", 24), delay_ms=o.get("delay_ms", 25)),
+    "triangle": lambda b, o: test_triangle(b, size=o.get("size", 50), delay_ms=o.get("delay_ms", 30)),
+    "line": lambda b, o: test_line(b, length=o.get("size", 50) * 2, steps=o.get("steps", 10), delay_ms=o.get("delay_ms", 30)),
+    "random_drag": lambda b, o: test_random_drag(b, delay_ms=o.get("delay_ms", 30), steps=o.get("steps", 20)),
+}
+
+
+def _resolve(path_str: str) -> Path:
+    path = Path(path_str)
+    if not path.is_absolute() and not path.exists():
+        candidate = RECORDINGS_DIR / path.name
+        if candidate.exists():
+            return candidate
+    return path
+
+
+def _run_play(backend, job: dict) -> dict:
+    path = _resolve(job["path"])
+    total = 0
+    extra = {}
+    curve = None
+    if job.get("accel_comp") and read_header(path).get("mouse_source") == "raw":
+        extra = {"accel_comp": False}  # Raw Input deltas are device counts: nothing to undo
+    elif job.get("accel_comp"):
+        curve = load_calibration()
+        if curve is None:
+            raise ValueError("no acceleration calibration (run: python cli.py calibrate)")
+        extra = {"accel_comp": True, "calibration_current": curve.matches_system()}
+    # Trim / scale / speed are part of the plan key, so edited plays are cached too
+    edits = {k: job[k] for k in EDIT_KEYS if job.get(k) is not None}
+    if edits:
+        extra["edited"] = True
+    if job.get("plan_cache", True):
+        hits = PLANS.hits
+        # Compensated plans are compiled up front so compensation adds nothing during playback
+        events = PLANS.compile(path, curve, edits) if curve is not None else PLANS.stream(path, edits=edits)
+        extra["plan"] = "hit" if PLANS.hits > hits else "miss"
+    else:
+        events = compile_events(path, curve, edits)
+        if curve is not None:
+            events = list(events)
+
+    def count(ev: dict, ok: bool) -> None:
+        nonlocal total
+        total += 1
+
+    try:
+        ok = play_recording(backend, events, on_event=count)
+    finally:
+        if hasattr(events, "close"):
+            events.close()  # unmaps a cached plan; a partly played stream is discarded
+    return {"target": str(path), "ok": ok, "events": total, **extra}
+
+
+def _run_fidelity(backend, job: dict) -> dict:
+    path = _resolve(job["path"])
+    return {"target": str(path), "report": measure(backend, iter_recording(path))}
+
+
+def _run_pattern(backend, job: dict) -> dict:
+    name = job["name"]
+    if name not in PATTERNS:
+        raise ValueError(f"Unknown pattern {name!r} (choose from {', '.join(PATTERNS)})")
+    return {"target": name, "ok": PATTERNS[name](backend, job)}
+
+
+def _run_status(backend, job: dict) -> dict:
+    if not hasattr(backend, "get_status"):
+        return {"target": "status", "status": None}
+    status = backend.get_status()
+    out = {"target": "status", "status": status}
+    if hasattr(backend, "get_write_combining_stats"):
+        out["write_combining"] = backend.get_write_combining_stats()
+    if status is None:
+        err = backend.get_last_error()
+        out["error"] = ERROR_CODES.get(err, f"Win32 error {err}")
+    return out
+
+
+def _run_stress(backend, job: dict) -> dict:
+    opts = {k: job[k] for k in ("start_hz", "max_hz", "factor", "step_s") if job.get(k) is not None}
+    result = StressTest(backend, **opts).run(on_step=lambda step: print(json.dumps({"stress_step": step}), flush=True))
+    # Steps were already printed as they finished; the job line carries the verdict
+    return {"target": "stress", **{k: v for k, v in result.items() if k != "steps"}, "steps": len(result["steps"])}
+
+
+def _run_contention(backend, job: dict) -> dict:
+    opts = {k: job[k] for k in ("max_threads", "calls_per_thread") if job.get(k) is not None}
+    return {"target": "contention", "steps": bench_contention(backend, **opts)}
+
+
+def _run_journal(backend, job: dict) -> dict:
+    if not hasattr(backend, "read_journal"):
+        return {"target": "journal", "error": "backend has no injection journal (driver only)"}
+    since = job.get("since", 0)
+    blob = backend.read_journal(since)
+    if blob is None:
+        err = backend.get_last_error()
+        return {"target": "journal", "error": ERROR_CODES.get(err, f"Win32 error {err}")}
+    if job.get("save"):
+        Path(job["save"]).write_bytes(blob)
+    return {"target": "journal", **summarize(decode_journal(blob), since)}
+
+
+def _run_calibrate(backend, job: dict) -> dict:
+    curve = run_calibration(backend)
+    return {"target": "calibrate", "points": curve.points[1:], "settings": curve.settings}
+
+
+RUNNERS = {
+    "play": _run_play,
+    "pattern": _run_pattern,
+    "status": _run_status,
+    "fidelity": _run_fidelity,
+    "stress": _run_stress,
+    "contention": _run_contention,
+    "calibrate": _run_calibrate,
+    "journal": _run_journal,
+}
+
+
+def run_jobs(backend, jobs: list[dict], out=sys.stdout) -> list[dict]:
+    """Run jobs in order on one backend; print and return a result dict per job."""
+    results = []
+    for i, job in enumerate(jobs):
+        kind = job.get("kind", "")
+        start = time.perf_counter()
+        try:
+            result = RUNNERS[kind](backend, job) if kind in RUNNERS else {"error": f"Unknown job kind {kind!r}"}
+        except Exception as e:
+            result = {"error": str(e)}
+        seconds = time.perf_counter() - start
+        result = {"job": i, "kind": kind, **result, "seconds": round(seconds, 6)}
+        if "ok" in result and seconds > 0:
+            result["events_per_sec"] = round(result["ok"] / seconds, 1)
+        results.append(result)
+        print(json.dumps(result), file=out, flush=True)
+    return results
+
+
+def _failed(result: dict) -> bool:
+    """A job failed if it raised, or its ok (bool or success count) is false or short of its events."""
+    if "error" in result:
+        return True
+    if "ok" not in result:
+        return False
+    if "events" in result:
+        return result["ok"] < result["events"]
+    return not result["ok"]
+
+
+def _build_jobs(args) -> list[dict]:
+    if args.command == "play":
+        edits = {k: getattr(args, k) for k in EDIT_KEYS if getattr(args, k) is not None}
+        return [
+            {"kind": "play", "path": p, "accel_comp": args.accel_comp, "plan_cache": not args.no_plan_cache, **edits}
+            for p in args.paths
+        ] * args.repeat
+    if args.command == "pattern":
+        opts = {k: v for k, v in (("size", args.size), ("radius", args.radius), ("steps", args.steps), ("delay_ms", args.delay_ms)) if v is not None}
+        return [{"kind": "pattern", "name": n, **opts} for n in args.names] * args.repeat
+    if args.command == "status":
+        return [{"kind": "status"}]
+    if args.command == "calibrate":
+        return [{"kind": "calibrate"}]
+    if args.command == "journal":
+        return [{"kind": "journal", "since": args.since, "save": args.save}]
+    if args.command == "stress":
+        return [{"kind": "stress", "start_hz": args.start_hz, "max_hz": args.max_hz, "factor": args.factor, "step_s": args.step_s}]
+    if args.command == "contention":
+        return [{"kind": "contention", "max_threads": args.max_threads, "calls_per_thread": args.calls}]
+    if args.command == "fidelity":
+        return [{"kind": "fidelity", "path": p} for p in args.paths]
+    with open(args.jobs, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _open_backend(name: str, combine_us: int = 0):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "simulated":
+        return SaturatingBackend()
+    if name == "daemon":
+        client = DaemonClient(DEFAULT_ADDRESS, name="inputhog cli")
+        if not client.open():
+            print(f"Error: no controller daemon at {DEFAULT_ADDRESS} (start it with: python daemon.py)", file=sys.stderr)
+            return None
+        return client
+    if name == "user32":
+        if not User32Backend.is_available():
+            print("Error: pyautogui is required. Install with: pip install pyautogui", file=sys.stderr)
+            return None
+        return User32Backend()
+    client = InputHogClient(combine_window_us=combine_us)
+    if not client.open():
+        err = client.get_last_error()
+        print(f"Error: cannot open driver: {ERROR_CODES.get(err, f'Win32 error {err}')}", file=sys.stderr)
+        return None
+    return client
+
+
+def _list_recordings(directory: Path) -> int:
+    if not directory.is_dir():
+        print(f"Error: no recordings folder at {directory}", file=sys.stderr)
+        return 1
+    catalog = Catalog(directory)
+    catalog.refresh()
+    for entry in catalog.entries():
+        print(json.dumps(entry))
+    return 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="inputhog", description="Headless InputHog runner.")
+    parser.add_argument("--backend", choices=("driver", "user32", "memory", "simulated", "daemon"), default="driver")
+    parser.add_argument("--start-delay", type=float, default=0.0, help="seconds to wait before the first job")
+    parser.add_argument("--combine-us", type=int, default=0, help="driver backend: write-combine relative moves within this window (µs)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_play = sub.add_parser("play", help="play recordings")
+    p_play.add_argument("paths", nargs="+")
+    p_play.add_argument("--repeat", type=int, default=1)
+    p_play.add_argument("--accel-comp", action="store_true", help="compensate pointer acceleration (needs calibrate)")
+    p_play.add_argument("--no-plan-cache", action="store_true", help="parse the recording even if a compiled plan is cached")
+    p_play.add_argument("--start-s", type=float, help="play from this many seconds in")
+    p_play.add_argument("--end-s", type=float, help="stop at this many seconds in")
+    p_play.add_argument("--scale", type=float, help="scale move deltas (e.g. for a DPI change)")
+    p_play.add_argument("--speed", type=float, help="playback speed factor (2 = twice as fast)")
+
+    p_pat = sub.add_parser("pattern", help="run movement patterns")
+    p_pat.add_argument("names", nargs="+", choices=sorted(PATTERNS))
+    p_pat.add_argument("--size", type=int)
+    p_pat.add_argument("--radius", type=int)
+    p_pat.add_argument("--steps", type=int)
+    p_pat.add_argument("--delay-ms", type=float)
+    p_pat.add_argument("--repeat", type=int, default=1)
+
+    sub.add_parser("status", help="print driver status")
+    sub.add_parser("calibrate", help="measure the pointer acceleration curve for --accel-comp")
+
+    p_journal = sub.add_parser("journal", help="summarize the driver's per-event injection journal")
+    p_journal.add_argument("--since", type=int, default=0, help="only entries after this sequence number")
+    p_journal.add_argument("--save", type=Path, help="also write the raw reply to this file")
+    p_journal.add_argument("--load", type=Path, help="decode a saved reply instead of asking the driver")
+
+    p_fid = sub.add_parser("fidelity", help="play recordings and report timing error, drops and drift")
+    p_fid.add_argument("paths", nargs="+")
+
+    p_stress = sub.add_parser("stress", help="ramp the injection rate and report where it saturates")
+    p_stress.add_argument("--start-hz", type=float)
+    p_stress.add_argument("--max-hz", type=float)
+    p_stress.add_argument("--factor", type=float)
+    p_stress.add_argument("--step-s", type=float)
+
+    p_cont = sub.add_parser("contention", help="measure move throughput with concurrent sending threads")
+    p_cont.add_argument("--max-threads", type=int, help="double the sender count up to this (default 8)")
+    p_cont.add_argument("--calls", type=int, help="moves per thread per step (default 2000)")
+
+    p_list = sub.add_parser("list", help="list recordings with cached metadata (no backend needed)")
+    p_list.add_argument("--dir", type=Path, default=RECORDINGS_DIR)
+
+    p_cache = sub.add_parser("cache", help="show compiled plan cache usage (no backend needed)")
+    p_cache.add_argument("--clear", action="store_true", help="delete every cached plan")
+
+    p_run = sub.add_parser("run", help="run a JSON job list")
+    p_run.add_argument("jobs", help='file with [{"kind": "play"|"pattern"|"status"|"fidelity"|"stress"|"contention"|"calibrate"|"journal", ...}, ...]')
+
+    args = parser.parse_args(argv)
+    if args.combine_us and args.backend != "driver":
+        parser.error("--combine-us only applies to --backend driver")
+    if args.command == "list":
+        return _list_recordings(args.dir)
+    if args.command == "cache":
+        cleared = PLANS.clear() if args.clear else None
+        print(json.dumps({**PLANS.stats(), **({"cleared": cleared} if args.clear else {})}))
+        return 0
+    if args.command == "journal" and args.load:
+        print(json.dumps({"target": str(args.load), **summarize(decode_journal(args.load.read_bytes()), args.since or None)}))
+        return 0
+    jobs = _build_jobs(args)
+    backend = _open_backend(args.backend, args.combine_us)
+    if backend is None:
+        return 1
+    try:
+        if args.start_delay > 0:
+            time.sleep(args.start_delay)
+        results = run_jobs(backend, jobs)
+    finally:
+        if hasattr(backend, "close"):
+            backend.close()
+    return 2 if any(_failed(r) for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,17 @@
 """
-InputHog controller — sends mouse move requests to the kernel driver via IOCTL.
+InputHog controller — sends mouse and keyboard requests to the kernel driver via IOCTL.
 """
 
 import ctypes
+import sys
+import threading
+import time
+import weakref
 from ctypes import wintypes
 from typing import Optional
 
+from display import get_display_service
+
 # Constants (must match shared/ioctl.h)
 INPUT_HOG_DEVICE_TYPE = 0x8000
 FILE_ANY_ACCESS = 0
@@ -25,6 +31,56 @@ IOCTL_INPUT_HOG_MOUSE_INPUT = _ctl_code(
 IOCTL_INPUT_HOG_GET_STATUS = _ctl_code(
     INPUT_HOG_DEVICE_TYPE, 0x802, METHOD_BUFFERED, FILE_ANY_ACCESS
 )
+IOCTL_INPUT_HOG_SCHEDULE = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x804, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+IOCTL_INPUT_HOG_CANCEL = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x805, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+IOCTL_INPUT_HOG_QUEUE_INFO = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x806, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+
+IOCTL_INPUT_HOG_RING_MAP = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x807, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+IOCTL_INPUT_HOG_RING_UNMAP = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x808, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+IOCTL_INPUT_HOG_RING_DOORBELL = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x809, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+IOCTL_INPUT_HOG_MOVE_ABSOLUTE = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x80A, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+IOCTL_INPUT_HOG_KEYBOARD_INPUT = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x80B, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+IOCTL_INPUT_HOG_INPUT_BATCH = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x80C, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+IOCTL_INPUT_HOG_JOURNAL_READ = _ctl_code(
+    INPUT_HOG_DEVICE_TYPE, 0x80D, METHOD_BUFFERED, FILE_ANY_ACCESS
+)
+
+INPUT_HOG_QUEUE_CAPACITY = 4096
+INPUT_HOG_RING_MAGIC = 0x47524849  # 'IHRG'
+INPUT_HOG_ABSOLUTE_MAX = 65535  # MOUSE_ABSOLUTE_REQUEST x/y span the virtual desktop 0..65535
+INPUT_HOG_BATCH_MAX = 4096  # entries per IOCTL_INPUT_HOG_INPUT_BATCH
+INPUT_HOG_JOURNAL_CAPACITY = 4096  # injections the driver journal keeps
+
+# KEYBOARD_INPUT_REQUEST flags (KEY_BREAK/KEY_E0/KEY_E1 from ntddkbd.h)
+INPUT_HOG_KEY_BREAK = 0x0001
+INPUT_HOG_KEY_E0 = 0x0002
+INPUT_HOG_KEY_E1 = 0x0004
+
+# INPUT_BATCH_ENTRY types
+INPUT_HOG_ENTRY_MOUSE = 0
+INPUT_HOG_ENTRY_MOUSE_ABSOLUTE = 1
+INPUT_HOG_ENTRY_KEYBOARD = 2
+
+# Recording event types send_events() accepts
+INPUT_EVENT_TYPES = ("move", "button", "key", "anchor")
 
 GENERIC_READ = 0x80000000
 GENERIC_WRITE = 0x40000000
@@ -34,11 +90,13 @@ OPEN_EXISTING = 3
 FILE_ATTRIBUTE_NORMAL = 0x80
 
 
+# Structs use fixed-width fields (LONG/ULONG are 32-bit on Windows) so their
+# layout matches shared/ioctl.h on any host.
 class MOUSE_MOVE_REQUEST(ctypes.Structure):
     _pack_ = 1
     _fields_ = [
-        ("x", ctypes.c_long),
-        ("y", ctypes.c_long),
+        ("x", ctypes.c_int32),
+        ("y", ctypes.c_int32),
     ]
 
 
@@ -54,25 +112,242 @@ MOUSE_MIDDLE_BUTTON_UP = 0x0020
 class MOUSE_INPUT_REQUEST(ctypes.Structure):
     _pack_ = 1
     _fields_ = [
-        ("buttonFlags", ctypes.c_ushort),
-        ("x", ctypes.c_long),
-        ("y", ctypes.c_long),
+        ("buttonFlags", ctypes.c_uint16),
+        ("x", ctypes.c_int32),
+        ("y", ctypes.c_int32),
+    ]
+
+
+class MOUSE_ABSOLUTE_REQUEST(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("buttonFlags", ctypes.c_uint16),
+        ("x", ctypes.c_int32),
+        ("y", ctypes.c_int32),
+    ]
+
+
+class KEYBOARD_INPUT_REQUEST(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("makeCode", ctypes.c_uint16),
+        ("flags", ctypes.c_uint16),
+    ]
+
+
+class INPUT_BATCH_ENTRY(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("type", ctypes.c_uint16),
+        ("flags", ctypes.c_uint16),
+        ("x", ctypes.c_int32),
+        ("y", ctypes.c_int32),
+    ]
+
+
+class JOURNAL_READ_REQUEST(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("sinceSequence", ctypes.c_uint64),
+    ]
+
+
+class INPUT_HOG_JOURNAL_HEADER(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("version", ctypes.c_uint32),
+        ("count", ctypes.c_uint32),
+        ("oldestSequence", ctypes.c_uint64),
+        ("nextSequence", ctypes.c_uint64),
+        ("qpcFrequency", ctypes.c_int64),
+        ("capacity", ctypes.c_uint32),
+        ("entrySize", ctypes.c_uint32),
+    ]
+
+
+class INPUT_HOG_JOURNAL_ENTRY(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("sequence", ctypes.c_uint64),
+        ("qpc", ctypes.c_int64),
+        ("type", ctypes.c_uint16),
+        ("flags", ctypes.c_uint16),
+        ("x", ctypes.c_int32),
+        ("y", ctypes.c_int32),
+        ("status", ctypes.c_int32),
     ]
 
 
 class INPUT_HOG_STATUS(ctypes.Structure):
     _pack_ = 1
     _fields_ = [
-        ("version", ctypes.c_ulong),
-        ("injectionInitialized", ctypes.c_ulong),
-        ("callbackFound", ctypes.c_ulong),
-        ("lastInitStatus", ctypes.c_long),
-        ("lastInjectStatus", ctypes.c_long),
-        ("totalRequests", ctypes.c_ulong),
-        ("failedRequests", ctypes.c_ulong),
+        ("version", ctypes.c_uint32),
+        ("injectionInitialized", ctypes.c_uint32),
+        ("callbackFound", ctypes.c_uint32),
+        ("lastInitStatus", ctypes.c_int32),
+        ("lastInjectStatus", ctypes.c_int32),
+        ("totalRequests", ctypes.c_uint32),
+        ("failedRequests", ctypes.c_uint32),
+        ("keyboardCallbackFound", ctypes.c_uint32),
+    ]
+
+
+class SCHEDULED_INPUT(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("dueUs", ctypes.c_uint64),
+        ("buttonFlags", ctypes.c_uint16),
+        ("x", ctypes.c_int32),
+        ("y", ctypes.c_int32),
+    ]
+
+
+class INPUT_HOG_QUEUE_INFO(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("depth", ctypes.c_uint32),
+        ("capacity", ctypes.c_uint32),
+        ("totalScheduled", ctypes.c_uint32),
+        ("totalReleased", ctypes.c_uint32),
+        ("totalCancelled", ctypes.c_uint32),
+        ("failedReleases", ctypes.c_uint32),
+        ("maxLatenessUs", ctypes.c_uint32),
+    ]
+
+
+class RING_MAP_REQUEST(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("address", ctypes.c_uint64),
+        ("size", ctypes.c_uint32),
+    ]
+
+
+class INPUT_HOG_RING_HEADER(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("magic", ctypes.c_uint32),
+        ("capacity", ctypes.c_uint32),
+        ("head", ctypes.c_uint32),
+        ("tail", ctypes.c_uint32),
+        ("consumed", ctypes.c_uint32),
+        ("failed", ctypes.c_uint32),
+        ("lastInjectStatus", ctypes.c_int32),
+        ("reserved", ctypes.c_uint32),
     ]
 
 
+def pack_schedule(events) -> bytes:
+    """
+    Pack (due_us, button_flags, x, y) tuples into a SCHEDULE_REQUEST buffer.
+    due_us is relative to when the driver accepts the batch.
+    """
+    entries = [
+        SCHEDULED_INPUT(dueUs=int(due_us), buttonFlags=flags, x=x, y=y)
+        for due_us, flags, x, y in events
+    ]
+    return bytes(ctypes.c_uint32(len(entries))) + bytes((SCHEDULED_INPUT * len(entries))(*entries))
+
+
+# Set-1 scan codes (US layout) for vk_to_scan() where MapVirtualKeyW is not
+# available. 0xE0xx marks extended keys.
+VK_SCAN_CODES = {
+    0x08: 0x0E, 0x09: 0x0F, 0x0D: 0x1C, 0x10: 0x2A, 0x11: 0x1D, 0x12: 0x38,
+    0x13: 0xE11D, 0x14: 0x3A, 0x1B: 0x01, 0x20: 0x39,
+    0x21: 0xE049, 0x22: 0xE051, 0x23: 0xE04F, 0x24: 0xE047,
+    0x25: 0xE04B, 0x26: 0xE048, 0x27: 0xE04D, 0x28: 0xE050,
+    0x2C: 0xE037, 0x2D: 0xE052, 0x2E: 0xE053,
+    0x5B: 0xE05B, 0x5C: 0xE05C, 0x5D: 0xE05D,
+    0x6A: 0x37, 0x6B: 0x4E, 0x6D: 0x4A, 0x6E: 0x53, 0x6F: 0xE035,
+    0x90: 0x45, 0x91: 0x46,
+    0xA0: 0x2A, 0xA1: 0x36, 0xA2: 0x1D, 0xA3: 0xE01D, 0xA4: 0x38, 0xA5: 0xE038,
+    0xBA: 0x27, 0xBB: 0x0D, 0xBC: 0x33, 0xBD: 0x0C, 0xBE: 0x34, 0xBF: 0x35,
+    0xC0: 0x29, 0xDB: 0x1A, 0xDC: 0x2B, 0xDD: 0x1B, 0xDE: 0x28,
+}
+VK_SCAN_CODES.update(zip(range(0x30, 0x3A), (0x0B, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 0x08, 0x09, 0x0A)))
+VK_SCAN_CODES.update(zip(range(0x41, 0x5B), (
+    0x1E, 0x30, 0x2E, 0x20, 0x12, 0x21, 0x22, 0x23, 0x17, 0x24, 0x25, 0x26, 0x32,
+    0x31, 0x18, 0x19, 0x10, 0x13, 0x1F, 0x14, 0x16, 0x2F, 0x11, 0x2D, 0x15, 0x2C,
+)))
+VK_SCAN_CODES.update(zip(range(0x60, 0x6A), (0x52, 0x4F, 0x50, 0x51, 0x4B, 0x4C, 0x4D, 0x47, 0x48, 0x49)))
+VK_SCAN_CODES.update(zip(range(0x70, 0x7C), (0x3B, 0x3C, 0x3D, 0x3E, 0x3F, 0x40, 0x41, 0x42, 0x43, 0x44, 0x57, 0x58)))
+
+# Keys whose scan code carries the E0 prefix even where MapVirtualKeyW omits it
+EXTENDED_VKS = frozenset((0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2D, 0x2E, 0x5B, 0x5C, 0x5D, 0x6F, 0xA3, 0xA5))
+
+MAPVK_VK_TO_VSC_EX = 4
+
+
+def vk_to_scan(vk: int) -> int:
+    """
+    Scan code for a virtual-key code, 0xE0xx/0xE1xx for extended keys; 0 if unknown.
+    Uses the active keyboard layout on Windows, VK_SCAN_CODES elsewhere.
+    """
+    if sys.platform == "win32":
+        scan = ctypes.windll.user32.MapVirtualKeyW(vk, MAPVK_VK_TO_VSC_EX)
+        if scan and vk in EXTENDED_VKS:
+            scan |= 0xE000
+    else:
+        scan = VK_SCAN_CODES.get(vk, 0)
+    return scan
+
+
+def key_request(scan: int, pressed: bool) -> KEYBOARD_INPUT_REQUEST:
+    """KEYBOARD_INPUT_REQUEST for a scan code as returned by vk_to_scan (prefix in the high byte)."""
+    flags = 0 if pressed else INPUT_HOG_KEY_BREAK
+    prefix = scan >> 8
+    if prefix == 0xE0:
+        flags |= INPUT_HOG_KEY_E0
+    elif prefix == 0xE1:
+        flags |= INPUT_HOG_KEY_E1
+    elif prefix:
+        raise ValueError(f"bad scan code 0x{scan:X}")
+    return KEYBOARD_INPUT_REQUEST(makeCode=scan & 0xFF, flags=flags)
+
+
+def event_entry(ev: dict, normalize=None, scan_for=vk_to_scan) -> tuple[int, int, int, int]:
+    """
+    (type, flags, x, y) INPUT_BATCH_ENTRY fields for one recording event.
+    normalize(x, y) maps anchor pixels to 0..65535 and is only called for anchors.
+    Raises ValueError for events the driver cannot inject.
+    """
+    ev_type = ev.get("type", "")
+    if ev_type == "move":
+        return INPUT_HOG_ENTRY_MOUSE, 0, ev.get("dx", 0), ev.get("dy", 0)
+    if ev_type == "button":
+        return INPUT_HOG_ENTRY_MOUSE, ev.get("flag", 0), 0, 0
+    if ev_type == "anchor":
+        if normalize is None:
+            raise ValueError("anchor event needs normalize")
+        nx, ny = normalize(ev.get("x", 0), ev.get("y", 0))
+        return INPUT_HOG_ENTRY_MOUSE_ABSOLUTE, 0, nx, ny
+    if ev_type == "key" and ev.get("vk") is not None:
+        scan = ev.get("scan") or scan_for(int(ev["vk"]))
+        if not scan:
+            raise ValueError(f"no scan code for vk 0x{int(ev['vk']):X}")
+        req = key_request(scan, ev.get("pressed", True))
+        return INPUT_HOG_ENTRY_KEYBOARD, req.flags, req.makeCode, 0
+    raise ValueError(f"cannot inject {ev_type!r} event")
+
+
+def pack_input_batch(entries) -> bytes:
+    """Pack (type, flags, x, y) tuples into an INPUT_BATCH_REQUEST buffer."""
+    items = [INPUT_BATCH_ENTRY(type=t, flags=flags, x=x, y=y) for t, flags, x, y in entries]
+    return bytes(ctypes.c_uint32(len(items))) + bytes((INPUT_BATCH_ENTRY * len(items))(*items))
+
+
+def queue_info_to_dict(info: INPUT_HOG_QUEUE_INFO) -> dict:
+    return {
+        "depth": int(info.depth),
+        "capacity": int(info.capacity),
+        "total_scheduled": int(info.totalScheduled),
+        "total_released": int(info.totalReleased),
+        "total_cancelled": int(info.totalCancelled),
+        "failed_releases": int(info.failedReleases),
+        "max_lateness_us": int(info.maxLatenessUs),
+    }
+
+
 # Common Windows error codes for debugging
 ERROR_CODES = {
     2: "ERROR_FILE_NOT_FOUND (driver/device not found)",
@@ -80,25 +355,63 @@ ERROR_CODES = {
     6: "ERROR_INVALID_HANDLE",
     31: "ERROR_GEN_FAILURE (driver returned error)",
     87: "ERROR_INVALID_PARAMETER (wrong buffer/IOCTL)",
+    170: "ERROR_BUSY (ring already mapped by another handle)",
     1167: "ERROR_DEVICE_NOT_CONNECTED",
+    1450: "ERROR_NO_SYSTEM_RESOURCES (driver queue full)",
 }
 
 
 class InputHogClient:
-    """Client for communicating with the InputHog kernel driver."""
-
-    def __init__(self, device_path: str = r"\\.\InputHog"):
+    """
+    Client for communicating with the InputHog kernel driver.
+
+    Safe to share between threads: the last error is tracked per thread, and
+    each sending thread leases its own device handle from a small pool
+    (synchronous handles serialize every IOCTL issued on them). Threads beyond
+    pool_size share the primary handle opened by open().
+
+    Write combining (combine_window_us > 0, or set_write_combining()) is
+    opt-in: relative moves are summed in one accumulator and sent as a single
+    mouse_input once the window since the first pending move has passed, with
+    the next button event (the motion rides along in the same request), or on
+    flush(). Every other request flushes pending motion first, so order is kept.
+    The accumulator is emptied under a lock but sent outside it, so movers are
+    not held up by a send in progress.
+    """
+
+    def __init__(self, device_path: str = r"\\.\InputHog", pool_size: int = 4, combine_window_us: int = 0):
         self._device_path = device_path
         self._handle = None
-        self._last_error = 0
+        self._pool_size = pool_size
+        self._lock = threading.Lock()
+        self._tls = threading.local()
+        self._pooled: list[int] = []  # every extra handle opened for the pool
+        self._idle: list[int] = []  # pooled handles not leased by a live thread
+        self._generation = 0  # bumped by close() to invalidate outstanding leases
+        self._opening = 0  # pool handles being opened outside the lock
+        # Write combining state, guarded by _combine_cond; _send_lock orders combined sends
+        self._combine_cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._combine_ns = 0
+        self._pending_dx = 0
+        self._pending_dy = 0
+        self._pending_calls = 0
+        self._pending_since = 0
+        self._combine_stats = {"calls": 0, "flushes": 0, "failed": 0}
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_stop = False
+        if combine_window_us > 0:
+            self.set_write_combining(combine_window_us)
 
     def get_last_error(self) -> int:
-        """Last Win32 error captured by this client."""
-        return self._last_error
+        """Last Win32 error captured by this client on the calling thread."""
+        return getattr(self._tls, "last_error", 0)
 
-    def open(self) -> bool:
-        """Open a handle to the driver. Returns True on success."""
-        self._handle = ctypes.windll.kernel32.CreateFileW(
+    def _set_error(self, code: int) -> None:
+        self._tls.last_error = code
+
+    def _create_handle(self) -> Optional[int]:
+        handle = ctypes.windll.kernel32.CreateFileW(
             self._device_path,
             GENERIC_READ | GENERIC_WRITE,
             FILE_SHARE_READ | FILE_SHARE_WRITE,
@@ -107,101 +420,291 @@ class InputHogClient:
             FILE_ATTRIBUTE_NORMAL,
             None,
         )
-        ok = self._handle != wintypes.HANDLE(-1).value
-        if not ok:
-            self._handle = None
-            self._last_error = ctypes.windll.kernel32.GetLastError()
-        else:
-            self._last_error = 0
-        return ok
+        if handle == wintypes.HANDLE(-1).value:
+            self._set_error(ctypes.windll.kernel32.GetLastError())
+            return None
+        return handle
+
+    def open(self) -> bool:
+        """Open a handle to the driver. Returns True on success."""
+        handle = self._create_handle()
+        with self._lock:
+            self._handle = handle
+        if handle is None:
+            return False
+        with self._combine_cond:
+            self._start_flusher()  # stopped by an earlier close()
+        self._set_error(0)
+        return True
 
     def close(self) -> None:
-        """Close the driver handle."""
-        if self._handle is not None:
-            ctypes.windll.kernel32.CloseHandle(self._handle)
+        """Stop the write-combining flusher and flush pending motion, then close every handle."""
+        self._stop_flusher()
+        self.flush()
+        with self._lock:
+            handles = self._pooled + ([self._handle] if self._handle is not None else [])
             self._handle = None
-        self._last_error = 0
-
-    def move_mouse(self, x: int, y: int) -> bool:
-        """
-        Send a relative mouse movement request.
-        Returns True if the IOCTL succeeded.
-        """
-        if self._handle is None:
-            self._last_error = 6  # ERROR_INVALID_HANDLE
+            self._pooled = []
+            self._idle = []
+            self._generation += 1
+        for handle in handles:
+            ctypes.windll.kernel32.CloseHandle(handle)
+        self._set_error(0)
+
+    def _lease(self) -> Optional[int]:
+        """Handle for the calling thread, leased from the pool on first use."""
+        lease = getattr(self._tls, "lease", None)
+        with self._lock:
+            # Generation checked under the lock: close() may be invalidating the lease right now
+            if lease is not None and lease[0] == self._generation:
+                return lease[1]
+            if self._handle is None:
+                return None
+            generation = self._generation
+            if self._idle:
+                return self._adopt(generation, self._idle.pop())
+            if len(self._pooled) + self._opening >= self._pool_size:
+                return self._adopt(generation, self._handle)
+            self._opening += 1  # reserve the slot; CreateFileW runs without the lock
+        created = self._create_handle()
+        with self._lock:
+            self._opening -= 1
+            if created is not None and generation == self._generation:
+                self._pooled.append(created)
+                return self._adopt(generation, created)
+            # Open failed, or close() ran meanwhile: share the current primary handle
+            handle = self._handle
+            lease = self._adopt(self._generation, handle) if handle is not None else None
+        if created is not None:
+            ctypes.windll.kernel32.CloseHandle(created)
+        return lease
+
+    def _adopt(self, generation: int, handle: int) -> int:
+        """Make handle the calling thread's lease; caller holds self._lock."""
+        if handle != self._handle:
+            # Return the handle to the pool when this thread goes away
+            weakref.finalize(threading.current_thread(), self._release, generation, handle)
+        self._tls.lease = (generation, handle)
+        return handle
+
+    def _release(self, generation: int, handle: int) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._idle.append(handle)
+
+    def _ioctl(self, code: int, in_buf, in_size: int, out_buf, out_size: int) -> bool:
+        handle = self._lease()
+        if handle is None:
+            self._set_error(6)  # ERROR_INVALID_HANDLE
             return False
 
-        req = MOUSE_MOVE_REQUEST(x=x, y=y)
-        buffer = ctypes.create_string_buffer(ctypes.sizeof(req))
-        ctypes.memmove(buffer, ctypes.byref(req), ctypes.sizeof(req))
-
         bytes_returned = wintypes.DWORD()
         ok = ctypes.windll.kernel32.DeviceIoControl(
-            self._handle,
-            IOCTL_INPUT_HOG_MOVE_MOUSE,
-            buffer,
-            ctypes.sizeof(req),
-            None,
-            0,
+            handle,
+            code,
+            in_buf,
+            in_size,
+            out_buf,
+            out_size,
             ctypes.byref(bytes_returned),
             None,
         )
-        if not ok:
-            self._last_error = ctypes.windll.kernel32.GetLastError()
-        else:
-            self._last_error = 0
+        self._set_error(0 if ok else ctypes.windll.kernel32.GetLastError())
         return bool(ok)
 
+    def set_write_combining(self, window_us: int) -> None:
+        """Enable write combining with the given window, or disable it with 0 (pending motion is flushed)."""
+        with self._combine_cond:
+            self._combine_ns = max(0, int(window_us)) * 1000
+            self._combine_cond.notify_all()
+            self._start_flusher()
+        self.flush()
+
+    def _start_flusher(self) -> None:
+        """Start the backstop thread if combining is on and it is not running (caller holds _combine_cond)."""
+        if self._combine_ns and (self._flusher is None or not self._flusher.is_alive()):
+            self._flusher_stop = False
+            self._flusher = threading.Thread(target=self._flush_expired, name="inputhog-combine", daemon=True)
+            self._flusher.start()
+
+    def _stop_flusher(self) -> None:
+        with self._combine_cond:
+            flusher, self._flusher = self._flusher, None
+            self._flusher_stop = True
+            self._combine_cond.notify_all()
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+
+    def get_write_combining_stats(self) -> dict:
+        """
+        window_us; calls = moves taken into the accumulator; flushes = requests
+        sent just to carry them (motion folded into a button event is free);
+        combined = requests saved (calls - flushes - pending); failed = moves
+        lost to a failed send.
+        """
+        with self._combine_cond:
+            stats = dict(self._combine_stats)
+            stats["pending"] = self._pending_calls
+            stats["combined"] = stats["calls"] - stats["flushes"] - self._pending_calls
+            stats["window_us"] = self._combine_ns // 1000
+            return stats
+
+    def flush(self) -> bool:
+        """Send pending combined motion now. True if nothing was pending or the send succeeded."""
+        return self._send_pending()
+
+    def _send_pending(self, button_flags: int = 0, x: int = 0, y: int = 0) -> bool:
+        """
+        Send pending motion, plus an optional button event, as one mouse_input.
+        The motion is taken under _combine_cond and sent after releasing it;
+        _send_lock keeps sends in the order their motion was taken.
+        """
+        with self._send_lock:
+            with self._combine_cond:
+                dx, dy, n = self._pending_dx, self._pending_dy, self._pending_calls
+                self._pending_dx = self._pending_dy = self._pending_calls = 0
+                if n and not button_flags:
+                    self._combine_stats["flushes"] += 1
+            if n == 0 and not button_flags and not x and not y:
+                return True
+            req = MOUSE_INPUT_REQUEST(buttonFlags=button_flags, x=dx + x, y=dy + y)
+            ok = self._ioctl(IOCTL_INPUT_HOG_MOUSE_INPUT, ctypes.byref(req), ctypes.sizeof(req), None, 0)
+            if n and not ok:
+                with self._combine_cond:
+                    self._combine_stats["failed"] += n
+            return ok
+
+    def _combine(self, x: int, y: int) -> bool:
+        with self._combine_cond:
+            now = time.perf_counter_ns()
+            if not self._pending_calls:
+                self._pending_since = now
+                self._combine_cond.notify_all()
+            self._pending_dx += x
+            self._pending_dy += y
+            self._pending_calls += 1
+            self._combine_stats["calls"] += 1
+            expired = now - self._pending_since >= self._combine_ns
+        return self._send_pending() if expired else True
+
+    def _flush_expired(self) -> None:
+        """Backstop thread: sends pending motion whose window ran out with no later call to carry it."""
+        while True:
+            with self._combine_cond:
+                while True:
+                    if self._flusher_stop or not self._combine_ns:
+                        return
+                    if not self._pending_calls:
+                        self._combine_cond.wait()
+                        continue
+                    remaining_ns = self._pending_since + self._combine_ns - time.perf_counter_ns()
+                    if remaining_ns <= 0:
+                        break
+                    self._combine_cond.wait(remaining_ns / 1e9)
+            self._send_pending()
+
+    def _flushed(self) -> None:
+        """Flush before a request that must not overtake pending motion."""
+        with self._combine_cond:
+            pending = self._pending_calls
+        if pending:
+            self._send_pending()
+
+    def move_mouse(self, x: int, y: int) -> bool:
+        """
+        Send a relative mouse movement request.
+        Returns True if the IOCTL succeeded (or the move was accepted for combining).
+        """
+        if self._combine_ns:
+            return self._combine(x, y)
+        req = MOUSE_MOVE_REQUEST(x=x, y=y)
+        return self._ioctl(IOCTL_INPUT_HOG_MOVE_MOUSE, ctypes.byref(req), ctypes.sizeof(req), None, 0)
+
     def mouse_input(self, button_flags: int, x: int, y: int) -> bool:
         """Send mouse input (buttons + movement). Returns True if IOCTL succeeded."""
-        if self._handle is None:
-            self._last_error = 6
-            return False
-
+        if self._combine_ns:
+            if not button_flags:
+                return self._combine(x, y)
+            return self._send_pending(button_flags, x, y)
+        self._flushed()
         req = MOUSE_INPUT_REQUEST(buttonFlags=button_flags, x=x, y=y)
-        buffer = ctypes.create_string_buffer(ctypes.sizeof(req))
-        ctypes.memmove(buffer, ctypes.byref(req), ctypes.sizeof(req))
+        return self._ioctl(IOCTL_INPUT_HOG_MOUSE_INPUT, ctypes.byref(req), ctypes.sizeof(req), None, 0)
 
-        bytes_returned = wintypes.DWORD()
-        ok = ctypes.windll.kernel32.DeviceIoControl(
-            self._handle,
-            IOCTL_INPUT_HOG_MOUSE_INPUT,
-            buffer,
-            ctypes.sizeof(req),
-            None,
-            0,
-            ctypes.byref(bytes_returned),
-            None,
-        )
-        if not ok:
-            self._last_error = ctypes.windll.kernel32.GetLastError()
-        else:
-            self._last_error = 0
-        return bool(ok)
+    def move_absolute(self, nx: int, ny: int, button_flags: int = 0) -> bool:
+        """Move to normalised virtual-desktop coordinates (0..65535 each), optionally with button flags."""
+        self._flushed()
+        req = MOUSE_ABSOLUTE_REQUEST(buttonFlags=button_flags, x=nx, y=ny)
+        return self._ioctl(IOCTL_INPUT_HOG_MOVE_ABSOLUTE, ctypes.byref(req), ctypes.sizeof(req), None, 0)
+
+    def move_to(self, x: int, y: int, button_flags: int = 0) -> bool:
+        """
+        Move to virtual-desktop pixel (x, y) in one absolute event, independent
+        of pointer acceleration. Pixels are normalised against the cached
+        display topology (display.py).
+        """
+        nx, ny = get_display_service().normalize(x, y)
+        return self.move_absolute(nx, ny, button_flags)
+
+    def key(self, vk: int, pressed: bool = True, scan: Optional[int] = None) -> bool:
+        """
+        Press or release a key through the KbdClass service callback.
+        scan (set-1, 0xE0xx for extended keys) overrides the lookup from vk.
+        """
+        code = scan or vk_to_scan(vk)
+        if not code:
+            self._set_error(87)  # ERROR_INVALID_PARAMETER
+            return False
+        req = key_request(code, pressed)
+        self._flushed()
+        return self._ioctl(IOCTL_INPUT_HOG_KEYBOARD_INPUT, ctypes.byref(req), ctypes.sizeof(req), None, 0)
+
+    def send_inputs(self, entries) -> int:
+        """
+        Inject (type, flags, x, y) INPUT_BATCH_ENTRY tuples in order, up to
+        INPUT_HOG_BATCH_MAX per IOCTL. The driver takes each IOCTL whole or
+        not at all. Returns how many entries were injected.
+        """
+        entries = list(entries)
+        self._flushed()
+        sent = 0
+        injected = ctypes.c_uint32()
+        for i in range(0, len(entries), INPUT_HOG_BATCH_MAX):
+            chunk = entries[i:i + INPUT_HOG_BATCH_MAX]
+            buf = pack_input_batch(chunk)
+            if not self._ioctl(IOCTL_INPUT_HOG_INPUT_BATCH, buf, len(buf), ctypes.byref(injected), ctypes.sizeof(injected)):
+                break
+            sent += len(chunk)
+        return sent
+
+    def send_events(self, events) -> int:
+        """
+        Inject recording events (move, button, key, anchor) in order as mixed
+        input batches, so keys share the mouse's channel. Stops before the
+        first event the driver cannot take. Returns how many events were
+        injected (a prefix of events).
+        """
+        normalize = get_display_service().normalize
+        entries = []
+        bad = False
+        for ev in events:
+            try:
+                entries.append(event_entry(ev, normalize))
+            except ValueError:
+                bad = True
+                break
+        sent = self.send_inputs(entries)
+        if bad and sent == len(entries):
+            self._set_error(87)  # ERROR_INVALID_PARAMETER
+        return sent
 
     def get_status(self) -> Optional[dict]:
         """Query current driver status. Returns dict on success, else None."""
-        if self._handle is None:
-            self._last_error = 6  # ERROR_INVALID_HANDLE
-            return None
-
         out_status = INPUT_HOG_STATUS()
-        bytes_returned = wintypes.DWORD()
-        ok = ctypes.windll.kernel32.DeviceIoControl(
-            self._handle,
-            IOCTL_INPUT_HOG_GET_STATUS,
-            None,
-            0,
-            ctypes.byref(out_status),
-            ctypes.sizeof(out_status),
-            ctypes.byref(bytes_returned),
-            None,
-        )
-        if not ok:
-            self._last_error = ctypes.windll.kernel32.GetLastError()
+        if not self._ioctl(
+            IOCTL_INPUT_HOG_GET_STATUS, None, 0, ctypes.byref(out_status), ctypes.sizeof(out_status)
+        ):
             return None
 
-        self._last_error = 0
         return {
             "version": int(out_status.version),
             "injection_initialized": bool(out_status.injectionInitialized),
@@ -210,8 +713,65 @@ class InputHogClient:
             "last_inject_status": int(out_status.lastInjectStatus),
             "total_requests": int(out_status.totalRequests),
             "failed_requests": int(out_status.failedRequests),
+            "keyboard_callback_found": bool(out_status.keyboardCallbackFound),
         }
 
+    def schedule(self, events) -> bool:
+        """
+        Queue (due_us, button_flags, x, y) events in the driver, which releases
+        each one from a high-resolution kernel timer at its due time (relative
+        to submission). The whole batch is rejected if it does not fit.
+        """
+        buf = pack_schedule(events)
+        self._flushed()
+        return self._ioctl(IOCTL_INPUT_HOG_SCHEDULE, buf, len(buf), None, 0)
+
+    def cancel(self) -> Optional[int]:
+        """Drop every event still waiting in the driver queue. Returns how many were dropped."""
+        removed = ctypes.c_uint32()
+        if not self._ioctl(IOCTL_INPUT_HOG_CANCEL, None, 0, ctypes.byref(removed), ctypes.sizeof(removed)):
+            return None
+        return int(removed.value)
+
+    def get_queue_info(self) -> Optional[dict]:
+        """Query timed queue depth and counters. Returns dict on success, else None."""
+        info = INPUT_HOG_QUEUE_INFO()
+        if not self._ioctl(IOCTL_INPUT_HOG_QUEUE_INFO, None, 0, ctypes.byref(info), ctypes.sizeof(info)):
+            return None
+        return queue_info_to_dict(info)
+
+    def read_journal(self, since: int = 0, max_entries: int = INPUT_HOG_JOURNAL_CAPACITY) -> Optional[bytes]:
+        """
+        Raw IOCTL_INPUT_HOG_JOURNAL_READ reply (header + entries) for injections
+        with sequence > since, or None on failure. Decode with journal.decode_journal.
+        """
+        req = JOURNAL_READ_REQUEST(sinceSequence=since)
+        size = ctypes.sizeof(INPUT_HOG_JOURNAL_HEADER) + max_entries * ctypes.sizeof(INPUT_HOG_JOURNAL_ENTRY)
+        buf = ctypes.create_string_buffer(max(size, ctypes.sizeof(req)))
+        ctypes.memmove(buf, ctypes.byref(req), ctypes.sizeof(req))
+        if not self._ioctl(IOCTL_INPUT_HOG_JOURNAL_READ, buf, ctypes.sizeof(req), buf, size):
+            return None
+        header = INPUT_HOG_JOURNAL_HEADER.from_buffer(buf)
+        used = ctypes.sizeof(header) + header.count * header.entrySize
+        return buf.raw[:min(used, size)]
+
+    def map_ring(self, address: int, size: int) -> bool:
+        """
+        Ask the driver to lock and map a ring buffer (INPUT_HOG_RING_HEADER +
+        MOUSE_INPUT_REQUEST slots) at address in this process. The mapping is
+        owned by the calling thread's handle; while it exists, other handles
+        get ERROR_BUSY. See ring.RingTransport.
+        """
+        req = RING_MAP_REQUEST(address=address, size=size)
+        return self._ioctl(IOCTL_INPUT_HOG_RING_MAP, ctypes.byref(req), ctypes.sizeof(req), None, 0)
+
+    def unmap_ring(self) -> bool:
+        return self._ioctl(IOCTL_INPUT_HOG_RING_UNMAP, None, 0, None, 0)
+
+    def ring_doorbell(self) -> bool:
+        """Tell the driver new slots are ready; it drains the ring before returning."""
+        return self._ioctl(IOCTL_INPUT_HOG_RING_DOORBELL, None, 0, None, 0)
+
     def __enter__(self) -> "InputHogClient":
         if not self.open():
             raise RuntimeError("Failed to open InputHog driver. Is it loaded?")
@@ -221,6 +781,44 @@ class InputHogClient:
         self.close()
 
 
+def bench_contention(client, max_threads: int = 8, calls_per_thread: int = 2000) -> list[dict]:
+    """
+    Measure move_mouse throughput with 1..max_threads concurrent senders
+    (doubling each step). Sends (0, 0) moves so the cursor stays put.
+    Returns one dict per step: threads, calls, seconds, calls_per_sec, failed.
+    """
+    results = []
+    n = 1
+    while n <= max_threads:
+        failed = [0] * n
+        barrier = threading.Barrier(n + 1)
+
+        def sender(idx: int) -> None:
+            barrier.wait()
+            for _ in range(calls_per_thread):
+                if not client.move_mouse(0, 0):
+                    failed[idx] += 1
+
+        threads = [threading.Thread(target=sender, args=(i,), daemon=True) for i in range(n)]
+        for t in threads:
+            t.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        calls = n * calls_per_thread
+        results.append({
+            "threads": n,
+            "calls": calls,
+            "seconds": elapsed,
+            "calls_per_sec": calls / elapsed if elapsed > 0 else 0.0,
+            "failed": sum(failed),
+        })
+        n *= 2
+    return results
+
+
 def main() -> None:
     """Demo: move mouse in a small square."""
     try:
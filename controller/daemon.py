@@ -0,0 +1,457 @@
+"""
+Controller daemon: one process owns the driver handle, every tool talks to it.
+Listens on a named pipe (\\\\.\\pipe\\InputHog) on Windows, or a Unix socket
+elsewhere, via multiprocessing.connection, which frames each message with
+its length. Requests are one type byte plus a body:
+  MSG_HELLO   utf-8 client name (optional, shows up in status)
+  MSG_BATCH   <I count, then count x <Hii (buttonFlags, x, y), the
+              MOUSE_INPUT_REQUEST layout; flags 0 = relative move
+  MSG_STATUS  empty
+  MSG_KEY     <HBH (virtual key, pressed, scan code or 0 to look it up)
+  MSG_MOVE_TO <iiH (virtual-desktop x, y, buttonFlags)
+Replies: MSG_RESULT <III (events, succeeded, last error), MSG_STATUS_REPLY
+(JSON), MSG_ERROR (utf-8 text). A batch is injected as a unit, in order;
+batches from different clients are interleaved by deficit round robin on
+event count, so a client streaming large batches cannot starve the others.
+Keys and absolute moves queue behind the client's earlier batches, one
+event each.
+
+DaemonClient is the client library; it has the backend interface
+(move_mouse, mouse_input, move_to, key, submit, get_status, get_last_error),
+so patterns, playback and the CLI can use the daemon in place of
+InputHogClient. key/move_to raise DaemonError if the daemon's backend
+cannot inject them.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import Client, Listener
+from typing import Optional
+
+from timeline import submit_batch
+
+if sys.platform == "win32":
+    DEFAULT_ADDRESS = r"\\.\pipe\InputHog"
+else:
+    DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), "inputhog.sock")
+
+MSG_HELLO = 0x01
+MSG_BATCH = 0x02
+MSG_STATUS = 0x03
+MSG_KEY = 0x04
+MSG_MOVE_TO = 0x05
+MSG_RESULT = 0x81
+MSG_STATUS_REPLY = 0x82
+MSG_ERROR = 0xFF
+
+MAX_BATCH_EVENTS = 65536
+QUANTUM_EVENTS = 256  # DRR credit per client per round
+
+_COUNT = struct.Struct("<I")
+_EVENT = struct.Struct("<Hii")
+_RESULT = struct.Struct("<III")
+_KEY = struct.Struct("<HBH")
+_MOVE_TO = struct.Struct("<iiH")
+MAX_MESSAGE = 1 + _COUNT.size + MAX_BATCH_EVENTS * _EVENT.size
+
+
+class DaemonError(Exception):
+    """The daemon rejected a request."""
+
+
+def pack_batch(batch: list[tuple[int, int, int]]) -> bytes:
+    if len(batch) > MAX_BATCH_EVENTS:
+        raise ValueError(f"batch of {len(batch)} events exceeds {MAX_BATCH_EVENTS}")
+    out = bytearray(1 + _COUNT.size + len(batch) * _EVENT.size)
+    out[0] = MSG_BATCH
+    _COUNT.pack_into(out, 1, len(batch))
+    offset = 1 + _COUNT.size
+    for flags, x, y in batch:
+        _EVENT.pack_into(out, offset, flags, x, y)
+        offset += _EVENT.size
+    return bytes(out)
+
+
+def unpack_batch(body: bytes) -> list[tuple[int, int, int]]:
+    if len(body) < _COUNT.size:
+        raise ValueError("truncated batch")
+    (count,) = _COUNT.unpack_from(body)
+    if count > MAX_BATCH_EVENTS or len(body) != _COUNT.size + count * _EVENT.size:
+        raise ValueError(f"bad batch length {len(body)} for {count} events")
+    return list(_EVENT.iter_unpack(body[_COUNT.size:]))
+
+
+class _Submission:
+    """A batch of (button_flags, x, y), or one backend call (method name, args) counted as one event."""
+
+    def __init__(self, batch: list[tuple[int, int, int]], call: Optional[tuple[str, tuple]] = None) -> None:
+        self.batch = batch
+        self.call = call
+        self.size = 1 if call is not None else len(batch)
+        self.ok = 0
+        self.last_error = 0
+        self.done = threading.Event()
+
+
+class _ClientState:
+    def __init__(self, cid: int) -> None:
+        self.id = cid
+        self.name = f"client {cid}"
+        self.queue: deque[_Submission] = deque()
+        self.deficit = 0
+        self.batches = 0
+        self.events = 0
+        self.ok = 0
+        self.connected_at = time.time()
+
+
+class FairScheduler:
+    """
+    Per-client FIFO queues drained by one injector thread with deficit round
+    robin: each round a client with work gains QUANTUM_EVENTS of credit and
+    sends whole batches while its credit covers them. Works without any IPC.
+    """
+
+    def __init__(self, backend, quantum: int = QUANTUM_EVENTS) -> None:
+        self.backend = backend
+        self.quantum = quantum
+        self._cond = threading.Condition()
+        self._clients: dict[int, _ClientState] = {}
+        self._active: deque[int] = deque()  # client ids with queued batches, in round order
+        self._ids = itertools.count(1)
+        self._closed = False
+        self.total_batches = 0
+        self.total_events = 0
+        self.failed_events = 0
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name="inputhog-daemon-inject", daemon=True)
+        self._thread.start()
+
+    def register(self) -> int:
+        with self._cond:
+            cid = next(self._ids)
+            self._clients[cid] = _ClientState(cid)
+            return cid
+
+    def unregister(self, cid: int) -> None:
+        with self._cond:
+            state = self._clients.pop(cid, None)
+            if state is not None:
+                for sub in state.queue:
+                    sub.done.set()
+                if cid in self._active:
+                    self._active.remove(cid)
+
+    def set_name(self, cid: int, name: str) -> None:
+        with self._cond:
+            if cid in self._clients:
+                self._clients[cid].name = name
+
+    def submit(self, cid: int, batch: list[tuple[int, int, int]]) -> _Submission:
+        return self._enqueue(cid, _Submission(batch))
+
+    def submit_call(self, cid: int, method: str, *args) -> _Submission:
+        """Queue backend.<method>(*args) (key, move_to) behind the client's batches."""
+        return self._enqueue(cid, _Submission([], (method, args)))
+
+    def _enqueue(self, cid: int, sub: _Submission) -> _Submission:
+        with self._cond:
+            state = self._clients.get(cid)
+            if state is None or self._closed or not sub.size:
+                sub.done.set()
+                return sub
+            state.queue.append(sub)
+            if cid not in self._active:
+                self._active.append(cid)
+            self._cond.notify()
+        return sub
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "total_batches": self.total_batches,
+                "total_events": self.total_events,
+                "failed_events": self.failed_events,
+                "clients": [
+                    {"id": s.id, "name": s.name, "batches": s.batches, "events": s.events,
+                     "ok": s.ok, "queued": sum(q.size for q in s.queue)}
+                    for s in self._clients.values()
+                ],
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _next(self) -> Optional[tuple[_ClientState, _Submission]]:
+        """Pick the next batch to send (caller holds the lock)."""
+        while self._active:
+            cid = self._active[0]
+            state = self._clients[cid]
+            if not state.queue:
+                state.deficit = 0
+                self._active.popleft()
+                continue
+            head = state.queue[0]
+            if state.deficit >= head.size:
+                state.deficit -= head.size
+                state.queue.popleft()
+                return state, head
+            state.deficit += self.quantum
+            self._active.rotate(-1)
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                picked = None
+                while not self._closed:
+                    picked = self._next()
+                    if picked is not None:
+                        break
+                    self._cond.wait()
+                if picked is None:
+                    for state in self._clients.values():
+                        for sub in state.queue:
+                            sub.done.set()
+                    return
+            state, sub = picked
+            try:
+                if sub.call is not None:
+                    method, args = sub.call
+                    results = [bool(getattr(self.backend, method)(*args))]
+                else:
+                    results = submit_batch(self.backend, sub.batch)
+            except Exception:
+                results = [False] * sub.size
+            sub.ok = sum(results)
+            if sub.ok < len(results):
+                sub.last_error = self.backend.get_last_error()
+            with self._cond:
+                state.batches += 1
+                state.events += sub.size
+                state.ok += sub.ok
+                self.total_batches += 1
+                self.total_events += sub.size
+                self.failed_events += sub.size - sub.ok
+            sub.done.set()
+
+
+class ControllerDaemon:
+    """Accepts connections on address and serves each on its own thread."""
+
+    def __init__(self, backend, address: str = DEFAULT_ADDRESS, quantum: int = QUANTUM_EVENTS) -> None:
+        self.backend = backend
+        self.address = address
+        self.scheduler = FairScheduler(backend, quantum)
+        self._listener: Optional[Listener] = None
+        self._stopping = False
+
+    def status(self) -> dict:
+        status = self.backend.get_status() if hasattr(self.backend, "get_status") else None
+        out = dict(status) if status else {}
+        out["daemon"] = self.scheduler.status()
+        return out
+
+    def serve_forever(self) -> None:
+        if sys.platform != "win32" and os.path.exists(self.address):
+            os.unlink(self.address)  # stale socket from a previous run
+        self._listener = Listener(self.address)
+        try:
+            while not self._stopping:
+                try:
+                    conn = self._listener.accept()
+                except OSError:
+                    break
+                if self._stopping:
+                    conn.close()
+                    break
+                threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+        finally:
+            self._listener.close()
+            self.scheduler.close()
+
+    def stop(self) -> None:
+        """Stop accepting; wakes a blocked accept() with a throwaway connection."""
+        self._stopping = True
+        try:
+            Client(self.address).close()
+        except OSError:
+            pass
+
+    def _serve(self, conn) -> None:
+        cid = self.scheduler.register()
+        try:
+            while True:
+                try:
+                    msg = conn.recv_bytes(MAX_MESSAGE)
+                except (EOFError, OSError):
+                    return
+                if not msg:
+                    continue
+                kind, body = msg[0], msg[1:]
+                try:
+                    if kind == MSG_BATCH:
+                        sub = self.scheduler.submit(cid, unpack_batch(body))
+                    elif kind == MSG_KEY:
+                        vk, pressed, scan = self._unpack_call(_KEY, body, "key")
+                        sub = self.scheduler.submit_call(cid, "key", vk, bool(pressed), scan or None)
+                    elif kind == MSG_MOVE_TO:
+                        x, y, flags = self._unpack_call(_MOVE_TO, body, "move_to")
+                        sub = self.scheduler.submit_call(cid, "move_to", x, y, flags)
+                    else:
+                        sub = None
+                    if sub is not None:
+                        sub.done.wait()
+                        conn.send_bytes(bytes([MSG_RESULT]) + _RESULT.pack(sub.size, sub.ok, sub.last_error))
+                    elif kind == MSG_STATUS:
+                        conn.send_bytes(bytes([MSG_STATUS_REPLY]) + json.dumps(self.status()).encode("utf-8"))
+                    elif kind == MSG_HELLO:
+                        self.scheduler.set_name(cid, body.decode("utf-8", "replace")[:64])
+                    else:
+                        raise ValueError(f"unknown message type 0x{kind:02X}")
+                except ValueError as e:
+                    conn.send_bytes(bytes([MSG_ERROR]) + str(e).encode("utf-8"))
+        finally:
+            self.scheduler.unregister(cid)
+            conn.close()
+
+    def _unpack_call(self, layout: struct.Struct, body: bytes, method: str) -> tuple:
+        if not hasattr(self.backend, method):
+            raise ValueError(f"the daemon's backend has no {method}")
+        if len(body) != layout.size:
+            raise ValueError(f"bad {method} length {len(body)}")
+        return layout.unpack(body)
+
+
+class DaemonClient:
+    """Backend that forwards to a running ControllerDaemon. Calls from several threads are serialised."""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, name: str = "") -> None:
+        self.address = address
+        self.name = name or f"pid {os.getpid()}"
+        self._conn = None
+        self._lock = threading.Lock()
+        self._last_error = 0
+
+    def open(self) -> bool:
+        try:
+            self._conn = Client(self.address)
+            self._conn.send_bytes(bytes([MSG_HELLO]) + self.name.encode("utf-8"))
+        except OSError as e:
+            self._conn = None
+            self._last_error = getattr(e, "winerror", None) or e.errno or 0
+            return False
+        return True
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get_last_error(self) -> int:
+        return self._last_error
+
+    def _request(self, msg: bytes) -> Optional[bytes]:
+        with self._lock:
+            if self._conn is None:
+                return None
+            try:
+                self._conn.send_bytes(msg)
+                reply = self._conn.recv_bytes()
+            except (EOFError, OSError) as e:
+                self._last_error = getattr(e, "winerror", None) or getattr(e, "errno", None) or 0
+                self.close()
+                return None
+        if reply[0] == MSG_ERROR:
+            raise DaemonError(reply[1:].decode("utf-8", "replace"))
+        return reply
+
+    def submit(self, batch: list[tuple[int, int, int]]) -> int:
+        """Inject (button_flags, x, y) events as one batch. Returns how many succeeded."""
+        if not batch:
+            return 0
+        reply = self._request(pack_batch(batch))
+        if reply is None:
+            return 0
+        count, ok, last_error = _RESULT.unpack_from(reply, 1)
+        if ok < count:
+            self._last_error = last_error
+        return ok
+
+    def mouse_input(self, button_flags: int, x: int, y: int) -> bool:
+        return self.submit([(button_flags, x, y)]) == 1
+
+    def move_mouse(self, x: int, y: int) -> bool:
+        return self.mouse_input(0, x, y)
+
+    def _call(self, msg: bytes) -> bool:
+        reply = self._request(msg)
+        if reply is None:
+            return False
+        count, ok, last_error = _RESULT.unpack_from(reply, 1)
+        if ok < count:
+            self._last_error = last_error
+        return ok == count
+
+    def move_to(self, x: int, y: int, button_flags: int = 0) -> bool:
+        """Absolute move to virtual-desktop pixel (x, y), normalised by the daemon's backend."""
+        return self._call(bytes([MSG_MOVE_TO]) + _MOVE_TO.pack(x, y, button_flags))
+
+    def key(self, vk: int, pressed: bool = True, scan: Optional[int] = None) -> bool:
+        return self._call(bytes([MSG_KEY]) + _KEY.pack(vk, int(pressed), scan or 0))
+
+    def get_status(self) -> Optional[dict]:
+        """Driver status (if the daemon's backend has one) plus a "daemon" section."""
+        reply = self._request(bytes([MSG_STATUS]))
+        return json.loads(reply[1:]) if reply is not None else None
+
+    def __enter__(self) -> "DaemonClient":
+        self.open()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Own the InputHog driver handle and serve batched input to local clients.")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS)
+    parser.add_argument("--backend", choices=("driver", "memory"), default="driver")
+    parser.add_argument("--quantum", type=int, default=QUANTUM_EVENTS, help="events of credit per client per round")
+    args = parser.parse_args(argv)
+
+    if args.backend == "memory":
+        from backend_memory import MemoryBackend
+        backend = MemoryBackend()
+    else:
+        from client import InputHogClient
+        backend = InputHogClient()
+        if not backend.open():
+            print(f"Error: cannot open driver (Win32 error {backend.get_last_error()})", file=sys.stderr)
+            return 1
+    daemon = ControllerDaemon(backend, args.address, args.quantum)
+    print(f"Listening on {args.address}", flush=True)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if hasattr(backend, "close"):
+            backend.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
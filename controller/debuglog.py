@@ -0,0 +1,142 @@
+"""
+Buffered, asynchronous debug log (inputhog_debug.log).
+log() only enqueues a record; a background thread batches records to disk,
+rotates the file by size, and collapses bursts of the same message into one
+"repeated N times" line, so callers on the GUI thread never touch the file.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+MAX_BYTES = 1024 * 1024  # rotate when the log grows past this
+BACKUP_COUNT = 3  # inputhog_debug.log.1 .. .3
+DUPLICATE_WINDOW_S = 5.0  # identical messages within this window are counted, not written
+
+_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_path = Path.cwd() / "inputhog_debug.log"
+_writer: Optional[threading.Thread] = None
+_start_lock = threading.Lock()
+_FLUSH = object()
+
+
+def configure(path: Path) -> None:
+    """Set the log file. Records already queued go to the new file."""
+    global _path
+    _path = Path(path)
+
+
+def log(msg: str) -> None:
+    """Queue one record (timestamp, thread, message). Never blocks on I/O."""
+    _queue.put((time.time(), threading.current_thread().name, msg))
+    if _writer is None:
+        _start()
+
+
+def flush(timeout: float = 2.0) -> None:
+    """Wait until everything queued so far has been written (e.g. before exit)."""
+    if _writer is None:
+        return
+    done = threading.Event()
+    _queue.put((_FLUSH, done))
+    done.wait(timeout)
+
+
+def _start() -> None:
+    global _writer
+    with _start_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name="inputhog-log", daemon=True)
+            _writer.start()
+            atexit.register(flush)
+
+
+def _format(ts: float, thread: str, msg: str) -> str:
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+    return f"{stamp}.{int(ts * 1000) % 1000:03d} [{thread}] {msg}\n"
+
+
+def _rotate(path: Path) -> None:
+    for i in range(BACKUP_COUNT - 1, 0, -1):
+        src = path.with_name(f"{path.name}.{i}")
+        if src.exists():
+            src.replace(path.with_name(f"{path.name}.{i + 1}"))
+    if path.exists():
+        path.replace(path.with_name(f"{path.name}.1"))
+
+
+def _write(path: Path, lines: list) -> None:
+    """Append lines, rotating whenever the file reaches MAX_BYTES."""
+    size = path.stat().st_size if path.exists() else 0
+    start = 0
+    while start < len(lines):
+        if size >= MAX_BYTES:
+            _rotate(path)
+            size = 0
+        end = start
+        while end < len(lines) and (size < MAX_BYTES or end == start):
+            size += len(lines[end].encode("utf-8"))
+            end += 1
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(lines[start:end])
+        start = end
+
+
+class _Deduper:
+    """Turns a record stream into lines, collapsing repeats of the last message."""
+
+    def __init__(self) -> None:
+        self.last_msg: Optional[str] = None
+        self.last_ts = 0.0
+        self.repeats = 0
+        self.repeat_ts = 0.0
+
+    def feed(self, ts: float, thread: str, msg: str, out: list) -> None:
+        if msg == self.last_msg and ts - self.last_ts < DUPLICATE_WINDOW_S:
+            self.repeats += 1
+            self.repeat_ts = ts
+            return
+        self.drain(out)
+        out.append(_format(ts, thread, msg))
+        self.last_msg = msg
+        self.last_ts = ts
+
+    def drain(self, out: list) -> None:
+        if self.repeats:
+            out.append(_format(self.repeat_ts, "inputhog-log", f"(last message repeated {self.repeats} times)"))
+            self.repeats = 0
+            self.last_msg = None
+
+
+def _run() -> None:
+    dedupe = _Deduper()
+    while True:
+        try:
+            item = _queue.get(timeout=DUPLICATE_WINDOW_S)
+        except queue.Empty:
+            item = None
+        idle = item is None
+        lines: list[str] = []
+        waiters = []
+        # Take everything already queued so a burst becomes one write
+        while item is not None:
+            if item[0] is _FLUSH:
+                waiters.append(item[1])
+            else:
+                dedupe.feed(*item, lines)
+            try:
+                item = _queue.get_nowait()
+            except queue.Empty:
+                item = None
+        if waiters or idle:
+            dedupe.drain(lines)
+        if lines:
+            try:
+                _write(_path, lines)
+            except OSError:
+                pass
+        for done in waiters:
+            done.set()
@@ -0,0 +1,302 @@
+"""
+Cached display topology (virtual desktop, monitors, DPI).
+DisplayService keeps the last topology read from a metrics provider and only
+asks again after invalidate(), which DisplayChangeWatcher calls on
+WM_DISPLAYCHANGE / WM_DPICHANGED / work-area changes. Patterns and the raw
+input recorder read screen geometry from here instead of GetSystemMetrics.
+FakeMetricsProvider stands in for Win32 so the cache logic runs anywhere,
+and is the default provider off Windows.
+"""
+
+import ctypes
+import random
+import sys
+import threading
+from ctypes import wintypes
+from typing import NamedTuple, Optional
+
+from win32 import ABSOLUTE_RANGE, ABSOLUTE_SPAN, WNDCLASSW, user32 as _user32
+
+IS_WINDOWS = sys.platform == "win32"
+
+SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN = 76, 77
+SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN = 78, 79
+MONITORINFOF_PRIMARY = 0x1
+MDT_EFFECTIVE_DPI = 0
+DEFAULT_DPI = 96
+
+WM_DISPLAYCHANGE = 0x007E
+WM_SETTINGCHANGE = 0x001A
+WM_DPICHANGED = 0x02E0
+WM_QUIT = 0x0012
+SPI_SETWORKAREA = 0x002F
+
+
+class Rect(NamedTuple):
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+    @property
+    def width(self) -> int:
+        return self.right - self.left
+
+    @property
+    def height(self) -> int:
+        return self.bottom - self.top
+
+    def contains(self, x: int, y: int) -> bool:
+        return self.left <= x < self.right and self.top <= y < self.bottom
+
+
+class Monitor(NamedTuple):
+    rect: Rect
+    work: Rect
+    dpi: int
+    primary: bool
+
+
+class Topology(NamedTuple):
+    virtual: Rect
+    monitors: tuple[Monitor, ...]
+
+
+def normalize_point(x: int, y: int, virtual: Rect) -> tuple[int, int]:
+    """
+    Virtual-desktop pixel -> 0..65535 absolute coordinates (MOUSE_VIRTUAL_DESKTOP).
+    Windows maps an absolute coordinate n back to pixel floor(n * span / 65536),
+    so each pixel gets the smallest n that lands on it: ceil(p * 65536 / span).
+    Points outside are clamped. Exact for desktops up to 65536 px per axis.
+    """
+    def axis(v: int, lo: int, span: int) -> int:
+        if span <= 1:
+            return 0
+        v = min(max(v - lo, 0), span - 1)
+        return min(-(-v * ABSOLUTE_SPAN // span), ABSOLUTE_RANGE)
+
+    return axis(x, virtual.left, virtual.width), axis(y, virtual.top, virtual.height)
+
+
+def denormalize_point(nx: int, ny: int, virtual: Rect) -> tuple[int, int]:
+    """0..65535 -> virtual-desktop pixel, as Windows maps absolute input (inverse of normalize_point)."""
+    def axis(n: int, lo: int, span: int) -> int:
+        n = min(max(n, 0), ABSOLUTE_RANGE)
+        return lo + n * max(span, 1) // ABSOLUTE_SPAN
+
+    return axis(nx, virtual.left, virtual.width), axis(ny, virtual.top, virtual.height)
+
+
+class _MONITORINFO(ctypes.Structure):
+    _fields_ = [
+        ("cbSize", wintypes.DWORD),
+        ("rcMonitor", wintypes.RECT),
+        ("rcWork", wintypes.RECT),
+        ("dwFlags", wintypes.DWORD),
+    ]
+
+
+def _rect(r: wintypes.RECT) -> Rect:
+    return Rect(r.left, r.top, r.right, r.bottom)
+
+
+class Win32MetricsProvider:
+    """Reads topology via EnumDisplayMonitors/GetMonitorInfoW/GetDpiForMonitor; binds the calls once."""
+
+    def __init__(self) -> None:
+        user32 = ctypes.windll.user32
+        self._get_metric = user32.GetSystemMetrics
+        self._get_cursor_pos = user32.GetCursorPos
+        self._enum_monitors = user32.EnumDisplayMonitors
+        self._get_monitor_info = user32.GetMonitorInfoW
+        self._get_monitor_info.argtypes = [wintypes.HMONITOR, ctypes.POINTER(_MONITORINFO)]
+        try:
+            self._get_dpi = ctypes.windll.shcore.GetDpiForMonitor  # Windows 8.1+
+        except (AttributeError, OSError):
+            self._get_dpi = None
+        self._point = wintypes.POINT()
+
+    def topology(self) -> Topology:
+        monitors = []
+
+        @ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HMONITOR, wintypes.HDC, ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+        def on_monitor(hmon, hdc, rect, lparam):
+            info = _MONITORINFO()
+            info.cbSize = ctypes.sizeof(info)
+            if self._get_monitor_info(hmon, ctypes.byref(info)):
+                dpi = DEFAULT_DPI
+                if self._get_dpi is not None:
+                    dx, dy = wintypes.UINT(), wintypes.UINT()
+                    if self._get_dpi(hmon, MDT_EFFECTIVE_DPI, ctypes.byref(dx), ctypes.byref(dy)) == 0:
+                        dpi = dx.value
+                monitors.append(Monitor(_rect(info.rcMonitor), _rect(info.rcWork), dpi, bool(info.dwFlags & MONITORINFOF_PRIMARY)))
+            return True
+
+        self._enum_monitors(None, None, on_monitor, 0)
+        x = self._get_metric(SM_XVIRTUALSCREEN)
+        y = self._get_metric(SM_YVIRTUALSCREEN)
+        virtual = Rect(x, y, x + self._get_metric(SM_CXVIRTUALSCREEN), y + self._get_metric(SM_CYVIRTUALSCREEN))
+        monitors.sort(key=lambda m: (not m.primary, m.rect.left, m.rect.top))
+        return Topology(virtual, tuple(monitors))
+
+    def cursor_pos(self) -> tuple[int, int]:
+        self._get_cursor_pos(ctypes.byref(self._point))
+        return self._point.x, self._point.y
+
+
+class FakeMetricsProvider:
+    """Scriptable provider: set .monitors / .cursor; counts topology() calls."""
+
+    def __init__(self, monitors: Optional[list[Monitor]] = None, cursor: tuple[int, int] = (0, 0)) -> None:
+        self.monitors = monitors or [Monitor(Rect(0, 0, 1920, 1080), Rect(0, 0, 1920, 1040), DEFAULT_DPI, True)]
+        self.cursor = cursor
+        self.topology_calls = 0
+
+    def topology(self) -> Topology:
+        self.topology_calls += 1
+        rects = [m.rect for m in self.monitors]
+        virtual = Rect(
+            min(r.left for r in rects), min(r.top for r in rects),
+            max(r.right for r in rects), max(r.bottom for r in rects),
+        )
+        return Topology(virtual, tuple(self.monitors))
+
+    def cursor_pos(self) -> tuple[int, int]:
+        return self.cursor
+
+
+class DisplayService:
+    """
+    Thread-safe topology cache. Every read after invalidate() re-queries the
+    provider once; `generation` increases on each refresh so callers can tell
+    when geometry they derived earlier is stale.
+    """
+
+    def __init__(self, provider=None) -> None:
+        if provider is None:
+            provider = Win32MetricsProvider() if IS_WINDOWS else FakeMetricsProvider()
+        self._provider = provider
+        self._lock = threading.Lock()
+        self._topology: Optional[Topology] = None
+        self.generation = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._topology = None
+
+    def topology(self) -> Topology:
+        with self._lock:
+            if self._topology is None:
+                self._topology = self._provider.topology()
+                self.generation += 1
+            return self._topology
+
+    def virtual_rect(self) -> Rect:
+        return self.topology().virtual
+
+    def monitors(self) -> tuple[Monitor, ...]:
+        return self.topology().monitors
+
+    def primary(self) -> Monitor:
+        monitors = self.monitors()
+        return next((m for m in monitors if m.primary), monitors[0])
+
+    def screen_size(self) -> tuple[int, int]:
+        """Primary monitor size (what SM_CXSCREEN/SM_CYSCREEN report)."""
+        rect = self.primary().rect
+        return rect.width, rect.height
+
+    def monitor_at(self, x: int, y: int) -> Optional[Monitor]:
+        return next((m for m in self.monitors() if m.rect.contains(x, y)), None)
+
+    def cursor_pos(self) -> tuple[int, int]:
+        """Live cursor position (not cached)."""
+        return self._provider.cursor_pos()
+
+    def normalize(self, x: int, y: int) -> tuple[int, int]:
+        """Pixel -> absolute 0..65535 coordinates on the current virtual desktop."""
+        return normalize_point(x, y, self.virtual_rect())
+
+    def random_point(self, margin: int = 0, rng: Optional[random.Random] = None) -> tuple[int, int]:
+        """Uniform point on a randomly chosen monitor, at least margin px from its edges."""
+        rng = rng or random
+        rect = rng.choice(self.monitors()).rect
+        x = rng.randint(rect.left + margin, max(rect.left + margin, rect.right - margin - 1))
+        y = rng.randint(rect.top + margin, max(rect.top + margin, rect.bottom - margin - 1))
+        return x, y
+
+
+class DisplayChangeWatcher:
+    """
+    Hidden top-level window (message-only windows miss broadcasts) on its own
+    thread that invalidates the service when the display layout, DPI or work
+    area changes.
+    """
+
+    _CLASS_NAME = "InputHogDisplayWatcher"
+
+    def __init__(self, service: DisplayService) -> None:
+        self._service = service
+        self._thread: Optional[threading.Thread] = None
+        self._thread_id = 0
+        self._ready = threading.Event()
+        self._wndproc = None
+
+    def start(self) -> None:
+        if not IS_WINDOWS or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="inputhog-display", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        self._thread.join()
+        self._thread = None
+
+    def _wnd_proc(self, hwnd, msg, wparam, lparam):
+        if msg in (WM_DISPLAYCHANGE, WM_DPICHANGED) or (msg == WM_SETTINGCHANGE and wparam == SPI_SETWORKAREA):
+            self._service.invalidate()
+        return self._user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+
+    def _run(self) -> None:
+        from win32 import WNDPROC
+        user32 = self._user32 = _user32()
+        kernel32 = ctypes.windll.kernel32
+        self._thread_id = kernel32.GetCurrentThreadId()
+        hinst = kernel32.GetModuleHandleW(None)
+        self._wndproc = WNDPROC(self._wnd_proc)
+        wc = WNDCLASSW()
+        wc.lpfnWndProc = ctypes.cast(self._wndproc, ctypes.c_void_p)
+        wc.hInstance = hinst
+        wc.lpszClassName = self._CLASS_NAME
+        user32.RegisterClassW(ctypes.byref(wc))
+        hwnd = user32.CreateWindowExW(0, self._CLASS_NAME, None, 0, 0, 0, 0, 0, None, None, hinst, None)
+        self._ready.set()
+        if not hwnd:
+            return
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        user32.DestroyWindow(hwnd)
+
+
+_service: Optional[DisplayService] = None
+_service_lock = threading.Lock()
+
+
+def get_display_service(provider=None) -> DisplayService:
+    """
+    Process-wide service, created (with its change watcher) on first use.
+    provider only applies to that first call; the default reads Win32 on
+    Windows and a FakeMetricsProvider elsewhere.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = DisplayService(provider)
+            DisplayChangeWatcher(_service).start()
+        return _service
@@ -0,0 +1,265 @@
+"""
+Playback fidelity analyzer.
+Wraps any backend in InstrumentedBackend to capture what was actually injected
+and when, then aligns that capture against the source recording and reports
+lateness percentiles, dropped / merged / failed events and positional drift.
+
+    python fidelity.py recording.json [--backend driver|user32|memory]
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from recording import iter_recording, play_recording
+
+MERGE_LOOKAHEAD = 64  # source events searched when aligning one captured injection
+
+
+class InstrumentedBackend:
+    """
+    Backend wrapper that forwards every call to `inner` and records
+    (t_ns, kind, flags, dx, dy, ok) for each injection: kind "move" / "button"
+    (dx, dy relative), "anchor" (dx, dy = absolute x, y) or "key" (flags =
+    pressed, dx = vk). key, move_to and send_events exist only when inner has
+    them, so hasattr() checks keep working. Anything else (get_last_error,
+    get_status, ...) is passed through untouched.
+    """
+
+    def __init__(self, inner, clock_ns: Callable[[], int] = time.perf_counter_ns) -> None:
+        self.inner = inner
+        self._clock_ns = clock_ns
+        self._lock = threading.Lock()
+        self.capture: list[tuple] = []
+        self.start_ns = clock_ns()
+
+    def __getattr__(self, name):
+        if name in _OPTIONAL_INJECTORS:
+            getattr(self.inner, name)  # AttributeError if inner cannot do it
+            return getattr(self, "_" + name)
+        return getattr(self.inner, name)
+
+    def _record(self, *entries: tuple) -> None:
+        t = self._clock_ns()
+        with self._lock:
+            self.capture.extend((t,) + e for e in entries)
+
+    def mark(self) -> None:
+        """Clear the capture and make now the playback start (t = 0)."""
+        with self._lock:
+            self.capture = []
+            self.start_ns = self._clock_ns()
+
+    def move_mouse(self, x: int, y: int) -> bool:
+        ok = self.inner.move_mouse(x, y)
+        t = self._clock_ns()
+        with self._lock:
+            self.capture.append((t, "move", 0, x, y, ok))
+        return ok
+
+    def mouse_input(self, button_flags: int, x: int, y: int) -> bool:
+        ok = self.inner.mouse_input(button_flags, x, y)
+        t = self._clock_ns()
+        with self._lock:
+            self.capture.append((t, "button" if button_flags else "move", button_flags, x, y, ok))
+        return ok
+
+    def _move_to(self, x: int, y: int, button_flags: int = 0) -> bool:
+        ok = self.inner.move_to(x, y, button_flags)
+        self._record(("anchor", button_flags, x, y, ok))
+        return ok
+
+    def _key(self, vk: int, pressed: bool = True, scan: Optional[int] = None) -> bool:
+        ok = self.inner.key(vk, pressed, scan)
+        self._record(("key", int(bool(pressed)), vk, 0, ok))
+        return ok
+
+    def _send_events(self, events) -> int:
+        events = list(events)
+        sent = self.inner.send_events(events)
+        self._record(*(_capture_entry(ev) + (i < sent,) for i, ev in enumerate(events)))
+        return sent
+
+
+_OPTIONAL_INJECTORS = ("move_to", "key", "send_events")
+
+
+def _capture_entry(ev: dict) -> tuple:
+    """(kind, flags, dx, dy) of one recording event, as InstrumentedBackend records it."""
+    ev_type = ev.get("type")
+    if ev_type == "button":
+        return "button", ev.get("flag", 0), 0, 0
+    if ev_type == "anchor":
+        return "anchor", 0, ev.get("x", 0), ev.get("y", 0)
+    if ev_type == "key":
+        return "key", int(bool(ev.get("pressed", True))), ev.get("vk"), 0
+    return "move", 0, ev.get("dx", 0), ev.get("dy", 0)
+
+
+def percentile(sorted_vals: list, p: float):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_vals:
+        return None
+    rank = max(1, -(-len(sorted_vals) * p // 100))
+    return sorted_vals[int(rank) - 1]
+
+
+def _round(v: Optional[float]) -> Optional[float]:
+    return None if v is None else round(v, 1)
+
+
+def _source_events(events: Iterable[dict]) -> list[tuple]:
+    """(t_us, kind, flag, dx, dy) for every injectable event, in the layout of _capture_entry."""
+    return [
+        (ev.get("t_us", 0),) + _capture_entry(ev)
+        for ev in events
+        if ev.get("type") in ("move", "button", "anchor", "key")
+    ]
+
+
+def _match(source: list[tuple], i: int, cap: tuple) -> int:
+    """
+    Number of source events starting at i that cap accounts for: 1 for an
+    exact match, >1 when cap is the sum of consecutive moves, 0 for no match.
+    """
+    _, kind, flag, dx, dy, _ = cap
+    first = source[i]
+    if kind != "move":
+        return 1 if first[1:] == (kind, flag, dx, dy) else 0
+    sx = sy = 0
+    for k in range(i, min(len(source), i + MERGE_LOOKAHEAD)):
+        if source[k][1] != "move":
+            return 0
+        sx += source[k][3]
+        sy += source[k][4]
+        if sx == dx and sy == dy:
+            return k - i + 1
+    return 0
+
+
+def analyze(events: Iterable[dict], capture: list[tuple], start_ns: int) -> dict:
+    """
+    Align captured injections (InstrumentedBackend.capture, start_ns = playback
+    start) against the source events. Each injection is matched to the next
+    source event(s) it accounts for; source events skipped over are dropped,
+    a move equal to the sum of several source moves counts them as merged, and
+    injections that match nothing are unexpected. Lateness is injection time
+    minus due time of the last source event it covers. Anchors set the
+    expected position (and, when injected, the actual one); keys are matched
+    like buttons, and keys_not_observed counts the dropped ones.
+    """
+    source = _source_events(events)
+    lateness: list[float] = []
+    dropped = merged = failed = unexpected = keys_matched = 0
+    exp_x = exp_y = act_x = act_y = 0
+    max_drift = 0.0
+    i = 0
+    def expect(k: int) -> None:
+        nonlocal exp_x, exp_y
+        _, kind, _, x, y = source[k]
+        if kind == "anchor":
+            exp_x, exp_y = x, y
+        elif kind == "move":
+            exp_x += x
+            exp_y += y
+
+    for cap in capture:
+        t_ns, kind, _, dx, dy, ok = cap
+        n = 0
+        skip = i
+        while skip < len(source) and skip < i + MERGE_LOOKAHEAD:
+            n = _match(source, skip, cap)
+            if n:
+                break
+            skip += 1
+        if not n:
+            unexpected += 1
+        else:
+            dropped += skip - i
+            for k in range(i, skip + n):
+                expect(k)
+            keys_matched += kind == "key"
+            merged += n - 1
+            lateness.append((t_ns - start_ns) / 1000 - source[skip + n - 1][0])
+            i = skip + n
+        if not ok:
+            failed += 1
+        elif kind == "anchor":
+            act_x, act_y = dx, dy
+        elif kind != "key":
+            act_x += dx
+            act_y += dy
+        max_drift = max(max_drift, ((act_x - exp_x) ** 2 + (act_y - exp_y) ** 2) ** 0.5)
+    dropped += len(source) - i
+    for k in range(i, len(source)):
+        expect(k)
+
+    lateness.sort()
+    return {
+        "source_events": len(source),
+        "injected": len(capture),
+        "keys_not_observed": sum(1 for s in source if s[1] == "key") - keys_matched,
+        "dropped": dropped,
+        "merged": merged,
+        "failed": failed,
+        "unexpected": unexpected,
+        "lateness_us": {
+            "p50": _round(percentile(lateness, 50)),
+            "p99": _round(percentile(lateness, 99)),
+            "max": _round(lateness[-1] if lateness else None),
+            "min": _round(lateness[0] if lateness else None),
+        },
+        "drift_px": {"final_x": act_x - exp_x, "final_y": act_y - exp_y, "max": round(max_drift, 3)},
+    }
+
+
+def measure(
+    backend,
+    events: Iterable[dict],
+    play: Callable = play_recording,
+    on_event: Optional[Callable[[dict, bool], None]] = None,
+) -> dict:
+    """Play events through an instrumented backend and return analyze()'s report."""
+    events = list(events)
+    inst = backend if isinstance(backend, InstrumentedBackend) else InstrumentedBackend(backend)
+    inst.mark()
+    play(inst, events, on_event)
+    return analyze(events, inst.capture, inst.start_ns)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure how closely playback matches a recording.")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--backend", choices=("driver", "user32", "memory"), default="memory")
+    args = parser.parse_args(argv)
+
+    if args.backend == "memory":
+        from backend_memory import MemoryBackend
+        backend = MemoryBackend()
+    elif args.backend == "user32":
+        from backend_user32 import User32Backend
+        if not User32Backend.is_available():
+            print("Error: pyautogui is required. Install with: pip install pyautogui", file=sys.stderr)
+            return 1
+        backend = User32Backend()
+    else:
+        from client import InputHogClient
+        backend = InputHogClient()
+        if not backend.open():
+            print(f"Error: cannot open driver (Win32 error {backend.get_last_error()})", file=sys.stderr)
+            return 1
+    try:
+        report = measure(backend, iter_recording(args.path))
+    finally:
+        if hasattr(backend, "close"):
+            backend.close()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Persistent job executor for the GUI.
+One long-lived worker thread runs queued jobs (patterns, playback, stress
+runs) one after another. Cancellation is cooperative: backends obtained via
+job.backend() raise JobCancelled at their next call once the job is
+cancelled, and whatever buttons and keys the job still holds are released
+when it ends, however it ends.
+"""
+
+import itertools
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, Optional
+
+from client import (
+    MOUSE_LEFT_BUTTON_DOWN,
+    MOUSE_LEFT_BUTTON_UP,
+    MOUSE_RIGHT_BUTTON_DOWN,
+    MOUSE_RIGHT_BUTTON_UP,
+    MOUSE_MIDDLE_BUTTON_DOWN,
+    MOUSE_MIDDLE_BUTTON_UP,
+)
+from recording import _inject_key
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+# Button-down flag -> matching up flag
+BUTTON_RELEASE = {
+    MOUSE_LEFT_BUTTON_DOWN: MOUSE_LEFT_BUTTON_UP,
+    MOUSE_RIGHT_BUTTON_DOWN: MOUSE_RIGHT_BUTTON_UP,
+    MOUSE_MIDDLE_BUTTON_DOWN: MOUSE_MIDDLE_BUTTON_UP,
+}
+
+# Progress callbacks are forwarded at most this often (playback reports per event)
+REPORT_INTERVAL_NS = 100_000_000
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled."""
+
+
+class _GuardedBackend:
+    """Backend proxy for one job: each input call is a cancellation point; held buttons and keys are remembered."""
+
+    def __init__(self, inner, job: "Job") -> None:
+        self._inner = inner
+        self._job = job
+        self.held: set[int] = set()
+        self.keys_held: set[int] = set()
+        # Optional methods are exposed only where the inner backend has them
+        if hasattr(inner, "move_to"):
+            self.move_to = self._move_to
+        if hasattr(inner, "key"):
+            self.key = self._key
+        if hasattr(inner, "send_events"):
+            self.send_events = self._send_events
+
+    def _track(self, button_flags: int) -> None:
+        for down, up in BUTTON_RELEASE.items():
+            if button_flags & down:
+                self.held.add(down)
+            if button_flags & up:
+                self.held.discard(down)
+
+    def mouse_input(self, button_flags: int, x: int, y: int) -> bool:
+        self._job.check()
+        ok = self._inner.mouse_input(button_flags, x, y)
+        if ok:
+            self._track(button_flags)
+        return ok
+
+    def move_mouse(self, x: int, y: int) -> bool:
+        self._job.check()
+        return self._inner.move_mouse(x, y)
+
+    def _move_to(self, x: int, y: int, button_flags: int = 0) -> bool:
+        self._job.check()
+        ok = self._inner.move_to(x, y, button_flags)
+        if ok:
+            self._track(button_flags)
+        return ok
+
+    def _track_key(self, vk: int, pressed: bool) -> None:
+        if pressed:
+            self.keys_held.add(vk)
+        else:
+            self.keys_held.discard(vk)
+
+    def _key(self, vk: int, pressed: bool = True, scan: Optional[int] = None) -> bool:
+        self._job.check()
+        ok = self._inner.key(vk, pressed, scan)
+        if ok:
+            self._track_key(vk, pressed)
+        return ok
+
+    def _send_events(self, events) -> int:
+        self._job.check()
+        events = list(events)
+        sent = self._inner.send_events(events)
+        for ev in events[:sent]:
+            if ev.get("type") == "button":
+                self._track(ev.get("flag", 0))
+            elif ev.get("type") == "key" and ev.get("vk") is not None:
+                self._track_key(int(ev["vk"]), ev.get("pressed", True))
+        return sent
+
+    def release(self) -> set[int]:
+        """Release held buttons and keys; returns the keys released here."""
+        for down in sorted(self.held):
+            self._inner.mouse_input(BUTTON_RELEASE[down], 0, 0)
+        self.held.clear()
+        keys = set(self.keys_held)
+        for vk in sorted(keys):
+            self._inner.key(vk, False)
+        self.keys_held.clear()
+        return keys
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class Job:
+    """
+    A queued unit of work: fn(job) runs on the executor thread and its return
+    value becomes job.result. Inside fn, use job.backend(b) for input, call
+    job.report() for progress and job.track_event() as a playback on_event to
+    have pressed keys released on cancel.
+    """
+
+    def __init__(self, jid: int, name: str, fn: Callable[["Job"], Any], executor: "JobExecutor") -> None:
+        self.id = jid
+        self.name = name
+        self.fn = fn
+        self.state = QUEUED
+        self.progress: Optional[float] = None  # 0..1 when the total is known
+        self.detail = ""
+        self.result: Any = None
+        self.error = ""
+        self.traceback = ""
+        self.queued_ns = time.perf_counter_ns()
+        self.started_ns = 0
+        self.finished_ns = 0
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+        self._executor = executor
+        self._backends: list[_GuardedBackend] = []
+        self._keys_held: set[int] = set()
+        self._on_cancel: list[Callable[[], None]] = []
+        self._last_report_ns = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.name)
+
+    def on_cancel(self, fn: Callable[[], None]) -> None:
+        """Call fn (from the cancelling thread) when the job is cancelled, e.g. StressTest.stop."""
+        self._on_cancel.append(fn)
+        if self.cancel_event.is_set():
+            fn()
+
+    def backend(self, inner):
+        guarded = _GuardedBackend(inner, self)
+        self._backends.append(guarded)
+        return guarded
+
+    def track_event(self, ev: dict, ok: bool) -> None:
+        if ok and ev.get("type") == "key" and ev.get("vk") is not None:
+            if ev.get("pressed", True):
+                self._keys_held.add(int(ev["vk"]))
+            else:
+                self._keys_held.discard(int(ev["vk"]))
+
+    def report(self, done: Optional[int] = None, total: Optional[int] = None, detail: str = "") -> None:
+        if total:
+            self.progress = min(1.0, (done or 0) / total)
+        if detail:
+            self.detail = detail
+        now = time.perf_counter_ns()
+        if now - self._last_report_ns >= REPORT_INTERVAL_NS:
+            self._last_report_ns = now
+            self._executor._notify(self)
+
+    def elapsed_s(self) -> float:
+        if not self.started_ns:
+            return 0.0
+        return ((self.finished_ns or time.perf_counter_ns()) - self.started_ns) / 1e9
+
+    def wait_s(self) -> float:
+        return ((self.started_ns or time.perf_counter_ns()) - self.queued_ns) / 1e9
+
+    def release_inputs(self) -> None:
+        released: set[int] = set()
+        for guarded in self._backends:
+            try:
+                released |= guarded.release()
+            except Exception:
+                pass
+        for vk in sorted(self._keys_held - released):
+            try:
+                _inject_key(vk, False)
+            except Exception:
+                pass
+        self._keys_held.clear()
+
+    def info(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "progress": self.progress,
+            "detail": self.detail,
+            "elapsed_s": round(self.elapsed_s(), 3),
+            "wait_s": round(self.wait_s(), 3),
+            "error": self.error,
+        }
+
+
+class JobExecutor:
+    """
+    FIFO queue drained by one daemon thread. on_update(job) runs on that
+    thread when a job starts, reports progress (throttled) and finishes.
+    """
+
+    def __init__(self, on_update: Optional[Callable[[Job], None]] = None) -> None:
+        self._on_update = on_update
+        self._cond = threading.Condition()
+        self._queue: deque[Job] = deque()
+        self._ids = itertools.count(1)
+        self._current: Optional[Job] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="inputhog-jobs", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[Job], Any], name: str = "") -> Job:
+        with self._cond:
+            jid = next(self._ids)
+            job = Job(jid, name or f"job {jid}", fn, self)
+            self._queue.append(job)
+            self._cond.notify()
+        self._notify(job)
+        return job
+
+    def cancel(self, jid: Optional[int] = None) -> int:
+        """Cancel one job, or the running job and everything queued if jid is None. Returns how many."""
+        with self._cond:
+            targets = list(self._queue)
+            if self._current is not None:
+                targets.insert(0, self._current)
+            if jid is not None:
+                targets = [j for j in targets if j.id == jid]
+            dropped = []
+            for job in targets:
+                job.cancel_event.set()
+                if job.state == QUEUED:
+                    self._queue.remove(job)
+                    self._finish(job, CANCELLED)
+                    dropped.append(job)
+        for job in targets:
+            if job not in dropped:
+                for fn in list(job._on_cancel):
+                    fn()
+        for job in dropped:
+            self._notify(job)
+        return len(targets)
+
+    def current(self) -> Optional[Job]:
+        with self._cond:
+            return self._current
+
+    def pending(self) -> list[Job]:
+        """Running job first, then the queue in order."""
+        with self._cond:
+            return ([self._current] if self._current is not None else []) + list(self._queue)
+
+    def find(self, name: str) -> Optional[Job]:
+        return next((j for j in self.pending() if j.name == name), None)
+
+    def close(self) -> None:
+        self.cancel()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _notify(self, job: Job) -> None:
+        if self._on_update is not None:
+            self._on_update(job)
+
+    @staticmethod
+    def _finish(job: Job, state: str) -> None:
+        job.state = state
+        job.finished_ns = time.perf_counter_ns()
+        job.done.set()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job = self._current = self._queue.popleft()
+                job.state = RUNNING
+                job.started_ns = time.perf_counter_ns()
+            self._notify(job)
+            state = DONE
+            try:
+                job.result = job.fn(job)
+                if job.cancelled:
+                    state = CANCELLED
+            except JobCancelled:
+                state = CANCELLED
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.traceback = traceback.format_exc()
+                state = FAILED
+            finally:
+                job.release_inputs()
+            with self._cond:
+                self._finish(job, state)
+                self._current = None
+            self._notify(job)
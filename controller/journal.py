@@ -0,0 +1,189 @@
+"""
+Driver injection journal.
+The driver records every injection (sequence, QPC timestamp, entry type,
+flags, x/y, NTSTATUS) in a fixed-size ring; IOCTL_INPUT_HOG_JOURNAL_READ
+returns the entries after a given sequence number. decode_journal() turns a
+raw reply into column arrays and works on captured blobs anywhere;
+find_gaps() reports sequences that were overwritten before they were read.
+JournalReader drains the driver incrementally and counts what it lost.
+"""
+
+import struct
+from array import array
+from typing import Optional
+
+from client import (
+    INPUT_HOG_ENTRY_KEYBOARD,
+    INPUT_HOG_ENTRY_MOUSE,
+    INPUT_HOG_ENTRY_MOUSE_ABSOLUTE,
+    INPUT_HOG_JOURNAL_CAPACITY,
+)
+
+# Vectorized decoding (optional)
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+JOURNAL_VERSION = 1
+
+# Little-endian layouts of INPUT_HOG_JOURNAL_HEADER / INPUT_HOG_JOURNAL_ENTRY (shared/ioctl.h)
+HEADER = struct.Struct("<IIQQqII")
+ENTRY = struct.Struct("<QqHHiii")
+
+COLUMNS = ("sequence", "qpc", "type", "flags", "x", "y", "status")
+_ARRAY_CODES = ("Q", "q", "H", "H", "i", "i", "i")
+_NUMPY_FORMATS = ("<u8", "<i8", "<u2", "<u2", "<i4", "<i4", "<i4")
+_OFFSETS = (0, 8, 16, 18, 20, 24, 28)
+
+ENTRY_TYPES = {
+    INPUT_HOG_ENTRY_MOUSE: "mouse",
+    INPUT_HOG_ENTRY_MOUSE_ABSOLUTE: "absolute",
+    INPUT_HOG_ENTRY_KEYBOARD: "keyboard",
+}
+
+
+class JournalBlock:
+    """
+    One decoded reply: header fields plus one array per column (see COLUMNS),
+    numpy arrays when available, else array.array.
+    """
+
+    def __init__(self, oldest_sequence: int, next_sequence: int, qpc_frequency: int, capacity: int, columns: dict) -> None:
+        self.oldest_sequence = oldest_sequence
+        self.next_sequence = next_sequence
+        self.qpc_frequency = qpc_frequency
+        self.capacity = capacity
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns["sequence"])
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+    def times_us(self, origin_qpc: Optional[int] = None) -> list[float]:
+        """Timestamps in µs since origin_qpc (default: the first entry)."""
+        qpc = self.columns["qpc"]
+        if not len(qpc) or not self.qpc_frequency:
+            return []
+        origin = qpc[0] if origin_qpc is None else origin_qpc
+        scale = 1_000_000 / self.qpc_frequency
+        return [(int(q) - int(origin)) * scale for q in qpc]
+
+
+def encode_journal(
+    entries: list[tuple[int, int, int, int, int, int, int]],
+    oldest_sequence: int = 1,
+    next_sequence: Optional[int] = None,
+    qpc_frequency: int = 10_000_000,
+    capacity: int = INPUT_HOG_JOURNAL_CAPACITY,
+) -> bytes:
+    """Build a reply blob from (sequence, qpc, type, flags, x, y, status) tuples, as the driver would."""
+    if next_sequence is None:
+        next_sequence = (entries[-1][0] + 1) if entries else oldest_sequence
+    out = [HEADER.pack(JOURNAL_VERSION, len(entries), oldest_sequence, next_sequence, qpc_frequency, capacity, ENTRY.size)]
+    out.extend(ENTRY.pack(*e) for e in entries)
+    return b"".join(out)
+
+
+def decode_journal(blob: bytes) -> JournalBlock:
+    """Decode an IOCTL_INPUT_HOG_JOURNAL_READ reply. Raises ValueError on a malformed blob."""
+    if len(blob) < HEADER.size:
+        raise ValueError(f"journal blob too short ({len(blob)} bytes)")
+    version, count, oldest, nxt, freq, capacity, entry_size = HEADER.unpack_from(blob)
+    if version < JOURNAL_VERSION or entry_size < ENTRY.size:
+        raise ValueError(f"unsupported journal version {version} (entry size {entry_size})")
+    if HEADER.size + count * entry_size > len(blob):
+        raise ValueError(f"journal blob truncated: {count} entries of {entry_size} bytes do not fit")
+
+    if HAS_NUMPY:
+        dtype = np.dtype({"names": COLUMNS, "formats": _NUMPY_FORMATS, "offsets": _OFFSETS, "itemsize": entry_size})
+        records = np.frombuffer(blob, dtype=dtype, count=count, offset=HEADER.size)
+        columns = {name: records[name].copy() for name in COLUMNS}
+    else:
+        columns = {name: array(code) for name, code in zip(COLUMNS, _ARRAY_CODES)}
+        cols = [columns[name] for name in COLUMNS]
+        for i in range(count):
+            for col, value in zip(cols, ENTRY.unpack_from(blob, HEADER.size + i * entry_size)):
+                col.append(value)
+    return JournalBlock(oldest, nxt, freq, capacity, columns)
+
+
+def find_gaps(sequences, since: Optional[int] = None) -> list[tuple[int, int]]:
+    """
+    (first missing sequence, how many) for every hole in an ascending
+    sequence column, including one before the first entry when since (the
+    last sequence already read) is given.
+    """
+    gaps = []
+    expected = None if since is None else since + 1
+    for seq in sequences:
+        seq = int(seq)
+        if expected is not None and seq > expected:
+            gaps.append((expected, seq - expected))
+        expected = seq + 1
+    return gaps
+
+
+def _fmt_status(status: int) -> str:
+    return f"0x{status & 0xFFFFFFFF:08X}"
+
+
+def summarize(block: JournalBlock, since: Optional[int] = None) -> dict:
+    """Counts by type, failures by NTSTATUS, time span and gaps of one block."""
+    seqs = block["sequence"]
+    statuses = [int(s) for s in block["status"]]
+    failures: dict[str, int] = {}
+    for s in statuses:
+        if s < 0:  # NT_SUCCESS is status >= 0
+            failures[_fmt_status(s)] = failures.get(_fmt_status(s), 0) + 1
+    by_type: dict[str, int] = {}
+    for t in block["type"]:
+        name = ENTRY_TYPES.get(int(t), str(int(t)))
+        by_type[name] = by_type.get(name, 0) + 1
+    times = block.times_us()
+    gaps = find_gaps(seqs, since)
+    return {
+        "entries": len(block),
+        "first_sequence": int(seqs[0]) if len(seqs) else None,
+        "last_sequence": int(seqs[-1]) if len(seqs) else None,
+        "next_sequence": block.next_sequence,
+        "span_us": round(times[-1], 1) if times else 0.0,
+        "by_type": by_type,
+        "failed": sum(failures.values()),
+        "failures": failures,
+        "gaps": gaps,
+        "lost": sum(n for _, n in gaps),
+    }
+
+
+class JournalReader:
+    """
+    Incremental drain: each drain() returns the entries injected since the
+    previous one. lost counts entries overwritten before they could be read;
+    a driver reload (sequence numbers start again) is detected and followed.
+    """
+
+    def __init__(self, client, since: int = 0) -> None:
+        self._client = client
+        self.since = since
+        self.lost = 0
+        self.restarts = 0
+
+    def drain(self) -> Optional[JournalBlock]:
+        """Newer entries as a JournalBlock, or None if the read failed."""
+        blob = self._client.read_journal(self.since)
+        if blob is None:
+            return None
+        block = decode_journal(blob)
+        if block.next_sequence <= self.since:
+            # Driver reloaded: its sequence restarted below what we had read
+            self.restarts += 1
+            self.since = 0
+            return self.drain()
+        self.lost += sum(n for _, n in find_gaps(block["sequence"], self.since))
+        if len(block):
+            self.since = int(block["sequence"][-1])
+        return block
@@ -3,27 +3,83 @@ Movement patterns for InputHog testing.
 """
 
 import math
-import random
 import time
 from typing import Callable, Optional
 
-import ctypes
-from ctypes import wintypes
-
 from client import InputHogClient, MOUSE_RIGHT_BUTTON_DOWN, MOUSE_RIGHT_BUTTON_UP
+from display import DisplayService, get_display_service
+from profiling import profiled, span
 
 MoveCallback = Callable[[int, int, bool, int], None]
 
 def _step(client: InputHogClient, dx: int, dy: int, delay_ms: float, on_move: Optional[MoveCallback]) -> bool:
-    ok = client.move_mouse(dx, dy)
+    with span("ioctl"):
+        ok = client.move_mouse(dx, dy)
     if on_move:
         err = client.get_last_error() if not ok else 0
-        on_move(dx, dy, ok, err)
+        with span("on_move"):
+            on_move(dx, dy, ok, err)
     if delay_ms > 0:
-        time.sleep(delay_ms / 1000.0)
+        with span("sleep"):
+            time.sleep(delay_ms / 1000.0)
     return ok
 
 
+def _square_steps(size: int) -> list[tuple[int, int]]:
+    return [(size, 0), (0, size), (-size, 0), (0, -size)]
+
+
+def _circle_steps(radius: int, steps: int) -> list[tuple[int, int]]:
+    """Out to the perimeter, around the circle, and back to the start."""
+    steps = max(steps, 4)
+    out = [(radius, 0)]
+    prev_x = radius
+    prev_y = 0
+    for i in range(1, steps + 1):
+        angle = 2 * math.pi * i / steps
+        x = int(round(radius * math.cos(angle)))
+        y = int(round(radius * math.sin(angle)))
+        out.append((x - prev_x, y - prev_y))
+        prev_x, prev_y = x, y
+    out.append((-radius, 0))
+    return out
+
+
+def _triangle_steps(size: int) -> list[tuple[int, int]]:
+    # Equilateral: right, upper-left, lower-left, back to start
+    h = int(size * math.sqrt(3) / 2)
+    return [(size, 0), (-size // 2, -h), (-size // 2, h)]
+
+
+def _line_steps(length: int, steps: int, horizontal: bool = True) -> list[tuple[int, int]]:
+    step_size = length // steps if steps > 0 else length
+    return [(step_size, 0) if horizontal else (0, step_size)] * steps
+
+
+PATTERN_STEPS = {
+    "square": lambda o: _square_steps(o.get("size", 50)),
+    "circle": lambda o: _circle_steps(o.get("radius", 30), o.get("steps", 24)),
+    "triangle": lambda o: _triangle_steps(o.get("size", 50)),
+    "line": lambda o: _line_steps(o.get("size", 50) * 2, o.get("steps", 10), o.get("horizontal", True)),
+}
+
+
+def pattern_events(name: str, delay_ms: float = 30, **opts) -> list[dict]:
+    """
+    A pattern as recording-format move events (one every delay_ms, starting
+    at t_us=0), e.g. for timeline.TimelineScheduler. random_drag is not
+    included: it depends on the cursor position when it runs.
+    """
+    if name not in PATTERN_STEPS:
+        raise ValueError(f"Unknown pattern {name!r} (choose from {', '.join(PATTERN_STEPS)})")
+    step_us = int(delay_ms * 1000)
+    return [
+        {"t_us": i * step_us, "type": "move", "dx": dx, "dy": dy}
+        for i, (dx, dy) in enumerate(PATTERN_STEPS[name](opts))
+    ]
+
+
+@profiled("pattern.square")
 def test_square(
     client: InputHogClient,
     size: int = 50,
@@ -31,14 +87,14 @@ def test_square(
     on_move: Optional[MoveCallback] = None,
 ) -> int:
     """Move in a square. Returns number of successful moves."""
-    steps = [(size, 0), (0, size), (-size, 0), (0, -size)]
     success = 0
-    for dx, dy in steps:
+    for dx, dy in _square_steps(size):
         if _step(client, dx, dy, delay_ms, on_move):
             success += 1
     return success
 
 
+@profiled("pattern.circle")
 def test_circle(
     client: InputHogClient,
     radius: int = 30,
@@ -47,34 +103,14 @@ def test_circle(
     on_move: Optional[MoveCallback] = None,
 ) -> int:
     """Move in a closed circle and return to start. Returns successful moves."""
-    if steps < 4:
-        steps = 4
-
     success = 0
-
-    # Move from center to the circle perimeter first.
-    if _step(client, radius, 0, delay_ms, on_move):
-        success += 1
-
-    prev_x = radius
-    prev_y = 0
-    for i in range(1, steps + 1):
-        angle = 2 * math.pi * i / steps
-        x = int(round(radius * math.cos(angle)))
-        y = int(round(radius * math.sin(angle)))
-        dx = x - prev_x
-        dy = y - prev_y
+    for dx, dy in _circle_steps(radius, steps):
         if _step(client, dx, dy, delay_ms, on_move):
             success += 1
-        prev_x, prev_y = x, y
-
-    # Return to original cursor location.
-    if _step(client, -radius, 0, delay_ms, on_move):
-        success += 1
-
     return success
 
 
+@profiled("pattern.triangle")
 def test_triangle(
     client: InputHogClient,
     size: int = 50,
@@ -82,16 +118,14 @@ def test_triangle(
     on_move: Optional[MoveCallback] = None,
 ) -> int:
     """Move in a triangle. Returns number of successful moves."""
-    # Equilateral: right, upper-left, lower-left, back to start
-    h = int(size * math.sqrt(3) / 2)
-    steps = [(size, 0), (-size // 2, -h), (-size // 2, h)]
     success = 0
-    for dx, dy in steps:
+    for dx, dy in _triangle_steps(size):
         if _step(client, dx, dy, delay_ms, on_move):
             success += 1
     return success
 
 
+@profiled("pattern.line")
 def test_line(
     client: InputHogClient,
     length: int = 100,
@@ -101,11 +135,8 @@ def test_line(
     on_move: Optional[MoveCallback] = None,
 ) -> int:
     """Move in a straight line. Returns number of successful moves."""
-    step_size = length // steps if steps > 0 else length
     success = 0
-    for _ in range(steps):
-        dx = step_size if horizontal else 0
-        dy = 0 if horizontal else step_size
+    for dx, dy in _line_steps(length, steps, horizontal):
         if _step(client, dx, dy, delay_ms, on_move):
             success += 1
     return success
@@ -116,46 +147,35 @@ def move(client: InputHogClient, x: int, y: int) -> bool:
     return client.move_mouse(x, y)
 
 
-def _get_cursor_pos() -> tuple[int, int]:
-    """Get current cursor position (screen coords)."""
-    point = wintypes.POINT()
-    ctypes.windll.user32.GetCursorPos(ctypes.byref(point))
-    return (point.x, point.y)
-
-
-def _get_screen_size() -> tuple[int, int]:
-    """Get primary screen width and height."""
-    w = ctypes.windll.user32.GetSystemMetrics(0)   # SM_CXSCREEN
-    h = ctypes.windll.user32.GetSystemMetrics(1)  # SM_CYSCREEN
-    return (w, h)
-
-
+@profiled("pattern.random_drag")
 def test_random_drag(
     client: InputHogClient,
     delay_ms: float = 1000,
     steps: int = 20,
     margin: int = 50,
     on_move: Optional[MoveCallback] = None,
+    display: Optional[DisplayService] = None,
 ) -> int:
     """
-    Pick 2 random screen points, move to first, right-drag to second.
+    Pick 2 random points (each on any monitor), move to first, right-drag to second.
+    Backends with move_to land on each point exactly (absolute moves, immune to
+    pointer acceleration); others get relative deltas from the cursor position.
     Returns number of successful moves.
     """
-    w, h = _get_screen_size()
-    cx, cy = _get_cursor_pos()
+    display = display or get_display_service()
+    absolute = hasattr(client, "move_to")
+    cx, cy = display.cursor_pos()
 
-    # Random points within margin of edges
-    x1 = random.randint(margin, max(margin, w - margin - 1))
-    y1 = random.randint(margin, max(margin, h - margin - 1))
-    x2 = random.randint(margin, max(margin, w - margin - 1))
-    y2 = random.randint(margin, max(margin, h - margin - 1))
+    # Random points within margin of their monitor's edges
+    x1, y1 = display.random_point(margin)
+    x2, y2 = display.random_point(margin)
 
     success = 0
 
-    # Move to point 1 (relative delta)
+    # Move to point 1
     dx1 = x1 - cx
     dy1 = y1 - cy
-    if client.move_mouse(dx1, dy1):
+    if client.move_to(x1, y1) if absolute else client.move_mouse(dx1, dy1):
         success += 1
         if on_move:
             on_move(dx1, dy1, True, 0)
@@ -170,16 +190,25 @@ def test_random_drag(
     if delay_ms > 0:
         time.sleep(delay_ms / 1000.0)
 
-    # Drag to point 2 in steps (relative deltas)
+    # Drag to point 2 in steps
     step_dx = (x2 - x1) // steps
     step_dy = (y2 - y1) // steps
-    for _ in range(steps):
-        if client.mouse_input(0, step_dx, step_dy):  # 0 = move only, button held
+    px, py = x1, y1
+    for i in range(1, steps + 1):
+        if absolute:
+            nx, ny = x1 + (x2 - x1) * i // steps, y1 + (y2 - y1) * i // steps
+            dx, dy = nx - px, ny - py
+            ok = client.move_to(nx, ny)  # button stays held
+            px, py = nx, ny
+        else:
+            dx, dy = step_dx, step_dy
+            ok = client.mouse_input(0, step_dx, step_dy)  # 0 = move only, button held
+        if ok:
             success += 1
             if on_move:
-                on_move(step_dx, step_dy, True, 0)
+                on_move(dx, dy, True, 0)
         elif on_move:
-            on_move(step_dx, step_dy, False, client.get_last_error())
+            on_move(dx, dy, False, client.get_last_error())
         if delay_ms > 0:
             time.sleep(delay_ms / 1000.0)
 
@@ -0,0 +1,557 @@
+"""
+Content-addressed cache of compiled playback plans.
+Getting a recording ready to play (parse, upgrade to v3 events, optional
+trim / scale / speed edits and acceleration compensation) is repeated on
+every load. PlanCache keys the result by the SHA-256 of the source file plus
+the compile options and stores it as fixed-size binary records, so a later
+load of the same content maps the file with mmap and decodes events as they
+are played instead of parsing JSON. Source digests are remembered per
+(path, size, mtime) in sources.json, so a lookup does not re-read an
+unchanged file; a file not seen before is hashed while it is compiled.
+Least recently used plans are evicted once the directory exceeds max_bytes.
+The GUI, cli.py and playback_user32.py share one cache directory.
+
+Layout (little-endian):
+    header   "IHPL" u16 version, u16 reserved, u32 event count, u32 extras length
+    records  per event: i64 t_us, u16 tag, u16 flag, i32 a, i32 b
+    extras   JSON list of the events that do not fit a record (tag 0xFFFF, a = index)
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from accel import DEFAULT_LUT_SIZE, AccelCurve, InverseLUT, compensate_events
+from recording import Recording, iter_recording
+
+CACHE_DIR = Path(__file__).resolve().parent / "plan_cache"
+PLAN_SUFFIX = ".ihpl"
+PLAN_VERSION = 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+COMPILE_ATTEMPTS = 3  # compile() retries while the source keeps changing under it
+WRITE_BUFFER_SIZE = 1024 * 1024
+INDEX_NAME = "sources.json"
+INDEX_MAX_ENTRIES = 4096
+TEMP_MAX_AGE_S = 3600  # older *.tmp files belong to writers that died before commit
+
+# Playback edits (seconds, factors) applied through recording.Recording before compensation
+EDIT_KEYS = ("start_s", "end_s", "scale", "speed")
+
+_MAGIC = b"IHPL"
+_HEADER = struct.Struct("<4sHHII")
+_RECORD = struct.Struct("<qHHii")
+
+# Record tags; events with other types or extra keys go to the extras list
+_TAG_MOVE = 0
+_TAG_BUTTON = 1
+_TAG_KEY = 2
+_TAG_ANCHOR = 3
+_TAG_JSON = 0xFFFF
+_PLAIN_KEYS = {
+    "move": {"t_us", "type", "dx", "dy"},
+    "button": {"t_us", "type", "flag"},
+    "key": {"t_us", "type", "vk", "pressed"},
+    "anchor": {"t_us", "type", "x", "y"},
+}
+_I32 = (-(1 << 31), (1 << 31) - 1)
+_I64 = (-(1 << 63), (1 << 63) - 1)
+
+
+def _record(ev: dict) -> Optional[tuple[int, int, int, int, int]]:
+    """(t_us, tag, flag, a, b) for an event that round-trips through a record, else None."""
+    ev_type = ev.get("type")
+    t = ev.get("t_us")
+    if _PLAIN_KEYS.get(ev_type) != ev.keys() or type(t) is not int or not _I64[0] <= t <= _I64[1]:
+        return None
+    if ev_type == "move":
+        tag, flag, a, b = _TAG_MOVE, 0, ev["dx"], ev["dy"]
+    elif ev_type == "button":
+        tag, flag, a, b = _TAG_BUTTON, ev["flag"], 0, 0
+    elif ev_type == "key":
+        if type(ev["pressed"]) is not bool:
+            return None
+        tag, flag, a, b = _TAG_KEY, int(ev["pressed"]), ev["vk"], 0
+    else:
+        tag, flag, a, b = _TAG_ANCHOR, 0, ev["x"], ev["y"]
+    if type(flag) is not int or not 0 <= flag <= 0xFFFF:
+        return None
+    if any(type(v) is not int or not _I32[0] <= v <= _I32[1] for v in (a, b)):
+        return None
+    return t, tag, flag, a, b
+
+
+class CompiledPlan:
+    """
+    One plan file mapped read-only. len() needs no decoding; iterating
+    decodes each event from the mapping when it is reached. Raises
+    ValueError if the file is not a valid plan.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"{self.path.name}: empty plan file") from None
+        try:
+            if len(self._map) < _HEADER.size:
+                raise ValueError(f"{self.path.name}: plan header truncated")
+            magic, version, _, count, extras_len = _HEADER.unpack_from(self._map)
+            if magic != _MAGIC or version != PLAN_VERSION:
+                raise ValueError(f"{self.path.name}: not a version {PLAN_VERSION} plan")
+            extras_at = _HEADER.size + count * _RECORD.size
+            if extras_at + extras_len != len(self._map):
+                raise ValueError(f"{self.path.name}: plan size does not match its header")
+            self._extras = json.loads(self._map[extras_at:]) if extras_len else []
+        except ValueError:
+            self._map.close()
+            raise
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _event(self, i: int) -> dict:
+        t, tag, flag, a, b = _RECORD.unpack_from(self._map, _HEADER.size + i * _RECORD.size)
+        if tag == _TAG_MOVE:
+            return {"t_us": t, "type": "move", "dx": a, "dy": b}
+        if tag == _TAG_BUTTON:
+            return {"t_us": t, "type": "button", "flag": flag}
+        if tag == _TAG_KEY:
+            return {"t_us": t, "type": "key", "vk": a, "pressed": bool(flag)}
+        if tag == _TAG_ANCHOR:
+            return {"t_us": t, "type": "anchor", "x": a, "y": b}
+        if tag == _TAG_JSON:
+            return dict(self._extras[a])
+        raise ValueError(f"{self.path.name}: unknown record tag {tag:#x}")
+
+    def __getitem__(self, i: int) -> dict:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("plan index out of range")
+        return self._event(i)
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(self._count):
+            yield self._event(i)
+
+    def to_events(self) -> list[dict]:
+        return list(self)
+
+    def close(self) -> None:
+        """Unmap the file (on Windows a mapped plan cannot be replaced or evicted)."""
+        self._map.close()
+
+    def __enter__(self) -> "CompiledPlan":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class _PlanWriter:
+    """Streams records to a temp file in the cache directory; commit() renames it into place."""
+
+    def __init__(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        self.tmp = Path(tmp)
+        self._f = os.fdopen(fd, "wb")
+        self._f.write(bytes(_HEADER.size))
+        self._buf = bytearray()
+        self._extras: list[dict] = []
+        self.count = 0
+
+    def add(self, ev: dict) -> None:
+        rec = _record(ev)
+        if rec is None:
+            t = ev.get("t_us")
+            rec = (t if type(t) is int and _I64[0] <= t <= _I64[1] else 0, _TAG_JSON, 0, len(self._extras), 0)
+            self._extras.append(ev)
+        self._buf += _RECORD.pack(*rec)
+        self.count += 1
+        if len(self._buf) >= WRITE_BUFFER_SIZE:
+            self._f.write(self._buf)
+            self._buf.clear()
+
+    def commit(self, path: Path) -> bool:
+        """Finish the file and rename it to path. False (temp file removed) if path could not be replaced."""
+        extras = json.dumps(self._extras, separators=(",", ":")).encode("utf-8") if self._extras else b""
+        self._f.write(self._buf)
+        self._f.write(extras)
+        self._f.seek(0)
+        self._f.write(_HEADER.pack(_MAGIC, PLAN_VERSION, 0, self.count, len(extras)))
+        self._f.close()
+        try:
+            os.replace(self.tmp, path)
+        except OSError:
+            # Windows: another process has the same plan mapped; it is identical
+            self.tmp.unlink(missing_ok=True)
+            return False
+        return True
+
+    def discard(self) -> None:
+        self._f.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+class _TrailingHash:
+    """SHA-256 of a file, read a second time just behind a parser that reports its progress in bytes."""
+
+    def __init__(self, path: Path) -> None:
+        self._f = open(path, "rb")
+        self._h = hashlib.sha256()
+        self._done = 0
+
+    def advance(self, upto: int) -> None:
+        while self._done < upto:
+            chunk = self._f.read(min(HASH_CHUNK_SIZE, upto - self._done))
+            if not chunk:
+                return
+            self._h.update(chunk)
+            self._done += len(chunk)
+
+    def finish(self) -> str:
+        while chunk := self._f.read(HASH_CHUNK_SIZE):
+            self._h.update(chunk)
+        self._f.close()
+        return self._h.hexdigest()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class PlanCache:
+    """
+    Compiled plans in one directory. Safe to use from any thread, and several
+    processes may share the directory (plans are written to a temp file and
+    renamed into place). hits/misses/stores/evictions count this instance's
+    activity; stats() adds what is on disk. Close the CompiledPlans it
+    returns once played.
+    """
+
+    def __init__(self, directory: Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._digests: Optional[dict[str, list]] = None  # path -> [size, mtime_ns, sha256]; INDEX_NAME on first use
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _index(self) -> dict[str, list]:
+        """The source digest index, loaded on first use; caller holds self._lock."""
+        if self._digests is None:
+            try:
+                data = json.loads((self.directory / INDEX_NAME).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = None
+            self._digests = data if isinstance(data, dict) else {}
+        return self._digests
+
+    def _known_digest(self, path: Path, st: os.stat_result) -> Optional[str]:
+        with self._lock:
+            known = self._index().get(str(path))
+        if isinstance(known, list) and known[:2] == [st.st_size, st.st_mtime_ns] and len(known) == 3:
+            return known[2]
+        return None
+
+    def _remember(self, path: Path, st: os.stat_result, digest: str) -> None:
+        """Record path's digest for its size and mtime, here and in the index shared with other processes."""
+        try:
+            on_disk = json.loads((self.directory / INDEX_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            on_disk = {}
+        with self._lock:
+            index = self._index()
+            if isinstance(on_disk, dict):
+                index.update((k, v) for k, v in on_disk.items() if k not in index)
+            index.pop(str(path), None)
+            index[str(path)] = [st.st_size, st.st_mtime_ns, digest]
+            while len(index) > INDEX_MAX_ENTRIES:
+                del index[next(iter(index))]
+            data = json.dumps(index)
+        tmp = None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.directory / INDEX_NAME)
+        except OSError:
+            if tmp is not None:
+                Path(tmp).unlink(missing_ok=True)
+
+    def source_digest(self, path: Path) -> str:
+        """SHA-256 of the file's bytes, re-hashed only when its size or mtime changes."""
+        path = Path(path).resolve()
+        st = path.stat()
+        digest = self._known_digest(path, st)
+        if digest is not None:
+            return digest
+        hasher = _TrailingHash(path)
+        digest = hasher.finish()
+        if _same_file(path, st):
+            self._remember(path, st, digest)
+        return digest
+
+    def key(self, path: Path, curve: Optional[AccelCurve] = None, edits: Optional[dict] = None) -> str:
+        """Plan key: source content plus every option that changes the compiled events."""
+        return self._key(self.source_digest(path), curve, _edit_options(edits))
+
+    @staticmethod
+    def _key(digest: str, curve: Optional[AccelCurve], edits: dict) -> str:
+        options = {"version": PLAN_VERSION, "source": digest}
+        if curve is not None:
+            options["accel"] = {"curve": curve.to_dict(), "lut_size": DEFAULT_LUT_SIZE}
+        if edits:
+            options["edits"] = edits
+        return hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _plan_path(self, key: str) -> Path:
+        return self.directory / (key + PLAN_SUFFIX)
+
+    def get(self, path: Path, curve: Optional[AccelCurve] = None, edits: Optional[dict] = None) -> Optional[CompiledPlan]:
+        """The cached plan, or None on a miss (unreadable plans are deleted and count as misses)."""
+        return self._lookup(self.key(path, curve, edits))
+
+    def _lookup(self, key: str) -> Optional[CompiledPlan]:
+        plan_path = self._plan_path(key)
+        plan = None
+        try:
+            plan = CompiledPlan(plan_path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            plan_path.unlink(missing_ok=True)
+        if plan is not None:
+            try:
+                os.utime(plan_path)  # mtime is the recency used by eviction
+            except OSError:
+                pass
+        with self._lock:
+            if plan is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return plan
+
+    def compile(self, path: Path, curve: Optional[AccelCurve] = None, edits: Optional[dict] = None) -> CompiledPlan:
+        """
+        Cached plan for path, compiling and storing it first on a miss. Raises
+        ValueError if the file changed during each of COMPILE_ATTEMPTS compiles.
+        """
+        plan = self.get(path, curve, edits)
+        if plan is not None:
+            return plan
+        for _ in range(COMPILE_ATTEMPTS):
+            key = _drain(self._compile_and_store(Path(path).resolve(), curve, _edit_options(edits), None))
+            if key is not None:
+                return CompiledPlan(self._plan_path(key))
+        raise ValueError(f"{Path(path).name} kept changing while it was compiled")
+
+    def stream(
+        self,
+        path: Path,
+        curve: Optional[AccelCurve] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        edits: Optional[dict] = None,
+    ) -> Iterable[dict]:
+        """
+        Compiled events of path for streaming playback: the CompiledPlan on a
+        hit; on a miss a generator that compiles while it is consumed and
+        stores the plan only once it has been consumed to the end.
+        on_progress(bytes_read, total_bytes) follows iter_recording on a miss.
+        A file not seen before is hashed alongside the parse, not ahead of
+        it, so its first event is not held up; a plan read from a file that
+        changed meanwhile is not stored.
+        """
+        path = Path(path).resolve()
+        edits = _edit_options(edits)
+        digest = self._known_digest(path, path.stat())
+        if digest is not None:
+            plan = self._lookup(self._key(digest, curve, edits))
+            if plan is not None:
+                return plan
+        else:
+            with self._lock:
+                self.misses += 1
+        return self._compile_and_store(path, curve, edits, on_progress)
+
+    def _compile_and_store(self, path: Path, curve: Optional[AccelCurve], edits: dict, on_progress) -> Iterator[dict]:
+        """Yield the compiled events, then store the plan; returns its key, or None if the source changed meanwhile."""
+        st = path.stat()
+        digest = self._known_digest(path, st)
+        hasher = _TrailingHash(path) if digest is None else None
+
+        def progress(done: int, total: int) -> None:
+            if hasher is not None:
+                hasher.advance(done)
+            if on_progress is not None:
+                on_progress(done, total)
+
+        writer = _PlanWriter(self.directory)
+        try:
+            for ev in compile_events(path, curve, edits, progress):
+                writer.add(ev)
+                yield ev
+            if hasher is not None:
+                digest = hasher.finish()
+        except BaseException:  # includes GeneratorExit when the consumer stops early
+            writer.discard()
+            if hasher is not None:
+                hasher.close()
+            raise
+        return self._store(writer, path, st, digest, self._key(digest, curve, edits))
+
+    def _store(self, writer: _PlanWriter, path: Path, st: os.stat_result, digest: str, key: str) -> Optional[str]:
+        """
+        Commit the plan under key, whose digest was taken for st, the source's
+        state before it was read. None (plan discarded) if the source's size
+        or mtime has changed since: the events may mix old and new content.
+        """
+        if not _same_file(path, st):
+            writer.discard()
+            return None
+        self._remember(path, st, digest)
+        plan_path = self._plan_path(key)
+        if writer.commit(plan_path):
+            with self._lock:
+                self.stores += 1
+        self._evict(keep=plan_path)
+        return key
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """(mtime, size, path) of every plan, oldest first."""
+        out = []
+        for p in self.directory.glob("*" + PLAN_SUFFIX):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, p))
+        out.sort()
+        return out
+
+    def _evict(self, keep: Optional[Path] = None) -> None:
+        """Delete least recently used plans until the total fits max_bytes, and orphaned temp files."""
+        cutoff = time.time() - TEMP_MAX_AGE_S
+        for p in self.directory.glob("*.tmp"):
+            try:
+                if p.stat().st_mtime < cutoff:
+                    p.unlink()
+            except OSError:
+                continue
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                p.unlink()
+            except OSError:
+                continue  # Windows: mapped by a running playback
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self) -> int:
+        """Delete every plan (and leftover temp files and the digest index). Returns how many plans were removed."""
+        removed = 0
+        with self._lock:
+            self._digests = None
+        extra = [self.directory / INDEX_NAME] + list(self.directory.glob("*.tmp"))
+        for p in list(self.directory.glob("*" + PLAN_SUFFIX)) + extra:
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            removed += p.suffix == PLAN_SUFFIX
+        return removed
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "directory": str(self.directory),
+            }
+
+
+def compile_events(
+    path: Path,
+    curve: Optional[AccelCurve] = None,
+    edits: Optional[dict] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterable[dict]:
+    """
+    The events a plan holds, without the cache: the recording with edits
+    (EDIT_KEYS; loads it whole, needs numpy) then compensation applied.
+    """
+    events: Iterable[dict] = iter_recording(Path(path), on_progress)
+    edits = _edit_options(edits)
+    if edits:
+        rec = Recording.from_events(events)
+        if "start_s" in edits or "end_s" in edits:
+            end_s = edits.get("end_s")
+            rec = rec.trim(int(edits.get("start_s", 0) * 1e6), None if end_s is None else int(end_s * 1e6))
+        if "scale" in edits:
+            rec = rec.scale(edits["scale"])
+        if "speed" in edits:
+            rec = rec.time_warp(1 / edits["speed"])
+        events = rec.to_events()
+    if curve is not None:
+        events = compensate_events(events, InverseLUT(curve))
+    return events
+
+
+def _edit_options(edits: Optional[dict]) -> dict:
+    """Edits as they go into a plan key: known keys only, None dropped, numbers as floats."""
+    out = {}
+    for k, v in (edits or {}).items():
+        if k not in EDIT_KEYS:
+            raise ValueError(f"unknown edit {k!r} (choose from {', '.join(EDIT_KEYS)})")
+        if v is not None:
+            out[k] = float(v)
+    if out.get("speed", 1.0) <= 0:
+        raise ValueError("speed must be positive")
+    return out
+
+
+def _same_file(path: Path, st: os.stat_result) -> bool:
+    try:
+        now = path.stat()
+    except OSError:
+        return False  # removed meanwhile
+    return (now.st_size, now.st_mtime_ns) == (st.st_size, st.st_mtime_ns)
+
+
+def _drain(gen):
+    """Run a generator to the end and return its return value."""
+    while True:
+        try:
+            next(gen)
+        except StopIteration as stop:
+            return stop.value
@@ -7,7 +7,7 @@ Reuses recording format and load/save from recording.py.
 import sys
 import time
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Iterable, Optional
 
 # High-level mouse/keyboard via pyautogui (no driver)
 try:
@@ -18,7 +18,9 @@ except ImportError:
 
 import ctypes
 
-from recording import load_recording
+from catalog import Catalog
+from plancache import PlanCache
+from recording import sleep_until
 from client import (
     MOUSE_LEFT_BUTTON_DOWN,
     MOUSE_LEFT_BUTTON_UP,
@@ -48,7 +50,7 @@ def _inject_key(vk: int, pressed: bool) -> None:
 
 
 def play_recording_user32(
-    events: list[dict],
+    events: Iterable[dict],
     on_event: Optional[Callable[[dict, bool], None]] = None,
     fail_fast: bool = False,
 ) -> int:
@@ -56,6 +58,7 @@ def play_recording_user32(
     Play a recording using user-mode APIs only (no InputHog driver).
     - Mouse: pyautogui.moveRel / mouseDown / mouseUp
     - Keyboard: keybd_event
+    events may be a list or a stream such as iter_recording() or PlanCache.stream().
     Returns number of successful events.
     """
     if not HAS_PYAUTOGUI:
@@ -64,14 +67,10 @@ def play_recording_user32(
         )
 
     success = 0
-    prev_t = 0
+    start_ns = time.perf_counter_ns()
 
     for ev in events:
-        t = ev.get("t", 0)
-        delay_ms = t - prev_t
-        if delay_ms > 0:
-            time.sleep(delay_ms / 1000.0)
-        prev_t = t
+        sleep_until(start_ns + ev.get("t_us", 0) * 1000)
 
         ev_type = ev.get("type", "")
         ok = False
@@ -103,6 +102,13 @@ def play_recording_user32(
                 except Exception:
                     ok = False
 
+        elif ev_type == "anchor":
+            try:
+                pyautogui.moveTo(ev.get("x", 0), ev.get("y", 0), _pause=False)
+                ok = True
+            except Exception:
+                ok = False
+
         elif ev_type == "key":
             vk = ev.get("vk")
             if vk is not None:
@@ -132,11 +138,12 @@ def main() -> None:
     if len(sys.argv) < 2:
         # List available recordings or use default
         if recordings_dir.exists():
-            files = list(recordings_dir.glob("*.json"))
-            if not files:
-                print(f"No .json recordings in {recordings_dir}")
+            catalog = Catalog(recordings_dir)
+            catalog.refresh()
+            path = catalog.most_recent()
+            if path is None:
+                print(f"No recordings in {recordings_dir}")
                 sys.exit(1)
-            path = sorted(files, key=lambda p: p.stat().st_mtime, reverse=True)[0]
             print(f"Using most recent: {path.name}")
         else:
             print("Usage: python playback_user32.py <recording.json>")
@@ -150,12 +157,23 @@ def main() -> None:
             print(f"File not found: {path}")
             sys.exit(1)
 
-    events = load_recording(path)
-    print(f"Loaded {len(events)} events. Playing in 2 seconds...")
+    print(f"Playing {path.name} in 2 seconds...")
     time.sleep(2)
 
-    n = play_recording_user32(events)
-    print(f"Played {n}/{len(events)} events (user-mode, no driver)")
+    # Stream events from disk so playback starts without parsing the whole file;
+    # the compiled plan is cached, so later runs of the same content skip parsing
+    total = 0
+
+    def count(ev: dict, ok: bool) -> None:
+        nonlocal total
+        total += 1
+
+    events = PlanCache().stream(path)
+    try:
+        n = play_recording_user32(events, on_event=count)
+    finally:
+        events.close()
+    print(f"Played {n}/{total} events (user-mode, no driver)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+"""
+Path preview for recordings: level-of-detail decimation plus live stats.
+The cursor path (running sum of move deltas, starting at 0,0) is cut into at
+most max_buckets runs of consecutive points; each run keeps its first, last
+and min/max-x/y points in order, so spikes and corners survive while a
+million-event recording shrinks to a few thousand canvas coordinates.
+  PathLOD        streaming version (recorder feeds it as events arrive)
+  decimate_path  one-shot version for loaded recordings (numpy when available)
+  RecorderStats  events/s, peak rate and counts by type, updated per event
+"""
+
+from collections import deque
+from typing import Iterable, Optional
+
+# Vectorized decimation (optional)
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+DEFAULT_BUCKETS = 1024  # ~2 buckets per pixel on the preview canvas; <= 6 points each
+
+RATE_WINDOW_US = 1_000_000
+RATE_BIN_US = 100_000
+
+
+def _extremes(points: list[tuple[int, int, int]]) -> list[tuple[int, int, int]]:
+    """First, last and min/max x/y of (seq, x, y) points, in seq order without duplicates."""
+    keep = {
+        points[0],
+        points[-1],
+        min(points, key=lambda p: p[1]),
+        max(points, key=lambda p: p[1]),
+        min(points, key=lambda p: p[2]),
+        max(points, key=lambda p: p[2]),
+    }
+    return sorted(keep)
+
+
+class PathLOD:
+    """
+    Streaming min/max decimation. Points collect into the open bucket until it
+    holds bucket_size of them; when max_buckets are closed, neighbours are
+    merged pairwise and bucket_size doubles, so memory stays O(max_buckets)
+    and each point costs O(1) amortised.
+    """
+
+    def __init__(self, max_buckets: int = DEFAULT_BUCKETS) -> None:
+        self.max_buckets = max(2, max_buckets)
+        self.bucket_size = 1
+        self.x = 0
+        self.y = 0
+        self.count = 0
+        self.bbox = (0, 0, 0, 0)  # min_x, min_y, max_x, max_y
+        self._buckets: list[list[tuple[int, int, int]]] = []
+        self._open: list[tuple[int, int, int]] = [(0, 0, 0)]
+
+    def add_move(self, dx: int, dy: int) -> None:
+        self.x += dx
+        self.y += dy
+        self.count += 1
+        x, y = self.x, self.y
+        min_x, min_y, max_x, max_y = self.bbox
+        if x < min_x or y < min_y or x > max_x or y > max_y:
+            self.bbox = (min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y))
+        self._open.append((self.count, x, y))
+        if len(self._open) >= self.bucket_size:
+            self._buckets.append(_extremes(self._open))
+            self._open = []
+            if len(self._buckets) >= self.max_buckets:
+                b = self._buckets
+                self._buckets = [_extremes(b[i] + b[i + 1]) if i + 1 < len(b) else b[i] for i in range(0, len(b), 2)]
+                self.bucket_size *= 2
+
+    def feed(self, events: Iterable[dict]) -> None:
+        for ev in events:
+            if ev.get("type") == "move":
+                self.add_move(ev.get("dx", 0), ev.get("dy", 0))
+
+    def points(self) -> list[tuple[int, int]]:
+        out = [(x, y) for bucket in self._buckets for _, x, y in bucket]
+        out.extend((x, y) for _, x, y in self._open)
+        return out
+
+
+def decimate_path(events: list[dict], max_buckets: int = DEFAULT_BUCKETS) -> tuple[list[tuple[int, int]], tuple[int, int, int, int]]:
+    """Decimated path and bounding box (min_x, min_y, max_x, max_y) of a whole recording."""
+    if not HAS_NUMPY:
+        lod = PathLOD(max_buckets)
+        lod.feed(events)
+        return lod.points(), lod.bbox
+    deltas = np.array([(ev.get("dx", 0), ev.get("dy", 0)) for ev in events if ev.get("type") == "move"], dtype=np.int64)
+    if not len(deltas):
+        return [(0, 0)], (0, 0, 0, 0)
+    path = np.vstack([np.zeros((1, 2), dtype=np.int64), np.cumsum(deltas, axis=0)])
+    n = len(path)
+    bbox = (int(path[:, 0].min()), int(path[:, 1].min()), int(path[:, 0].max()), int(path[:, 1].max()))
+    if n <= max_buckets * 6:
+        return [(int(x), int(y)) for x, y in path], bbox
+    size = -(-n // max_buckets)
+    padded = np.pad(path, ((0, size * max_buckets - n), (0, 0)), mode="edge").reshape(max_buckets, size, 2)
+    base = np.arange(max_buckets) * size
+    picks = [base, base + size - 1]
+    for axis in (0, 1):
+        picks.append(base + padded[:, :, axis].argmin(axis=1))
+        picks.append(base + padded[:, :, axis].argmax(axis=1))
+    idx = np.unique(np.minimum(np.concatenate(picks), n - 1))
+    return [(int(x), int(y)) for x, y in path[idx]], bbox
+
+
+def fit_to_canvas(
+    points: list[tuple[int, int]],
+    bbox: tuple[int, int, int, int],
+    width: int,
+    height: int,
+    pad: int = 4,
+) -> list[float]:
+    """
+    Scale points into a width x height canvas (aspect kept, centred) and drop
+    consecutive points that land on the same pixel. Returns flat x0, y0, x1, ...
+    """
+    min_x, min_y, max_x, max_y = bbox
+    span = max(max_x - min_x, max_y - min_y, 1)
+    scale = min(width - 2 * pad, height - 2 * pad) / span
+    off_x = (width - (max_x - min_x) * scale) / 2 - min_x * scale
+    off_y = (height - (max_y - min_y) * scale) / 2 - min_y * scale
+    out: list[float] = []
+    last: Optional[tuple[int, int]] = None
+    for x, y in points:
+        px, py = round(x * scale + off_x), round(y * scale + off_y)
+        if (px, py) != last:
+            out.extend((px, py))
+            last = (px, py)
+    return out
+
+
+class RecorderStats:
+    """
+    Incremental recording counters: total, by type, events in the last second
+    (100 ms bins) and the highest such rate seen. add() is O(1); the recorder
+    calls it under its lock so the GUI never rescans the event list.
+    """
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.by_type: dict[str, int] = {}
+        self.peak_rate = 0
+        self._bins: deque[list[int]] = deque()  # [bin index, count]
+        self._window = 0
+
+    def _expire(self, current_bin: int) -> None:
+        oldest = current_bin - RATE_WINDOW_US // RATE_BIN_US
+        while self._bins and self._bins[0][0] <= oldest:
+            self._window -= self._bins.popleft()[1]
+
+    def add(self, ev: dict) -> None:
+        self.total += 1
+        ev_type = ev.get("type", "")
+        self.by_type[ev_type] = self.by_type.get(ev_type, 0) + 1
+        b = ev.get("t_us", 0) // RATE_BIN_US
+        if self._bins and self._bins[-1][0] >= b:
+            self._bins[-1][1] += 1  # same bin (or a slightly late event from another thread)
+        else:
+            self._bins.append([b, 1])
+            self._expire(b)
+        self._window += 1
+        if self._window > self.peak_rate:
+            self.peak_rate = self._window
+
+    def snapshot(self, now_us: int) -> dict:
+        """{"total", "rate", "peak_rate", "by_type"}; rate counts the second before now_us."""
+        self._expire(now_us // RATE_BIN_US)
+        return {
+            "total": self.total,
+            "rate": self._window,
+            "peak_rate": self.peak_rate,
+            "by_type": dict(self.by_type),
+        }
+
+
+def describe_stats(stats: dict) -> str:
+    by_type = ", ".join(f"{n} {t}" for t, n in sorted(stats["by_type"].items()))
+    return f"{stats['total']} events ({by_type or 'none'}), {stats['rate']}/s, peak {stats['peak_rate']}/s"
@@ -0,0 +1,188 @@
+"""
+Opt-in profiling for InputHog playback, recording and patterns.
+Enable with INPUTHOG_PROFILE (comma list: "spans", "cprofile", "tracemalloc";
+"1" means spans) or from the GUI toggle. When disabled, span() and the
+profiled() wrappers cost one global check.
+
+Span timings are written as collapsed stacks ("thread;outer;inner <us>"),
+which speedscope and flamegraph.pl open directly.
+"""
+
+import cProfile
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+ENV_VAR = "INPUTHOG_PROFILE"
+MODES = ("spans", "cprofile", "tracemalloc")
+
+_modes: frozenset = frozenset()
+_output_dir = Path.cwd()
+_lock = threading.Lock()
+_tls = threading.local()
+_self_ns: dict[str, int] = {}  # collapsed stack -> self time
+_sessions = 0  # open sessions across threads
+_NULL = nullcontext()
+
+
+def configure(modes: Union[str, Iterable[str], None], output_dir: Optional[Path] = None) -> None:
+    """Set active modes (None/"" disables) and where profile files are written."""
+    global _modes, _output_dir
+    if isinstance(modes, str):
+        modes = ["spans"] if modes.strip() == "1" else modes.split(",")
+    _modes = frozenset(m.strip() for m in (modes or ()) if m.strip() in MODES)
+    if output_dir is not None:
+        _output_dir = Path(output_dir)
+
+
+def enabled() -> bool:
+    return bool(_modes)
+
+
+class _Span:
+    __slots__ = ("name", "start", "child_ns")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.child_ns = 0
+
+    def __enter__(self) -> "_Span":
+        stack = getattr(_tls, "stack", None)
+        if stack is None:
+            stack = _tls.stack = []
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter_ns() - self.start
+        stack = _tls.stack
+        key = ";".join([threading.current_thread().name] + [s.name for s in stack])
+        stack.pop()
+        if stack:
+            stack[-1].child_ns += elapsed
+        with _lock:
+            _self_ns[key] = _self_ns.get(key, 0) + elapsed - self.child_ns
+
+
+def span(name: str):
+    """Time a block as a named span nested under any open span on this thread."""
+    if "spans" not in _modes:
+        return _NULL
+    return _Span(name)
+
+
+@contextmanager
+def session(label: str):
+    """
+    Profile one operation (a playback, a recording, a pattern). Opens a span
+    named label and, for cprofile/tracemalloc, profiles this thread. When the
+    last open session ends, accumulated results are written to files.
+    """
+    global _sessions
+    if not _modes:
+        yield
+        return
+    profiler = cProfile.Profile() if "cprofile" in _modes else None
+    if "tracemalloc" in _modes and not tracemalloc.is_tracing():
+        tracemalloc.start(25)
+    with _lock:
+        _sessions += 1
+    if profiler:
+        profiler.enable()
+    try:
+        with span(label):
+            yield
+    finally:
+        if profiler:
+            profiler.disable()
+        with _lock:
+            _sessions -= 1
+            last = _sessions == 0
+        try:
+            _write(label, profiler, last)
+        except OSError:
+            pass
+
+
+def profiled(label: str):
+    """Decorator form of session(label)."""
+
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _modes:
+                return fn(*args, **kwargs)
+            with session(label):
+                return fn(*args, **kwargs)
+
+        return inner
+
+    return wrap
+
+
+def flush(label: str) -> None:
+    """Write accumulated spans now (for work not wrapped in a session, e.g. recorder callbacks)."""
+    if not _modes:
+        return
+    with _lock:
+        if _sessions:
+            return  # the running session writes everything when it ends
+    try:
+        _write(label, None, True)
+    except OSError:
+        pass
+
+
+def flush_async(label: str) -> Optional[threading.Thread]:
+    """flush() on a worker thread, so GUI-thread callers never wait on the writes."""
+    if not _modes:
+        return None
+    # Not a daemon: a flush started just before exit still finishes its files
+    worker = threading.Thread(target=flush, args=(label,), name="inputhog-profile-flush")
+    worker.start()
+    return worker
+
+
+def spanned(name: str, fn):
+    """Wrap a callback so each call is a span; returns fn unchanged when spans are off."""
+    if "spans" not in _modes:
+        return fn
+
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        with _Span(name):
+            return fn(*args, **kwargs)
+
+    return inner
+
+
+def _write(label: str, profiler: Optional[cProfile.Profile], flush_spans: bool) -> None:
+    stem = f"inputhog_profile_{label}_{time.strftime('%Y%m%d-%H%M%S')}"
+    _output_dir.mkdir(parents=True, exist_ok=True)
+    if profiler is not None:
+        profiler.dump_stats(str(_output_dir / f"{stem}.prof"))
+    if flush_spans:
+        with _lock:
+            stacks = dict(_self_ns)
+            _self_ns.clear()
+        if stacks:
+            with open(_output_dir / f"{stem}.collapsed.txt", "w", encoding="utf-8") as f:
+                for key, ns in sorted(stacks.items()):
+                    f.write(f"{key} {max(ns, 0) // 1000}\n")
+        if tracemalloc.is_tracing():
+            top = tracemalloc.take_snapshot().statistics("traceback")[:25]
+            tracemalloc.stop()
+            with open(_output_dir / f"{stem}.tracemalloc.txt", "w", encoding="utf-8") as f:
+                for stat in top:
+                    f.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+                    for line in stat.traceback.format():
+                        f.write(f"    {line}\n")
+
+
+configure(os.environ.get(ENV_VAR))
@@ -0,0 +1,289 @@
+"""
+Raw Input (WM_INPUT) mouse capture for the recorder.
+Records device deltas as reported by the mouse HID (usage page 1, usage 2):
+no pointer acceleration, no clipping at screen edges, one event per report
+at the device polling rate. Split in three so the first two run anywhere:
+  decode_rawmouse()  RAWMOUSE struct -> (x, y, absolute, button flags)
+  DeltaAccumulator   decoded reports -> recording events (absolute -> relative)
+  RawMouseCapture    message-only window + GetMessage loop on its own thread (Windows)
+"""
+
+import ctypes
+import sys
+import threading
+import time
+from ctypes import wintypes
+from typing import Callable, Optional
+
+from client import (
+    MOUSE_LEFT_BUTTON_DOWN,
+    MOUSE_LEFT_BUTTON_UP,
+    MOUSE_RIGHT_BUTTON_DOWN,
+    MOUSE_RIGHT_BUTTON_UP,
+    MOUSE_MIDDLE_BUTTON_DOWN,
+    MOUSE_MIDDLE_BUTTON_UP,
+)
+from win32 import ABSOLUTE_SPAN, WNDCLASSW, user32 as _window_user32
+
+if sys.platform == "win32":
+    from win32 import WNDPROC
+
+HAS_RAW_INPUT = sys.platform == "win32"
+
+# RAWMOUSE.usFlags
+MOUSE_MOVE_RELATIVE = 0x00
+MOUSE_MOVE_ABSOLUTE = 0x01
+MOUSE_VIRTUAL_DESKTOP = 0x02
+
+# RAWMOUSE.usButtonFlags; buttons use the same bits as MOUSE_INPUT_DATA (client.MOUSE_*)
+RI_MOUSE_BUTTON_4_DOWN = 0x0040
+RI_MOUSE_BUTTON_4_UP = 0x0080
+RI_MOUSE_BUTTON_5_DOWN = 0x0100
+RI_MOUSE_BUTTON_5_UP = 0x0200
+RI_MOUSE_WHEEL = 0x0400
+RI_MOUSE_HWHEEL = 0x0800
+BUTTON_FLAGS = (
+    MOUSE_LEFT_BUTTON_DOWN,
+    MOUSE_LEFT_BUTTON_UP,
+    MOUSE_RIGHT_BUTTON_DOWN,
+    MOUSE_RIGHT_BUTTON_UP,
+    MOUSE_MIDDLE_BUTTON_DOWN,
+    MOUSE_MIDDLE_BUTTON_UP,
+    RI_MOUSE_BUTTON_4_DOWN,
+    RI_MOUSE_BUTTON_4_UP,
+    RI_MOUSE_BUTTON_5_DOWN,
+    RI_MOUSE_BUTTON_5_UP,
+)
+
+WM_INPUT = 0x00FF
+WM_QUIT = 0x0012
+RID_INPUT = 0x10000003
+RIM_TYPEMOUSE = 0
+RIDEV_REMOVE = 0x00000001
+RIDEV_INPUTSINK = 0x00000100
+HWND_MESSAGE = -3
+HID_USAGE_PAGE_GENERIC = 0x01
+HID_USAGE_GENERIC_MOUSE = 0x02
+
+
+class RAWINPUTHEADER(ctypes.Structure):
+    _fields_ = [
+        ("dwType", ctypes.c_uint32),
+        ("dwSize", ctypes.c_uint32),
+        ("hDevice", ctypes.c_void_p),
+        ("wParam", ctypes.c_size_t),
+    ]
+
+
+class _RAWMOUSE_BUTTONS(ctypes.Structure):
+    _fields_ = [
+        ("usButtonFlags", ctypes.c_uint16),
+        ("usButtonData", ctypes.c_uint16),
+    ]
+
+
+class _RAWMOUSE_UNION(ctypes.Union):
+    _anonymous_ = ("s",)
+    _fields_ = [
+        ("ulButtons", ctypes.c_uint32),
+        ("s", _RAWMOUSE_BUTTONS),
+    ]
+
+
+class RAWMOUSE(ctypes.Structure):
+    _anonymous_ = ("u",)
+    _fields_ = [
+        ("usFlags", ctypes.c_uint16),
+        ("u", _RAWMOUSE_UNION),
+        ("ulRawButtons", ctypes.c_uint32),
+        ("lLastX", ctypes.c_int32),
+        ("lLastY", ctypes.c_int32),
+        ("ulExtraInformation", ctypes.c_uint32),
+    ]
+
+
+class RAWINPUT_MOUSE(ctypes.Structure):
+    """RAWINPUT with the mouse member of the data union (the only one we register for)."""
+    _fields_ = [
+        ("header", RAWINPUTHEADER),
+        ("mouse", RAWMOUSE),
+    ]
+
+
+class RAWINPUTDEVICE(ctypes.Structure):
+    _fields_ = [
+        ("usUsagePage", ctypes.c_uint16),
+        ("usUsage", ctypes.c_uint16),
+        ("dwFlags", ctypes.c_uint32),
+        ("hwndTarget", ctypes.c_void_p),
+    ]
+
+
+def decode_rawmouse(rm: RAWMOUSE) -> tuple[int, int, bool, list[int]]:
+    """
+    Decode one report: (x, y, absolute, button flags). x/y are a relative
+    delta, or a 0..65535 position when absolute (tablets, RDP, VMs). Button
+    transitions are returned in bit order; wheel data is not recorded.
+    """
+    absolute = bool(rm.usFlags & MOUSE_MOVE_ABSOLUTE)
+    flags = rm.usButtonFlags
+    buttons = [f for f in BUTTON_FLAGS if flags & f]
+    return int(rm.lLastX), int(rm.lLastY), absolute, buttons
+
+
+class DeltaAccumulator:
+    """
+    Turns decoded reports into recording events. Relative reports pass through;
+    absolute reports are scaled to pixels (screen or virtual desktop, per
+    MOUSE_VIRTUAL_DESKTOP) and differenced against the previous absolute
+    position. Keeps running totals of the reported motion.
+    """
+
+    def __init__(self, screen_size: tuple[int, int], virtual_size: Optional[tuple[int, int]] = None) -> None:
+        self.screen_size = screen_size
+        self.virtual_size = virtual_size or screen_size
+        self._abs_pos: Optional[tuple[int, int]] = None
+        self.total_dx = 0
+        self.total_dy = 0
+        self.reports = 0
+
+    def feed(self, t_us: int, x: int, y: int, absolute: bool, buttons: list[int], virtual_desktop: bool = False) -> list[dict]:
+        self.reports += 1
+        if absolute:
+            w, h = self.virtual_size if virtual_desktop else self.screen_size
+            # Same mapping Windows applies to absolute input (see display.denormalize_point)
+            pos = (x * w // ABSOLUTE_SPAN, y * h // ABSOLUTE_SPAN)
+            prev = self._abs_pos
+            self._abs_pos = pos
+            dx, dy = (pos[0] - prev[0], pos[1] - prev[1]) if prev is not None else (0, 0)
+        else:
+            dx, dy = x, y
+        out = []
+        if dx or dy:
+            self.total_dx += dx
+            self.total_dy += dy
+            out.append({"t_us": t_us, "type": "move", "dx": dx, "dy": dy})
+        for flag in buttons:
+            out.append({"t_us": t_us, "type": "button", "flag": flag})
+        return out
+
+    def feed_rawmouse(self, t_us: int, rm: RAWMOUSE) -> list[dict]:
+        x, y, absolute, buttons = decode_rawmouse(rm)
+        return self.feed(t_us, x, y, absolute, buttons, bool(rm.usFlags & MOUSE_VIRTUAL_DESKTOP))
+
+
+def _user32():
+    user32 = _window_user32()
+    user32.GetRawInputData.argtypes = [
+        wintypes.HANDLE, wintypes.UINT, wintypes.LPVOID, ctypes.POINTER(wintypes.UINT), wintypes.UINT,
+    ]
+    user32.GetRawInputData.restype = wintypes.UINT
+    return user32
+
+
+class RawMouseCapture:
+    """
+    Registers for mouse Raw Input on a message-only window owned by a dedicated
+    thread and calls on_events(list[dict]) for every WM_INPUT report, with
+    t_us measured from start_ns. RIDEV_INPUTSINK keeps input flowing while
+    another window has focus.
+    """
+
+    _CLASS_NAME = "InputHogRawInput"
+
+    def __init__(self, start_ns: int, on_events: Callable[[list[dict]], None]) -> None:
+        self._start_ns = start_ns
+        self._on_events = on_events
+        self._thread: Optional[threading.Thread] = None
+        self._thread_id = 0
+        self._ready = threading.Event()
+        self._error = 0
+        self._wndproc = None
+        self._accumulator: Optional[DeltaAccumulator] = None
+        self._display = None
+        self._topology = None
+
+    @staticmethod
+    def is_available() -> bool:
+        return HAS_RAW_INPUT
+
+    def start(self) -> None:
+        """Start the capture thread. Raises OSError if registration fails."""
+        if not HAS_RAW_INPUT:
+            raise OSError("Raw Input is only available on Windows")
+        self._ready.clear()
+        self._error = 0
+        self._thread = threading.Thread(target=self._run, name="inputhog-rawinput", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            self._thread.join()
+            self._thread = None
+            raise OSError(self._error, f"Raw Input registration failed (Win32 error {self._error})")
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        self._thread.join()
+        self._thread = None
+
+    def _wnd_proc(self, hwnd, msg, wparam, lparam):
+        if msg == WM_INPUT:
+            t_us = (time.perf_counter_ns() - self._start_ns) // 1000
+            raw = RAWINPUT_MOUSE()
+            size = wintypes.UINT(ctypes.sizeof(raw))
+            got = self._user32.GetRawInputData(
+                lparam, RID_INPUT, ctypes.byref(raw), ctypes.byref(size), ctypes.sizeof(RAWINPUTHEADER)
+            )
+            if got != 0xFFFFFFFF and raw.header.dwType == RIM_TYPEMOUSE:
+                self._sync_display()
+                events = self._accumulator.feed_rawmouse(t_us, raw.mouse)
+                if events:
+                    self._on_events(events)
+        return self._user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+
+    def _sync_display(self) -> None:
+        """Rescale absolute reports if the display layout changed (cheap when it has not)."""
+        topology = self._display.topology()
+        if topology is not self._topology:
+            self._topology = topology
+            self._accumulator.screen_size = self._display.screen_size()
+            self._accumulator.virtual_size = (topology.virtual.width, topology.virtual.height)
+
+    def _run(self) -> None:
+        user32 = self._user32 = _user32()
+        kernel32 = ctypes.windll.kernel32
+        self._thread_id = kernel32.GetCurrentThreadId()
+        from display import get_display_service
+        self._display = get_display_service()
+        self._accumulator = DeltaAccumulator((0, 0))
+        self._sync_display()
+        hinst = kernel32.GetModuleHandleW(None)
+        self._wndproc = WNDPROC(self._wnd_proc)
+        wc = WNDCLASSW()
+        wc.lpfnWndProc = ctypes.cast(self._wndproc, ctypes.c_void_p)
+        wc.hInstance = hinst
+        wc.lpszClassName = self._CLASS_NAME
+        user32.RegisterClassW(ctypes.byref(wc))  # fails harmlessly if already registered
+        hwnd = user32.CreateWindowExW(0, self._CLASS_NAME, None, 0, 0, 0, 0, 0, HWND_MESSAGE, None, hinst, None)
+        if not hwnd:
+            self._error = kernel32.GetLastError()
+            self._ready.set()
+            return
+        rid = RAWINPUTDEVICE(HID_USAGE_PAGE_GENERIC, HID_USAGE_GENERIC_MOUSE, RIDEV_INPUTSINK, hwnd)
+        if not user32.RegisterRawInputDevices(ctypes.byref(rid), 1, ctypes.sizeof(rid)):
+            self._error = kernel32.GetLastError()
+            user32.DestroyWindow(hwnd)
+            self._ready.set()
+            return
+        self._ready.set()
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+        rid = RAWINPUTDEVICE(HID_USAGE_PAGE_GENERIC, HID_USAGE_GENERIC_MOUSE, RIDEV_REMOVE, None)
+        user32.RegisterRawInputDevices(ctypes.byref(rid), 1, ctypes.sizeof(rid))
+        user32.DestroyWindow(hwnd)
@@ -3,17 +3,24 @@ Record and playback mouse and keyboard input for InputHog.
 Records user mouse movements, clicks, and key presses with timestamps for playback.
 """
 
+import codecs
 import ctypes
+import functools
 import json
 import threading
 import time
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Iterable, Iterator, Optional
 
-from pynput import keyboard, mouse
-from pynput.mouse import Button
+# Vectorized Recording transforms (optional)
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
 
 from client import (
+    INPUT_EVENT_TYPES,
     InputHogClient,
     MOUSE_LEFT_BUTTON_DOWN,
     MOUSE_LEFT_BUTTON_UP,
@@ -22,10 +29,15 @@ from client import (
     MOUSE_MIDDLE_BUTTON_DOWN,
     MOUSE_MIDDLE_BUTTON_UP,
 )
+from display import get_display_service
+from preview import PathLOD, RecorderStats
+from rawinput import RawMouseCapture
+import profiling
+from profiling import profiled, span
 
 KEYEVENTF_KEYUP = 0x0002
 
-# pynput Key enum -> Windows VK code (for keys that lack .vk)
+# pynput Key name -> Windows VK code (for keys that lack .vk)
 # https://learn.microsoft.com/en-us/windows/win32/inputdev/virtual-key-codes
 _KEY_VK_LIST = [
     ("alt", 0x12), ("alt_l", 0xA4), ("alt_r", 0xA5), ("alt_gr", 0xA5),
@@ -48,89 +60,196 @@ _KEY_VK_LIST = [
     ("media_volume_mute", 0xAD), ("media_volume_down", 0xAE), ("media_volume_up", 0xAF),
     ("media_previous", 0xB1), ("media_next", 0xB0),
 ]
-KEY_TO_VK = {}
-for k, v in _KEY_VK_LIST:
-    if hasattr(keyboard.Key, k):
-        KEY_TO_VK[getattr(keyboard.Key, k)] = v
 
-# pynput Button -> driver button flags (from ntddmou.h)
-BUTTON_FLAGS = {
-    Button.left: (MOUSE_LEFT_BUTTON_DOWN, MOUSE_LEFT_BUTTON_UP),
-    Button.right: (MOUSE_RIGHT_BUTTON_DOWN, MOUSE_RIGHT_BUTTON_UP),
-    Button.middle: (MOUSE_MIDDLE_BUTTON_DOWN, MOUSE_MIDDLE_BUTTON_UP),
-}
 
-RECORDING_VERSION = 2  # Added keyboard
+@functools.lru_cache(maxsize=None)
+def _pynput_maps() -> tuple[dict, dict]:
+    """
+    (pynput Key -> VK code, pynput Button -> (down, up) driver flags).
+    pynput is imported here, on first use by MouseRecorder, so playback,
+    the CLI and the other headless modules import without it.
+    """
+    from pynput import keyboard
+    from pynput.mouse import Button
+    key_to_vk = {getattr(keyboard.Key, k): v for k, v in _KEY_VK_LIST if hasattr(keyboard.Key, k)}
+    # Button flags from ntddmou.h
+    button_flags = {
+        Button.left: (MOUSE_LEFT_BUTTON_DOWN, MOUSE_LEFT_BUTTON_UP),
+        Button.right: (MOUSE_RIGHT_BUTTON_DOWN, MOUSE_RIGHT_BUTTON_UP),
+        Button.middle: (MOUSE_MIDDLE_BUTTON_DOWN, MOUSE_MIDDLE_BUTTON_UP),
+    }
+    return key_to_vk, button_flags
+
+RECORDING_VERSION = 3  # Microsecond timestamps ("t_us"); v2 stored whole milliseconds in "t"
+
+# Players sleep until this close to a deadline, then spin for sub-millisecond accuracy
+SPIN_THRESHOLD_NS = 2_000_000
 
+# Default spacing of absolute "anchor" events when the recorder stores them
+ANCHOR_INTERVAL_MS = 250
 
-def _button_to_flag(button: Button, pressed: bool) -> int:
-    if button not in BUTTON_FLAGS:
+# Bytes read per step by iter_recording
+LOAD_CHUNK_SIZE = 64 * 1024
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WS = " \t\n\r"
+
+
+def _button_to_flag(button, pressed: bool) -> int:
+    button_flags = _pynput_maps()[1]
+    if button not in button_flags:
         return 0
-    down, up = BUTTON_FLAGS[button]
+    down, up = button_flags[button]
     return down if pressed else up
 
 
+def upgrade_event(ev: dict) -> dict:
+    """Convert a v1/v2 event (millisecond "t") to v3 ("t_us"). v3 events are returned as is."""
+    if "t_us" in ev:
+        return ev
+    out = {"t_us": int(ev.get("t", 0)) * 1000}
+    out.update((k, v) for k, v in ev.items() if k != "t")
+    return out
+
+
+def sleep_until(deadline_ns: int) -> None:
+    """Block until time.perf_counter_ns() reaches deadline_ns (sleep, then spin the last stretch)."""
+    while True:
+        remaining = deadline_ns - time.perf_counter_ns()
+        if remaining <= 0:
+            return
+        if remaining > SPIN_THRESHOLD_NS:
+            time.sleep((remaining - SPIN_THRESHOLD_NS) / 1e9)
+        else:
+            time.sleep(0)
+
+
 def _key_to_vk(key) -> Optional[int]:
     """Extract virtual key code from pynput key. Returns None if unavailable."""
     if hasattr(key, "vk") and key.vk is not None:
         return int(key.vk)
-    if key in KEY_TO_VK:
-        return KEY_TO_VK[key]
+    key_to_vk = _pynput_maps()[0]
+    if key in key_to_vk:
+        return key_to_vk[key]
     return None
 
 
 class MouseRecorder:
-    """Records mouse movements, clicks, and keyboard input with timestamps for playback."""
+    """
+    Records mouse movements, clicks, and keyboard input with timestamps for playback.
+    With raw_input=True mouse events come from Raw Input (device deltas at the
+    polling rate, see rawinput.py) instead of the pynput hook; if registration
+    fails the hook is used. mouse_source reports which one is active.
+    stats and path are updated as events arrive (see preview.py); read them
+    through get_stats() / get_path_points().
+    With anchor_interval_ms > 0, an {"type": "anchor", "x", "y"} event with the
+    absolute cursor position (virtual-desktop pixels) follows the first move
+    and then at most one move every interval, so playback can cancel drift
+    with a single absolute move (see play_recording).
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, raw_input: bool = False, anchor_interval_ms: float = 0) -> None:
+        self.raw_input = raw_input
+        self.anchor_interval_ms = anchor_interval_ms
+        self._next_anchor_us: Optional[int] = None
+        self.mouse_source = ""
         self._events: list[dict] = []
         self._lock = threading.Lock()
-        self._start_time: float = 0
+        self._start_ns: int = 0
         self._last_pos: tuple[int, int] | None = None
-        self._mouse_listener: Optional[mouse.Listener] = None
-        self._keyboard_listener: Optional[keyboard.Listener] = None
+        self._mouse_listener = None  # pynput mouse.Listener
+        self._keyboard_listener = None  # pynput keyboard.Listener
+        self._raw_capture: Optional[RawMouseCapture] = None
+        self.stats = RecorderStats()
+        self.path = PathLOD()
+
+    def _add(self, ev: dict) -> None:
+        """Append one event; caller holds self._lock."""
+        self._events.append(ev)
+        self.stats.add(ev)
+        if ev["type"] == "move":
+            self.path.add_move(ev["dx"], ev["dy"])
+
+    def _maybe_anchor(self, t_us: int, pos: Optional[tuple[int, int]] = None) -> None:
+        """Add an anchor after a move if one is due; caller holds self._lock."""
+        if self.anchor_interval_ms <= 0:
+            return
+        if self._next_anchor_us is not None and t_us < self._next_anchor_us:
+            return
+        x, y = pos if pos is not None else get_display_service().cursor_pos()
+        self._add({"t_us": t_us, "type": "anchor", "x": x, "y": y})
+        self._next_anchor_us = t_us + int(self.anchor_interval_ms * 1000)
 
     def start(self) -> None:
         """Start recording. Stops any existing recording."""
+        from pynput import keyboard, mouse
+        _pynput_maps()
         self._events = []
-        self._start_time = time.perf_counter()
+        self.stats = RecorderStats()
+        self.path = PathLOD()
+        self._start_ns = time.perf_counter_ns()
         self._last_pos = None
+        self._next_anchor_us = None
 
         def on_move(x: int, y: int) -> None:
             if self._last_pos is not None:
                 dx = x - self._last_pos[0]
                 dy = y - self._last_pos[1]
                 if dx != 0 or dy != 0:
-                    t_ms = int((time.perf_counter() - self._start_time) * 1000)
+                    t_us = (time.perf_counter_ns() - self._start_ns) // 1000
                     with self._lock:
-                        self._events.append({"t": t_ms, "type": "move", "dx": dx, "dy": dy})
+                        self._add({"t_us": t_us, "type": "move", "dx": dx, "dy": dy})
+                        self._maybe_anchor(t_us, (x, y))
             self._last_pos = (x, y)
 
-        def on_click(x: int, y: int, button: Button, pressed: bool) -> None:
+        def on_click(x: int, y: int, button, pressed: bool) -> None:
             self._last_pos = (x, y)
             flag = _button_to_flag(button, pressed)
             if flag != 0:
-                t_ms = int((time.perf_counter() - self._start_time) * 1000)
+                t_us = (time.perf_counter_ns() - self._start_ns) // 1000
                 with self._lock:
-                    self._events.append({"t": t_ms, "type": "button", "flag": flag})
+                    self._add({"t_us": t_us, "type": "button", "flag": flag})
 
         def on_key_press(key) -> None:
             vk = _key_to_vk(key)
             if vk is not None:
-                t_ms = int((time.perf_counter() - self._start_time) * 1000)
+                t_us = (time.perf_counter_ns() - self._start_ns) // 1000
                 with self._lock:
-                    self._events.append({"t": t_ms, "type": "key", "vk": vk, "pressed": True})
+                    self._add({"t_us": t_us, "type": "key", "vk": vk, "pressed": True})
 
         def on_key_release(key) -> None:
             vk = _key_to_vk(key)
             if vk is not None:
-                t_ms = int((time.perf_counter() - self._start_time) * 1000)
+                t_us = (time.perf_counter_ns() - self._start_ns) // 1000
                 with self._lock:
-                    self._events.append({"t": t_ms, "type": "key", "vk": vk, "pressed": False})
-
-        self._mouse_listener = mouse.Listener(on_move=on_move, on_click=on_click)
-        self._keyboard_listener = keyboard.Listener(on_press=on_key_press, on_release=on_key_release)
-        self._mouse_listener.start()
+                    self._add({"t_us": t_us, "type": "key", "vk": vk, "pressed": False})
+
+        def on_raw_events(events: list[dict]) -> None:
+            with self._lock:
+                for ev in events:
+                    self._add(ev)
+                if any(ev["type"] == "move" for ev in events):
+                    self._maybe_anchor(events[-1]["t_us"])
+
+        self._raw_capture = None
+        if self.raw_input and RawMouseCapture.is_available():
+            capture = RawMouseCapture(self._start_ns, profiling.spanned("recorder.on_raw_input", on_raw_events))
+            try:
+                capture.start()
+                self._raw_capture = capture
+            except OSError:
+                pass
+        if self._raw_capture is None:
+            self._mouse_listener = mouse.Listener(
+                on_move=profiling.spanned("recorder.on_move", on_move),
+                on_click=profiling.spanned("recorder.on_click", on_click),
+            )
+            self._mouse_listener.start()
+        self.mouse_source = "raw" if self._raw_capture is not None else "hook"
+        self._keyboard_listener = keyboard.Listener(
+            on_press=profiling.spanned("recorder.on_key_press", on_key_press),
+            on_release=profiling.spanned("recorder.on_key_release", on_key_release),
+        )
         self._keyboard_listener.start()
 
     def stop(self) -> list[dict]:
@@ -138,29 +257,341 @@ class MouseRecorder:
         if self._mouse_listener is not None:
             self._mouse_listener.stop()
             self._mouse_listener = None
+        if self._raw_capture is not None:
+            self._raw_capture.stop()
+            self._raw_capture = None
         if self._keyboard_listener is not None:
             self._keyboard_listener.stop()
             self._keyboard_listener = None
         with self._lock:
-            out = sorted(self._events, key=lambda e: e.get("t", 0))
+            out = sorted(self._events, key=lambda e: e.get("t_us", 0))
+        profiling.flush_async("record")  # stop() runs on the Tk thread
         return out
 
     def get_event_count(self) -> int:
         return len(self._events)
 
+    def get_stats(self) -> dict:
+        """Live counters (see RecorderStats.snapshot); rate is over the last second."""
+        now_us = (time.perf_counter_ns() - self._start_ns) // 1000
+        with self._lock:
+            return self.stats.snapshot(now_us)
+
+    def get_path_points(self) -> tuple[list[tuple[int, int]], tuple[int, int, int, int]]:
+        """Decimated path recorded so far and its bounding box."""
+        with self._lock:
+            return self.path.points(), self.path.bbox
+
 
-def save_recording(events: list[dict], path: Path) -> None:
-    """Save recording to a JSON file."""
-    data = {"version": RECORDING_VERSION, "events": events}
+def save_recording(events: list[dict], path: Path, mouse_source: str = "") -> None:
+    """Save recording to a JSON file. mouse_source ("raw" / "hook", see MouseRecorder) goes in the header."""
+    data: dict = {"version": RECORDING_VERSION}
+    if mouse_source:
+        data["mouse_source"] = mouse_source
+    data["events"] = events
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2)
 
 
 def load_recording(path: Path) -> list[dict]:
-    """Load recording from a JSON file. Returns list of events."""
+    """Load recording from a JSON file. Returns list of v3 events (older files are upgraded)."""
     with open(path, encoding="utf-8") as f:
         data = json.load(f)
-    return data.get("events", [])
+    return [upgrade_event(ev) for ev in data.get("events", [])]
+
+
+def read_header(path: Path, limit: int = 4096) -> dict:
+    """
+    Top-level keys saved before "events" (version, mouse_source) without
+    parsing the events. {} for archives and files it cannot read.
+    """
+    if path.suffix == ".ihar":
+        return {}
+    try:
+        with open(path, "rb") as f:
+            head = f.read(limit).decode("utf-8", errors="ignore")
+        idx = head.find('"events"')
+        if idx < 0:
+            return {}
+        data = json.loads(head[:idx] + '"events": []}')
+    except (OSError, ValueError):
+        return {}
+    data.pop("events", None)
+    return data
+
+
+def iter_recording(
+    path: Path,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    chunk_size: int = LOAD_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """
+    Incrementally load a recording, yielding events as they are parsed.
+    Reads the file in chunks and decodes one event object at a time from the
+    "events" array, so playback can start before the whole file is read.
+    on_progress(bytes_read, total_bytes) is called after each chunk.
+    Events are upgraded to v3 ("t_us") as they are yielded.
+    Files without an "events" array fall back to a full json.loads.
+    .ihar archives are streamed chunk by chunk (see archive.py).
+    """
+    if path.suffix == ".ihar":
+        from archive import iter_archive  # archive imports this module
+        yield from iter_archive(path, on_progress)
+        return
+    total = path.stat().st_size
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        buf = ""
+        pos = 0
+        bytes_read = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buf, pos, bytes_read, eof
+            if eof:
+                return False
+            chunk = f.read(chunk_size)
+            bytes_read += len(chunk)
+            if not chunk:
+                eof = True
+                buf = buf[pos:] + decoder.decode(b"", final=True)
+            else:
+                buf = buf[pos:] + decoder.decode(chunk)
+            pos = 0
+            if on_progress:
+                on_progress(bytes_read, total)
+            return True
+
+        def skip_ws() -> bool:
+            """Advance past whitespace; False if the file ended first."""
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _JSON_WS:
+                    pos += 1
+                if pos < len(buf):
+                    return True
+                if not fill():
+                    return False
+
+        # Header: find the start of the "events" array
+        key = '"events"'
+        while True:
+            idx = buf.find(key, pos)
+            if idx >= 0:
+                pos = idx + len(key)
+                break
+            if not fill():
+                data = json.loads(buf) if buf.strip() else {}
+                yield from (upgrade_event(ev) for ev in data.get("events", []))
+                return
+        for expected in (":", "["):
+            if not skip_ws() or buf[pos] != expected:
+                raise ValueError(f"Malformed recording: expected '{expected}' after \"events\"")
+            pos += 1
+
+        # Body: one event object at a time
+        while True:
+            if not skip_ws():
+                raise ValueError("Malformed recording: unterminated events array")
+            if buf[pos] == "]":
+                return
+            while True:
+                try:
+                    ev, end = _JSON_DECODER.raw_decode(buf, pos)
+                    break
+                except json.JSONDecodeError:
+                    if not fill():
+                        raise
+            pos = end
+            yield upgrade_event(ev)
+            if not skip_ws():
+                raise ValueError("Malformed recording: unterminated events array")
+            if buf[pos] == ",":
+                pos += 1
+            elif buf[pos] != "]":
+                raise ValueError(f"Malformed recording: unexpected {buf[pos]!r} in events array")
+
+
+# Recording.types codes, indexed by event "type"
+EVENT_TYPES = INPUT_EVENT_TYPES
+_TYPE_CODES = {name: i for i, name in enumerate(EVENT_TYPES)}
+_COLUMNS = ("t_us", "type", "dx", "dy", "flag", "vk", "pressed", "x", "y")
+
+
+class Recording:
+    """
+    Columnar view of a recording with vectorized, lazily evaluated transforms.
+    Timestamps and deltas are NumPy arrays; each transform returns a new
+    Recording that records the step, and the steps run only when the columns
+    are needed (save, playback, or array access). Requires numpy.
+    Events of unknown type and extra per-event keys are dropped.
+    """
+
+    def __init__(self, columns: dict, ops: tuple = ()) -> None:
+        if not HAS_NUMPY:
+            raise RuntimeError("numpy is required. Install with: pip install numpy")
+        self._source = columns
+        self._ops = ops
+        self._cache: Optional[dict] = None if ops else columns
+
+    @classmethod
+    def from_events(cls, events: Iterable[dict]) -> "Recording":
+        """Build from a list or stream of event dicts (time order is kept as given)."""
+        rows = [
+            (
+                ev["t_us"],
+                _TYPE_CODES[ev["type"]],
+                ev.get("dx", 0),
+                ev.get("dy", 0),
+                ev.get("flag", 0),
+                ev.get("vk") or 0,
+                bool(ev.get("pressed", True)),
+                ev.get("x", 0),
+                ev.get("y", 0),
+            )
+            for ev in map(upgrade_event, events)
+            if ev.get("type") in _TYPE_CODES
+        ]
+        dtypes = (np.int64, np.uint8, np.int64, np.int64, np.uint16, np.int32, np.bool_, np.int64, np.int64)
+        columns = {
+            name: np.array([r[i] for r in rows], dtype=dtype)
+            for i, (name, dtype) in enumerate(zip(_COLUMNS, dtypes))
+        }
+        return cls(columns)
+
+    @classmethod
+    def load(cls, path: Path) -> "Recording":
+        return cls.from_events(iter_recording(path))
+
+    # --- Transforms (lazy) ---
+
+    def _then(self, op: Callable[[dict], dict]) -> "Recording":
+        return Recording(self._source, self._ops + (op,))
+
+    def scale(self, sx: float, sy: Optional[float] = None) -> "Recording":
+        """
+        Scale move deltas (e.g. for a DPI change). The fractional part is carried
+        into later moves, so the summed path matches the scaled path to within
+        one pixel instead of drifting.
+        """
+        sy = sx if sy is None else sy
+
+        def op(c: dict) -> dict:
+            is_move = c["type"] == _TYPE_CODES["move"]
+            out = dict(c)
+            for axis, factor in (("dx", sx), ("dy", sy)):
+                exact = np.cumsum(c[axis][is_move] * float(factor))
+                emitted = np.rint(exact).astype(np.int64)
+                col = c[axis].copy()
+                col[is_move] = np.diff(emitted, prepend=0)
+                out[axis] = col
+            return out
+
+        return self._then(op)
+
+    def time_warp(self, factor: float = 1.0, offset_us: int = 0) -> "Recording":
+        """Map each timestamp t_us to round(t_us * factor) + offset_us. factor must be > 0."""
+        if factor <= 0:
+            raise ValueError("Time warp factor must be positive.")
+
+        def op(c: dict) -> dict:
+            out = dict(c)
+            out["t_us"] = np.rint(c["t_us"] * float(factor)).astype(np.int64) + int(offset_us)
+            return out
+
+        return self._then(op)
+
+    def trim(self, start_us: int = 0, end_us: Optional[int] = None, rebase: bool = True) -> "Recording":
+        """Keep events with start_us <= t_us < end_us; rebase shifts them to start at 0."""
+
+        def op(c: dict) -> dict:
+            keep = c["t_us"] >= start_us
+            if end_us is not None:
+                keep &= c["t_us"] < end_us
+            out = {name: col[keep] for name, col in c.items()}
+            if rebase:
+                out["t_us"] = out["t_us"] - int(start_us)
+            return out
+
+        return self._then(op)
+
+    def filter_types(self, *types: str) -> "Recording":
+        """Keep only the given event types, e.g. filter_types("move", "button")."""
+        codes = [_TYPE_CODES[name] for name in types]
+
+        def op(c: dict) -> dict:
+            keep = np.isin(c["type"], codes)
+            return {name: col[keep] for name, col in c.items()}
+
+        return self._then(op)
+
+    def concat(self, other: "Recording", gap_us: int = 0) -> "Recording":
+        """Append other after this recording's last event plus gap_us."""
+
+        def op(c: dict) -> dict:
+            tail = other._materialise()
+            offset = (int(c["t_us"][-1]) if len(c["t_us"]) else 0) + int(gap_us)
+            out = {name: np.concatenate([c[name], tail[name]]) for name in _COLUMNS}
+            out["t_us"][len(c["t_us"]):] += offset
+            return out
+
+        return self._then(op)
+
+    # --- Materialisation ---
+
+    def _materialise(self) -> dict:
+        if self._cache is None:
+            columns = self._source
+            for op in self._ops:
+                columns = op(columns)
+            self._cache = columns
+        return self._cache
+
+    def __len__(self) -> int:
+        return len(self._materialise()["t_us"])
+
+    @property
+    def timestamps(self) -> "np.ndarray":
+        """Event times in microseconds."""
+        return self._materialise()["t_us"]
+
+    @property
+    def types(self) -> "np.ndarray":
+        return self._materialise()["type"]
+
+    @property
+    def dx(self) -> "np.ndarray":
+        return self._materialise()["dx"]
+
+    @property
+    def dy(self) -> "np.ndarray":
+        return self._materialise()["dy"]
+
+    def to_events(self) -> list[dict]:
+        """Materialise as the list[dict] format used by save/play."""
+        c = self._materialise()
+        events = []
+        for t, code, dx, dy, flag, vk, pressed, x, y in zip(*(c[name].tolist() for name in _COLUMNS)):
+            ev_type = EVENT_TYPES[code]
+            if ev_type == "move":
+                events.append({"t_us": t, "type": ev_type, "dx": dx, "dy": dy})
+            elif ev_type == "button":
+                events.append({"t_us": t, "type": ev_type, "flag": flag})
+            elif ev_type == "anchor":
+                events.append({"t_us": t, "type": ev_type, "x": x, "y": y})
+            else:
+                events.append({"t_us": t, "type": ev_type, "vk": vk, "pressed": pressed})
+        return events
+
+    def save(self, path: Path) -> None:
+        save_recording(self.to_events(), path)
+
+    def play(
+        self,
+        client: InputHogClient,
+        on_event: Optional[Callable[[dict, bool], None]] = None,
+    ) -> int:
+        return play_recording(client, self.to_events(), on_event)
 
 
 def _inject_key(vk: int, pressed: bool) -> None:
@@ -169,50 +600,71 @@ def _inject_key(vk: int, pressed: bool) -> None:
     ctypes.windll.user32.keybd_event(vk, 0, flags, 0)
 
 
+@profiled("play_recording")
 def play_recording(
     client: InputHogClient,
-    events: list[dict],
+    events: Iterable[dict],
     on_event: Optional[Callable[[dict, bool], None]] = None,
+    cancel: Optional[threading.Event] = None,
 ) -> int:
     """
-    Play a recording: mouse via driver, keyboard via keybd_event.
+    Play a recording: mouse via driver; keyboard via client.key (the driver's
+    KbdClass callback) where the client has one, else keybd_event.
+    events may be a list or a stream such as iter_recording(); each event is
+    scheduled against the playback start, so parse time does not add drift.
+    Setting cancel stops playback before the next event, also mid-gap.
+    "anchor" events snap the cursor to their absolute position through
+    client.move_to; backends without one skip them (reported as played).
     Returns number of successful events.
     """
-    if not events:
-        return 0
-
     success = 0
-    prev_t = 0
+    start_ns = time.perf_counter_ns()
 
     for ev in events:
-        t = ev.get("t", 0)
-        delay_ms = t - prev_t
-        if delay_ms > 0:
-            time.sleep(delay_ms / 1000.0)
-        prev_t = t
-
-        ev_type = ev.get("type", "")
-        ok = False
-
-        if ev_type == "move":
-            dx = ev.get("dx", 0)
-            dy = ev.get("dy", 0)
-            ok = client.move_mouse(dx, dy)
-        elif ev_type == "button":
-            flag = ev.get("flag", 0)
-            ok = client.mouse_input(flag, 0, 0)
-        elif ev_type == "key":
-            vk = ev.get("vk")
-            if vk is not None:
-                try:
-                    _inject_key(int(vk), ev.get("pressed", True))
-                    ok = True
-                except Exception:
-                    ok = False
+        deadline = start_ns + ev.get("t_us", 0) * 1000
+        with span("sleep"):
+            if cancel is not None:
+                coarse_ns = deadline - time.perf_counter_ns() - SPIN_THRESHOLD_NS
+                if cancel.wait(coarse_ns / 1e9 if coarse_ns > 0 else 0):
+                    break
+            sleep_until(deadline)
+
+        with span("dispatch"):
+            ev_type = ev.get("type", "")
+            ok = False
+
+            if ev_type == "move":
+                dx = ev.get("dx", 0)
+                dy = ev.get("dy", 0)
+                with span("ioctl"):
+                    ok = client.move_mouse(dx, dy)
+            elif ev_type == "button":
+                flag = ev.get("flag", 0)
+                with span("ioctl"):
+                    ok = client.mouse_input(flag, 0, 0)
+            elif ev_type == "anchor":
+                if hasattr(client, "move_to"):
+                    with span("ioctl"):
+                        ok = client.move_to(ev.get("x", 0), ev.get("y", 0))
+                else:
+                    ok = True  # a hint only; relative moves still play (as in timeline.py)
+            elif ev_type == "key":
+                vk = ev.get("vk")
+                if vk is not None and hasattr(client, "key"):
+                    with span("ioctl"):
+                        ok = client.key(int(vk), ev.get("pressed", True))
+                elif vk is not None:
+                    try:
+                        with span("keybd_event"):
+                            _inject_key(int(vk), ev.get("pressed", True))
+                        ok = True
+                    except Exception:
+                        ok = False
 
         if ok:
             success += 1
         if on_event:
-            on_event(ev, ok)
+            with span("on_event"):
+                on_event(ev, ok)
 
     return success
@@ -0,0 +1,307 @@
+"""
+Shared-memory ring transport between the controller and the driver.
+The ring is an INPUT_HOG_RING_HEADER followed by capacity MOUSE_INPUT_REQUEST
+slots (see shared/ioctl.h). The controller is the single producer and writes
+slots through a memoryview; the driver is the single consumer and drains the
+ring on IOCTL_INPUT_HOG_RING_DOORBELL, writing its status counters back into
+the header. RingConsumer mirrors the driver side so the protocol can run
+against a plain mmap without the driver.
+"""
+
+import ctypes
+import mmap
+import struct
+import threading
+from typing import Callable, Optional
+
+from client import (
+    INPUT_HOG_RING_HEADER,
+    INPUT_HOG_RING_MAGIC,
+    InputHogClient,
+    MOUSE_INPUT_REQUEST,
+)
+
+HEADER_SIZE = ctypes.sizeof(INPUT_HOG_RING_HEADER)
+SLOT_SIZE = ctypes.sizeof(MOUSE_INPUT_REQUEST)
+MAX_CAPACITY = 65536  # INPUT_HOG_RING_MAX_CAPACITY
+
+_U32 = struct.Struct("<I")
+_I32 = struct.Struct("<i")
+_SLOT = struct.Struct("<Hii")  # buttonFlags, x, y
+_OFF_MAGIC = INPUT_HOG_RING_HEADER.magic.offset
+_OFF_CAPACITY = INPUT_HOG_RING_HEADER.capacity.offset
+_OFF_HEAD = INPUT_HOG_RING_HEADER.head.offset
+_OFF_TAIL = INPUT_HOG_RING_HEADER.tail.offset
+_OFF_CONSUMED = INPUT_HOG_RING_HEADER.consumed.offset
+_OFF_FAILED = INPUT_HOG_RING_HEADER.failed.offset
+_OFF_LAST_STATUS = INPUT_HOG_RING_HEADER.lastInjectStatus.offset
+_INDEX_MASK = 0xFFFFFFFF  # head/tail are free-running 32-bit counters
+
+
+def ring_size(capacity: int) -> int:
+    """Bytes needed for a ring with capacity slots."""
+    return HEADER_SIZE + capacity * SLOT_SIZE
+
+
+def init_ring(buf, capacity: int) -> None:
+    """Write an empty ring header into buf. capacity must be a power of two."""
+    if capacity <= 0 or capacity > MAX_CAPACITY or capacity & (capacity - 1):
+        raise ValueError("Ring capacity must be a power of two up to 65536.")
+    mv = memoryview(buf).cast("B")
+    if len(mv) < ring_size(capacity):
+        raise ValueError("Buffer too small for ring capacity.")
+    mv[:HEADER_SIZE] = bytes(HEADER_SIZE)
+    _U32.pack_into(mv, _OFF_MAGIC, INPUT_HOG_RING_MAGIC)
+    _U32.pack_into(mv, _OFF_CAPACITY, capacity)
+
+
+def create_mmap_ring(capacity: int) -> mmap.mmap:
+    """Anonymous, page-aligned mapping holding an empty ring."""
+    mm = mmap.mmap(-1, ring_size(capacity))
+    init_ring(mm, capacity)
+    return mm
+
+
+def _validated_capacity(mv: memoryview) -> int:
+    if _U32.unpack_from(mv, _OFF_MAGIC)[0] != INPUT_HOG_RING_MAGIC:
+        raise ValueError("Not an InputHog ring (bad magic).")
+    capacity = _U32.unpack_from(mv, _OFF_CAPACITY)[0]
+    if capacity == 0 or capacity > MAX_CAPACITY or capacity & (capacity - 1) or len(mv) < ring_size(capacity):
+        raise ValueError("Invalid ring capacity.")
+    return capacity
+
+
+class RingProducer:
+    """Controller side: writes slots and publishes them by advancing head."""
+
+    def __init__(self, buf) -> None:
+        self._mv = memoryview(buf).cast("B")
+        self.capacity = _validated_capacity(self._mv)
+        self._mask = self.capacity - 1
+
+    @property
+    def head(self) -> int:
+        return _U32.unpack_from(self._mv, _OFF_HEAD)[0]
+
+    @property
+    def tail(self) -> int:
+        return _U32.unpack_from(self._mv, _OFF_TAIL)[0]
+
+    def pending(self) -> int:
+        """Slots published but not yet consumed."""
+        return (self.head - self.tail) & _INDEX_MASK
+
+    def free(self) -> int:
+        return self.capacity - self.pending()
+
+    def push(self, button_flags: int, x: int, y: int) -> bool:
+        """Write one slot. Returns False if the ring is full."""
+        return self.push_many([(button_flags, x, y)]) == 1
+
+    def push_many(self, events) -> int:
+        """
+        Write as many (button_flags, x, y) events as fit, then publish them
+        with a single head update. Returns how many were written.
+        """
+        head = self.head
+        room = self.capacity - ((head - self.tail) & _INDEX_MASK)
+        n = 0
+        for flags, x, y in events:
+            if n == room:
+                break
+            _SLOT.pack_into(self._mv, HEADER_SIZE + ((head + n) & self._mask) * SLOT_SIZE, flags, x, y)
+            n += 1
+        if n:
+            # Slots are written before head moves, so the consumer never sees a partial slot
+            _U32.pack_into(self._mv, _OFF_HEAD, (head + n) & _INDEX_MASK)
+        return n
+
+    def status(self) -> dict:
+        """Counters the consumer writes back through the mapping."""
+        return {
+            "pending": self.pending(),
+            "consumed": _U32.unpack_from(self._mv, _OFF_CONSUMED)[0],
+            "failed": _U32.unpack_from(self._mv, _OFF_FAILED)[0],
+            "last_inject_status": _I32.unpack_from(self._mv, _OFF_LAST_STATUS)[0],
+        }
+
+
+class RingConsumer:
+    """
+    Driver side of the protocol (mirrors RingDrain in driver/ring.c).
+    Capacity and tail are private copies taken at map time; the shared
+    header is not trusted after that.
+    """
+
+    def __init__(self, buf) -> None:
+        self._mv = memoryview(buf).cast("B")
+        self.capacity = _validated_capacity(self._mv)
+        self._mask = self.capacity - 1
+        self._tail = _U32.unpack_from(self._mv, _OFF_TAIL)[0]
+
+    def drain(self, inject: Callable[[int, int, int], int]) -> int:
+        """
+        Consume every published slot through inject(flags, x, y) -> NTSTATUS
+        (negative = failure). Returns how many slots were consumed.
+        Raises ValueError if the producer index is corrupt.
+        """
+        head = _U32.unpack_from(self._mv, _OFF_HEAD)[0]
+        if (head - self._tail) & _INDEX_MASK > self.capacity:
+            raise ValueError("Ring head is out of range.")
+        consumed = _U32.unpack_from(self._mv, _OFF_CONSUMED)[0]
+        failed = _U32.unpack_from(self._mv, _OFF_FAILED)[0]
+        n = 0
+        while self._tail != head:
+            flags, x, y = _SLOT.unpack_from(self._mv, HEADER_SIZE + (self._tail & self._mask) * SLOT_SIZE)
+            status = inject(flags, x, y)
+            _I32.pack_into(self._mv, _OFF_LAST_STATUS, status)
+            if status < 0:
+                failed = (failed + 1) & _INDEX_MASK
+            consumed = (consumed + 1) & _INDEX_MASK
+            self._tail = (self._tail + 1) & _INDEX_MASK
+            n += 1
+        _U32.pack_into(self._mv, _OFF_CONSUMED, consumed)
+        _U32.pack_into(self._mv, _OFF_FAILED, failed)
+        _U32.pack_into(self._mv, _OFF_TAIL, self._tail)
+        return n
+
+
+class _LoopbackDriver:
+    """Driver-wide state behind LoopbackRingDevice handles (driver/ring.c globals, driver.c counters)."""
+
+    def __init__(self) -> None:
+        self.consumer: Optional[RingConsumer] = None
+        self.owner: Optional["LoopbackRingDevice"] = None
+        self.total_requests = 0
+        self.failed_requests = 0
+
+
+class LoopbackRingDevice:
+    """
+    Stand-in for the driver's ring IOCTLs on one handle: map_ring wraps the
+    memory in a RingConsumer and ring_doorbell drains it into
+    backend.mouse_input. Pass share_with=another device to model a second
+    handle (process) on the same driver: while one handle has a ring mapped,
+    map_ring on the others fails with ERROR_BUSY, and only the owner may
+    ring the doorbell.
+    """
+
+    STATUS_UNSUCCESSFUL = -0x3FFFFFFF  # 0xC0000001 as a signed NTSTATUS
+    ERROR_NOT_READY = 21  # STATUS_DEVICE_NOT_READY
+    ERROR_BUSY = 170  # STATUS_DEVICE_BUSY
+    ERROR_INVALID_PARAMETER = 87
+
+    def __init__(self, backend, share_with: Optional["LoopbackRingDevice"] = None) -> None:
+        self._backend = backend
+        self._driver = share_with._driver if share_with is not None else _LoopbackDriver()
+        self._last_error = 0
+
+    def get_last_error(self) -> int:
+        return self._last_error
+
+    def _done(self, error: int) -> bool:
+        self._last_error = error
+        return error == 0
+
+    def map_ring(self, address: int, size: int) -> bool:
+        driver = self._driver
+        if driver.consumer is not None and driver.owner is not self:
+            return self._done(self.ERROR_BUSY)
+        try:
+            consumer = RingConsumer((ctypes.c_char * size).from_address(address))
+        except ValueError:
+            return self._done(self.ERROR_INVALID_PARAMETER)
+        driver.consumer, driver.owner = consumer, self
+        return self._done(0)
+
+    def unmap_ring(self) -> bool:
+        if self._driver.owner is self:
+            self._driver.consumer = self._driver.owner = None
+        return self._done(0)
+
+    def ring_doorbell(self) -> bool:
+        driver = self._driver
+        if driver.consumer is None or driver.owner is not self:
+            return self._done(self.ERROR_NOT_READY)
+        failed = 0
+
+        def inject(flags: int, x: int, y: int) -> int:
+            nonlocal failed
+            if self._backend.mouse_input(flags, x, y):
+                return 0
+            failed += 1
+            return self.STATUS_UNSUCCESSFUL
+
+        driver.total_requests += driver.consumer.drain(inject)
+        driver.failed_requests += failed
+        return self._done(0)
+
+    def get_status(self) -> dict:
+        """The driver counters the doorbell updates (total_requests / failed_requests)."""
+        return {"total_requests": self._driver.total_requests, "failed_requests": self._driver.failed_requests}
+
+
+class RingTransport:
+    """
+    Input backend (move_mouse/mouse_input) that writes events into a ring
+    mapped by the driver and rings the doorbell once per submission.
+    device defaults to a dedicated InputHogClient with no handle pool: the
+    driver ties the mapping to one handle, so every thread must use it.
+    """
+
+    def __init__(self, device=None, capacity: int = 1024) -> None:
+        self._device = device if device is not None else InputHogClient(pool_size=0)
+        self._owns_device = device is None
+        self._mm = create_mmap_ring(capacity)
+        self._producer = RingProducer(self._mm)
+        self._lock = threading.Lock()  # single producer
+        self._mapped = False
+
+    def open(self) -> bool:
+        if self._owns_device and not self._device.open():
+            return False
+        anchor = ctypes.c_char.from_buffer(self._mm)
+        address = ctypes.addressof(anchor)
+        del anchor  # release the buffer export so the mmap can close later
+        self._mapped = self._device.map_ring(address, len(self._mm))
+        return self._mapped
+
+    def close(self) -> None:
+        if self._mapped:
+            self._device.unmap_ring()
+            self._mapped = False
+        if self._owns_device:
+            self._device.close()
+        self._producer = None
+        self._mm.close()
+
+    def get_last_error(self) -> int:
+        return self._device.get_last_error()
+
+    def submit(self, events) -> int:
+        """Send (button_flags, x, y) events, ringing the doorbell whenever the ring fills."""
+        with self._lock:
+            return self._submit_locked(list(events))
+
+    def _submit_locked(self, events: list) -> int:
+        sent = 0
+        while sent < len(events):
+            n = self._producer.push_many(events[sent:])
+            sent += n
+            if not self._device.ring_doorbell():
+                return sent - self._producer.pending()
+            if n == 0 and self._producer.free() == 0:
+                break  # consumer made no progress
+        return sent
+
+    def move_mouse(self, x: int, y: int) -> bool:
+        return self.mouse_input(0, x, y)
+
+    def mouse_input(self, button_flags: int, x: int, y: int) -> bool:
+        """True if the event was consumed and injected without a failure."""
+        with self._lock:
+            failed = self._producer.status()["failed"]
+            return self._submit_locked([(button_flags, x, y)]) == 1 and self._producer.status()["failed"] == failed
+
+    def get_ring_status(self) -> dict:
+        return self._producer.status()
@@ -0,0 +1,259 @@
+"""
+Saturation stress test: find the injection rate a backend can sustain.
+Ramps the event rate step by step against the current backend. At each step
+it records client-side call latency, send lateness and failures, and samples
+get_status() (failed_requests, last_inject_status) before and after. The
+knee is the first step where failures, latency or falling behind the target
+rate cross their thresholds; the step before it is the sustainable rate.
+
+SaturatingBackend simulates a driver whose downstream queue drains at a fixed
+rate, on a virtual clock, so the ramp/knee logic runs instantly on any OS.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+from fidelity import percentile
+from recording import sleep_until
+
+STATUS_INSUFFICIENT_RESOURCES = -1073741670  # 0xC000009A as a signed NTSTATUS
+
+DEFAULT_START_HZ = 250
+DEFAULT_MAX_HZ = 64000
+DEFAULT_FACTOR = 2.0
+DEFAULT_STEP_S = 1.0
+MAX_FAIL_RATIO = 0.001  # more failed injections than this = saturated
+LATENCY_FACTOR = 3.0  # p99 call latency this many times the first step's = saturated
+LATENCY_FLOOR_US = 50  # ...and at least this much above it (ignore noise on fast calls)
+MIN_ACHIEVED_RATIO = 0.95  # achieved rate below this share of the target = falling behind
+
+
+def ramp_rates(start_hz: float, max_hz: float, factor: float = DEFAULT_FACTOR) -> list[float]:
+    rates = []
+    rate = start_hz
+    while rate <= max_hz:
+        rates.append(rate)
+        rate *= factor
+    return rates
+
+
+def _status_counters(backend) -> tuple[Optional[int], Optional[int]]:
+    status = backend.get_status() if hasattr(backend, "get_status") else None
+    if not status:
+        return None, None
+    return status.get("failed_requests"), status.get("last_inject_status")
+
+
+def run_step(
+    backend,
+    rate_hz: float,
+    duration_s: float,
+    clock_ns: Callable[[], int] = time.perf_counter_ns,
+    wait_until: Callable[[int], None] = sleep_until,
+    cancel: Optional[threading.Event] = None,
+) -> dict:
+    """
+    Send (+1, 0) / (-1, 0) moves (cursor stays put) at rate_hz for duration_s,
+    scheduled against absolute deadlines. Returns the step's measurements.
+    """
+    failed_before, _ = _status_counters(backend)
+    interval_ns = int(1e9 / rate_hz)
+    count = max(1, int(rate_hz * duration_s))
+    latencies: list[float] = []
+    lateness: list[float] = []
+    client_failed = 0
+    start = clock_ns()
+    give_up = start + int(2 * duration_s * 1e9)  # a saturated step would otherwise run for ages
+    sent = 0
+    for i in range(count):
+        if (cancel is not None and cancel.is_set()) or clock_ns() > give_up:
+            break
+        deadline = start + i * interval_ns
+        wait_until(deadline)
+        t0 = clock_ns()
+        ok = backend.move_mouse(1 if i % 2 == 0 else -1, 0)
+        t1 = clock_ns()
+        sent += 1
+        latencies.append((t1 - t0) / 1000)
+        lateness.append((t0 - deadline) / 1000)
+        if not ok:
+            client_failed += 1
+    elapsed_s = max(clock_ns() - start, 1) / 1e9
+    failed_after, last_status = _status_counters(backend)
+    driver_failed = failed_after - failed_before if failed_after is not None and failed_before is not None else None
+    latencies.sort()
+    lateness.sort()
+    return {
+        "target_hz": rate_hz,
+        "achieved_hz": round(sent / elapsed_s, 1),
+        "sent": sent,
+        "client_failed": client_failed,
+        "driver_failed": driver_failed,
+        "last_inject_status": last_status,
+        "latency_p50_us": round(percentile(latencies, 50) or 0, 1),
+        "latency_p99_us": round(percentile(latencies, 99) or 0, 1),
+        "lateness_max_us": round(lateness[-1] if lateness else 0, 1),
+    }
+
+
+def saturation_reason(step: dict, baseline: Optional[dict]) -> Optional[str]:
+    """Why this step counts as saturated (None if it is fine)."""
+    failed = max(step["client_failed"], step["driver_failed"] or 0)
+    if step["sent"] and failed / step["sent"] > MAX_FAIL_RATIO:
+        return f"{failed}/{step['sent']} injections failed"
+    if step["achieved_hz"] < step["target_hz"] * MIN_ACHIEVED_RATIO:
+        return f"achieved {step['achieved_hz']:.0f}/s of {step['target_hz']:.0f}/s"
+    if baseline is not None:
+        base = baseline["latency_p99_us"]
+        p99 = step["latency_p99_us"]
+        if p99 > base * LATENCY_FACTOR and p99 > base + LATENCY_FLOOR_US:
+            return f"p99 latency {p99:.0f} us vs {base:.0f} us at {baseline['target_hz']:.0f}/s"
+    return None
+
+
+class StressTest:
+    """
+    Ramp controller. run() steps through rates until the knee is found
+    (plus confirm_steps more, to rule out a one-off spike) or max_hz is
+    reached; stop() from another thread ends it after the current event.
+    Backends exposing a `clock` (SaturatingBackend) run on that clock.
+    """
+
+    def __init__(
+        self,
+        backend,
+        start_hz: float = DEFAULT_START_HZ,
+        max_hz: float = DEFAULT_MAX_HZ,
+        factor: float = DEFAULT_FACTOR,
+        step_s: float = DEFAULT_STEP_S,
+        confirm_steps: int = 1,
+    ) -> None:
+        self.backend = backend
+        self.rates = ramp_rates(start_hz, max_hz, factor)
+        self.step_s = step_s
+        self.confirm_steps = confirm_steps
+        self._cancel = threading.Event()
+        clock = getattr(backend, "clock", None)
+        self._clock_ns = clock.now_ns if clock is not None else time.perf_counter_ns
+        self._wait_until = clock.sleep_until if clock is not None else sleep_until
+
+    def stop(self) -> None:
+        self._cancel.set()
+
+    def run(self, on_step: Optional[Callable[[dict], None]] = None) -> dict:
+        """Returns {"steps", "knee_hz", "sustainable_hz", "reason", "cancelled"}."""
+        self._cancel.clear()
+        steps: list[dict] = []
+        baseline = None
+        knee = None
+        confirmed = 0
+        for rate in self.rates:
+            if self._cancel.is_set():
+                break
+            step = run_step(self.backend, rate, self.step_s, self._clock_ns, self._wait_until, self._cancel)
+            step["saturated"] = saturation_reason(step, baseline)
+            if baseline is None and step["saturated"] is None:
+                baseline = step
+            steps.append(step)
+            if on_step:
+                on_step(step)
+            if step["saturated"]:
+                if knee is None:
+                    knee = step
+                else:
+                    confirmed += 1
+                if confirmed >= self.confirm_steps:
+                    break
+            elif knee is not None:
+                knee = None  # recovered: that was a spike, keep ramping
+                confirmed = 0
+        good = [s for s in steps if not s["saturated"] and (knee is None or s["target_hz"] < knee["target_hz"])]
+        return {
+            "steps": steps,
+            "knee_hz": knee["target_hz"] if knee else None,
+            "sustainable_hz": good[-1]["target_hz"] if good else None,
+            "reason": knee["saturated"] if knee else None,
+            "cancelled": self._cancel.is_set(),
+        }
+
+
+class VirtualClock:
+    """Nanosecond clock that only moves when slept on or advanced."""
+
+    def __init__(self) -> None:
+        self.t_ns = 0
+
+    def now_ns(self) -> int:
+        return self.t_ns
+
+    def advance(self, ns: int) -> None:
+        self.t_ns += ns
+
+    def sleep_until(self, deadline_ns: int) -> None:
+        self.t_ns = max(self.t_ns, deadline_ns)
+
+
+class SaturatingBackend:
+    """
+    Simulated driver path: each call costs call_ns (+ per_queued_ns for every
+    event still queued, modelling lock contention) and enqueues the event into
+    a downstream queue that drains at capacity_hz. Once queue_limit events are
+    waiting, injections fail with STATUS_INSUFFICIENT_RESOURCES.
+    """
+
+    def __init__(
+        self,
+        capacity_hz: float = 8000,
+        queue_limit: int = 64,
+        call_ns: int = 20_000,
+        per_queued_ns: int = 2_000,
+        clock: Optional[VirtualClock] = None,
+    ) -> None:
+        self.capacity_hz = capacity_hz
+        self.queue_limit = queue_limit
+        self.call_ns = call_ns
+        self.per_queued_ns = per_queued_ns
+        self.clock = clock or VirtualClock()
+        self._queued = 0.0
+        self._drained_at = self.clock.now_ns()
+        self._total = 0
+        self._failed = 0
+        self._last_status = 0
+        self._last_error = 0
+
+    def get_last_error(self) -> int:
+        return self._last_error
+
+    def _drain(self) -> None:
+        now = self.clock.now_ns()
+        self._queued = max(0.0, self._queued - (now - self._drained_at) * self.capacity_hz / 1e9)
+        self._drained_at = now
+
+    def mouse_input(self, button_flags: int, x: int, y: int) -> bool:
+        self._drain()
+        self.clock.advance(self.call_ns + int(self._queued) * self.per_queued_ns)
+        self._total += 1
+        if self._queued >= self.queue_limit:
+            self._failed += 1
+            self._last_status = STATUS_INSUFFICIENT_RESOURCES
+            self._last_error = 31  # ERROR_GEN_FAILURE
+            return False
+        self._queued += 1
+        self._last_status = 0
+        self._last_error = 0
+        return True
+
+    def move_mouse(self, x: int, y: int) -> bool:
+        return self.mouse_input(0, x, y)
+
+    def get_status(self) -> dict:
+        return {
+            "version": 0,
+            "injection_initialized": True,
+            "callback_found": True,
+            "last_init_status": 0,
+            "last_inject_status": self._last_status,
+            "total_requests": self._total,
+            "failed_requests": self._failed,
+        }
@@ -0,0 +1,10 @@
+"""
+Shared pytest setup. The controller modules are flat scripts imported by
+name (as app.py and cli.py do), so the controller directory goes on sys.path.
+Everything under tests/ runs without Windows, the driver or pynput.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,73 @@
+"""Acceleration calibration and compensation against a simulated pointer."""
+
+import random
+
+from accel import AccelCurve, InverseLUT, calibrate, compensate_events, magnitude
+from recording import read_header, save_recording
+
+
+def enhance(s: float) -> float:
+    """A made-up piecewise-linear "Enhance pointer precision" curve: gain rises with speed."""
+    if s <= 4:
+        return s
+    if s <= 16:
+        return 4 + (s - 4) * 2
+    return 28 + (s - 16) * 3
+
+
+class Pointer:
+    """Backend whose moves go through a curve per axis, with sub-pixel remainders kept."""
+
+    def __init__(self, curve_x, curve_y) -> None:
+        self.curves = (curve_x, curve_y)
+        self.pos = [0.0, 0.0]
+        self.moves = []
+
+    def move_mouse(self, dx, dy):
+        self.moves.append((dx, dy))
+        m = magnitude(dx, dy)
+        for axis, d in enumerate((dx, dy)):
+            if m:
+                self.pos[axis] += d / m * self.curves[axis](m)
+        return True
+
+    def get_last_error(self):
+        return 0
+
+    def cursor_pos(self):
+        return round(self.pos[0]), round(self.pos[1])
+
+
+def test_calibrate_measures_both_axes():
+    slow_y = Pointer(enhance, lambda s: enhance(s) / 2)
+    curve = calibrate(slow_y, slow_y.cursor_pos, magnitudes=(4, 16), sleep=lambda s: None)
+    assert any(dy for _, dy in slow_y.moves)
+    # One curve from both axes: the median of the X and Y runs
+    for m in (4, 16):
+        assert abs(curve.output(m) - (enhance(m) + enhance(m) / 2) / 2) <= 0.25
+
+
+def test_calibrated_compensation_replays_recorded_path():
+    pointer = Pointer(enhance, enhance)
+    curve = calibrate(pointer, pointer.cursor_pos, magnitudes=range(1, 65), sleep=lambda s: None)
+    rng = random.Random(1)
+    events = [{"t_us": i, "type": "move", "dx": rng.randint(-60, 60), "dy": rng.randint(-60, 60)} for i in range(2000)]
+    replay = Pointer(enhance, enhance)
+    for ev in compensate_events(events, InverseLUT(curve)):
+        replay.move_mouse(ev["dx"], ev["dy"])
+    want = (sum(ev["dx"] for ev in events), sum(ev["dy"] for ev in events))
+    assert abs(replay.pos[0] - want[0]) <= 2 and abs(replay.pos[1] - want[1]) <= 2
+
+
+def test_linear_curve_is_identity():
+    events = [{"t_us": 0, "type": "move", "dx": 7, "dy": -3}, {"t_us": 1, "type": "key", "vk": 65, "pressed": True}]
+    assert list(compensate_events(events, InverseLUT(AccelCurve.linear(1.0)))) == events
+
+
+def test_mouse_source_saved_in_header(tmp_path):
+    path = tmp_path / "raw.json"
+    save_recording([{"t_us": 0, "type": "move", "dx": 1, "dy": 0}], path, mouse_source="raw")
+    assert read_header(path) == {"version": 3, "mouse_source": "raw"}
+    save_recording([], tmp_path / "plain.json")
+    assert read_header(tmp_path / "plain.json") == {"version": 3}
+    assert read_header(tmp_path / "missing.json") == {}
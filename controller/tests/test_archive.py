@@ -0,0 +1,42 @@
+"""Archive round trips, including negative times and events stored as JSON."""
+
+import pytest
+
+from archive import ArchiveReader, decode_chunk, encode_chunk, iter_archive, write_archive
+from test_recording import sample_events
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_round_trip(tmp_path, codec):
+    events = sample_events(5000)
+    path = tmp_path / "a.ihar"
+    assert write_archive(events, path, codec=codec, chunk_us=300_000) == len(events)
+    assert list(iter_archive(path)) == events
+    assert len(ArchiveReader(path).chunks) > 1
+
+
+def test_negative_timestamps_round_trip(tmp_path):
+    events = [dict(ev, t_us=ev["t_us"] - 1_000_000) for ev in sample_events(3000)]
+    path = tmp_path / "neg.ihar"
+    write_archive(events, path, chunk_us=250_000)
+    reader = ArchiveReader(path)
+    assert reader.chunks[0][0] == -1_000_000
+    assert reader.duration_us == events[-1]["t_us"] - events[0]["t_us"]
+    assert list(iter_archive(path)) == events
+
+
+def test_events_that_do_not_fit_a_tag_are_kept_as_json():
+    events = [
+        {"t_us": 0, "type": "key", "vk": None, "pressed": True},
+        {"t_us": 1, "type": "key", "vk": 65, "pressed": None},
+        {"t_us": 2, "type": "button", "flag": -1},
+        {"t_us": 3, "type": "move", "dx": 1.5, "dy": 0},
+        {"t_us": 4, "type": "move", "dx": True, "dy": 0},
+        {"t_us": 5, "type": "move", "dx": 2, "dy": 3},
+    ]
+    assert decode_chunk(encode_chunk(events, 0), 0) == events
+
+
+def test_non_integer_time_is_rejected():
+    with pytest.raises(ValueError, match="t_us must be an integer"):
+        encode_chunk([{"t_us": 1.5, "type": "move", "dx": 1, "dy": 0}], 0)
@@ -0,0 +1,35 @@
+"""Catalog summaries: counts, duration and the sliding-window peak rate."""
+
+import random
+
+from catalog import RATE_WINDOW_US, Catalog, summarize
+from recording import save_recording
+
+
+def brute_force_peak(times: list[int]) -> int:
+    return max(sum(1 for u in times if t <= u < t + RATE_WINDOW_US) for t in times)
+
+
+def test_summarize_peak_rate_matches_brute_force(tmp_path):
+    rng = random.Random(7)
+    t, events = 0, []
+    for i in range(600):
+        t += rng.choice((0, 1_000, 20_000, 400_000))  # bursts, equal stamps and pauses
+        events.append({"t_us": t, "type": "move", "dx": 1, "dy": -1} if i % 4 else {"t_us": t, "type": "key", "vk": 65, "pressed": True})
+    path = tmp_path / "r.json"
+    save_recording(events, path)
+    s = summarize(path)
+    assert s["peak_rate"] == brute_force_peak([ev["t_us"] for ev in events]) * 1_000_000 / RATE_WINDOW_US
+    assert (s["events"], s["moves"], s["keys"]) == (600, 450, 150)
+    assert s["duration_us"] == t - events[0]["t_us"]
+    assert (s["max_x"], s["min_y"]) == (450, -450)
+
+
+def test_unreadable_recording_is_kept_with_error(tmp_path):
+    (tmp_path / "bad.json").write_text('{"events": [{"t_us": 0,')
+    save_recording([], tmp_path / "empty.json")
+    catalog = Catalog(tmp_path)
+    catalog.refresh()
+    entries = {e["name"]: e for e in catalog.entries()}
+    assert entries["bad.json"]["error"]
+    assert entries["empty.json"]["events"] == 0 and entries["empty.json"]["peak_rate"] == 0
@@ -0,0 +1,97 @@
+"""Headless runner: run_jobs on the memory backend, exit status and backend cleanup."""
+
+import io
+import json
+
+import pytest
+
+import cli
+from backend_memory import MemoryBackend
+from recording import save_recording
+from test_recording import sample_events
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "r.json"
+    save_recording([dict(ev, t_us=0) for ev in sample_events(300)], path)
+    return path
+
+
+def run(backend, jobs):
+    out = io.StringIO()
+    results = cli.run_jobs(backend, jobs, out=out)
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == results
+    return results
+
+
+def test_run_jobs_in_order_on_one_backend(recording):
+    backend = MemoryBackend()
+    results = run(backend, [
+        {"kind": "pattern", "name": "square", "delay_ms": 0},
+        {"kind": "play", "path": str(recording), "plan_cache": False},
+        {"kind": "status"},
+    ])
+    assert [(r["job"], r["kind"]) for r in results] == [(0, "pattern"), (1, "play"), (2, "status")]
+    assert results[0]["ok"] == 4
+    assert results[1]["ok"] == results[1]["events"] == 300
+    assert results[2]["status"]["total_requests"] == 4 + 300  # one backend call per move, button, key and anchor
+    assert not any(cli._failed(r) for r in results)
+
+
+def test_errors_are_reported_per_job(tmp_path):
+    results = run(MemoryBackend(), [
+        {"kind": "nope"},
+        {"kind": "pattern", "name": "hexagon"},
+        {"kind": "play", "path": str(tmp_path / "missing.json"), "plan_cache": False},
+        {"kind": "pattern", "name": "line", "delay_ms": 0},
+    ])
+    assert results[0]["error"] == "Unknown job kind 'nope'"
+    assert "hexagon" in results[1]["error"]
+    assert "error" in results[2]
+    assert results[3]["ok"] == 10
+    assert [cli._failed(r) for r in results] == [True, True, True, False]
+
+
+def test_failed_injections_fail_the_job(recording):
+    results = run(MemoryBackend(fail_every=2), [
+        {"kind": "play", "path": str(recording), "plan_cache": False},
+        {"kind": "pattern", "name": "square", "delay_ms": 0},
+    ])
+    assert results[0]["ok"] < results[0]["events"]
+    assert [cli._failed(r) for r in results] == [True, False]
+    assert cli._failed({"kind": "pattern", "ok": 0})
+    assert cli._failed({"kind": "calibrate", "ok": False})
+    assert not cli._failed({"kind": "play", "ok": 0, "events": 0})
+
+
+class ClosingBackend(MemoryBackend):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_main_exit_status_and_close(monkeypatch, tmp_path, recording):
+    opened = []
+
+    def open_backend(name, combine_us=0):
+        opened.append(ClosingBackend(fail_every=2 if name == "simulated" else 0))
+        return opened[-1]
+
+    monkeypatch.setattr(cli, "_open_backend", open_backend)
+    assert cli.main(["--backend", "memory", "pattern", "square", "--delay-ms", "0"]) == 0
+    assert cli.main(["--backend", "simulated", "play", str(recording), "--no-plan-cache"]) == 2
+    jobs = tmp_path / "jobs.json"
+    jobs.write_text(json.dumps([{"kind": "status"}, {"kind": "bogus"}]))
+    assert cli.main(["--backend", "memory", "run", str(jobs)]) == 2
+    assert [b.closed for b in opened] == [True, True, True]
+
+
+def test_combine_us_needs_the_driver_backend(capsys):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["--backend", "memory", "--combine-us", "250", "status"])
+    assert exc.value.code == 2
+    assert "--combine-us" in capsys.readouterr().err
@@ -0,0 +1,148 @@
+"""InputHogClient request handling with the IOCTL layer replaced by a recorder."""
+
+import threading
+import time
+
+from client import IOCTL_INPUT_HOG_MOUSE_INPUT, InputHogClient
+
+
+class RecordingClient(InputHogClient):
+    """Records each mouse_input instead of calling DeviceIoControl; gate can hold a send."""
+
+    def __init__(self, **kwargs) -> None:
+        self.sent = []
+        self.gate = threading.Event()
+        self.gate.set()
+        super().__init__(**kwargs)
+
+    def _ioctl(self, code, in_buf, in_size, out_buf, out_size):
+        self.gate.wait()
+        if code == IOCTL_INPUT_HOG_MOUSE_INPUT:
+            req = in_buf._obj
+            self.sent.append((req.buttonFlags, req.x, req.y))
+        return True
+
+
+def test_combined_motion_adds_up_across_threads():
+    client = RecordingClient(combine_window_us=200)
+    threads = [threading.Thread(target=lambda: [client.move_mouse(1, -2) for _ in range(2000)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    client.close()
+    assert sum(x for _, x, _ in client.sent) == 8000
+    assert sum(y for _, _, y in client.sent) == -16000
+    stats = client.get_write_combining_stats()
+    assert stats["calls"] == 8000 and stats["pending"] == 0
+    assert stats["combined"] == 8000 - len(client.sent)
+
+
+def test_button_carries_pending_motion_in_order():
+    client = RecordingClient(combine_window_us=1_000_000)
+    client.move_mouse(3, 4)
+    client.move_mouse(2, 1)
+    client.mouse_input(0x0001, 0, 0)
+    client.mouse_input(0x0002, 1, 1)
+    client.close()
+    assert client.sent == [(0x0001, 5, 5), (0x0002, 1, 1)]
+
+
+def test_moves_not_blocked_by_send_in_progress():
+    client = RecordingClient(combine_window_us=1_000_000)
+    client.move_mouse(1, 0)
+    client.gate.clear()
+    flusher = threading.Thread(target=client.flush)
+    flusher.start()
+    time.sleep(0.05)  # flusher is now inside _ioctl
+    start = time.perf_counter()
+    client.move_mouse(1, 0)
+    assert time.perf_counter() - start < 0.5
+    client.gate.set()
+    flusher.join()
+    client.close()
+    assert client.sent == [(0, 1, 0), (0, 1, 0)]
+
+
+def test_expired_window_flushed_by_backstop_thread():
+    client = RecordingClient(combine_window_us=2000)
+    client.move_mouse(5, 5)
+    deadline = time.perf_counter() + 2
+    while not client.sent and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    assert client.sent == [(0, 5, 5)]
+    client.close()
+
+
+def test_close_stops_flusher():
+    client = RecordingClient(combine_window_us=1000)
+    flusher = client._flusher
+    assert flusher is not None and flusher.is_alive()
+    client.move_mouse(2, 0)
+    client.close()
+    assert not flusher.is_alive()
+    assert client.sent == [(0, 2, 0)]
+
+
+class PooledClient(InputHogClient):
+    """Hands out fake handle numbers instead of opening the device."""
+
+    def __init__(self, **kwargs) -> None:
+        self.next_handle = 100
+        super().__init__(**kwargs)
+
+    def _create_handle(self):
+        self.next_handle += 1
+        return self.next_handle
+
+    def close(self) -> None:
+        with self._lock:
+            self._handle = None
+            self._pooled = []
+            self._idle = []
+            self._generation += 1
+
+
+def test_lease_is_per_thread_and_invalidated_by_close():
+    client = PooledClient(pool_size=2)
+    client.open()
+    primary = client._handle
+    leases = []
+    threads = [threading.Thread(target=lambda: leases.append((client._lease(), client._lease()))) for _ in range(3)]
+    for t in threads:
+        t.start()
+        t.join()
+    assert all(a == b for a, b in leases)
+    assert primary not in (leases[0][0], leases[1][0])
+    mine = client._lease()
+    client.close()
+    assert client._lease() is None
+    client.open()
+    assert client._lease() not in (None, mine)
+
+
+def test_slow_open_does_not_block_other_leases():
+    client = PooledClient(pool_size=1)
+    client.open()
+    opening, gate = threading.Event(), threading.Event()
+    create = client._create_handle
+
+    def slow_create():
+        opening.set()
+        gate.wait(5)
+        return create()
+
+    client._create_handle = slow_create
+    leased = []
+    worker = threading.Thread(target=lambda: leased.append(client._lease()))
+    worker.start()
+    assert opening.wait(2)
+    # The only pool slot is being opened: this thread shares the primary handle without waiting
+    start = time.perf_counter()
+    assert client._lease() == client._handle
+    assert time.perf_counter() - start < 0.5
+    gate.set()
+    worker.join()
+    assert leased[0] not in (None, client._handle)
+    assert client._pooled == leased
+
@@ -0,0 +1,164 @@
+"""FairScheduler deficit round robin, and DaemonClient against a live ControllerDaemon."""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from backend_memory import MemoryBackend
+from daemon import ControllerDaemon, DaemonClient, DaemonError, FairScheduler
+
+QUANTUM = 64
+
+
+class GatedBackend:
+    """Records submitted batches; the first submit blocks until gate is set, so tests can queue work behind it."""
+
+    def __init__(self) -> None:
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.batches: list[list[tuple[int, int, int]]] = []
+
+    def submit(self, batch) -> int:
+        if not self.entered.is_set():
+            self.entered.set()
+            self.gate.wait(5)
+        self.batches.append(list(batch))
+        return len(batch)
+
+    def get_last_error(self) -> int:
+        return 0
+
+
+def blocked_scheduler():
+    backend = GatedBackend()
+    sched = FairScheduler(backend, QUANTUM)
+    warmup = sched.register()
+    sched.submit(warmup, [(0, 0, 0)])
+    assert backend.entered.wait(2)
+    return sched, backend
+
+
+def test_large_batches_do_not_starve_small_ones():
+    sched, backend = blocked_scheduler()
+    try:
+        big, small = sched.register(), sched.register()
+        big_subs = [sched.submit(big, [(0, 1, 0)] * 200) for _ in range(6)]
+        small_subs = [sched.submit(small, [(0, 2, 0)] * 8) for _ in range(150)]
+        backend.gate.set()
+        assert all(s.done.wait(2) for s in big_subs + small_subs)
+    finally:
+        sched.close()
+    order = [b[0][1] for b in backend.batches[1:]]
+    assert order.count(1) == 6 and order.count(2) == 150
+    assert order[0] == 2  # the big client needs several rounds of credit first
+
+    # While both have work queued, served events stay within one quantum plus one batch of each other
+    served = {1: 0, 2: 0}
+    for b in backend.batches[1:]:
+        served[b[0][1]] += len(b)
+        if served[1] < 1200 and served[2] < 1200:
+            assert abs(served[1] - served[2]) <= QUANTUM + 200
+    status = sched.status()
+    assert status["total_events"] == 1 + 1200 + 1200
+    assert status["failed_events"] == 0
+
+
+def test_unregister_with_queued_batches():
+    sched, backend = blocked_scheduler()
+    try:
+        cid = sched.register()
+        subs = [sched.submit(cid, [(0, 1, 1)] * 10) for _ in range(3)]
+        assert [c["queued"] for c in sched.status()["clients"] if c["id"] == cid] == [30]
+        sched.unregister(cid)
+        assert all(s.done.is_set() and s.ok == 0 for s in subs)
+        assert cid not in [c["id"] for c in sched.status()["clients"]]
+        late = sched.submit(cid, [(0, 1, 1)])
+        assert late.done.is_set() and late.ok == 0
+
+        other = sched.register()
+        after = sched.submit(other, [(0, 5, 5)])
+        backend.gate.set()
+        assert after.done.wait(2) and after.ok == 1
+    finally:
+        sched.close()
+    assert [b[0] for b in backend.batches] == [(0, 0, 0), (0, 5, 5)]
+
+
+def test_calls_queue_behind_batches_in_order():
+    backend = MemoryBackend()
+    sched = FairScheduler(backend)
+    try:
+        cid = sched.register()
+        subs = [
+            sched.submit(cid, [(0, 5, 5)]),
+            sched.submit_call(cid, "move_to", 100, 200, 0),
+            sched.submit(cid, [(0, 1, 1)]),
+            sched.submit_call(cid, "key", 0x41, True, None),
+        ]
+        assert all(s.done.wait(2) and s.ok == 1 for s in subs)
+    finally:
+        sched.close()
+    assert (backend.x, backend.y) == (101, 201)
+    assert backend.keys == {0x41}
+
+
+@pytest.fixture
+def daemon_address(tmp_path):
+    if sys.platform == "win32":
+        return rf"\\.\pipe\InputHogTest{os.getpid()}"
+    return str(tmp_path / "d.sock")
+
+
+def serve(backend, address):
+    daemon = ControllerDaemon(backend, address)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    client = DaemonClient(address, name="test client")
+    deadline = time.monotonic() + 5
+    while not client.open():
+        assert time.monotonic() < deadline, "daemon did not start listening"
+        time.sleep(0.01)
+    return daemon, thread, client
+
+
+def test_daemon_client_end_to_end(daemon_address):
+    backend = MemoryBackend()
+    daemon, thread, client = serve(backend, daemon_address)
+    try:
+        assert client.submit([(0, 3, 4)] * 10) == 10
+        assert client.move_mouse(1, 1)
+        assert client.move_to(-50, 60)
+        assert client.key(0x41) and client.key(0x42, True)
+        assert client.key(0x42, False)
+        status = client.get_status()
+        assert status["total_requests"] == 15
+        clients = status["daemon"]["clients"]
+        assert [c["name"] for c in clients] == ["test client"]
+        assert clients[0]["events"] == clients[0]["ok"] == 15
+    finally:
+        client.close()
+        daemon.stop()
+        thread.join(5)
+    assert not thread.is_alive()
+    assert (backend.x, backend.y) == (-50, 60)
+    assert backend.keys == {0x41}
+    assert not client.mouse_input(0, 1, 1)  # closed
+
+
+def test_daemon_without_key_support_fails_loudly(daemon_address):
+    backend = GatedBackend()  # batches only
+    backend.gate.set()
+    daemon, thread, client = serve(backend, daemon_address)
+    try:
+        with pytest.raises(DaemonError, match="no key"):
+            client.key(0x41)
+        with pytest.raises(DaemonError, match="no move_to"):
+            client.move_to(0, 0)
+        assert client.submit([(0, 0, 0)]) == 1
+    finally:
+        client.close()
+        daemon.stop()
+        thread.join(5)
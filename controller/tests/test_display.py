@@ -0,0 +1,136 @@
+"""Absolute-coordinate normalisation, and the DisplayService cache and its change-message invalidation."""
+
+import pytest
+
+import display
+from display import (
+    SPI_SETWORKAREA,
+    WM_DISPLAYCHANGE,
+    WM_DPICHANGED,
+    WM_SETTINGCHANGE,
+    DisplayChangeWatcher,
+    DisplayService,
+    FakeMetricsProvider,
+    Monitor,
+    Rect,
+    denormalize_point,
+    normalize_point,
+)
+
+RECTS = [
+    Rect(0, 0, 1920, 1080),
+    Rect(0, 0, 3840, 2160),
+    Rect(0, 0, 5760, 1080),
+    Rect(-1920, 0, 1920, 1080),  # secondary monitor left of the primary
+    Rect(-1280, -1024, 2560, 1440),
+    Rect(0, 0, 1, 1),
+    Rect(0, 0, 65536, 2),
+]
+
+
+def windows_pixel(n: int, lo: int, span: int) -> int:
+    """Where Windows puts absolute coordinate n on an axis starting at lo, span pixels wide."""
+    return lo + n * span // 65536
+
+
+@pytest.mark.parametrize("rect", RECTS, ids=str)
+def test_every_pixel_lands_on_itself(rect):
+    for x in range(rect.left, rect.right):
+        nx, _ = normalize_point(x, rect.top, rect)
+        assert 0 <= nx <= 65535
+        assert windows_pixel(nx, rect.left, rect.width) == x
+    for y in range(rect.top, rect.bottom):
+        _, ny = normalize_point(rect.left, y, rect)
+        assert 0 <= ny <= 65535
+        assert windows_pixel(ny, rect.top, rect.height) == y
+
+
+@pytest.mark.parametrize("rect", RECTS, ids=str)
+def test_denormalize_matches_windows(rect):
+    for x in range(rect.left, rect.right, 7):
+        y = rect.top + (x - rect.left) % rect.height
+        assert denormalize_point(*normalize_point(x, y, rect), rect) == (x, y)
+    for n in range(0, 65536, 97):
+        px, py = denormalize_point(n, n, rect)
+        assert px == windows_pixel(n, rect.left, rect.width)
+        assert py == windows_pixel(n, rect.top, rect.height)
+
+
+def test_points_outside_are_clamped():
+    rect = Rect(-1920, 0, 1920, 1080)
+    assert normalize_point(-5000, -10, rect) == (0, 0)
+    nx, ny = normalize_point(5000, 5000, rect)
+    assert denormalize_point(nx, ny, rect) == (rect.right - 1, rect.bottom - 1)
+
+
+def test_service_normalizes_on_current_topology():
+    provider = FakeMetricsProvider([
+        Monitor(Rect(0, 0, 1920, 1080), Rect(0, 0, 1920, 1040), 96, True),
+        Monitor(Rect(-2560, -360, 0, 1080), Rect(-2560, -360, 0, 1040), 120, False),
+    ])
+    service = DisplayService(provider)
+    virtual = service.virtual_rect()
+    assert virtual == Rect(-2560, -360, 1920, 1080)
+    assert denormalize_point(*service.normalize(-2560, -360), virtual) == (-2560, -360)
+    assert denormalize_point(*service.normalize(1919, 1079), virtual) == (1919, 1079)
+    assert provider.topology_calls == 1
+    service.invalidate()
+    service.virtual_rect()
+    assert provider.topology_calls == 2
+
+
+class FakeUser32:
+    def DefWindowProcW(self, hwnd, msg, wparam, lparam):
+        return 0
+
+
+def test_service_caches_until_invalidated():
+    provider = FakeMetricsProvider()
+    service = DisplayService(provider)
+    assert service.generation == 0
+    first = service.topology()
+    for _ in range(5):
+        assert service.topology() is first
+        service.screen_size(), service.monitor_at(10, 10), service.normalize(5, 5)
+    assert (provider.topology_calls, service.generation) == (1, 1)
+
+    provider.monitors = [Monitor(Rect(0, 0, 2560, 1440), Rect(0, 0, 2560, 1400), 144, True)]
+    assert service.screen_size() == (1920, 1080)  # stale until invalidated
+    service.invalidate()
+    service.invalidate()
+    assert service.screen_size() == (2560, 1440)
+    assert service.primary().dpi == 144
+    assert (provider.topology_calls, service.generation) == (2, 2)
+
+
+@pytest.mark.parametrize("msg, wparam, refreshes", [
+    (WM_DISPLAYCHANGE, 0, True),
+    (WM_DPICHANGED, 0, True),
+    (WM_SETTINGCHANGE, SPI_SETWORKAREA, True),
+    (WM_SETTINGCHANGE, 0, False),
+    (0x0001, 0, False),  # WM_CREATE
+])
+def test_watcher_messages_bump_the_generation(msg, wparam, refreshes):
+    provider = FakeMetricsProvider()
+    service = DisplayService(provider)
+    service.topology()
+    watcher = DisplayChangeWatcher(service)
+    watcher._user32 = FakeUser32()
+    provider.monitors = [Monitor(Rect(0, 0, 1280, 720), Rect(0, 0, 1280, 680), 96, True)]
+    assert watcher._wnd_proc(None, msg, wparam, 0) == 0
+    assert service.screen_size() == ((1280, 720) if refreshes else (1920, 1080))
+    assert service.generation == (2 if refreshes else 1)  # the read after invalidate() refreshed once
+    assert provider.topology_calls == service.generation
+
+
+def test_process_service_off_windows(monkeypatch):
+    monkeypatch.setattr(display, "_service", None)
+    monkeypatch.setattr(display, "IS_WINDOWS", False)
+    service = display.get_display_service()
+    assert isinstance(service._provider, FakeMetricsProvider)
+    assert service.screen_size() == (1920, 1080)
+    assert display.get_display_service(FakeMetricsProvider()) is service
+
+    monkeypatch.setattr(display, "_service", None)
+    provider = FakeMetricsProvider(cursor=(7, 8))
+    assert display.get_display_service(provider).cursor_pos() == (7, 8)
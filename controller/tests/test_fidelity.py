@@ -0,0 +1,72 @@
+"""Fidelity analysis of playbacks with anchors and keys."""
+
+from backend_memory import MemoryBackend
+from fidelity import InstrumentedBackend, analyze, measure, percentile
+from test_recording import RelativeOnly
+
+EVENTS = [
+    {"t_us": 0, "type": "move", "dx": 5, "dy": 5},
+    {"t_us": 0, "type": "anchor", "x": 100, "y": 100},
+    {"t_us": 0, "type": "key", "vk": 65, "pressed": True},
+    {"t_us": 0, "type": "move", "dx": 1, "dy": 0},
+    {"t_us": 0, "type": "key", "vk": 65, "pressed": False},
+    {"t_us": 0, "type": "button", "flag": 1},
+]
+
+
+def test_anchors_and_keys_are_captured_and_matched():
+    backend = MemoryBackend()
+    report = measure(backend, EVENTS)
+    assert (backend.x, backend.y) == (101, 100)
+    assert report["injected"] == len(EVENTS)
+    assert report["keys_not_observed"] == 0
+    assert (report["dropped"], report["unexpected"], report["failed"]) == (0, 0, 0)
+    assert report["drift_px"] == {"final_x": 0, "final_y": 0, "max": 0}
+
+
+def test_failed_anchor_shows_up_as_drift():
+    backend = MemoryBackend(fail_every=2)  # the anchor is the 2nd call
+    report = measure(backend, EVENTS)
+    assert report["failed"] == 3
+    # Drift is where the cursor really is minus where the recording puts it
+    assert (backend.x, backend.y) == (5, 5)
+    assert (report["drift_px"]["final_x"], report["drift_px"]["final_y"]) == (5 - 101, 5 - 100)
+
+
+def test_optional_methods_follow_the_inner_backend():
+    wrapped = InstrumentedBackend(RelativeOnly())
+    assert not hasattr(wrapped, "move_to")
+    assert hasattr(wrapped, "key")
+    assert not hasattr(InstrumentedBackend(object()), "send_events")
+
+
+def test_keys_without_backend_key_are_reported_not_observed():
+    inst = InstrumentedBackend(MemoryBackend())
+    inst.mark()
+    inst.move_mouse(5, 5)
+    inst.move_to(100, 100)
+    inst.move_mouse(1, 0)
+    inst.mouse_input(1, 0, 0)
+    report = analyze(EVENTS, inst.capture, inst.start_ns)
+    assert report["keys_not_observed"] == 2
+    assert report["dropped"] == 2
+    assert report["drift_px"]["final_x"] == 0
+
+
+def test_send_events_captures_the_injected_prefix():
+    class Batching(MemoryBackend):
+        def send_events(self, events):
+            return 3
+
+    inst = InstrumentedBackend(Batching())
+    inst.mark()
+    assert inst.send_events(EVENTS) == 3
+    assert [c[1] for c in inst.capture] == ["move", "anchor", "key", "move", "key", "button"]
+    assert [c[-1] for c in inst.capture] == [True, True, True, False, False, False]
+
+
+def test_percentile_is_nearest_rank():
+    vals = list(range(1, 101))
+    assert [percentile(vals, p) for p in (1, 50, 99, 100)] == [1, 50, 99, 100]
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
@@ -0,0 +1,85 @@
+"""client.py layouts and constants against shared/ioctl.h."""
+
+import ctypes
+import re
+from pathlib import Path
+
+import pytest
+
+import client
+import journal
+from client import INPUT_BATCH_ENTRY, KEYBOARD_INPUT_REQUEST, key_request, pack_input_batch, pack_schedule
+
+IOCTL_H = Path(__file__).resolve().parents[2] / "shared" / "ioctl.h"
+C_SIZES = {"USHORT": 2, "ULONG": 4, "LONG": 4, "ULONGLONG": 8, "LONGLONG": 8}
+
+
+def parse_header() -> tuple[dict, dict]:
+    """({struct name: packed size without trailing [1] arrays}, {#define name: int value})."""
+    text = re.sub(r"//[^\n]*", "", IOCTL_H.read_text())
+    sizes = {}
+    for body, name in re.findall(r"typedef struct _\w+ \{(.*?)\} (\w+)", text, re.S):
+        size = 0
+        for field in filter(None, (f.strip() for f in body.split(";"))):
+            words = field.replace("volatile", "").split()
+            if words[1].endswith("[1]"):
+                continue  # variable-length tail
+            size += C_SIZES[words[0]]
+        sizes[name] = size
+    defines = {name: int(value, 0) for name, value in re.findall(r"#define (\w+)\s+(0x[0-9A-Fa-f]+|\d+)\b", text)}
+    return sizes, defines
+
+
+SIZES, DEFINES = parse_header()
+
+
+@pytest.mark.parametrize("name", sorted(SIZES))
+def test_struct_size_matches_header(name):
+    if name in ("SCHEDULE_REQUEST", "INPUT_BATCH_REQUEST"):
+        pytest.skip("packed by pack_schedule / pack_input_batch")
+    assert ctypes.sizeof(getattr(client, name)) == SIZES[name]
+
+
+def test_constants_match_header():
+    shared = [name for name in DEFINES if hasattr(client, name)]
+    assert "INPUT_HOG_BATCH_MAX" in shared and "INPUT_HOG_KEY_E0" in shared
+    for name in shared:
+        assert getattr(client, name) == DEFINES[name], name
+
+
+def test_ioctl_codes_match_header():
+    codes = re.findall(r"#define (IOCTL_\w+) \\\s+CTL_CODE\(\w+, (0x[0-9A-F]+)", IOCTL_H.read_text())
+    assert len(codes) == 13
+    for name, function in codes:
+        assert getattr(client, name) == client._ctl_code(0x8000, int(function, 16), 0, 0), name
+
+
+def test_pack_input_batch_size():
+    entries = [(client.INPUT_HOG_ENTRY_MOUSE, 1, -5, 7), (client.INPUT_HOG_ENTRY_KEYBOARD, 2, 0x48, 0)] * 3
+    buf = pack_input_batch(entries)
+    assert len(buf) == 4 + len(entries) * SIZES["INPUT_BATCH_ENTRY"]
+    assert int.from_bytes(buf[:4], "little") == len(entries)
+    second = INPUT_BATCH_ENTRY.from_buffer_copy(buf, 4 + SIZES["INPUT_BATCH_ENTRY"])
+    assert (second.type, second.flags, second.x, second.y) == (client.INPUT_HOG_ENTRY_KEYBOARD, 2, 0x48, 0)
+    assert pack_input_batch([]) == bytes(4)
+
+
+def test_pack_schedule_size():
+    buf = pack_schedule([(1000, 0, 1, 2), (2000, 1, 0, 0)])
+    assert len(buf) == 4 + 2 * SIZES["SCHEDULED_INPUT"]
+
+
+def test_key_request_layout_and_flags():
+    assert ctypes.sizeof(key_request(0x1E, True)) == SIZES["KEYBOARD_INPUT_REQUEST"]
+    up = key_request(0xE048, False)
+    assert isinstance(up, KEYBOARD_INPUT_REQUEST)
+    assert up.makeCode == 0x48
+    assert up.flags == client.INPUT_HOG_KEY_BREAK | client.INPUT_HOG_KEY_E0
+    assert key_request(0xE11D, True).flags == client.INPUT_HOG_KEY_E1
+    with pytest.raises(ValueError):
+        key_request(0x1F1E, True)
+
+
+def test_journal_structs_match_header():
+    assert journal.HEADER.size == SIZES["INPUT_HOG_JOURNAL_HEADER"]
+    assert journal.ENTRY.size == SIZES["INPUT_HOG_JOURNAL_ENTRY"]
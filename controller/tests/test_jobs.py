@@ -0,0 +1,194 @@
+"""JobExecutor: cancellation, on_cancel callbacks and input release on every exit path (MemoryBackend)."""
+
+import threading
+
+import jobs
+from backend_memory import MemoryBackend
+from client import MOUSE_LEFT_BUTTON_DOWN, MOUSE_RIGHT_BUTTON_DOWN
+from jobs import CANCELLED, DONE, FAILED, JobExecutor
+
+VK_A, VK_SHIFT = 0x41, 0x10
+
+
+def press_and(then):
+    """Job body: hold left button, right button (via move_to) and two keys, then call then(job, guarded)."""
+    def fn(job):
+        backend = job.backend(fn.inner)
+        assert backend.mouse_input(MOUSE_LEFT_BUTTON_DOWN, 0, 0)
+        assert backend.move_to(10, 10, MOUSE_RIGHT_BUTTON_DOWN)
+        assert backend.key(VK_SHIFT) and backend.key(VK_A)
+        assert backend.key(VK_A, False) and backend.key(VK_A)
+        return then(job, backend)
+    fn.inner = MemoryBackend()
+    return fn
+
+
+def run(fn, name=""):
+    ex = JobExecutor()
+    try:
+        job = ex.submit(fn, name)
+        assert job.done.wait(2)
+        return job
+    finally:
+        ex.close()
+
+
+def test_release_after_normal_return():
+    fn = press_and(lambda job, b: (set(fn.inner.buttons), set(fn.inner.keys)))
+    job = run(fn)
+    assert (job.state, job.result) == (DONE, ({"left", "right"}, {VK_SHIFT, VK_A}))
+    assert fn.inner.buttons == set() and fn.inner.keys == set()
+
+
+def test_release_after_exception():
+    def boom(job, backend):
+        raise RuntimeError("pattern failed")
+    fn = press_and(boom)
+    job = run(fn)
+    assert job.state == FAILED
+    assert job.error == "RuntimeError: pattern failed"
+    assert "RuntimeError" in job.traceback
+    assert fn.inner.buttons == set() and fn.inner.keys == set()
+
+
+def test_cancel_running_job_releases_and_calls_on_cancel():
+    started = threading.Event()
+    calls = []
+
+    def spin(job, backend):
+        job.on_cancel(lambda: calls.append(threading.current_thread().name))
+        started.set()
+        while True:
+            backend.move_mouse(1, 0)  # raises JobCancelled once cancelled
+
+    fn = press_and(spin)
+    ex = JobExecutor()
+    try:
+        job = ex.submit(fn, "spin")
+        assert started.wait(2)
+        assert ex.current() is job
+        assert ex.cancel(job.id) == 1
+        assert job.done.wait(2)
+    finally:
+        ex.close()
+    assert job.state == CANCELLED
+    assert calls == [threading.current_thread().name]
+    assert fn.inner.buttons == set() and fn.inner.keys == set()
+
+
+def test_job_that_returns_after_cancel_is_cancelled():
+    started, go = threading.Event(), threading.Event()
+
+    def polite(job, backend):
+        started.set()
+        go.wait(2)
+        return "partial" if job.cancelled else "full"
+
+    fn = press_and(polite)
+    ex = JobExecutor()
+    try:
+        job = ex.submit(fn)
+        assert started.wait(2)
+        ex.cancel()
+        go.set()
+        assert job.done.wait(2)
+    finally:
+        ex.close()
+    assert (job.state, job.result) == (CANCELLED, "partial")
+    assert fn.inner.buttons == set() and fn.inner.keys == set()
+
+
+def test_on_cancel_after_cancellation_runs_immediately():
+    ex = JobExecutor()
+    try:
+        job = ex.submit(lambda job: None)
+        job.done.wait(2)
+    finally:
+        ex.close()
+    job.cancel_event.set()
+    calls = []
+    job.on_cancel(lambda: calls.append(1))
+    assert calls == [1]
+
+
+def test_cancel_queued_job_never_runs():
+    release, ran = threading.Event(), []
+    ex = JobExecutor()
+    try:
+        first = ex.submit(lambda job: release.wait(2), "first")
+        second = ex.submit(lambda job: ran.append(job.name), "second")
+        assert [j.name for j in ex.pending()] == ["first", "second"]
+        assert ex.cancel(second.id) == 1
+        assert second.state == CANCELLED and second.done.is_set()
+        release.set()
+        assert first.done.wait(2)
+    finally:
+        ex.close()
+    assert first.state == DONE
+    assert ran == []
+
+
+def test_cancel_all_cancels_running_and_queued():
+    started = threading.Event()
+    ex = JobExecutor()
+    try:
+        running = ex.submit(lambda job: (started.set(), job.cancel_event.wait(2)), "running")
+        queued = [ex.submit(lambda job: None) for _ in range(3)]
+        assert started.wait(2)
+        assert ex.cancel() == 4
+        assert all(j.done.wait(2) for j in [running] + queued)
+    finally:
+        ex.close()
+    assert {j.state for j in [running] + queued} == {CANCELLED}
+
+
+def test_tracked_playback_keys_are_released_unless_a_backend_already_did(monkeypatch):
+    injected = []
+    monkeypatch.setattr(jobs, "_inject_key", lambda vk, pressed: injected.append((vk, pressed)))
+
+    def play(job, backend):
+        # A playback that sent VK_A through the backend and VK_SHIFT through keybd_event
+        job.track_event({"type": "key", "vk": VK_A, "pressed": True}, True)
+        job.track_event({"type": "key", "vk": VK_SHIFT, "pressed": True}, True)
+        job.track_event({"type": "key", "vk": 0x42, "pressed": True}, False)
+        raise jobs.JobCancelled(job.name)
+
+    inner = MemoryBackend()
+
+    def fn(job):
+        backend = job.backend(inner)
+        backend.key(VK_A)
+        return play(job, backend)
+
+    job = run(fn)
+    assert job.state == CANCELLED
+    assert inner.keys == set()
+    assert injected == [(VK_SHIFT, False)]
+
+
+def test_send_events_tracks_only_what_was_sent():
+    class Batching(MemoryBackend):
+        def send_events(self, events):
+            for i, ev in enumerate(events):
+                if i == 2:
+                    return i
+                if ev["type"] == "button":
+                    self.mouse_input(ev["flag"], 0, 0)
+                else:
+                    self.key(ev["vk"], ev["pressed"])
+            return len(events)
+
+    inner = Batching()
+
+    def fn(job):
+        backend = job.backend(inner)
+        sent = backend.send_events([
+            {"type": "button", "flag": MOUSE_LEFT_BUTTON_DOWN},
+            {"type": "key", "vk": VK_A, "pressed": True},
+            {"type": "key", "vk": VK_SHIFT, "pressed": True},
+        ])
+        return sent, set(backend.held), set(backend.keys_held)
+
+    job = run(fn)
+    assert job.result == (2, {MOUSE_LEFT_BUTTON_DOWN}, {VK_A})
+    assert inner.buttons == set() and inner.keys == set()
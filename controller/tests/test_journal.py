@@ -0,0 +1,103 @@
+"""Journal decoding of synthetic drain buffers, gap detection and incremental reads."""
+
+import pytest
+
+import journal
+from client import INPUT_HOG_ENTRY_KEYBOARD, INPUT_HOG_ENTRY_MOUSE, INPUT_HOG_ENTRY_MOUSE_ABSOLUTE
+from journal import ENTRY, HEADER, JournalReader, decode_journal, encode_journal, find_gaps, summarize
+
+STATUS_INVALID_PARAMETER = -0x3FFFFFF3  # 0xC000000D as a signed NTSTATUS
+
+
+def synthetic_entries(first: int, n: int) -> list[tuple]:
+    types = (INPUT_HOG_ENTRY_MOUSE, INPUT_HOG_ENTRY_MOUSE_ABSOLUTE, INPUT_HOG_ENTRY_KEYBOARD)
+    return [
+        (seq, 1_000_000 + seq * 80, types[seq % 3], seq % 7, -seq, 65535 - seq, STATUS_INVALID_PARAMETER if seq % 10 == 0 else 0)
+        for seq in range(first, first + n)
+    ]
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "array"])
+def decoder(request, monkeypatch):
+    if request.param:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(journal, "HAS_NUMPY", request.param)
+
+
+def test_decode_round_trip(decoder):
+    entries = synthetic_entries(1, 25)
+    block = decode_journal(encode_journal(entries, qpc_frequency=10_000_000))
+    assert len(block) == 25
+    assert block.next_sequence == 26
+    for i, name in enumerate(journal.COLUMNS):
+        assert [int(v) for v in block[name]] == [e[i] for e in entries], name
+    assert block.times_us()[:3] == [0.0, 8.0, 16.0]
+
+
+def test_decode_skips_larger_entries_from_newer_drivers(decoder):
+    entries = synthetic_entries(5, 4)
+    padded = 40
+    blob = bytearray(HEADER.pack(journal.JOURNAL_VERSION, 4, 5, 9, 10_000_000, 4096, padded))
+    for e in entries:
+        blob += ENTRY.pack(*e) + b"\xff" * (padded - ENTRY.size)
+    block = decode_journal(bytes(blob))
+    assert [int(v) for v in block["status"]] == [e[6] for e in entries]
+
+
+def test_decode_rejects_malformed_blobs():
+    blob = encode_journal(synthetic_entries(1, 3))
+    with pytest.raises(ValueError):
+        decode_journal(blob[:HEADER.size - 1])
+    with pytest.raises(ValueError):
+        decode_journal(blob[:-1])
+    with pytest.raises(ValueError):
+        decode_journal(HEADER.pack(1, 0, 1, 1, 1, 1, ENTRY.size - 4))
+
+
+def test_summarize_counts_types_failures_and_gaps():
+    entries = synthetic_entries(11, 30)
+    del entries[5:8]
+    s = summarize(decode_journal(encode_journal(entries)), since=8)
+    assert s["entries"] == 27
+    assert s["by_type"] == {"mouse": 9, "absolute": 9, "keyboard": 9}
+    assert s["failures"] == {"0xC000000D": 3}
+    assert s["gaps"] == [(9, 2), (16, 3)]
+    assert s["lost"] == 5
+
+
+def test_find_gaps():
+    assert find_gaps([3, 4, 7, 8, 10]) == [(5, 2), (9, 1)]
+    assert find_gaps([3, 4], since=0) == [(1, 2)]
+    assert find_gaps([], since=5) == []
+
+
+class FakeDriver:
+    """read_journal() over a capacity-limited journal, like the driver's ring."""
+
+    def __init__(self, capacity: int = 8) -> None:
+        self.capacity = capacity
+        self.next_sequence = 1
+
+    def inject(self, n: int) -> None:
+        self.next_sequence += n
+
+    def read_journal(self, since: int):
+        oldest = max(1, self.next_sequence - self.capacity)
+        first = max(since + 1, oldest)
+        entries = synthetic_entries(first, max(0, self.next_sequence - first))
+        return encode_journal(entries, oldest, self.next_sequence, capacity=self.capacity)
+
+
+def test_reader_counts_overwritten_entries_and_follows_reload():
+    driver = FakeDriver()
+    reader = JournalReader(driver)
+    driver.inject(5)
+    assert len(reader.drain()) == 5
+    driver.inject(12)  # 4 entries are overwritten before the next drain
+    block = reader.drain()
+    assert len(block) == 8 and reader.lost == 4 and reader.since == 17
+    assert len(reader.drain()) == 0
+    driver.next_sequence = 1  # driver reloaded
+    driver.inject(3)
+    assert [int(s) for s in reader.drain()["sequence"]] == [1, 2, 3]
+    assert reader.restarts == 1
@@ -0,0 +1,168 @@
+"""Plan cache: hits, misses, edits, eviction, and sources that change while compiling."""
+
+import hashlib
+import os
+import time
+
+import pytest
+
+import plancache
+from accel import AccelCurve, InverseLUT, compensate_events
+from plancache import CompiledPlan, PlanCache, compile_events
+from recording import iter_recording, save_recording
+from test_recording import sample_events
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "a.json"
+    save_recording(sample_events(3000), path)
+    return path
+
+
+def test_miss_then_hit(tmp_path, recording):
+    cache = PlanCache(tmp_path / "plans")
+    first = cache.compile(recording)
+    second = cache.compile(recording)
+    assert (cache.misses, cache.hits, cache.stores) == (1, 1, 1)
+    assert isinstance(second, CompiledPlan)
+    assert first.to_events() == second.to_events() == list(iter_recording(recording))
+    first.close()
+    second.close()
+
+
+def test_compensated_plan_is_keyed_by_curve(tmp_path, recording):
+    cache = PlanCache(tmp_path / "plans")
+    curve = AccelCurve.linear(2.0)
+    plan = cache.compile(recording, curve)
+    assert plan.to_events() == list(compensate_events(iter_recording(recording), InverseLUT(curve)))
+    assert cache.get(recording) is None
+    assert cache.get(recording, AccelCurve.linear(3.0)) is None
+    plan.close()
+
+
+def test_changed_source_misses(tmp_path, recording):
+    cache = PlanCache(tmp_path / "plans")
+    cache.compile(recording).close()
+    save_recording(sample_events(100), recording)
+    assert cache.get(recording) is None
+    plan = cache.compile(recording)
+    assert len(plan) == 100
+    plan.close()
+
+
+def test_stream_stores_only_when_consumed(tmp_path, recording):
+    cache = PlanCache(tmp_path / "plans")
+    stream = cache.stream(recording)
+    next(iter(stream))
+    stream.close()
+    assert cache.stores == 0
+    assert list(cache.stream(recording)) == list(iter_recording(recording))
+    assert cache.stores == 1
+    assert isinstance(cache.stream(recording), CompiledPlan)
+
+
+def test_source_changed_mid_read_is_not_stored(tmp_path):
+    recording = tmp_path / "small.json"
+    save_recording(sample_events(50), recording)  # one read chunk: the old content parses to the end
+    cache = PlanCache(tmp_path / "plans")
+    stream = iter(cache.stream(recording))
+    next(stream)
+    save_recording(sample_events(10), recording)
+    list(stream)
+    assert cache.stores == 0
+    assert list(os.scandir(cache.directory)) == []
+    assert cache.get(recording) is None
+
+
+def test_eviction_keeps_newest_within_budget(tmp_path):
+    cache = PlanCache(tmp_path / "plans")
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"r{i}.json"
+        save_recording(sample_events(1000 + i), path)
+        paths.append(path)
+    plan_size = 16 + 1000 * 20 + 64  # rough: header + records, no extras
+    cache.max_bytes = 2 * plan_size
+    for i, path in enumerate(paths):
+        cache.compile(path).close()
+        plan_files = sorted(cache.directory.glob("*.ihpl"), key=lambda p: p.stat().st_mtime_ns)
+        os.utime(plan_files[-1], ns=(i * 10**9, i * 10**9))  # distinct recency on coarse clocks
+    assert cache.stats()["entries"] == 2
+    assert cache.evictions == 2
+    assert cache.get(paths[0]) is None and cache.get(paths[1]) is None
+    for path in paths[2:]:
+        plan = cache.get(path)
+        assert plan is not None
+        plan.close()
+
+
+def test_new_process_hits_without_rehashing(tmp_path, recording, monkeypatch):
+    PlanCache(tmp_path / "plans").compile(recording).close()
+
+    def no_hashing(path):
+        raise AssertionError("source re-hashed")
+
+    monkeypatch.setattr(plancache, "_TrailingHash", no_hashing)
+    fresh = PlanCache(tmp_path / "plans")  # digests come from the index on disk
+    with fresh.stream(recording) as plan:
+        assert isinstance(plan, CompiledPlan)
+        assert len(plan) == 3000
+    assert (fresh.hits, fresh.misses) == (1, 0)
+
+
+def test_unseen_source_is_hashed_alongside_the_parse(tmp_path, recording):
+    cache = PlanCache(tmp_path / "plans")
+    calls = []
+    stream = iter(cache.stream(recording, on_progress=lambda done, total: calls.append(done)))
+    assert calls == []  # nothing read before the first event is asked for
+    first = next(stream)
+    assert first == next(iter_recording(recording))
+    assert cache.stores == 0
+    rest = list(stream)
+    assert cache.stores == 1 and len(rest) == 2999
+    assert cache.source_digest(recording) == hashlib.sha256(recording.read_bytes()).hexdigest()
+    with PlanCache(tmp_path / "plans").stream(recording) as plan:
+        assert isinstance(plan, CompiledPlan)
+
+
+def test_edits_are_part_of_the_key(tmp_path, recording):
+    pytest.importorskip("numpy")
+    cache = PlanCache(tmp_path / "plans")
+    edits = {"start_s": 0.2, "end_s": 1.0, "speed": 2, "scale": None}
+    with cache.compile(recording, edits=edits) as plan:
+        assert plan.to_events() == compile_events(recording, edits=edits)
+        assert 0 < len(plan) < 3000
+    assert cache.get(recording) is None
+    assert cache.get(recording, edits={"start_s": 0.2, "end_s": 1.0}) is None
+    plan = cache.get(recording, edits={"speed": 2.0, "end_s": 1, "start_s": 0.2})
+    assert plan is not None
+    plan.close()
+    assert list(cache.stream(recording, edits={"scale": 2})) == compile_events(recording, edits={"scale": 2})
+    assert cache.stores == 2
+    with pytest.raises(ValueError):
+        cache.stream(recording, edits={"speed": 0})
+    with pytest.raises(ValueError):
+        cache.stream(recording, edits={"rotate": 90})
+
+
+def test_closed_plan_is_unmapped(tmp_path, recording):
+    cache = PlanCache(tmp_path / "plans")
+    with cache.compile(recording) as plan:
+        assert plan[0] == next(iter_recording(recording))
+    with pytest.raises(ValueError):
+        plan[0]
+
+
+def test_orphaned_temp_files_are_swept(tmp_path, recording):
+    cache = PlanCache(tmp_path / "plans")
+    cache.directory.mkdir()
+    stale, fresh = cache.directory / "dead.tmp", cache.directory / "writing.tmp"
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    old = time.time() - plancache.TEMP_MAX_AGE_S - 60
+    os.utime(stale, (old, old))
+    cache.compile(recording).close()
+    assert not stale.exists() and fresh.exists()
+    assert cache.clear() == 1
+    assert list(cache.directory.iterdir()) == []
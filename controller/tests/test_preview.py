@@ -0,0 +1,119 @@
+"""Path preview: min/max decimation (streaming and one-shot) and incremental recorder counters."""
+
+import random
+
+import pytest
+
+import preview
+from preview import RATE_BIN_US, PathLOD, RecorderStats, decimate_path, describe_stats
+from recording import MouseRecorder
+from test_recording import sample_events
+
+
+def random_walk(n: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    events = []
+    for i in range(n):
+        if i % 50 == 25:
+            events.append({"t_us": i * 100, "type": "button", "flag": 1})
+        # Occasional spikes that decimation must not flatten
+        step = 400 if i % 997 == 0 else 3
+        events.append({"t_us": i * 100, "type": "move", "dx": rng.randint(-step, step), "dy": rng.randint(-step, step)})
+    return events
+
+
+def full_path(events: list[dict]) -> list[tuple[int, int]]:
+    x = y = 0
+    out = [(0, 0)]
+    for ev in events:
+        if ev["type"] == "move":
+            x += ev["dx"]
+            y += ev["dy"]
+            out.append((x, y))
+    return out
+
+
+def assert_decimated(points, bbox, path, limit):
+    assert len(points) <= limit
+    assert points[0] == path[0] and points[-1] == path[-1]
+    xs, ys = [p[0] for p in path], [p[1] for p in path]
+    assert bbox == (min(xs), min(ys), max(xs), max(ys))
+    # The extremes survive, and the points are a subsequence of the path
+    kept_x, kept_y = [p[0] for p in points], [p[1] for p in points]
+    assert (min(kept_x), min(kept_y), max(kept_x), max(kept_y)) == bbox
+    it = iter(path)
+    assert all(any(p == q for q in it) for p in points)
+
+
+def test_short_paths_are_kept_whole():
+    events = random_walk(200)
+    lod = PathLOD(max_buckets=256)
+    lod.feed(events)
+    assert lod.bucket_size == 1
+    assert lod.points() == full_path(events)
+    assert decimate_path(events, 64)[0] == full_path(events)  # under 6 points per bucket: kept as is
+
+
+@pytest.mark.parametrize("max_buckets", [16, 256])
+def test_streaming_decimation_keeps_extremes_in_order(max_buckets):
+    events = random_walk(20_000)
+    lod = PathLOD(max_buckets)
+    lod.feed(events)
+    path = full_path(events)
+    assert lod.count == len(path) - 1
+    # Closed buckets hold <= 6 points each; the open one holds < bucket_size
+    assert_decimated(lod.points(), lod.bbox, path, max_buckets * 6 + lod.bucket_size)
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_one_shot_decimation_keeps_extremes_in_order(monkeypatch, use_numpy):
+    if use_numpy and not preview.HAS_NUMPY:
+        pytest.skip("numpy not installed")
+    monkeypatch.setattr(preview, "HAS_NUMPY", use_numpy)
+    events = random_walk(20_000, seed=2)
+    points, bbox = decimate_path(events, 128)
+    assert_decimated(points, bbox, full_path(events), 128 * 6 + 128)
+
+
+def test_decimate_path_without_moves():
+    assert decimate_path([{"t_us": 0, "type": "button", "flag": 1}]) == ([(0, 0)], (0, 0, 0, 0))
+
+
+def test_recorder_stats_window_and_peak():
+    stats = RecorderStats()
+    for i in range(30):
+        stats.add({"t_us": i * 10_000, "type": "move"})  # 30 events in 300 ms
+    for i in range(5):
+        stats.add({"t_us": 1_500_000 + i * 100_000, "type": "key"})
+    snap = stats.snapshot(2_000_000)
+    assert snap == {"total": 35, "rate": 5, "peak_rate": 30, "by_type": {"move": 30, "key": 5}}
+    assert stats.snapshot(10_000_000)["rate"] == 0
+    assert describe_stats(snap) == "35 events (5 key, 30 move), 5/s, peak 30/s"
+
+
+def test_recorder_stats_tolerate_late_events():
+    stats = RecorderStats()
+    stats.add({"t_us": 5 * RATE_BIN_US, "type": "move"})
+    stats.add({"t_us": 5 * RATE_BIN_US - 10, "type": "move"})  # another listener thread, a little behind
+    assert stats.snapshot(5 * RATE_BIN_US)["rate"] == 2
+
+
+def test_recorder_counters_match_a_rescan():
+    rec = MouseRecorder()
+    events = sample_events(5000) + random_walk(5000)
+    for ev in events:
+        with rec._lock:
+            rec._add(ev)
+    rec._start_ns = 0  # get_stats measures "now" from start; keep every event in the past
+    stats = rec.get_stats()
+    assert stats["total"] == len(events) == rec.get_event_count()
+    by_type = {}
+    for ev in events:
+        by_type[ev["type"]] = by_type.get(ev["type"], 0) + 1
+    assert stats["by_type"] == by_type
+
+    points, bbox = rec.get_path_points()
+    lod = PathLOD()
+    lod.feed(events)
+    assert (points, bbox) == (lod.points(), lod.bbox)
+    assert_decimated(points, bbox, full_path(events), len(full_path(events)))
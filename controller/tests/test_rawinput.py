@@ -0,0 +1,95 @@
+"""decode_rawmouse and DeltaAccumulator on hand-built RAWMOUSE reports."""
+
+from client import MOUSE_LEFT_BUTTON_DOWN, MOUSE_LEFT_BUTTON_UP, MOUSE_RIGHT_BUTTON_DOWN
+from rawinput import (
+    MOUSE_MOVE_ABSOLUTE,
+    MOUSE_MOVE_RELATIVE,
+    MOUSE_VIRTUAL_DESKTOP,
+    RAWMOUSE,
+    RI_MOUSE_BUTTON_4_DOWN,
+    RI_MOUSE_WHEEL,
+    DeltaAccumulator,
+    decode_rawmouse,
+)
+from win32 import ABSOLUTE_SPAN
+
+
+def rawmouse(x: int = 0, y: int = 0, flags: int = MOUSE_MOVE_RELATIVE, buttons: int = 0) -> RAWMOUSE:
+    rm = RAWMOUSE()
+    rm.usFlags = flags
+    rm.usButtonFlags = buttons
+    rm.lLastX = x
+    rm.lLastY = y
+    return rm
+
+
+def absolute(px: int, py: int, size: tuple[int, int]) -> tuple[int, int]:
+    """Pixel -> 0..65535 coordinate that maps back to exactly that pixel."""
+    return -(-px * ABSOLUTE_SPAN // size[0]), -(-py * ABSOLUTE_SPAN // size[1])
+
+
+def test_decode_relative_report():
+    assert decode_rawmouse(rawmouse(-7, 12)) == (-7, 12, False, [])
+
+
+def test_decode_absolute_report():
+    x, y, is_abs, buttons = decode_rawmouse(rawmouse(32768, 65535, MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP))
+    assert (x, y, is_abs, buttons) == (32768, 65535, True, [])
+
+
+def test_decode_buttons_in_bit_order_without_wheel():
+    rm = rawmouse(buttons=RI_MOUSE_BUTTON_4_DOWN | MOUSE_LEFT_BUTTON_UP | MOUSE_RIGHT_BUTTON_DOWN | RI_MOUSE_WHEEL)
+    rm.usButtonData = 120
+    assert decode_rawmouse(rm)[3] == [MOUSE_LEFT_BUTTON_UP, MOUSE_RIGHT_BUTTON_DOWN, RI_MOUSE_BUTTON_4_DOWN]
+
+
+def test_relative_reports_pass_through_and_total():
+    acc = DeltaAccumulator((1920, 1080))
+    assert acc.feed_rawmouse(10, rawmouse(3, -4)) == [{"t_us": 10, "type": "move", "dx": 3, "dy": -4}]
+    assert acc.feed_rawmouse(20, rawmouse(0, 0)) == []
+    assert acc.feed_rawmouse(30, rawmouse(-1, 2)) == [{"t_us": 30, "type": "move", "dx": -1, "dy": 2}]
+    assert (acc.total_dx, acc.total_dy, acc.reports) == (2, -2, 3)
+
+
+def test_first_absolute_report_is_zero_then_differenced():
+    screen = (1920, 1080)
+    acc = DeltaAccumulator(screen)
+    assert acc.feed_rawmouse(0, rawmouse(*absolute(100, 200, screen), MOUSE_MOVE_ABSOLUTE)) == []
+    out = acc.feed_rawmouse(1000, rawmouse(*absolute(110, 195, screen), MOUSE_MOVE_ABSOLUTE))
+    assert out == [{"t_us": 1000, "type": "move", "dx": 10, "dy": -5}]
+    assert (acc.total_dx, acc.total_dy) == (10, -5)
+
+
+def test_absolute_reports_use_screen_or_virtual_desktop_size():
+    screen, virtual = (1920, 1080), (3840, 1080)
+    acc = DeltaAccumulator(screen, virtual)
+    acc.feed_rawmouse(0, rawmouse(0, 0, MOUSE_MOVE_ABSOLUTE))
+    # Half the absolute range is half the screen width, or half the virtual desktop width
+    half = ABSOLUTE_SPAN // 2
+    assert acc.feed_rawmouse(1, rawmouse(half, 0, MOUSE_MOVE_ABSOLUTE))[0]["dx"] == 960
+    acc = DeltaAccumulator(screen, virtual)
+    acc.feed_rawmouse(0, rawmouse(0, 0, MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP))
+    assert acc.feed_rawmouse(1, rawmouse(half, 0, MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP))[0]["dx"] == 1920
+
+
+def test_virtual_size_defaults_to_screen():
+    acc = DeltaAccumulator((800, 600))
+    acc.feed_rawmouse(0, rawmouse(0, 0, MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP))
+    assert acc.feed_rawmouse(1, rawmouse(ABSOLUTE_SPAN // 2, 0, MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP))[0]["dx"] == 400
+
+
+def test_button_transitions_follow_the_move():
+    acc = DeltaAccumulator((1920, 1080))
+    out = acc.feed_rawmouse(5, rawmouse(1, 1, buttons=MOUSE_LEFT_BUTTON_DOWN))
+    assert out == [
+        {"t_us": 5, "type": "move", "dx": 1, "dy": 1},
+        {"t_us": 5, "type": "button", "flag": MOUSE_LEFT_BUTTON_DOWN},
+    ]
+    assert acc.feed_rawmouse(6, rawmouse(buttons=MOUSE_LEFT_BUTTON_UP)) == [
+        {"t_us": 6, "type": "button", "flag": MOUSE_LEFT_BUTTON_UP},
+    ]
+    # A button transition on an absolute report with no motion still records the button
+    acc.feed_rawmouse(7, rawmouse(100, 100, MOUSE_MOVE_ABSOLUTE))
+    assert acc.feed_rawmouse(8, rawmouse(100, 100, MOUSE_MOVE_ABSOLUTE, MOUSE_RIGHT_BUTTON_DOWN)) == [
+        {"t_us": 8, "type": "button", "flag": MOUSE_RIGHT_BUTTON_DOWN},
+    ]
@@ -0,0 +1,169 @@
+"""Recording format: v3 events, anchors, streaming load and playback callbacks."""
+
+import json
+import statistics
+import time
+
+import pytest
+
+from backend_memory import MemoryBackend
+from recording import SPIN_THRESHOLD_NS, Recording, iter_recording, play_recording, save_recording, sleep_until
+
+
+def sample_events(n: int = 2000) -> list[dict]:
+    events = []
+    for i in range(n):
+        t = i * 500
+        if i % 100 == 0:
+            events.append({"t_us": t, "type": "anchor", "x": -1920 + i, "y": 40})
+        elif i % 100 == 1:
+            events.append({"t_us": t, "type": "button", "flag": 1})
+        elif i % 100 == 2:
+            events.append({"t_us": t, "type": "key", "vk": 65, "pressed": i % 200 == 2})
+        else:
+            events.append({"t_us": t, "type": "move", "dx": i % 7 - 3, "dy": i % 5 - 2})
+    return events
+
+
+class RelativeOnly:
+    """A backend without move_to (like User32Backend on the driver-less path)."""
+
+    def __init__(self) -> None:
+        self.inner = MemoryBackend()
+
+    def move_mouse(self, x, y):
+        return self.inner.move_mouse(x, y)
+
+    def mouse_input(self, flags, x, y):
+        return self.inner.mouse_input(flags, x, y)
+
+    def key(self, vk, pressed=True, scan=None):
+        return self.inner.key(vk, pressed, scan)
+
+    def get_last_error(self):
+        return 0
+
+
+def test_anchor_reported_to_on_event_without_move_to():
+    events = sample_events(300)
+    seen = []
+    ok = play_recording(RelativeOnly(), [dict(ev, t_us=0) for ev in events], on_event=lambda ev, ok: seen.append(ok))
+    assert len(seen) == len(events)
+    assert ok == len(events)
+
+
+def test_anchor_applied_through_move_to():
+    backend = MemoryBackend()
+    play_recording(backend, [{"t_us": 0, "type": "move", "dx": 5, "dy": 5}, {"t_us": 0, "type": "anchor", "x": -300, "y": 7}])
+    assert (backend.x, backend.y) == (-300, 7)
+
+
+def test_iter_recording_streams_v2_and_v3(tmp_path):
+    events = sample_events(500)
+    path = tmp_path / "a.json"
+    save_recording(events, path)
+    assert list(iter_recording(path, chunk_size=97)) == events
+    legacy = tmp_path / "v2.json"
+    legacy.write_text(json.dumps({"version": 2, "events": [{"t": 3, "type": "move", "dx": 1, "dy": 0}]}))
+    assert list(iter_recording(legacy)) == [{"t_us": 3000, "type": "move", "dx": 1, "dy": 0}]
+
+
+def test_sleep_until_is_never_early_and_rarely_late():
+    lateness = []
+    for wait_ns in (100_000, SPIN_THRESHOLD_NS // 2, SPIN_THRESHOLD_NS * 2, 5_000_000) * 5:
+        deadline = time.perf_counter_ns() + wait_ns
+        sleep_until(deadline)
+        lateness.append(time.perf_counter_ns() - deadline)
+    assert min(lateness) >= 0
+    # The last stretch is spun, so the deadline is overshot by scheduling noise only
+    assert statistics.median(lateness) < 500_000
+
+
+def test_recording_keeps_anchors():
+    pytest.importorskip("numpy")
+    events = sample_events(2001)
+    rec = Recording.from_events(events)
+    assert len(rec) == 2001
+    assert rec.to_events() == events
+
+
+# Plain-Python reference versions of the Recording transforms
+
+
+def ref_scale(events, sx, sy):
+    out, acc, emitted = [], [0.0, 0.0], [0, 0]
+    for ev in events:
+        if ev["type"] != "move":
+            out.append(dict(ev))
+            continue
+        deltas = []
+        for i, (axis, factor) in enumerate((("dx", sx), ("dy", sy))):
+            acc[i] += ev[axis] * factor
+            total = round(acc[i])
+            deltas.append(total - emitted[i])
+            emitted[i] = total
+        out.append(dict(ev, dx=deltas[0], dy=deltas[1]))
+    return out
+
+
+def ref_time_warp(events, factor, offset_us):
+    return [dict(ev, t_us=round(ev["t_us"] * factor) + offset_us) for ev in events]
+
+
+def ref_trim(events, start_us, end_us):
+    return [
+        dict(ev, t_us=ev["t_us"] - start_us)
+        for ev in events
+        if ev["t_us"] >= start_us and (end_us is None or ev["t_us"] < end_us)
+    ]
+
+
+def ref_concat(events, other, gap_us):
+    offset = (events[-1]["t_us"] if events else 0) + gap_us
+    return [dict(ev) for ev in events] + [dict(ev, t_us=ev["t_us"] + offset) for ev in other]
+
+
+def random_events(rng, n):
+    events, t = [], 0
+    for _ in range(n):
+        t += rng.randrange(0, 5000)
+        kind = rng.random()
+        if kind < 0.8:
+            events.append({"t_us": t, "type": "move", "dx": rng.randint(-40, 40), "dy": rng.randint(-40, 40)})
+        elif kind < 0.9:
+            events.append({"t_us": t, "type": "button", "flag": rng.choice([1, 2, 4, 8])})
+        elif kind < 0.97:
+            events.append({"t_us": t, "type": "key", "vk": rng.randint(1, 254), "pressed": rng.random() < 0.5})
+        else:
+            events.append({"t_us": t, "type": "anchor", "x": rng.randint(-1920, 3839), "y": rng.randint(0, 1079)})
+    return events
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_recording_transforms_match_reference(seed):
+    pytest.importorskip("numpy")
+    import random
+
+    rng = random.Random(seed)
+    events = random_events(rng, 3000)
+    other = random_events(rng, 500)
+    sx, sy = rng.uniform(0.3, 3.0), rng.uniform(0.3, 3.0)
+    factor = rng.uniform(0.1, 4.0)
+    start = events[len(events) // 4]["t_us"]
+    end = events[3 * len(events) // 4]["t_us"]
+    rec = Recording.from_events(events)
+
+    assert rec.scale(sx, sy).to_events() == ref_scale(events, sx, sy)
+    assert rec.time_warp(factor, 250).to_events() == ref_time_warp(events, factor, 250)
+    assert rec.trim(start, end).to_events() == ref_trim(events, start, end)
+    assert rec.filter_types("move", "key").to_events() == [ev for ev in events if ev["type"] in ("move", "key")]
+    assert rec.concat(Recording.from_events(other), 1000).to_events() == ref_concat(events, other, 1000)
+    chained = rec.trim(start, None).scale(sx, sy).time_warp(factor)
+    assert chained.to_events() == ref_time_warp(ref_scale(ref_trim(events, start, None), sx, sy), factor, 0)
+
+
+def test_recording_load_matches_iter_recording(tmp_path):
+    pytest.importorskip("numpy")
+    path = tmp_path / "a.json"
+    save_recording(sample_events(1500), path)
+    assert Recording.load(path).to_events() == list(iter_recording(path))
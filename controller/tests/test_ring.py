@@ -0,0 +1,136 @@
+"""Ring protocol against an mmap-backed ring and the loopback driver stand-in."""
+
+import ctypes
+
+import pytest
+
+from backend_memory import MemoryBackend
+from ring import (
+    HEADER_SIZE,
+    LoopbackRingDevice,
+    RingConsumer,
+    RingProducer,
+    RingTransport,
+    _OFF_HEAD,
+    _OFF_TAIL,
+    _U32,
+    create_mmap_ring,
+    init_ring,
+    ring_size,
+)
+
+
+def address_of(transport: RingTransport) -> tuple[int, int]:
+    """(address, size) of a transport's ring, as RingTransport.open passes them to map_ring."""
+    anchor = ctypes.c_char.from_buffer(transport._mm)
+    address = ctypes.addressof(anchor)
+    del anchor
+    return address, len(transport._mm)
+
+
+def drain_all(consumer: RingConsumer) -> list[tuple[int, int, int]]:
+    out = []
+    consumer.drain(lambda f, x, y: out.append((f, x, y)) or 0)
+    return out
+
+
+def test_capacity_must_be_power_of_two():
+    for bad in (0, 3, 100, 131072):
+        with pytest.raises(ValueError):
+            init_ring(bytearray(ring_size(max(bad, 1))), bad)
+    with pytest.raises(ValueError):
+        init_ring(bytearray(HEADER_SIZE), 4)
+
+
+def test_full_ring_rejects_until_drained():
+    mm = create_mmap_ring(4)
+    producer, consumer = RingProducer(mm), RingConsumer(mm)
+    assert producer.push_many([(0, i, 0) for i in range(6)]) == 4
+    assert producer.free() == 0
+    assert not producer.push(0, 99, 0)
+    assert drain_all(consumer) == [(0, i, 0) for i in range(4)]
+    assert producer.free() == 4 and producer.pending() == 0
+    assert producer.push(0, 99, 0)
+
+
+def test_slots_wrap_around():
+    mm = create_mmap_ring(4)
+    producer, consumer = RingProducer(mm), RingConsumer(mm)
+    got = []
+    for batch in range(10):
+        events = [(0, batch, i) for i in range(3)]
+        assert producer.push_many(events) == 3
+        got += drain_all(consumer)
+    assert got == [(0, b, i) for b in range(10) for i in range(3)]
+    st = producer.status()
+    assert st["consumed"] == 30 and st["pending"] == 0
+
+
+def test_indices_wrap_at_32_bits():
+    mm = create_mmap_ring(8)
+    start = 0xFFFFFFFE
+    _U32.pack_into(mm, _OFF_HEAD, start)
+    _U32.pack_into(mm, _OFF_TAIL, start)
+    producer, consumer = RingProducer(mm), RingConsumer(mm)
+    assert producer.push_many([(0, i, 0) for i in range(5)]) == 5
+    assert producer.head == 3 and producer.pending() == 5
+    assert [x for _, x, _ in drain_all(consumer)] == list(range(5))
+    assert producer.tail == 3
+
+
+def test_corrupt_head_is_refused():
+    mm = create_mmap_ring(4)
+    consumer = RingConsumer(mm)
+    _U32.pack_into(mm, _OFF_HEAD, 100)
+    with pytest.raises(ValueError):
+        consumer.drain(lambda f, x, y: 0)
+
+
+def test_failures_are_counted_in_header_and_driver():
+    backend = MemoryBackend(fail_every=3)
+    device = LoopbackRingDevice(backend)
+    transport = RingTransport(device, capacity=4)
+    assert transport.open()
+    results = [transport.move_mouse(1, 0) for _ in range(9)]
+    assert results == [True, True, False] * 3
+    st = transport.get_ring_status()
+    assert st["consumed"] == 9 and st["failed"] == 3 and st["last_inject_status"] < 0
+    assert device.get_status() == {"total_requests": 9, "failed_requests": 3}
+    assert backend.x == 6
+    transport.close()
+
+
+def test_doorbell_drains_batches_larger_than_the_ring():
+    backend = MemoryBackend()
+    transport = RingTransport(LoopbackRingDevice(backend), capacity=8)
+    assert transport.open()
+    assert transport.submit([(0, 1, -1)] * 100) == 100
+    assert (backend.x, backend.y) == (100, -100)
+    assert transport.get_ring_status()["pending"] == 0
+    transport.close()
+
+
+def test_doorbell_without_mapping_fails():
+    device = LoopbackRingDevice(MemoryBackend())
+    assert not device.ring_doorbell()
+    assert device.get_last_error() == LoopbackRingDevice.ERROR_NOT_READY
+
+
+def test_second_handle_cannot_take_over_the_ring():
+    backend = MemoryBackend()
+    first = LoopbackRingDevice(backend)
+    second = LoopbackRingDevice(backend, share_with=first)
+    a = RingTransport(first, capacity=4)
+    b = RingTransport(second, capacity=4)
+    assert a.open()
+    assert not b.open()
+    assert second.get_last_error() == LoopbackRingDevice.ERROR_BUSY
+    # The first mapping keeps working, and the second handle cannot drain it
+    assert a.move_mouse(5, 0)
+    assert not second.ring_doorbell()
+    assert first.map_ring(*address_of(a))  # the owner may remap
+    a.close()
+    assert b.open()
+    assert b.move_mouse(1, 0)
+    assert backend.x == 6
+    b.close()
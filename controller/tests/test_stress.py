@@ -0,0 +1,135 @@
+"""StressTest ramp/knee logic on SaturatingBackend's virtual clock (runs instantly)."""
+
+from stress import (
+    SaturatingBackend,
+    StressTest,
+    VirtualClock,
+    ramp_rates,
+    run_step,
+    saturation_reason,
+)
+
+
+class SpikyBackend(SaturatingBackend):
+    """SaturatingBackend that fails every call while spiking is set."""
+
+    def __init__(self, **kw) -> None:
+        super().__init__(**kw)
+        self.spiking = False
+
+    def mouse_input(self, button_flags, x, y):
+        if self.spiking:
+            self.clock.advance(self.call_ns)
+            self._total += 1
+            self._failed += 1
+            return False
+        return super().mouse_input(button_flags, x, y)
+
+
+def step(target_hz, achieved_hz=None, sent=1000, client_failed=0, driver_failed=0, p99=10.0):
+    return {
+        "target_hz": target_hz,
+        "achieved_hz": target_hz if achieved_hz is None else achieved_hz,
+        "sent": sent,
+        "client_failed": client_failed,
+        "driver_failed": driver_failed,
+        "latency_p99_us": p99,
+    }
+
+
+def test_ramp_rates():
+    assert ramp_rates(250, 2000) == [250, 500, 1000, 2000]
+    assert ramp_rates(100, 50) == []
+
+
+def test_finds_knee_of_saturating_backend():
+    result = StressTest(SaturatingBackend(capacity_hz=8000), step_s=0.25).run()
+    assert result["knee_hz"] == 16000
+    assert result["sustainable_hz"] == 8000
+    assert result["reason"].startswith("achieved")
+    assert not result["cancelled"]
+    # The knee plus one confirming step, then it stops ramping
+    assert [s["target_hz"] for s in result["steps"]][-2:] == [16000, 32000]
+
+
+def test_knee_follows_capacity():
+    result = StressTest(SaturatingBackend(capacity_hz=2000), step_s=0.25).run()
+    assert result["sustainable_hz"] == 2000
+    assert result["knee_hz"] == 4000
+
+
+def test_one_off_spike_is_not_the_knee():
+    backend = SpikyBackend(capacity_hz=8000)
+    test = StressTest(backend, step_s=0.25)
+
+    def on_step(s):
+        # Fail the whole 1000/s step only
+        backend.spiking = s["target_hz"] == 500
+
+    result = test.run(on_step=on_step)
+    by_rate = {s["target_hz"]: s for s in result["steps"]}
+    assert by_rate[1000]["saturated"]
+    assert not by_rate[2000]["saturated"]
+    assert result["knee_hz"] == 16000
+    assert result["sustainable_hz"] == 8000
+
+
+def test_without_confirmation_first_saturated_step_ends_the_run():
+    backend = SpikyBackend(capacity_hz=8000)
+    test = StressTest(backend, step_s=0.25, confirm_steps=0)
+    result = test.run(on_step=lambda s: setattr(backend, "spiking", s["target_hz"] == 500))
+    assert result["knee_hz"] == 1000
+    assert result["sustainable_hz"] == 500
+    assert result["steps"][-1]["target_hz"] == 1000
+
+
+def test_stop_between_steps():
+    test = StressTest(SaturatingBackend(), step_s=0.25)
+    result = test.run(on_step=lambda s: test.stop())
+    assert result["cancelled"]
+    assert len(result["steps"]) == 1
+
+
+def test_stop_mid_step():
+    backend = SaturatingBackend()
+    test = StressTest(backend, step_s=1.0)
+    calls = 0
+    inner = backend.move_mouse
+
+    def move_mouse(x, y):
+        nonlocal calls
+        calls += 1
+        if calls == 100:
+            test.stop()
+        return inner(x, y)
+
+    backend.move_mouse = move_mouse
+    result = test.run()
+    assert result["cancelled"]
+    assert [s["sent"] for s in result["steps"]] == [100]
+
+
+def test_run_step_counts_driver_failures_and_gives_up():
+    clock = VirtualClock()
+    backend = SaturatingBackend(capacity_hz=1000, queue_limit=8, clock=clock)
+    s = run_step(backend, 4000, 0.5, clock.now_ns, clock.sleep_until)
+    assert s["client_failed"] > 0
+    assert s["driver_failed"] == s["client_failed"]
+    assert s["last_inject_status"] < 0
+    # Slow calls: the step is cut off after twice its duration
+    slow = SaturatingBackend(call_ns=10_000_000, clock=VirtualClock())
+    s = run_step(slow, 1000, 0.1, slow.clock.now_ns, slow.clock.sleep_until)
+    assert s["sent"] < 100
+    assert saturation_reason(s, None).startswith("achieved")
+
+
+def test_saturation_reason_thresholds():
+    base = step(250, p99=20.0)
+    assert saturation_reason(step(500), base) is None
+    assert "failed" in saturation_reason(step(500, client_failed=2), base)
+    assert "failed" in saturation_reason(step(500, driver_failed=5), base)
+    assert "achieved" in saturation_reason(step(500, achieved_hz=400), base)
+    # Latency: needs both 3x the baseline and the absolute floor
+    assert saturation_reason(step(500, p99=61.0), base) is None
+    assert "latency" in saturation_reason(step(500, p99=71.0), base)
+    assert saturation_reason(step(500, p99=71.0), None) is None
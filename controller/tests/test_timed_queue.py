@@ -0,0 +1,61 @@
+"""TimedEventQueue: due-time ordering, release slack, capacity and counters."""
+
+import random
+
+from timed_queue import RELEASE_SLACK_US, TimedEventQueue
+
+
+def test_releases_in_due_order_across_batches():
+    q = TimedEventQueue()
+    rng = random.Random(3)
+    batches = [[(rng.randrange(0, 10_000), 0, i, b) for i in range(50)] for b in range(5)]
+    for b, batch in enumerate(batches):
+        assert q.submit(b * 1000, batch)
+    released = q.release_due(1_000_000)
+    dues = [due for due, _, _, _ in released]
+    assert dues == sorted(dues)
+    assert len(released) == 250
+    assert len(q) == 0
+
+
+def test_equal_due_times_keep_submission_order():
+    q = TimedEventQueue()
+    q.submit(0, [(500, 0, i, 0) for i in range(10)])
+    q.submit(0, [(500, 0, i, 1) for i in range(10, 20)])
+    assert [x for _, _, x, _ in q.release_due(500)] == list(range(20))
+
+
+def test_due_times_are_relative_to_submission():
+    q = TimedEventQueue()
+    q.submit(1_000, [(100, 0, 1, 0)])
+    q.submit(0, [(600, 0, 2, 0)])
+    assert q.next_due_us() == 600
+    assert [x for _, _, x, _ in q.release_due(2_000)] == [2, 1]
+
+
+def test_slack_releases_events_due_just_after_now():
+    q = TimedEventQueue(slack_us=RELEASE_SLACK_US)
+    q.submit(0, [(1000, 0, 1, 0), (1000 + RELEASE_SLACK_US, 0, 2, 0), (1001 + RELEASE_SLACK_US, 0, 3, 0)])
+    assert q.release_due(999 - RELEASE_SLACK_US) == []
+    assert [x for _, _, x, _ in q.release_due(1000)] == [1, 2]
+    assert q.next_due_us() == 1001 + RELEASE_SLACK_US
+
+
+def test_lateness_tracks_the_latest_release():
+    q = TimedEventQueue()
+    q.submit(0, [(100, 0, 0, 0), (1_000, 0, 0, 0)])
+    q.release_due(150)
+    assert q.info()["max_lateness_us"] == 50
+    q.release_due(2_000)
+    assert q.info()["max_lateness_us"] == 1_000
+
+
+def test_batches_are_all_or_nothing():
+    q = TimedEventQueue(capacity=10)
+    assert q.submit(0, [(i, 0, 0, 0) for i in range(6)])
+    assert not q.submit(0, [(i, 0, 0, 0) for i in range(5)])
+    assert len(q) == 6
+    assert q.submit(0, [(i, 0, 0, 0) for i in range(4)])
+    assert q.cancel() == 10
+    info = q.info()
+    assert (info["depth"], info["total_scheduled"], info["total_cancelled"]) == (0, 10, 10)
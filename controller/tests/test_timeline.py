@@ -0,0 +1,158 @@
+"""TimelineScheduler: priority order within a slice, slicing, cancellation and failing backends (fake clock)."""
+
+import threading
+
+from timeline import TimelineScheduler
+
+
+class FakeClock:
+    """Frozen at `now` until a test moves it; with step > 0 every read advances it."""
+
+    def __init__(self) -> None:
+        self.now = 0
+        self.step = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> int:
+        with self._lock:
+            t = self.now
+            self.now += self.step
+            return t
+
+
+class BatchBackend:
+    """Records each submit() as one batch of (button_flags, x, y)."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[tuple[int, int, int]]] = []
+
+    def submit(self, batch) -> int:
+        self.batches.append(list(batch))
+        return len(batch)
+
+    def sent(self) -> list[tuple[int, int, int]]:
+        return [e for b in self.batches for e in b]
+
+
+class RaisingBackend:
+    def mouse_input(self, button_flags: int, x: int, y: int) -> bool:
+        raise OSError("device gone")
+
+
+def moves(*pairs):
+    """(t_us, dx) pairs -> move events; events start at 3 ms so nothing is due while the clock is frozen at 0."""
+    return [{"type": "move", "t_us": t, "dx": dx, "dy": 0} for t, dx in pairs]
+
+
+def test_higher_priority_goes_first_within_a_slice():
+    clock, backend = FakeClock(), BatchBackend()
+    sched = TimelineScheduler(backend, clock_ns=clock)
+    try:
+        low = sched.add(moves((3000, 1), (3050, 2)), priority=0)
+        high = sched.add(moves((3100, 10), (3150, 11)), priority=5)
+        clock.now = 3_200_000
+        assert sched.wait(low, 2) and sched.wait(high, 2)
+        assert backend.batches == [[(0, 10, 0), (0, 11, 0), (0, 1, 0), (0, 2, 0)]]
+        assert sched.total_batches == 1
+    finally:
+        sched.close()
+
+
+def test_equal_priority_interleaves_by_deadline():
+    clock, backend = FakeClock(), BatchBackend()
+    sched = TimelineScheduler(backend, clock_ns=clock)
+    try:
+        a = sched.add(moves((3000, 1), (3100, 3)))
+        b = sched.add(moves((3050, 2), (3150, 4)))
+        clock.now = 3_200_000
+        assert sched.wait(a, 2) and sched.wait(b, 2)
+        assert [dx for _, dx, _ in backend.sent()] == [1, 2, 3, 4]
+    finally:
+        sched.close()
+
+
+def test_events_further_apart_than_a_slice_go_in_separate_batches():
+    clock, backend = FakeClock(), BatchBackend()
+    sched = TimelineScheduler(backend, clock_ns=clock)
+    try:
+        tid = sched.add(moves((3000, 1), (3200, 2), (5000, 3)))
+        clock.step = 20_000
+        clock.now = 3_000_000
+        assert sched.wait(tid, 2)
+        assert [[dx for _, dx, _ in b] for b in backend.batches] == [[1, 2], [3]]
+    finally:
+        sched.close()
+
+
+def test_cancel_stops_the_remaining_events():
+    clock, backend = FakeClock(), BatchBackend()
+    sched = TimelineScheduler(backend, clock_ns=clock)
+    try:
+        tid = sched.add(moves((3000, 1), (1_000_000, 2)))
+        clock.now = 3_100_000
+        for _ in range(200):
+            if backend.batches:
+                break
+            threading.Event().wait(0.005)
+        assert sched.active() == 1
+        assert sched.cancel(tid) == 1
+        assert sched.wait(tid, 1)
+        assert sched.status() == []
+        clock.now = 2_000_000_000
+        assert sched.cancel(tid) == 0
+        assert sched.active() == 0
+        assert backend.sent() == [(0, 1, 0)]
+    finally:
+        sched.close()
+
+
+def test_cancel_all_and_close():
+    clock, backend = FakeClock(), BatchBackend()
+    sched = TimelineScheduler(backend, clock_ns=clock)
+    tids = [sched.add(moves((1_000_000, i))) for i in range(3)]
+    assert sched.cancel() == 3
+    assert all(sched.wait(tid, 1) for tid in tids)
+    sched.close()
+    assert backend.batches == []
+
+
+def test_failing_backend_fails_only_its_timeline():
+    clock, good = FakeClock(), BatchBackend()
+    events = []
+    sched = TimelineScheduler(good, on_event=lambda tid, ev, ok: events.append((tid, ok)), clock_ns=clock)
+    try:
+        bad = sched.add(moves((3000, 1), (3050, 2), (9000, 3)), backend=RaisingBackend())
+        ok = sched.add(moves((3020, 5), (9000, 6)))
+        clock.step = 20_000
+        clock.now = 3_100_000
+        assert sched.wait(bad, 2) and sched.wait(ok, 2)
+        assert isinstance(sched.last_error, OSError)
+        assert [dx for _, dx, _ in good.sent()] == [5, 6]
+        assert (bad, False) in events and (bad, True) not in events
+        assert [r for r in events if r[0] == ok] == [(ok, True), (ok, True)]
+        assert sched.status() == []
+
+        # The scheduler thread is still running
+        later = sched.add(moves((0, 7)))
+        assert sched.wait(later, 2)
+        assert good.sent()[-1] == (0, 7, 0)
+    finally:
+        sched.close()
+
+
+def test_raising_event_source_fails_its_timeline_after_what_it_produced():
+    clock, backend = FakeClock(), BatchBackend()
+    sched = TimelineScheduler(backend, clock_ns=clock)
+
+    def source():
+        yield from moves((3000, 1))
+        raise ValueError("truncated recording")
+
+    try:
+        tid = sched.add(source())
+        clock.now = 3_100_000
+        assert sched.wait(tid, 2)
+        assert backend.sent() == [(0, 1, 0)]
+        assert isinstance(sched.last_error, ValueError)
+    finally:
+        sched.close()
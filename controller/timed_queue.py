@@ -0,0 +1,137 @@
+"""
+User-mode model of the driver's timed event queue (driver/timed_queue.c).
+Lets the schedule/cancel/queue-info semantics run without the driver, and
+gives backends without IOCTL_INPUT_HOG_SCHEDULE (e.g. User32Backend) the
+same scheduling API.
+"""
+
+import bisect
+import itertools
+import threading
+import time
+from typing import Callable, Optional
+
+from client import INPUT_HOG_QUEUE_CAPACITY
+
+# Events due within this window are released together (matches RELEASE_SLACK)
+RELEASE_SLACK_US = 50
+
+
+class TimedEventQueue:
+    """
+    Pending (due_us, button_flags, x, y) events ordered by absolute due time.
+    Mirrors the driver: batches are all-or-nothing against capacity, due
+    times are relative to submission, and equal due times keep submission
+    order. Time is passed in explicitly, so the queue is fully deterministic.
+    """
+
+    def __init__(self, capacity: int = INPUT_HOG_QUEUE_CAPACITY, slack_us: int = RELEASE_SLACK_US) -> None:
+        self.capacity = capacity
+        self.slack_us = slack_us
+        self._pending: list[tuple[int, int, int, int, int]] = []  # (due, seq, flags, x, y)
+        self._seq = itertools.count()
+        self.total_scheduled = 0
+        self.total_released = 0
+        self.total_cancelled = 0
+        self.failed_releases = 0
+        self.max_lateness_us = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(self, now_us: int, events) -> bool:
+        """Queue a batch relative to now_us. Returns False (queue unchanged) if it does not fit."""
+        batch = list(events)
+        if len(batch) > self.capacity - len(self._pending):
+            return False
+        for due_us, flags, x, y in batch:
+            bisect.insort(self._pending, (now_us + int(due_us), next(self._seq), flags, x, y))
+        self.total_scheduled += len(batch)
+        return True
+
+    def next_due_us(self) -> Optional[int]:
+        return self._pending[0][0] if self._pending else None
+
+    def release_due(self, now_us: int) -> list[tuple[int, int, int, int]]:
+        """Pop every event due by now_us (+ slack). Returns (due_us, flags, x, y) in order."""
+        n = 0
+        while n < len(self._pending) and self._pending[n][0] <= now_us + self.slack_us:
+            n += 1
+        released, self._pending = self._pending[:n], self._pending[n:]
+        for due, _, _, _, _ in released:
+            self.max_lateness_us = max(self.max_lateness_us, now_us - due)
+        self.total_released += n
+        return [(due, flags, x, y) for due, _, flags, x, y in released]
+
+    def cancel(self) -> int:
+        removed = len(self._pending)
+        self._pending = []
+        self.total_cancelled += removed
+        return removed
+
+    def info(self) -> dict:
+        """Same keys as InputHogClient.get_queue_info()."""
+        return {
+            "depth": len(self._pending),
+            "capacity": self.capacity,
+            "total_scheduled": self.total_scheduled,
+            "total_released": self.total_released,
+            "total_cancelled": self.total_cancelled,
+            "failed_releases": self.failed_releases,
+            "max_lateness_us": self.max_lateness_us,
+        }
+
+
+class ThreadedScheduler:
+    """
+    Runs a TimedEventQueue on a worker thread and releases due events through
+    backend.mouse_input. Offers the InputHogClient schedule/cancel/
+    get_queue_info API on top of any backend.
+    """
+
+    def __init__(self, backend, clock_us: Optional[Callable[[], int]] = None) -> None:
+        self._backend = backend
+        self._clock_us = clock_us or (lambda: time.perf_counter_ns() // 1000)
+        self._queue = TimedEventQueue()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def schedule(self, events) -> bool:
+        with self._cond:
+            ok = self._queue.submit(self._clock_us(), events)
+            self._cond.notify()
+        return ok
+
+    def cancel(self) -> int:
+        with self._cond:
+            removed = self._queue.cancel()
+            self._cond.notify()
+        return removed
+
+    def get_queue_info(self) -> dict:
+        with self._cond:
+            return self._queue.info()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        with self._cond:
+            while not self._closed:
+                due = self._queue.next_due_us()
+                now = self._clock_us()
+                if due is None:
+                    self._cond.wait()
+                    continue
+                if due > now + self._queue.slack_us:
+                    self._cond.wait((due - now) / 1_000_000)
+                    continue
+                # Release under the lock, like the driver, so cancel() cannot interleave
+                for _, flags, x, y in self._queue.release_due(now):
+                    if not self._backend.mouse_input(flags, x, y):
+                        self._queue.failed_releases += 1
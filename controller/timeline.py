@@ -0,0 +1,384 @@
+"""
+Concurrent timeline scheduler.
+One thread merges any number of timelines (recordings, patterns, scripted
+event lists) in deadline order and sends each due slice to the backend as a
+single batch, so a keyboard macro and a mouse pattern can run together
+without two sleep loops competing for the CPU.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from client import INPUT_EVENT_TYPES
+from recording import SPIN_THRESHOLD_NS, _inject_key, sleep_until
+
+# Timeline events due within this window of each other go out in one batch
+SLICE_NS = 250_000
+
+PENDING, RUNNING, PAUSED, DONE, CANCELLED, FAILED = "pending", "running", "paused", "done", "cancelled", "failed"
+
+
+def submit_batch(backend, batch: list[tuple[int, int, int]]) -> list[bool]:
+    """
+    Send (button_flags, x, y) events in one call where the backend allows it:
+    RingTransport.submit (one doorbell), then InputHogClient.schedule (one
+    IOCTL, due now), else one mouse_input per event. Returns per-event success.
+    """
+    if hasattr(backend, "submit"):
+        sent = backend.submit(batch)
+        return [i < sent for i in range(len(batch))]
+    if hasattr(backend, "schedule") and len(batch) > 1:
+        ok = backend.schedule([(0, flags, x, y) for flags, x, y in batch])
+        return [ok] * len(batch)
+    return [backend.mouse_input(flags, x, y) for flags, x, y in batch]
+
+
+class _Timeline:
+    def __init__(self, tid: int, events: Iterable[dict], name: str, priority: int, backend, start_ns: int) -> None:
+        self.id = tid
+        self.name = name
+        self.priority = priority
+        self.backend = backend
+        self.start_ns = start_ns
+        self.state = PENDING
+        self.events = iter(events)
+        self.head: Optional[dict] = None
+        self.gen = 0  # bumped to invalidate the heap entry on pause/priority change
+        self.paused_at = 0
+        self.sent = 0
+        self.failed = 0
+        self.advancing = False  # the scheduler thread is reading events outside the lock
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+    def advance(self) -> bool:
+        self.head = next(self.events, None)
+        return self.head is not None
+
+    def due_ns(self, ev: Optional[dict] = None) -> int:
+        return self.start_ns + (self.head if ev is None else ev).get("t_us", 0) * 1000
+
+
+class TimelineScheduler:
+    """
+    Heap of timeline heads ordered by (deadline, -priority). Only the next
+    event of each timeline is in the heap, so recordings can be streamed
+    (iter_recording) without loading them. Timelines can be paused (their
+    remaining events shift by the pause length), resumed, cancelled and
+    re-prioritised. Higher priority goes first within a slice.
+    A backend or event source that raises fails only its own timelines
+    (state "failed", last_error set); the others keep playing.
+    on_event(timeline_id, event, ok) runs on the scheduler thread.
+    """
+
+    def __init__(
+        self,
+        backend,
+        on_event: Optional[Callable[[int, dict, bool], None]] = None,
+        clock_ns: Callable[[], int] = time.perf_counter_ns,
+    ) -> None:
+        self.backend = backend
+        self._on_event = on_event
+        self._clock_ns = clock_ns
+        self._cond = threading.Condition()
+        self._heap: list[tuple[int, int, int, int, int]] = []  # (due_ns, -priority, seq, id, gen)
+        self._timelines: dict[int, _Timeline] = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._closed = False
+        self.total_batches = 0
+        self.last_error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="inputhog-timelines", daemon=True)
+        self._thread.start()
+
+    def add(
+        self,
+        events: Iterable[dict],
+        name: str = "",
+        priority: int = 0,
+        start_delay_us: int = 0,
+        backend=None,
+    ) -> int:
+        """Start a timeline of recording-format events (t_us relative to its start). Returns its id."""
+        with self._cond:
+            tid = next(self._ids)
+            tl = _Timeline(tid, events, name or f"timeline {tid}", priority, backend or self.backend,
+                           self._clock_ns() + start_delay_us * 1000)
+            self._timelines[tid] = tl
+            if tl.advance():
+                self._push(tl)
+            else:
+                self._finish(tl, DONE)
+            self._cond.notify()
+        return tid
+
+    def pause(self, tid: int) -> bool:
+        with self._cond:
+            tl = self._timelines.get(tid)
+            if tl is None or tl.state not in (PENDING, RUNNING):
+                return False
+            tl.state = PAUSED
+            tl.paused_at = self._clock_ns()
+            tl.gen += 1
+            return True
+
+    def resume(self, tid: int) -> bool:
+        with self._cond:
+            tl = self._timelines.get(tid)
+            if tl is None or tl.state != PAUSED:
+                return False
+            tl.start_ns += self._clock_ns() - tl.paused_at
+            tl.state = RUNNING
+            if tl.advancing:
+                pass  # the scheduler thread pushes the next head when it has read it
+            elif tl.head is None:
+                self._complete(tl)  # paused after its last event went out
+            else:
+                self._push(tl)
+            self._cond.notify()
+            return True
+
+    def cancel(self, tid: Optional[int] = None) -> int:
+        """Cancel one timeline, or every unfinished one if tid is None. Returns how many."""
+        with self._cond:
+            if tid is None:
+                targets = list(self._timelines.values())
+            else:
+                targets = [self._timelines[tid]] if tid in self._timelines else []
+            n = 0
+            for tl in targets:
+                if tl.state in (PENDING, RUNNING, PAUSED):
+                    tl.gen += 1
+                    self._finish(tl, CANCELLED)
+                    n += 1
+            self._cond.notify()
+            return n
+
+    def set_priority(self, tid: int, priority: int) -> bool:
+        with self._cond:
+            tl = self._timelines.get(tid)
+            if tl is None or tl.state in (DONE, CANCELLED):
+                return False
+            tl.priority = priority
+            if tl.state != PAUSED and tl.head is not None and not tl.advancing:
+                self._push(tl)
+            return True
+
+    def wait(self, tid: int, timeout: Optional[float] = None) -> bool:
+        """Block until the timeline is done, cancelled or failed."""
+        tl = self._timelines.get(tid)
+        return tl is None or tl.done.wait(timeout)
+
+    def status(self) -> list[dict]:
+        with self._cond:
+            return [
+                {"id": tl.id, "name": tl.name, "state": tl.state, "priority": tl.priority,
+                 "sent": tl.sent, "failed": tl.failed}
+                for tl in self._timelines.values()
+            ]
+
+    def active(self) -> int:
+        with self._cond:
+            return sum(1 for tl in self._timelines.values() if tl.state in (PENDING, RUNNING, PAUSED))
+
+    def close(self) -> None:
+        self.cancel()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _push(self, tl: _Timeline) -> None:
+        tl.gen += 1
+        heapq.heappush(self._heap, (tl.due_ns(), -tl.priority, next(self._seq), tl.id, tl.gen))
+
+    def _complete(self, tl: _Timeline) -> None:
+        self._finish(tl, DONE if tl.error is None else FAILED)
+
+    def _finish(self, tl: _Timeline, state: str) -> None:
+        tl.state = state
+        tl.head = None
+        tl.done.set()
+        # Drop finished timelines so status() stays short
+        self._timelines.pop(tl.id, None)
+
+    def _live(self, entry) -> Optional[_Timeline]:
+        tl = self._timelines.get(entry[3])
+        return tl if tl is not None and tl.gen == entry[4] and tl.state in (PENDING, RUNNING) else None
+
+    def _take_slice(self, now: int) -> list[tuple[_Timeline, dict]]:
+        """
+        Every event due by now + SLICE_NS, higher priority first, then by
+        deadline. The heads are popped under the lock; the events behind them
+        are read with the lock released, since a streamed recording may block
+        on file I/O and add/pause/cancel must not wait for it.
+        """
+        horizon = now + SLICE_NS
+        with self._cond:
+            taken = []
+            while self._heap and self._heap[0][0] <= horizon:
+                tl = self._live(heapq.heappop(self._heap))
+                if tl is None:
+                    continue
+                tl.state = RUNNING
+                tl.advancing = True
+                tl.gen += 1
+                taken.append((tl, tl.head))
+                tl.head = None
+        pulled = [(tl, *self._pull(tl, head, horizon)) for tl, head in taken]
+        out = []
+        with self._cond:
+            for tl, events, nxt in pulled:
+                tl.advancing = False
+                if tl.state not in (RUNNING, PAUSED):
+                    continue  # cancelled meanwhile
+                tl.head = nxt
+                if nxt is not None and tl.state == RUNNING:
+                    self._push(tl)
+                out.extend((-tl.priority, due, len(out) + i, tl, ev) for i, (due, ev) in enumerate(events))
+        out.sort(key=lambda e: e[:3])
+        return [(tl, ev) for _, _, _, tl, ev in out]
+
+    def _pull(self, tl: _Timeline, head: dict, horizon: int) -> tuple[list[tuple[int, dict]], Optional[dict]]:
+        """Read tl's events due by horizon after head. Returns ([(due_ns, event)], next head or None)."""
+        events = [(tl.due_ns(head), head)]
+        try:
+            for ev in tl.events:
+                # Clamped so a timeline's own events never reorder in the sort
+                due = max(tl.due_ns(ev), events[-1][0])
+                if due > horizon:
+                    return events, ev
+                events.append((due, ev))
+        except Exception as exc:
+            tl.error = exc
+            self.last_error = exc
+        return events, None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    while self._heap and self._live(self._heap[0]) is None:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    due = self._heap[0][0]
+                    wait_ns = due - self._clock_ns() - SPIN_THRESHOLD_NS
+                    if wait_ns <= 0:
+                        break
+                    self._cond.wait(wait_ns / 1e9)
+            sleep_until(due)
+            batch = self._take_slice(self._clock_ns())
+            if batch:
+                try:
+                    self._dispatch(batch)
+                except Exception as exc:
+                    # e.g. a malformed event or a raising on_event: fail this batch's timelines, keep the rest
+                    with self._cond:
+                        self.last_error = exc
+                        for tl, _ in batch:
+                            if tl.state in (PENDING, RUNNING, PAUSED):
+                                tl.error = tl.error or exc
+                                tl.gen += 1
+                                self._finish(tl, FAILED)
+
+    def _dispatch(self, batch: list[tuple[_Timeline, dict]]) -> None:
+        """
+        Each backend's run goes out as one batch. Backends with send_events
+        (the driver client) take mouse, key and anchor events in one ordered
+        batch; for the others keys and anchors flush the mouse run before them.
+        A backend call that raises fails the timelines it was sending for.
+        """
+        results: list[bool] = []
+        run: list = []  # (button_flags, x, y), or event dicts for send_events
+        run_tls: list[_Timeline] = []
+        run_backend = None
+        mixed = False
+        errors: dict[_Timeline, Exception] = {}
+
+        def flush() -> None:
+            if run:
+                try:
+                    if mixed:
+                        sent = run_backend.send_events(run)
+                        results.extend(i < sent for i in range(len(run)))
+                    else:
+                        results.extend(submit_batch(run_backend, run))
+                except Exception as exc:
+                    results.extend([False] * len(run))
+                    errors.update((tl, exc) for tl in run_tls)
+                self.total_batches += 1
+                run.clear()
+                run_tls.clear()
+
+        def call(tl: _Timeline, fn, *args) -> None:
+            try:
+                results.append(fn(*args))
+            except Exception as exc:
+                results.append(False)
+                errors[tl] = exc
+
+        for tl, ev in batch:
+            ev_type = ev.get("type", "")
+            if tl.backend is not run_backend:
+                flush()
+                run_backend = tl.backend
+                mixed = hasattr(run_backend, "send_events")
+            if mixed and ev_type in INPUT_EVENT_TYPES:
+                run.append(ev)
+                run_tls.append(tl)
+                continue
+            if ev_type == "key":
+                flush()
+                vk = ev.get("vk")
+                if vk is not None and hasattr(tl.backend, "key"):
+                    call(tl, tl.backend.key, int(vk), ev.get("pressed", True))
+                    continue
+                try:
+                    _inject_key(int(vk), ev.get("pressed", True))
+                    results.append(True)
+                except Exception:
+                    results.append(False)
+                continue
+            if ev_type == "anchor":
+                flush()
+                if hasattr(tl.backend, "move_to"):
+                    call(tl, tl.backend.move_to, ev.get("x", 0), ev.get("y", 0))
+                else:
+                    results.append(True)  # a hint only; relative moves still play
+                continue
+            if ev_type == "move":
+                run.append((0, ev.get("dx", 0), ev.get("dy", 0)))
+                run_tls.append(tl)
+            elif ev_type == "button":
+                run.append((ev.get("flag", 0), 0, 0))
+                run_tls.append(tl)
+            else:
+                flush()
+                results.append(False)
+        flush()
+
+        with self._cond:
+            for (tl, ev), ok in zip(batch, results):
+                if ok:
+                    tl.sent += 1
+                else:
+                    tl.failed += 1
+            for tl, exc in errors.items():
+                tl.error = exc
+                self.last_error = exc
+            for tl, _ in batch:
+                if tl.error is not None and tl.state in (PENDING, RUNNING, PAUSED):
+                    tl.gen += 1
+                    self._finish(tl, FAILED)
+                elif tl.head is None and tl.state == RUNNING:
+                    self._complete(tl)
+        if self._on_event:
+            for (tl, ev), ok in zip(batch, results):
+                self._on_event(tl.id, ev, ok)
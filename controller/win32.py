@@ -0,0 +1,49 @@
+"""
+Win32 pieces shared by the modules that own hidden windows (rawinput.py,
+display.py): WNDCLASSW, WNDPROC, a user32 handle with the window functions'
+prototypes set, and the absolute-coordinate range of mouse input.
+Importable anywhere; WNDPROC exists only on Windows.
+"""
+
+import ctypes
+import sys
+from ctypes import wintypes
+
+IS_WINDOWS = sys.platform == "win32"
+
+# Absolute mouse coordinates run 0..65535; Windows maps n to pixel floor(n * span / 65536)
+ABSOLUTE_RANGE = 65535
+ABSOLUTE_SPAN = ABSOLUTE_RANGE + 1
+
+
+class WNDCLASSW(ctypes.Structure):
+    _fields_ = [
+        ("style", ctypes.c_uint),
+        ("lpfnWndProc", ctypes.c_void_p),
+        ("cbClsExtra", ctypes.c_int),
+        ("cbWndExtra", ctypes.c_int),
+        ("hInstance", ctypes.c_void_p),
+        ("hIcon", ctypes.c_void_p),
+        ("hCursor", ctypes.c_void_p),
+        ("hbrBackground", ctypes.c_void_p),
+        ("lpszMenuName", ctypes.c_wchar_p),
+        ("lpszClassName", ctypes.c_wchar_p),
+    ]
+
+
+if IS_WINDOWS:
+    WNDPROC = ctypes.WINFUNCTYPE(ctypes.c_ssize_t, wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+
+
+def user32():
+    """user32 with DefWindowProcW / CreateWindowExW prototypes set (64-bit safe handles)."""
+    lib = ctypes.windll.user32
+    lib.DefWindowProcW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+    lib.DefWindowProcW.restype = ctypes.c_ssize_t
+    lib.CreateWindowExW.argtypes = [
+        wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD,
+        ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+        wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID,
+    ]
+    lib.CreateWindowExW.restype = wintypes.HWND
+    return lib
@@ -2,10 +2,13 @@
 #include <wdm.h>
 #include "../shared/ioctl.h"
 #include "injection.h"
+#include "timed_queue.h"
+#include "ring.h"
+#include "journal.h"
 
 #define DEVICE_NAME L"\\Device\\InputHog"
 #define SYMLINK_NAME L"\\DosDevices\\InputHog"
-#define INPUT_HOG_STATUS_VERSION 1
+#define INPUT_HOG_STATUS_VERSION 2
 
 static PDEVICE_OBJECT g_DeviceObject = NULL;
 static volatile LONG g_TotalRequests = 0;
@@ -23,6 +26,7 @@ static VOID FillStatus(PINPUT_HOG_STATUS status)
     status->lastInjectStatus = g_LastInjectStatus;
     status->totalRequests = (ULONG)g_TotalRequests;
     status->failedRequests = (ULONG)g_FailedRequests;
+    status->keyboardCallbackFound = InjectionKeyboardReady() ? 1u : 0u;
 }
 
 static NTSTATUS DeviceCreate(PDEVICE_OBJECT DeviceObject, PIRP Irp)
@@ -43,6 +47,18 @@ static NTSTATUS DeviceClose(PDEVICE_OBJECT DeviceObject, PIRP Irp)
     return STATUS_SUCCESS;
 }
 
+static NTSTATUS DeviceCleanup(PDEVICE_OBJECT DeviceObject, PIRP Irp)
+{
+    UNREFERENCED_PARAMETER(DeviceObject);
+    // Last handle on this file object closed: drop its ring mapping while
+    // still in the owning process context
+    RingUnmap(IoGetCurrentIrpStackLocation(Irp)->FileObject);
+    Irp->IoStatus.Status = STATUS_SUCCESS;
+    Irp->IoStatus.Information = 0;
+    IoCompleteRequest(Irp, IO_NO_INCREMENT);
+    return STATUS_SUCCESS;
+}
+
 static NTSTATUS DeviceControl(PDEVICE_OBJECT DeviceObject, PIRP Irp)
 {
     UNREFERENCED_PARAMETER(DeviceObject);
@@ -77,17 +93,140 @@ static NTSTATUS DeviceControl(PDEVICE_OBJECT DeviceObject, PIRP Irp)
         } else {
             status = STATUS_BUFFER_TOO_SMALL;
         }
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_MOVE_ABSOLUTE) {
+        if (Irp->AssociatedIrp.SystemBuffer == NULL) {
+            status = STATUS_INVALID_PARAMETER;
+        } else if (stack->Parameters.DeviceIoControl.InputBufferLength >= sizeof(MOUSE_ABSOLUTE_REQUEST)) {
+            PMOUSE_ABSOLUTE_REQUEST req = (PMOUSE_ABSOLUTE_REQUEST)Irp->AssociatedIrp.SystemBuffer;
+            InterlockedIncrement(&g_TotalRequests);
+            status = InjectMouseAbsolute(req->buttonFlags, req->x, req->y);
+            g_LastInjectStatus = status;
+            if (!NT_SUCCESS(status))
+                InterlockedIncrement(&g_FailedRequests);
+        } else {
+            status = STATUS_BUFFER_TOO_SMALL;
+        }
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_KEYBOARD_INPUT) {
+        if (Irp->AssociatedIrp.SystemBuffer == NULL) {
+            status = STATUS_INVALID_PARAMETER;
+        } else if (stack->Parameters.DeviceIoControl.InputBufferLength >= sizeof(KEYBOARD_INPUT_REQUEST)) {
+            PKEYBOARD_INPUT_REQUEST req = (PKEYBOARD_INPUT_REQUEST)Irp->AssociatedIrp.SystemBuffer;
+            InterlockedIncrement(&g_TotalRequests);
+            status = InjectKeyboardInput(req->makeCode, req->flags);
+            g_LastInjectStatus = status;
+            if (!NT_SUCCESS(status))
+                InterlockedIncrement(&g_FailedRequests);
+        } else {
+            status = STATUS_BUFFER_TOO_SMALL;
+        }
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_INPUT_BATCH) {
+        ULONG inLen = stack->Parameters.DeviceIoControl.InputBufferLength;
+        if (Irp->AssociatedIrp.SystemBuffer == NULL) {
+            status = STATUS_INVALID_PARAMETER;
+        } else if (inLen >= FIELD_OFFSET(INPUT_BATCH_REQUEST, entries)) {
+            PINPUT_BATCH_REQUEST req = (PINPUT_BATCH_REQUEST)Irp->AssociatedIrp.SystemBuffer;
+            ULONG count = req->count;
+            ULONG maxCount = (inLen - FIELD_OFFSET(INPUT_BATCH_REQUEST, entries)) / sizeof(INPUT_BATCH_ENTRY);
+            if (count > maxCount) {
+                status = STATUS_BUFFER_TOO_SMALL;
+            } else if (count > INPUT_HOG_BATCH_MAX) {
+                status = STATUS_INVALID_PARAMETER;
+            } else {
+                ULONG injected = 0;
+                status = InjectInputBatch(req->entries, count, &injected);
+                InterlockedExchangeAdd(&g_TotalRequests, (LONG)count);
+                g_LastInjectStatus = status;
+                if (!NT_SUCCESS(status))
+                    InterlockedExchangeAdd(&g_FailedRequests, (LONG)count);
+                // Output shares SystemBuffer with the (already consumed) input
+                if (stack->Parameters.DeviceIoControl.OutputBufferLength >= sizeof(ULONG)) {
+                    *(PULONG)Irp->AssociatedIrp.SystemBuffer = injected;
+                    information = sizeof(ULONG);
+                }
+            }
+        } else {
+            status = STATUS_BUFFER_TOO_SMALL;
+        }
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_JOURNAL_READ) {
+        ULONG outLen = stack->Parameters.DeviceIoControl.OutputBufferLength;
+        if (Irp->AssociatedIrp.SystemBuffer == NULL) {
+            status = STATUS_INVALID_PARAMETER;
+        } else if (stack->Parameters.DeviceIoControl.InputBufferLength < sizeof(JOURNAL_READ_REQUEST) ||
+                   outLen < sizeof(INPUT_HOG_JOURNAL_HEADER)) {
+            status = STATUS_BUFFER_TOO_SMALL;
+        } else {
+            // Input and output share SystemBuffer: take the request before writing
+            ULONGLONG since = ((PJOURNAL_READ_REQUEST)Irp->AssociatedIrp.SystemBuffer)->sinceSequence;
+            PINPUT_HOG_JOURNAL_HEADER header = (PINPUT_HOG_JOURNAL_HEADER)Irp->AssociatedIrp.SystemBuffer;
+            ULONG maxEntries = (outLen - sizeof(INPUT_HOG_JOURNAL_HEADER)) / sizeof(INPUT_HOG_JOURNAL_ENTRY);
+            ULONG count = JournalRead(since, header, (PINPUT_HOG_JOURNAL_ENTRY)(header + 1), maxEntries);
+            information = sizeof(INPUT_HOG_JOURNAL_HEADER) + (ULONG_PTR)count * sizeof(INPUT_HOG_JOURNAL_ENTRY);
+            status = STATUS_SUCCESS;
+        }
     } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_GET_STATUS) {
+        // Version 1 clients pass the status struct without keyboardCallbackFound
+        ULONG outLen = stack->Parameters.DeviceIoControl.OutputBufferLength;
+        if (Irp->AssociatedIrp.SystemBuffer == NULL) {
+            status = STATUS_INVALID_PARAMETER;
+        } else if (outLen >= FIELD_OFFSET(INPUT_HOG_STATUS, keyboardCallbackFound)) {
+            INPUT_HOG_STATUS current;
+            FillStatus(&current);
+            information = min(outLen, sizeof(INPUT_HOG_STATUS));
+            RtlCopyMemory(Irp->AssociatedIrp.SystemBuffer, &current, information);
+            status = STATUS_SUCCESS;
+        } else {
+            status = STATUS_BUFFER_TOO_SMALL;
+        }
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_SCHEDULE) {
+        ULONG inLen = stack->Parameters.DeviceIoControl.InputBufferLength;
+        if (Irp->AssociatedIrp.SystemBuffer == NULL) {
+            status = STATUS_INVALID_PARAMETER;
+        } else if (inLen >= FIELD_OFFSET(SCHEDULE_REQUEST, entries)) {
+            PSCHEDULE_REQUEST req = (PSCHEDULE_REQUEST)Irp->AssociatedIrp.SystemBuffer;
+            ULONG maxCount = (inLen - FIELD_OFFSET(SCHEDULE_REQUEST, entries)) / sizeof(SCHEDULED_INPUT);
+            if (req->count > maxCount)
+                status = STATUS_BUFFER_TOO_SMALL;
+            else
+                status = TimedQueueSubmit(req->entries, req->count);
+        } else {
+            status = STATUS_BUFFER_TOO_SMALL;
+        }
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_CANCEL) {
+        ULONG removed = TimedQueueCancel();
+        if (Irp->AssociatedIrp.SystemBuffer != NULL &&
+            stack->Parameters.DeviceIoControl.OutputBufferLength >= sizeof(ULONG)) {
+            *(PULONG)Irp->AssociatedIrp.SystemBuffer = removed;
+            information = sizeof(ULONG);
+        }
+        status = STATUS_SUCCESS;
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_QUEUE_INFO) {
         if (Irp->AssociatedIrp.SystemBuffer == NULL) {
             status = STATUS_INVALID_PARAMETER;
-        } else if (stack->Parameters.DeviceIoControl.OutputBufferLength >= sizeof(INPUT_HOG_STATUS)) {
-            PINPUT_HOG_STATUS outStatus = (PINPUT_HOG_STATUS)Irp->AssociatedIrp.SystemBuffer;
-            FillStatus(outStatus);
-            information = sizeof(INPUT_HOG_STATUS);
+        } else if (stack->Parameters.DeviceIoControl.OutputBufferLength >= sizeof(INPUT_HOG_QUEUE_INFO)) {
+            TimedQueueQuery((PINPUT_HOG_QUEUE_INFO)Irp->AssociatedIrp.SystemBuffer);
+            information = sizeof(INPUT_HOG_QUEUE_INFO);
             status = STATUS_SUCCESS;
         } else {
             status = STATUS_BUFFER_TOO_SMALL;
         }
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_RING_MAP) {
+        if (Irp->AssociatedIrp.SystemBuffer == NULL) {
+            status = STATUS_INVALID_PARAMETER;
+        } else if (stack->Parameters.DeviceIoControl.InputBufferLength >= sizeof(RING_MAP_REQUEST)) {
+            PRING_MAP_REQUEST req = (PRING_MAP_REQUEST)Irp->AssociatedIrp.SystemBuffer;
+            status = RingMap(req->address, req->size, stack->FileObject);
+        } else {
+            status = STATUS_BUFFER_TOO_SMALL;
+        }
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_RING_UNMAP) {
+        RingUnmap(stack->FileObject);
+        status = STATUS_SUCCESS;
+    } else if (stack->Parameters.DeviceIoControl.IoControlCode == IOCTL_INPUT_HOG_RING_DOORBELL) {
+        ULONG consumed = 0;
+        ULONG failed = 0;
+        status = RingDrain(stack->FileObject, &consumed, &failed);
+        InterlockedExchangeAdd(&g_TotalRequests, (LONG)consumed);
+        InterlockedExchangeAdd(&g_FailedRequests, (LONG)failed);
     } else {
         status = STATUS_INVALID_DEVICE_REQUEST;
     }
@@ -107,6 +246,8 @@ static VOID DriverUnload(PDRIVER_OBJECT DriverObject)
     if (g_DeviceObject)
         IoDeleteDevice(g_DeviceObject);
 
+    RingUnmap(NULL);
+    TimedQueueCleanup();
     g_InjectionInitialized = FALSE;
     InjectionCleanup();
 }
@@ -115,12 +256,21 @@ NTSTATUS DriverEntry(PDRIVER_OBJECT DriverObject, PUNICODE_STRING RegistryPath)
 {
     UNREFERENCED_PARAMETER(RegistryPath);
 
+    JournalInitialize();
     NTSTATUS status = InjectionInitialize();
     g_LastInitStatus = status;
     if (!NT_SUCCESS(status))
         return status;
     g_InjectionInitialized = InjectionIsReady();
 
+    RingInitialize();
+    status = TimedQueueInitialize();
+    if (!NT_SUCCESS(status)) {
+        g_InjectionInitialized = FALSE;
+        InjectionCleanup();
+        return status;
+    }
+
     UNICODE_STRING deviceName;
     RtlInitUnicodeString(&deviceName, DEVICE_NAME);
 
@@ -134,6 +284,7 @@ NTSTATUS DriverEntry(PDRIVER_OBJECT DriverObject, PUNICODE_STRING RegistryPath)
         &g_DeviceObject
     );
     if (!NT_SUCCESS(status)) {
+        TimedQueueCleanup();
         g_InjectionInitialized = FALSE;
         InjectionCleanup();
         return status;
@@ -144,6 +295,7 @@ NTSTATUS DriverEntry(PDRIVER_OBJECT DriverObject, PUNICODE_STRING RegistryPath)
     status = IoCreateSymbolicLink(&symlinkName, &deviceName);
     if (!NT_SUCCESS(status)) {
         IoDeleteDevice(g_DeviceObject);
+        TimedQueueCleanup();
         g_InjectionInitialized = FALSE;
         InjectionCleanup();
         return status;
@@ -151,6 +303,7 @@ NTSTATUS DriverEntry(PDRIVER_OBJECT DriverObject, PUNICODE_STRING RegistryPath)
 
     DriverObject->DriverUnload = DriverUnload;
     DriverObject->MajorFunction[IRP_MJ_CREATE] = DeviceCreate;
+    DriverObject->MajorFunction[IRP_MJ_CLEANUP] = DeviceCleanup;
     DriverObject->MajorFunction[IRP_MJ_CLOSE] = DeviceClose;
     DriverObject->MajorFunction[IRP_MJ_DEVICE_CONTROL] = DeviceControl;
 
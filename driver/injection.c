@@ -1,4 +1,5 @@
 #include "injection.h"
+#include "journal.h"
 #include "../shared/ioctl.h"
 
 extern POBJECT_TYPE* IoDriverObjectType;
@@ -30,17 +31,48 @@ typedef VOID (NTAPI *MOUSE_SERVICE_CALLBACK)(
     PULONG InputDataConsumed
 );
 
+typedef struct _KEYBOARD_INPUT_DATA {
+    USHORT UnitId;
+    USHORT MakeCode;
+    USHORT Flags;
+    USHORT Reserved;
+    ULONG  ExtraInformation;
+} KEYBOARD_INPUT_DATA, *PKEYBOARD_INPUT_DATA;
+
+typedef VOID (NTAPI *KEYBOARD_SERVICE_CALLBACK)(
+    PDEVICE_OBJECT DeviceObject,
+    PKEYBOARD_INPUT_DATA InputDataStart,
+    PKEYBOARD_INPUT_DATA InputDataEnd,
+    PULONG InputDataConsumed
+);
+
 #define MOUSE_MOVE_RELATIVE 0
+#define MOUSE_MOVE_ABSOLUTE 1
+#define MOUSE_VIRTUAL_DESKTOP 2
 #define MOUSE_RIGHT_BUTTON_DOWN 0x0004
 #define MOUSE_RIGHT_BUTTON_UP   0x0008
 
+#define INPUT_HOG_KEY_FLAGS_MASK (INPUT_HOG_KEY_BREAK | INPUT_HOG_KEY_E0 | INPUT_HOG_KEY_E1)
+
+// Consecutive batch entries of one device go to its callback together, in
+// chunks of this many
+#define BATCH_CHUNK 16
+
 static PDEVICE_OBJECT g_ClassDeviceObject = NULL;
 static MOUSE_SERVICE_CALLBACK g_ServiceCallback = NULL;
+static PDEVICE_OBJECT g_KbdClassDeviceObject = NULL;
+static KEYBOARD_SERVICE_CALLBACK g_KbdServiceCallback = NULL;
 
-static NTSTATUS FindMouseCallback(VOID)
+// Find a class driver's service callback: the port driver's device extension
+// stores the class device object followed by the class service callback.
+static NTSTATUS FindClassCallback(
+    PCWSTR ClassName,
+    PCWSTR PortName,
+    PDEVICE_OBJECT* ClassDeviceOut,
+    PVOID* CallbackOut)
 {
     UNICODE_STRING classDriverName;
-    RtlInitUnicodeString(&classDriverName, L"\\Driver\\MouClass");
+    RtlInitUnicodeString(&classDriverName, ClassName);
 
     PDRIVER_OBJECT classDriverObject = NULL;
     NTSTATUS status = ObReferenceObjectByName(
@@ -56,51 +88,51 @@ static NTSTATUS FindMouseCallback(VOID)
     if (!NT_SUCCESS(status))
         return status;
 
-    UNICODE_STRING hidDriverName;
-    RtlInitUnicodeString(&hidDriverName, L"\\Driver\\MouHID");
+    UNICODE_STRING portDriverName;
+    RtlInitUnicodeString(&portDriverName, PortName);
 
-    PDRIVER_OBJECT hidDriverObject = NULL;
+    PDRIVER_OBJECT portDriverObject = NULL;
     status = ObReferenceObjectByName(
-        &hidDriverName,
+        &portDriverName,
         OBJ_CASE_INSENSITIVE,
         NULL,
         0,
         *IoDriverObjectType,
         KernelMode,
         NULL,
-        &hidDriverObject
+        &portDriverObject
     );
     if (!NT_SUCCESS(status)) {
         ObfDereferenceObject(classDriverObject);
         return status;
     }
 
-    PDEVICE_OBJECT hidDevice = hidDriverObject->DeviceObject;
-    while (hidDevice) {
+    PDEVICE_OBJECT portDevice = portDriverObject->DeviceObject;
+    while (portDevice) {
         PDEVICE_OBJECT classDevice = classDriverObject->DeviceObject;
         while (classDevice) {
-            PULONG_PTR ext = (PULONG_PTR)hidDevice->DeviceExtension;
+            PULONG_PTR ext = (PULONG_PTR)portDevice->DeviceExtension;
 
             for (SIZE_T i = 0; i + 1 < DEVICE_EXT_SCAN_COUNT; i++) {
                 if (ext[i] == (ULONG_PTR)classDevice &&
                     ext[i + 1] > (ULONG_PTR)classDriverObject->DriverStart) {
-                    g_ClassDeviceObject = classDevice;
-                    g_ServiceCallback = (MOUSE_SERVICE_CALLBACK)ext[i + 1];
+                    *ClassDeviceOut = classDevice;
+                    *CallbackOut = (PVOID)ext[i + 1];
                     ObfDereferenceObject(classDriverObject);
-                    ObfDereferenceObject(hidDriverObject);
+                    ObfDereferenceObject(portDriverObject);
                     return STATUS_SUCCESS;
                 }
             }
             classDevice = classDevice->NextDevice;
         }
-        hidDevice = hidDevice->NextDevice;
+        portDevice = portDevice->NextDevice;
     }
 
-    if (!g_ClassDeviceObject) {
+    if (!*ClassDeviceOut) {
         PDEVICE_OBJECT dev = classDriverObject->DeviceObject;
         while (dev) {
             if (!dev->NextDevice) {
-                g_ClassDeviceObject = dev;
+                *ClassDeviceOut = dev;
                 break;
             }
             dev = dev->NextDevice;
@@ -108,25 +140,63 @@ static NTSTATUS FindMouseCallback(VOID)
     }
 
     ObfDereferenceObject(classDriverObject);
-    ObfDereferenceObject(hidDriverObject);
-    return (g_ClassDeviceObject && g_ServiceCallback) ? STATUS_SUCCESS : STATUS_NOT_FOUND;
+    ObfDereferenceObject(portDriverObject);
+    return (*ClassDeviceOut && *CallbackOut) ? STATUS_SUCCESS : STATUS_NOT_FOUND;
+}
+
+static NTSTATUS FindMouseCallback(VOID)
+{
+    PVOID callback = NULL;
+    NTSTATUS status = FindClassCallback(
+        L"\\Driver\\MouClass", L"\\Driver\\MouHID", &g_ClassDeviceObject, &callback);
+    g_ServiceCallback = (MOUSE_SERVICE_CALLBACK)callback;
+    return status;
+}
+
+static NTSTATUS FindKeyboardCallback(VOID)
+{
+    // USB/Bluetooth keyboards sit on KbdHID, built-in PS/2 keyboards on i8042prt
+    static const PCWSTR portNames[] = { L"\\Driver\\KbdHID", L"\\Driver\\i8042prt" };
+    NTSTATUS status = STATUS_NOT_FOUND;
+
+    for (ULONG i = 0; i < ARRAYSIZE(portNames); i++) {
+        PDEVICE_OBJECT classDevice = NULL;
+        PVOID callback = NULL;
+        status = FindClassCallback(L"\\Driver\\KbdClass", portNames[i], &classDevice, &callback);
+        if (NT_SUCCESS(status)) {
+            g_KbdClassDeviceObject = classDevice;
+            g_KbdServiceCallback = (KEYBOARD_SERVICE_CALLBACK)callback;
+            return status;
+        }
+    }
+    return status;
 }
 
 NTSTATUS InjectionInitialize(VOID)
 {
-    return FindMouseCallback();
+    NTSTATUS status = FindMouseCallback();
+    if (!NT_SUCCESS(status))
+        return status;
+    // Keyboard injection is optional: without a KbdClass callback only
+    // keyboard requests fail (STATUS_DEVICE_NOT_READY)
+    FindKeyboardCallback();
+    return STATUS_SUCCESS;
 }
 
 VOID InjectionCleanup(VOID)
 {
     g_ClassDeviceObject = NULL;
     g_ServiceCallback = NULL;
+    g_KbdClassDeviceObject = NULL;
+    g_KbdServiceCallback = NULL;
 }
 
 NTSTATUS InjectMouseMove(LONG DeltaX, LONG DeltaY)
 {
-    if (!g_ServiceCallback || !g_ClassDeviceObject)
+    if (!g_ServiceCallback || !g_ClassDeviceObject) {
+        JournalRecord(INPUT_HOG_ENTRY_MOUSE, 0, DeltaX, DeltaY, STATUS_DEVICE_NOT_READY);
         return STATUS_DEVICE_NOT_READY;
+    }
 
     MOUSE_INPUT_DATA data = { 0 };
     data.UnitId = 0;
@@ -143,13 +213,16 @@ NTSTATUS InjectMouseMove(LONG DeltaX, LONG DeltaY)
         &consumed
     );
 
+    JournalRecord(INPUT_HOG_ENTRY_MOUSE, 0, DeltaX, DeltaY, STATUS_SUCCESS);
     return STATUS_SUCCESS;
 }
 
 NTSTATUS InjectMouseInput(USHORT ButtonFlags, LONG DeltaX, LONG DeltaY)
 {
-    if (!g_ServiceCallback || !g_ClassDeviceObject)
+    if (!g_ServiceCallback || !g_ClassDeviceObject) {
+        JournalRecord(INPUT_HOG_ENTRY_MOUSE, ButtonFlags, DeltaX, DeltaY, STATUS_DEVICE_NOT_READY);
         return STATUS_DEVICE_NOT_READY;
+    }
 
     MOUSE_INPUT_DATA data = { 0 };
     data.UnitId = 0;
@@ -166,6 +239,153 @@ NTSTATUS InjectMouseInput(USHORT ButtonFlags, LONG DeltaX, LONG DeltaY)
         &consumed
     );
 
+    JournalRecord(INPUT_HOG_ENTRY_MOUSE, ButtonFlags, DeltaX, DeltaY, STATUS_SUCCESS);
+    return STATUS_SUCCESS;
+}
+
+NTSTATUS InjectMouseAbsolute(USHORT ButtonFlags, LONG X, LONG Y)
+{
+    NTSTATUS status = STATUS_SUCCESS;
+    if (!g_ServiceCallback || !g_ClassDeviceObject)
+        status = STATUS_DEVICE_NOT_READY;
+    else if (X < 0 || X > INPUT_HOG_ABSOLUTE_MAX || Y < 0 || Y > INPUT_HOG_ABSOLUTE_MAX)
+        status = STATUS_INVALID_PARAMETER;
+    if (!NT_SUCCESS(status)) {
+        JournalRecord(INPUT_HOG_ENTRY_MOUSE_ABSOLUTE, ButtonFlags, X, Y, status);
+        return status;
+    }
+
+    MOUSE_INPUT_DATA data = { 0 };
+    data.UnitId = 0;
+    data.Flags = MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP;
+    data.ButtonFlags = ButtonFlags;
+    data.LastX = X;
+    data.LastY = Y;
+
+    ULONG consumed = 0;
+    g_ServiceCallback(
+        g_ClassDeviceObject,
+        &data,
+        &data + 1,
+        &consumed
+    );
+
+    JournalRecord(INPUT_HOG_ENTRY_MOUSE_ABSOLUTE, ButtonFlags, X, Y, STATUS_SUCCESS);
+    return STATUS_SUCCESS;
+}
+
+NTSTATUS InjectKeyboardInput(USHORT MakeCode, USHORT Flags)
+{
+    NTSTATUS status = STATUS_SUCCESS;
+    if (!g_KbdServiceCallback || !g_KbdClassDeviceObject)
+        status = STATUS_DEVICE_NOT_READY;
+    else if (Flags & ~INPUT_HOG_KEY_FLAGS_MASK)
+        status = STATUS_INVALID_PARAMETER;
+    if (!NT_SUCCESS(status)) {
+        JournalRecord(INPUT_HOG_ENTRY_KEYBOARD, Flags, MakeCode, 0, status);
+        return status;
+    }
+
+    KEYBOARD_INPUT_DATA data = { 0 };
+    data.UnitId = 0;
+    data.MakeCode = MakeCode;
+    data.Flags = Flags;
+
+    ULONG consumed = 0;
+    g_KbdServiceCallback(
+        g_KbdClassDeviceObject,
+        &data,
+        &data + 1,
+        &consumed
+    );
+
+    JournalRecord(INPUT_HOG_ENTRY_KEYBOARD, Flags, MakeCode, 0, STATUS_SUCCESS);
+    return STATUS_SUCCESS;
+}
+
+static NTSTATUS ValidateBatchEntry(PINPUT_BATCH_ENTRY Entry)
+{
+    switch (Entry->type) {
+    case INPUT_HOG_ENTRY_MOUSE:
+        return InjectionIsReady() ? STATUS_SUCCESS : STATUS_DEVICE_NOT_READY;
+    case INPUT_HOG_ENTRY_MOUSE_ABSOLUTE:
+        if (!InjectionIsReady())
+            return STATUS_DEVICE_NOT_READY;
+        if (Entry->x < 0 || Entry->x > INPUT_HOG_ABSOLUTE_MAX ||
+            Entry->y < 0 || Entry->y > INPUT_HOG_ABSOLUTE_MAX)
+            return STATUS_INVALID_PARAMETER;
+        return STATUS_SUCCESS;
+    case INPUT_HOG_ENTRY_KEYBOARD:
+        if (!InjectionKeyboardReady())
+            return STATUS_DEVICE_NOT_READY;
+        if ((Entry->flags & ~INPUT_HOG_KEY_FLAGS_MASK) || Entry->x < 0 || Entry->x > 0xFFFF)
+            return STATUS_INVALID_PARAMETER;
+        return STATUS_SUCCESS;
+    default:
+        return STATUS_INVALID_PARAMETER;
+    }
+}
+
+NTSTATUS InjectInputBatch(PINPUT_BATCH_ENTRY Entries, ULONG Count, PULONG Injected)
+{
+    *Injected = 0;
+    for (ULONG i = 0; i < Count; i++) {
+        NTSTATUS status = ValidateBatchEntry(&Entries[i]);
+        if (!NT_SUCCESS(status)) {
+            // Only the offending entry is journaled; nothing was injected
+            JournalRecord(Entries[i].type, Entries[i].flags, Entries[i].x, Entries[i].y, status);
+            return status;
+        }
+    }
+
+    MOUSE_INPUT_DATA mouse[BATCH_CHUNK];
+    KEYBOARD_INPUT_DATA keys[BATCH_CHUNK];
+    ULONG mouseCount = 0;
+    ULONG keyCount = 0;
+    ULONG consumed;
+
+    for (ULONG i = 0; i < Count; i++) {
+        PINPUT_BATCH_ENTRY entry = &Entries[i];
+        BOOLEAN isKey = (entry->type == INPUT_HOG_ENTRY_KEYBOARD);
+        JournalRecord(entry->type, entry->flags, entry->x, entry->y, STATUS_SUCCESS);
+
+        // Hand over the other device's pending run first so order is kept
+        if (isKey && mouseCount) {
+            g_ServiceCallback(g_ClassDeviceObject, mouse, mouse + mouseCount, &consumed);
+            mouseCount = 0;
+        } else if (!isKey && keyCount) {
+            g_KbdServiceCallback(g_KbdClassDeviceObject, keys, keys + keyCount, &consumed);
+            keyCount = 0;
+        }
+
+        if (isKey) {
+            RtlZeroMemory(&keys[keyCount], sizeof(KEYBOARD_INPUT_DATA));
+            keys[keyCount].MakeCode = (USHORT)entry->x;
+            keys[keyCount].Flags = entry->flags;
+            if (++keyCount == BATCH_CHUNK) {
+                g_KbdServiceCallback(g_KbdClassDeviceObject, keys, keys + keyCount, &consumed);
+                keyCount = 0;
+            }
+        } else {
+            RtlZeroMemory(&mouse[mouseCount], sizeof(MOUSE_INPUT_DATA));
+            mouse[mouseCount].Flags = (entry->type == INPUT_HOG_ENTRY_MOUSE_ABSOLUTE)
+                ? (MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP)
+                : MOUSE_MOVE_RELATIVE;
+            mouse[mouseCount].ButtonFlags = entry->flags;
+            mouse[mouseCount].LastX = entry->x;
+            mouse[mouseCount].LastY = entry->y;
+            if (++mouseCount == BATCH_CHUNK) {
+                g_ServiceCallback(g_ClassDeviceObject, mouse, mouse + mouseCount, &consumed);
+                mouseCount = 0;
+            }
+        }
+    }
+    if (mouseCount)
+        g_ServiceCallback(g_ClassDeviceObject, mouse, mouse + mouseCount, &consumed);
+    if (keyCount)
+        g_KbdServiceCallback(g_KbdClassDeviceObject, keys, keys + keyCount, &consumed);
+
+    *Injected = Count;
     return STATUS_SUCCESS;
 }
 
@@ -173,3 +393,8 @@ BOOLEAN InjectionIsReady(VOID)
 {
     return (g_ServiceCallback != NULL && g_ClassDeviceObject != NULL) ? TRUE : FALSE;
 }
+
+BOOLEAN InjectionKeyboardReady(VOID)
+{
+    return (g_KbdServiceCallback != NULL && g_KbdClassDeviceObject != NULL) ? TRUE : FALSE;
+}
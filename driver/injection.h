@@ -2,6 +2,7 @@
 
 #include <ntddk.h>
 #include <wdm.h>
+#include "../shared/ioctl.h"
 
 NTSTATUS InjectionInitialize(VOID);
 
@@ -11,4 +12,13 @@ NTSTATUS InjectMouseMove(LONG DeltaX, LONG DeltaY);
 
 NTSTATUS InjectMouseInput(USHORT ButtonFlags, LONG DeltaX, LONG DeltaY);
 
+NTSTATUS InjectMouseAbsolute(USHORT ButtonFlags, LONG X, LONG Y);
+
+NTSTATUS InjectKeyboardInput(USHORT MakeCode, USHORT Flags);
+
+// Validates all entries, then injects them in order (all or none)
+NTSTATUS InjectInputBatch(PINPUT_BATCH_ENTRY Entries, ULONG Count, PULONG Injected);
+
 BOOLEAN InjectionIsReady(VOID);
+
+BOOLEAN InjectionKeyboardReady(VOID);
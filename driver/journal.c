@@ -0,0 +1,59 @@
+#include "journal.h"
+
+// Fixed-size ring of the most recent injections. Sequence numbers start at 1
+// and never repeat while the driver is loaded; entry n lives in slot
+// n % INPUT_HOG_JOURNAL_CAPACITY, so readers see overwritten entries as a
+// gap in the sequence.
+
+static INPUT_HOG_JOURNAL_ENTRY g_Journal[INPUT_HOG_JOURNAL_CAPACITY];
+static ULONGLONG g_NextSequence = 1;
+static LONGLONG g_QpcFrequency = 0;
+static KSPIN_LOCK g_JournalLock;
+
+VOID JournalInitialize(VOID)
+{
+    LARGE_INTEGER frequency;
+    KeInitializeSpinLock(&g_JournalLock);
+    KeQueryPerformanceCounter(&frequency);
+    g_QpcFrequency = frequency.QuadPart;
+    g_NextSequence = 1;
+}
+
+VOID JournalRecord(USHORT Type, USHORT Flags, LONG X, LONG Y, NTSTATUS Status)
+{
+    LARGE_INTEGER qpc = KeQueryPerformanceCounter(NULL);
+    KIRQL irql;
+    KeAcquireSpinLock(&g_JournalLock, &irql);
+    ULONGLONG sequence = g_NextSequence++;
+    PINPUT_HOG_JOURNAL_ENTRY entry = &g_Journal[sequence % INPUT_HOG_JOURNAL_CAPACITY];
+    entry->sequence = sequence;
+    entry->qpc = qpc.QuadPart;
+    entry->type = Type;
+    entry->flags = Flags;
+    entry->x = X;
+    entry->y = Y;
+    entry->status = Status;
+    KeReleaseSpinLock(&g_JournalLock, irql);
+}
+
+ULONG JournalRead(ULONGLONG Since, PINPUT_HOG_JOURNAL_HEADER Header, PINPUT_HOG_JOURNAL_ENTRY Entries, ULONG MaxEntries)
+{
+    ULONG count = 0;
+    KIRQL irql;
+    KeAcquireSpinLock(&g_JournalLock, &irql);
+    ULONGLONG next = g_NextSequence;
+    ULONGLONG oldest = (next > INPUT_HOG_JOURNAL_CAPACITY) ? next - INPUT_HOG_JOURNAL_CAPACITY : 1;
+    ULONGLONG first = (Since + 1 > oldest) ? Since + 1 : oldest;
+    for (ULONGLONG sequence = first; sequence < next && count < MaxEntries; sequence++)
+        Entries[count++] = g_Journal[sequence % INPUT_HOG_JOURNAL_CAPACITY];
+    KeReleaseSpinLock(&g_JournalLock, irql);
+
+    Header->version = INPUT_HOG_JOURNAL_VERSION;
+    Header->count = count;
+    Header->oldestSequence = oldest;
+    Header->nextSequence = next;
+    Header->qpcFrequency = g_QpcFrequency;
+    Header->capacity = INPUT_HOG_JOURNAL_CAPACITY;
+    Header->entrySize = sizeof(INPUT_HOG_JOURNAL_ENTRY);
+    return count;
+}
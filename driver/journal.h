@@ -0,0 +1,13 @@
+#pragma once
+
+#include <ntddk.h>
+#include <wdm.h>
+#include "../shared/ioctl.h"
+
+VOID JournalInitialize(VOID);
+
+// Record one injected event; callable at IRQL <= DISPATCH_LEVEL
+VOID JournalRecord(USHORT Type, USHORT Flags, LONG X, LONG Y, NTSTATUS Status);
+
+// Copy up to MaxEntries entries with sequence > Since (oldest first) and fill Header
+ULONG JournalRead(ULONGLONG Since, PINPUT_HOG_JOURNAL_HEADER Header, PINPUT_HOG_JOURNAL_ENTRY Entries, ULONG MaxEntries);
@@ -0,0 +1,131 @@
+#include "ring.h"
+#include "injection.h"
+
+// Single-producer/single-consumer ring shared with the controller.
+// The controller allocates it; the driver locks the pages and maps them
+// into system space, then drains slots on each doorbell IOCTL.
+
+static FAST_MUTEX g_RingLock;
+static PMDL g_RingMdl = NULL;
+static PINPUT_HOG_RING_HEADER g_RingHeader = NULL;
+static PMOUSE_INPUT_REQUEST g_RingSlots = NULL;
+static PFILE_OBJECT g_RingOwner = NULL;
+static ULONG g_RingCapacity = 0;  // private copy; the shared header is not trusted
+static ULONG g_RingTail = 0;
+
+VOID RingInitialize(VOID)
+{
+    ExInitializeFastMutex(&g_RingLock);
+}
+
+static VOID UnmapLocked(VOID)
+{
+    if (g_RingMdl) {
+        MmUnlockPages(g_RingMdl);
+        IoFreeMdl(g_RingMdl);
+    }
+    g_RingMdl = NULL;
+    g_RingHeader = NULL;
+    g_RingSlots = NULL;
+    g_RingOwner = NULL;
+    g_RingCapacity = 0;
+    g_RingTail = 0;
+}
+
+NTSTATUS RingMap(ULONGLONG UserAddress, ULONG Size, PFILE_OBJECT Owner)
+{
+    if (UserAddress == 0 || Size < sizeof(INPUT_HOG_RING_HEADER))
+        return STATUS_INVALID_PARAMETER;
+
+    PMDL mdl = IoAllocateMdl((PVOID)(ULONG_PTR)UserAddress, Size, FALSE, FALSE, NULL);
+    if (!mdl)
+        return STATUS_INSUFFICIENT_RESOURCES;
+    __try {
+        MmProbeAndLockPages(mdl, UserMode, IoWriteAccess);
+    } __except (EXCEPTION_EXECUTE_HANDLER) {
+        IoFreeMdl(mdl);
+        return GetExceptionCode();
+    }
+
+    PINPUT_HOG_RING_HEADER header = (PINPUT_HOG_RING_HEADER)MmGetSystemAddressForMdlSafe(
+        mdl, NormalPagePriority | MdlMappingNoExecute);
+    if (!header) {
+        MmUnlockPages(mdl);
+        IoFreeMdl(mdl);
+        return STATUS_INSUFFICIENT_RESOURCES;
+    }
+
+    ULONG capacity = header->capacity;
+    if (header->magic != INPUT_HOG_RING_MAGIC ||
+        capacity == 0 || capacity > INPUT_HOG_RING_MAX_CAPACITY ||
+        (capacity & (capacity - 1)) != 0 ||
+        sizeof(INPUT_HOG_RING_HEADER) + (SIZE_T)capacity * sizeof(MOUSE_INPUT_REQUEST) > Size) {
+        MmUnlockPages(mdl);
+        IoFreeMdl(mdl);
+        return STATUS_INVALID_PARAMETER;
+    }
+
+    ExAcquireFastMutex(&g_RingLock);
+    if (g_RingHeader && g_RingOwner != Owner) {
+        // Another handle (process) owns the ring; it must unmap or close first
+        ExReleaseFastMutex(&g_RingLock);
+        MmUnlockPages(mdl);
+        IoFreeMdl(mdl);
+        return STATUS_DEVICE_BUSY;
+    }
+    UnmapLocked();
+    g_RingMdl = mdl;
+    g_RingHeader = header;
+    g_RingSlots = (PMOUSE_INPUT_REQUEST)(header + 1);
+    g_RingOwner = Owner;
+    g_RingCapacity = capacity;
+    g_RingTail = header->tail;
+    ExReleaseFastMutex(&g_RingLock);
+    return STATUS_SUCCESS;
+}
+
+VOID RingUnmap(PFILE_OBJECT Owner)
+{
+    ExAcquireFastMutex(&g_RingLock);
+    if (Owner == NULL || Owner == g_RingOwner)
+        UnmapLocked();
+    ExReleaseFastMutex(&g_RingLock);
+}
+
+NTSTATUS RingDrain(PFILE_OBJECT Owner, PULONG Consumed, PULONG Failed)
+{
+    NTSTATUS status = STATUS_SUCCESS;
+    ULONG consumed = 0;
+    ULONG failed = 0;
+
+    ExAcquireFastMutex(&g_RingLock);
+    if (!g_RingHeader || Owner != g_RingOwner) {
+        ExReleaseFastMutex(&g_RingLock);
+        return STATUS_DEVICE_NOT_READY;
+    }
+
+    ULONG head = ReadULongAcquire(&g_RingHeader->head);
+    if (head - g_RingTail > g_RingCapacity) {
+        // Producer index is corrupt; refuse rather than read stale slots
+        status = STATUS_DATA_ERROR;
+    } else {
+        while (g_RingTail != head) {
+            MOUSE_INPUT_REQUEST req = g_RingSlots[g_RingTail & (g_RingCapacity - 1)];
+            NTSTATUS injectStatus = InjectMouseInput(req.buttonFlags, req.x, req.y);
+            g_RingHeader->lastInjectStatus = injectStatus;
+            if (!NT_SUCCESS(injectStatus)) {
+                g_RingHeader->failed++;
+                failed++;
+            }
+            g_RingHeader->consumed++;
+            g_RingTail++;
+            consumed++;
+        }
+        WriteULongRelease(&g_RingHeader->tail, g_RingTail);
+    }
+    ExReleaseFastMutex(&g_RingLock);
+
+    *Consumed = consumed;
+    *Failed = failed;
+    return status;
+}
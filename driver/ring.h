@@ -0,0 +1,16 @@
+#pragma once
+
+#include <ntddk.h>
+#include <wdm.h>
+#include "../shared/ioctl.h"
+
+VOID RingInitialize(VOID);
+
+// STATUS_DEVICE_BUSY if another handle holds the mapping (the same handle may remap)
+NTSTATUS RingMap(ULONGLONG UserAddress, ULONG Size, PFILE_OBJECT Owner);
+
+// Unmap if Owner holds the mapping (NULL unmaps unconditionally)
+VOID RingUnmap(PFILE_OBJECT Owner);
+
+// Consumed / Failed: slots drained by this call and how many of them failed to inject
+NTSTATUS RingDrain(PFILE_OBJECT Owner, PULONG Consumed, PULONG Failed);
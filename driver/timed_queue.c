@@ -0,0 +1,192 @@
+#include "timed_queue.h"
+#include "injection.h"
+
+// Events due within this window are released together (100 ns units)
+#define RELEASE_SLACK 500
+
+typedef struct _QUEUED_INPUT {
+    ULONGLONG due;  // interrupt time, 100 ns units
+    USHORT buttonFlags;
+    LONG x;
+    LONG y;
+} QUEUED_INPUT;
+
+// Ring of pending events, kept sorted by due time (head = earliest)
+static QUEUED_INPUT g_Queue[INPUT_HOG_QUEUE_CAPACITY];
+static ULONG g_Head = 0;
+static ULONG g_Count = 0;
+static KSPIN_LOCK g_Lock;
+static PEX_TIMER g_Timer = NULL;
+
+// A submitted batch is sorted here before it is merged into the queue; used only under g_Lock
+static QUEUED_INPUT g_Batch[INPUT_HOG_QUEUE_CAPACITY];
+static QUEUED_INPUT g_Scratch[INPUT_HOG_QUEUE_CAPACITY];
+
+static ULONG g_TotalScheduled = 0;
+static ULONG g_TotalReleased = 0;
+static ULONG g_TotalCancelled = 0;
+static ULONG g_FailedReleases = 0;
+static ULONG g_MaxLatenessUs = 0;
+
+#define SLOT(i) g_Queue[(g_Head + (i)) % INPUT_HOG_QUEUE_CAPACITY]
+
+static ULONGLONG Now(VOID)
+{
+    ULONG64 qpc;
+    return KeQueryInterruptTimePrecise(&qpc);
+}
+
+// Arm the timer for the head of the queue. Caller holds g_Lock.
+static VOID ArmLocked(ULONGLONG now)
+{
+    if (g_Count == 0)
+        return;
+    LONGLONG delta = (LONGLONG)(SLOT(0).due - now);
+    if (delta < 1)
+        delta = 1;
+    ExSetTimer(g_Timer, -delta, 0, NULL);
+}
+
+static VOID TimerCallback(PEX_TIMER Timer, PVOID Context)
+{
+    UNREFERENCED_PARAMETER(Timer);
+    UNREFERENCED_PARAMETER(Context);
+
+    KIRQL irql;
+    KeAcquireSpinLock(&g_Lock, &irql);
+    ULONGLONG now = Now();
+    // Inject under the lock so releases from overlapping callbacks stay in order
+    while (g_Count > 0 && SLOT(0).due <= now + RELEASE_SLACK) {
+        QUEUED_INPUT ev = SLOT(0);
+        g_Head = (g_Head + 1) % INPUT_HOG_QUEUE_CAPACITY;
+        g_Count--;
+
+        if (now > ev.due) {
+            ULONG lateUs = (ULONG)((now - ev.due) / 10);
+            if (lateUs > g_MaxLatenessUs)
+                g_MaxLatenessUs = lateUs;
+        }
+        NTSTATUS status = InjectMouseInput(ev.buttonFlags, ev.x, ev.y);
+        g_TotalReleased++;
+        if (!NT_SUCCESS(status))
+            g_FailedReleases++;
+    }
+    ArmLocked(now);
+    KeReleaseSpinLock(&g_Lock, irql);
+}
+
+// Stable bottom-up merge sort of g_Batch[0..Count) by due. Caller holds g_Lock.
+static VOID SortBatchLocked(ULONG Count)
+{
+    BOOLEAN sorted = TRUE;
+    for (ULONG i = 1; i < Count && sorted; i++)
+        sorted = g_Batch[i - 1].due <= g_Batch[i].due;
+    if (sorted)
+        return;
+
+    QUEUED_INPUT* src = g_Batch;
+    QUEUED_INPUT* dst = g_Scratch;
+    for (ULONG width = 1; width < Count; width *= 2) {
+        for (ULONG lo = 0; lo < Count; lo += 2 * width) {
+            ULONG mid = (lo + width < Count) ? lo + width : Count;
+            ULONG hi = (lo + 2 * width < Count) ? lo + 2 * width : Count;
+            ULONG a = lo, b = mid, k = lo;
+            while (a < mid && b < hi)
+                dst[k++] = (src[b].due < src[a].due) ? src[b++] : src[a++];
+            while (a < mid)
+                dst[k++] = src[a++];
+            while (b < hi)
+                dst[k++] = src[b++];
+        }
+        QUEUED_INPUT* t = src;
+        src = dst;
+        dst = t;
+    }
+    if (src != g_Batch)
+        RtlCopyMemory(g_Batch, src, Count * sizeof(QUEUED_INPUT));
+}
+
+NTSTATUS TimedQueueInitialize(VOID)
+{
+    KeInitializeSpinLock(&g_Lock);
+    g_Head = 0;
+    g_Count = 0;
+    g_Timer = ExAllocateTimer(TimerCallback, NULL, EX_TIMER_HIGH_RESOLUTION);
+    return g_Timer ? STATUS_SUCCESS : STATUS_INSUFFICIENT_RESOURCES;
+}
+
+VOID TimedQueueCleanup(VOID)
+{
+    if (g_Timer) {
+        EXT_DELETE_PARAMETERS params;
+        ExInitializeDeleteTimerParameters(&params);
+        ExDeleteTimer(g_Timer, TRUE, TRUE, &params);
+        g_Timer = NULL;
+    }
+    g_Count = 0;
+}
+
+NTSTATUS TimedQueueSubmit(const SCHEDULED_INPUT* Entries, ULONG Count)
+{
+    if (!g_Timer)
+        return STATUS_DEVICE_NOT_READY;
+
+    KIRQL irql;
+    KeAcquireSpinLock(&g_Lock, &irql);
+    if (Count > INPUT_HOG_QUEUE_CAPACITY - g_Count) {
+        KeReleaseSpinLock(&g_Lock, irql);
+        return STATUS_INSUFFICIENT_RESOURCES;
+    }
+
+    ULONGLONG now = Now();
+    for (ULONG i = 0; i < Count; i++) {
+        g_Batch[i].due = now + Entries[i].dueUs * 10;
+        g_Batch[i].buttonFlags = Entries[i].buttonFlags;
+        g_Batch[i].x = Entries[i].x;
+        g_Batch[i].y = Entries[i].y;
+    }
+    SortBatchLocked(Count);
+
+    // Merge from the tail: O(depth + Count), and O(Count) when the batch is due after
+    // everything queued (the usual case). Ties keep queued events first.
+    ULONG i = g_Count, j = Count, k = g_Count + Count;
+    while (j > 0) {
+        if (i > 0 && SLOT(i - 1).due > g_Batch[j - 1].due)
+            SLOT(--k) = SLOT(--i);
+        else
+            SLOT(--k) = g_Batch[--j];
+    }
+    g_Count += Count;
+    g_TotalScheduled += Count;
+    ArmLocked(now);
+    KeReleaseSpinLock(&g_Lock, irql);
+    return STATUS_SUCCESS;
+}
+
+ULONG TimedQueueCancel(VOID)
+{
+    KIRQL irql;
+    KeAcquireSpinLock(&g_Lock, &irql);
+    ULONG removed = g_Count;
+    g_Count = 0;
+    g_Head = 0;
+    g_TotalCancelled += removed;
+    if (g_Timer)
+        ExCancelTimer(g_Timer, NULL);
+    KeReleaseSpinLock(&g_Lock, irql);
+    return removed;
+}
+
+VOID TimedQueueQuery(PINPUT_HOG_QUEUE_INFO Info)
+{
+    KIRQL irql;
+    KeAcquireSpinLock(&g_Lock, &irql);
+    Info->depth = g_Count;
+    Info->capacity = INPUT_HOG_QUEUE_CAPACITY;
+    Info->totalScheduled = g_TotalScheduled;
+    Info->totalReleased = g_TotalReleased;
+    Info->totalCancelled = g_TotalCancelled;
+    Info->failedReleases = g_FailedReleases;
+    Info->maxLatenessUs = g_MaxLatenessUs;
+    KeReleaseSpinLock(&g_Lock, irql);
+}
@@ -0,0 +1,15 @@
+#pragma once
+
+#include <ntddk.h>
+#include <wdm.h>
+#include "../shared/ioctl.h"
+
+NTSTATUS TimedQueueInitialize(VOID);
+
+VOID TimedQueueCleanup(VOID);
+
+NTSTATUS TimedQueueSubmit(const SCHEDULED_INPUT* Entries, ULONG Count);
+
+ULONG TimedQueueCancel(VOID);
+
+VOID TimedQueueQuery(PINPUT_HOG_QUEUE_INFO Info);
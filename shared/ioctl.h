@@ -13,6 +13,62 @@
 #define IOCTL_INPUT_HOG_GET_STATUS \
     CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x802, METHOD_BUFFERED, FILE_ANY_ACCESS)
 
+#define IOCTL_INPUT_HOG_SCHEDULE \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x804, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+#define IOCTL_INPUT_HOG_CANCEL \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x805, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+#define IOCTL_INPUT_HOG_QUEUE_INFO \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x806, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+#define IOCTL_INPUT_HOG_RING_MAP \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x807, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+#define IOCTL_INPUT_HOG_RING_UNMAP \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x808, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+#define IOCTL_INPUT_HOG_RING_DOORBELL \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x809, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+#define IOCTL_INPUT_HOG_MOVE_ABSOLUTE \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x80A, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+#define IOCTL_INPUT_HOG_KEYBOARD_INPUT \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x80B, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+#define IOCTL_INPUT_HOG_INPUT_BATCH \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x80C, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+#define IOCTL_INPUT_HOG_JOURNAL_READ \
+    CTL_CODE(INPUT_HOG_DEVICE_TYPE, 0x80D, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+// Maximum number of events waiting in the driver's timed queue
+#define INPUT_HOG_QUEUE_CAPACITY 4096
+
+#define INPUT_HOG_RING_MAGIC 0x47524849  // 'IHRG'
+#define INPUT_HOG_RING_MAX_CAPACITY 65536
+
+// MOUSE_ABSOLUTE_REQUEST coordinates: 0..65535 across the whole virtual desktop
+#define INPUT_HOG_ABSOLUTE_MAX 65535
+
+// KEYBOARD_INPUT_REQUEST flags (same values as KEY_BREAK/KEY_E0/KEY_E1 in ntddkbd.h)
+#define INPUT_HOG_KEY_BREAK 0x0001
+#define INPUT_HOG_KEY_E0    0x0002
+#define INPUT_HOG_KEY_E1    0x0004
+
+// INPUT_BATCH_ENTRY types
+#define INPUT_HOG_ENTRY_MOUSE          0  // flags = button flags, x/y = relative move
+#define INPUT_HOG_ENTRY_MOUSE_ABSOLUTE 1  // flags = button flags, x/y = 0..INPUT_HOG_ABSOLUTE_MAX
+#define INPUT_HOG_ENTRY_KEYBOARD       2  // flags = INPUT_HOG_KEY_*, x = make code, y unused
+
+// Maximum number of entries in one IOCTL_INPUT_HOG_INPUT_BATCH
+#define INPUT_HOG_BATCH_MAX 4096
+
+// Injection journal: the driver keeps this many most recent events
+#define INPUT_HOG_JOURNAL_CAPACITY 4096
+#define INPUT_HOG_JOURNAL_VERSION 1
+
 #pragma pack(push, 1)
 
 typedef struct _MOUSE_MOVE_REQUEST {
@@ -26,6 +82,67 @@ typedef struct _MOUSE_INPUT_REQUEST {
     LONG y;
 } MOUSE_INPUT_REQUEST, *PMOUSE_INPUT_REQUEST;
 
+// Absolute move (MOUSE_MOVE_ABSOLUTE | MOUSE_VIRTUAL_DESKTOP), optionally with
+// button flags. x/y are normalised: 0 = left/top, 65535 = right/bottom edge.
+typedef struct _MOUSE_ABSOLUTE_REQUEST {
+    USHORT buttonFlags;
+    LONG x;
+    LONG y;
+} MOUSE_ABSOLUTE_REQUEST, *PMOUSE_ABSOLUTE_REQUEST;
+
+// One key press or release through the KbdClass service callback.
+// makeCode is the set-1 scan code without its E0/E1 prefix (see flags).
+typedef struct _KEYBOARD_INPUT_REQUEST {
+    USHORT makeCode;
+    USHORT flags;
+} KEYBOARD_INPUT_REQUEST, *PKEYBOARD_INPUT_REQUEST;
+
+// One event of an IOCTL_INPUT_HOG_INPUT_BATCH; see INPUT_HOG_ENTRY_*.
+typedef struct _INPUT_BATCH_ENTRY {
+    USHORT type;
+    USHORT flags;
+    LONG x;
+    LONG y;
+} INPUT_BATCH_ENTRY, *PINPUT_BATCH_ENTRY;
+
+// Mouse and keyboard events injected in order. The driver validates every
+// entry first, so a batch is injected whole or not at all; the optional
+// output ULONG receives the number of entries injected.
+typedef struct _INPUT_BATCH_REQUEST {
+    ULONG count;
+    INPUT_BATCH_ENTRY entries[1];  // count entries
+} INPUT_BATCH_REQUEST, *PINPUT_BATCH_REQUEST;
+
+// IOCTL_INPUT_HOG_JOURNAL_READ input: return entries with sequence > sinceSequence
+typedef struct _JOURNAL_READ_REQUEST {
+    ULONGLONG sinceSequence;
+} JOURNAL_READ_REQUEST, *PJOURNAL_READ_REQUEST;
+
+// IOCTL_INPUT_HOG_JOURNAL_READ output: this header, then count entries
+// (as many as fit in the output buffer), oldest first. Entries older than
+// oldestSequence were overwritten.
+typedef struct _INPUT_HOG_JOURNAL_HEADER {
+    ULONG version;
+    ULONG count;
+    ULONGLONG oldestSequence;  // oldest entry still held
+    ULONGLONG nextSequence;    // sequence the next event will get
+    LONGLONG qpcFrequency;     // ticks per second of the qpc timestamps
+    ULONG capacity;
+    ULONG entrySize;
+} INPUT_HOG_JOURNAL_HEADER, *PINPUT_HOG_JOURNAL_HEADER;
+
+// One injected event. type is an INPUT_HOG_ENTRY_* value; flags are button
+// or key flags; x/y are the delta, absolute position or make code.
+typedef struct _INPUT_HOG_JOURNAL_ENTRY {
+    ULONGLONG sequence;
+    LONGLONG qpc;  // KeQueryPerformanceCounter at injection
+    USHORT type;
+    USHORT flags;
+    LONG x;
+    LONG y;
+    LONG status;   // NTSTATUS of the injection
+} INPUT_HOG_JOURNAL_ENTRY, *PINPUT_HOG_JOURNAL_ENTRY;
+
 typedef struct _INPUT_HOG_STATUS {
     ULONG version;
     ULONG injectionInitialized;
@@ -34,6 +151,50 @@ typedef struct _INPUT_HOG_STATUS {
     LONG lastInjectStatus;
     ULONG totalRequests;
     ULONG failedRequests;
+    ULONG keyboardCallbackFound;  // version 2+
 } INPUT_HOG_STATUS, *PINPUT_HOG_STATUS;
 
+// One event of an IOCTL_INPUT_HOG_SCHEDULE batch.
+// dueUs is relative to the moment the driver accepts the batch.
+typedef struct _SCHEDULED_INPUT {
+    ULONGLONG dueUs;
+    USHORT buttonFlags;
+    LONG x;
+    LONG y;
+} SCHEDULED_INPUT, *PSCHEDULED_INPUT;
+
+typedef struct _SCHEDULE_REQUEST {
+    ULONG count;
+    SCHEDULED_INPUT entries[1];  // count entries
+} SCHEDULE_REQUEST, *PSCHEDULE_REQUEST;
+
+typedef struct _INPUT_HOG_QUEUE_INFO {
+    ULONG depth;
+    ULONG capacity;
+    ULONG totalScheduled;
+    ULONG totalReleased;
+    ULONG totalCancelled;
+    ULONG failedReleases;
+    ULONG maxLatenessUs;
+} INPUT_HOG_QUEUE_INFO, *PINPUT_HOG_QUEUE_INFO;
+
+typedef struct _RING_MAP_REQUEST {
+    ULONGLONG address;  // user-mode address of the ring in the calling process
+    ULONG size;         // bytes, header included
+} RING_MAP_REQUEST, *PRING_MAP_REQUEST;
+
+// Shared ring: this header followed by capacity MOUSE_INPUT_REQUEST slots.
+// head/tail are free-running; slot = index & (capacity - 1).
+// Empty when head == tail, full when head - tail == capacity.
+typedef struct _INPUT_HOG_RING_HEADER {
+    ULONG magic;
+    ULONG capacity;           // power of two
+    volatile ULONG head;      // written by the controller (producer)
+    volatile ULONG tail;      // written by the driver (consumer)
+    volatile ULONG consumed;  // status counters, written by the driver
+    volatile ULONG failed;
+    volatile LONG lastInjectStatus;
+    ULONG reserved;
+} INPUT_HOG_RING_HEADER, *PINPUT_HOG_RING_HEADER;
+
 #pragma pack(pop)